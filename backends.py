@@ -0,0 +1,598 @@
+"""
+Healthcare System - Database Backends
+One small interface over MySQL and two embedded engines, so the whole
+generate -> denormalize -> normalize -> analyze cycle can run without a
+server:
+
+  mysql    MySQL/MariaDB over a native driver connection (db_loader)
+  sqlite   SQLite (standard library), row store
+  duckdb   DuckDB (pip install duckdb), columnar analytics
+
+The project's SQL files are written for MySQL. Statements are translated
+for the embedded engines as they are executed: MySQL-only functions
+(CURDATE, YEAR, DATE_FORMAT, DATE_SUB, DATEDIFF, CONCAT, GROUP_CONCAT),
+AUTO_INCREMENT, inline INDEX/KEY clauses, ON UPDATE CURRENT_TIMESTAMP,
+foreign keys, and (for DuckDB) MySQL's loose aggregates without GROUP BY. Each MySQL database becomes a SQLite file attached under
+the database's name, or a DuckDB schema, so references such as
+healthcare_system.denormalized_patient_encounters keep working.
+"""
+
+import csv
+import os
+import re
+import tempfile
+import threading
+import time
+
+import db_loader
+
+BACKENDS = ("mysql", "sqlite", "duckdb")
+DEFAULT_DATABASE = "healthcare_system"
+
+
+# ============================================================================
+# DIALECT TRANSLATION
+# ============================================================================
+# Calls are rewritten innermost-first with a small parenthesis-aware
+# scanner; string literals in the project's SQL never contain parentheses
+# or commas that would confuse it.
+
+def _split_args(text):
+    """Split a call's argument text (or a CREATE TABLE body) on top-level commas."""
+    args, depth, start, quote = [], 0, 0, None
+    for i, ch in enumerate(text):
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "'\"":
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            args.append(text[start:i].strip())
+            start = i + 1
+    args.append(text[start:].strip())
+    return args
+
+
+def rewrite_calls(sql, name, render):
+    """Replace every NAME(args) call with render(args)."""
+    pattern = re.compile(r"\b" + name + r"\s*\(", re.I)
+    pos = 0
+    while True:
+        m = pattern.search(sql, pos)
+        if m is None:
+            return sql
+        depth, end = 1, m.end()
+        while depth:
+            depth += {"(": 1, ")": -1}.get(sql[end], 0)
+            end += 1
+        inner = rewrite_calls(sql[m.end():end - 1], name, render)
+        replacement = render(_split_args(inner))
+        sql = sql[:m.start()] + replacement + sql[end:]
+        pos = m.start() + len(replacement)
+
+
+def _group_concat(dialect):
+    def render(args):
+        body, separator = args[0], "','"
+        m = re.search(r"\s+SEPARATOR\s+('.*')$", body, re.I | re.S)
+        if m:
+            body, separator = body[:m.start()], m.group(1)
+        body = re.sub(r"\s+ORDER\s+BY\s+.*$", "", body, flags=re.I | re.S)
+        if dialect == "duckdb":
+            return f"STRING_AGG({body}, {separator})"
+        # SQLite does not accept a separator together with DISTINCT
+        if body.upper().startswith("DISTINCT"):
+            return f"GROUP_CONCAT({body})"
+        return f"GROUP_CONCAT({body}, {separator})"
+    return render
+
+
+# MySQL's age-in-years idiom compares a boolean arithmetically, which DuckDB rejects
+_AGE_IDIOM = re.compile(r"YEAR\(CURDATE\(\)\) - YEAR\(([\w.]+)\) - "
+                        r"\(DATE_FORMAT\(CURDATE\(\), '%m%d'\) < DATE_FORMAT\(\1, '%m%d'\)\)", re.I)
+
+
+def translate_query(sql, dialect):
+    """Rewrite the MySQL functions in one DML statement or query."""
+    if dialect == "mysql":
+        return sql
+    if dialect == "duckdb":
+        sql = _AGE_IDIOM.sub(r"DATE_PART('year', AGE(CURRENT_DATE, \1))", sql)
+    today = "DATE('now')" if dialect == "sqlite" else "CURRENT_DATE"
+    sql = re.sub(r"\bCURDATE\(\)", today, sql, flags=re.I)
+    sql = rewrite_calls(sql, "GROUP_CONCAT", _group_concat(dialect))
+    sql = rewrite_calls(sql, "CONCAT", lambda a: "(" + " || ".join(a) + ")")
+    if dialect == "sqlite":
+        sql = rewrite_calls(sql, "DATE_SUB", lambda a: "DATE({}, '-{} {}')".format(
+            a[0], *re.match(r"INTERVAL\s+(\d+)\s+(\w+)", a[1], re.I).groups()))
+        sql = rewrite_calls(sql, "DATEDIFF",
+                            lambda a: f"CAST(JULIANDAY({a[0]}) - JULIANDAY({a[1]}) AS INTEGER)")
+        sql = rewrite_calls(sql, "YEAR", lambda a: f"CAST(STRFTIME('%Y', {a[0]}) AS INTEGER)")
+        sql = rewrite_calls(sql, "DATE_FORMAT", lambda a: f"STRFTIME({a[1]}, {a[0]})")
+    else:
+        sql = rewrite_calls(sql, "DATE_SUB", lambda a: f"({a[0]} - {a[1]})")
+        sql = rewrite_calls(sql, "DATEDIFF", lambda a: f"DATE_DIFF('day', {a[1]}, {a[0]})")
+        sql = rewrite_calls(sql, "DATE_FORMAT", lambda a: f"STRFTIME({a[0]}, {a[1]})")
+        sql = _any_value_columns(sql)
+    return sql
+
+
+_AGGREGATE = re.compile(r"\b(?:COUNT|SUM|AVG|MIN|MAX|STRING_AGG)\s*\(", re.I)
+_IDENTIFIER = re.compile(r"[A-Za-z_][\w.]*$")
+
+
+def _top_level(sql, pattern, start=0):
+    """First match of pattern outside parentheses and quotes, or None."""
+    regex = re.compile(pattern, re.I)
+    depth, quote = 0, None
+    for i in range(start, len(sql)):
+        ch = sql[i]
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "'\"":
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif depth == 0:
+            m = regex.match(sql, i)
+            if m and (i == 0 or not (sql[i - 1].isalnum() or sql[i - 1] == "_")):
+                return m
+    return None
+
+
+def _is_aggregate(expr):
+    """True if expr calls an aggregate function that is not a window function."""
+    for m in _AGGREGATE.finditer(expr):
+        depth, end = 1, m.end()
+        while depth and end < len(expr):
+            depth += {"(": 1, ")": -1}.get(expr[end], 0)
+            end += 1
+        if not re.match(r"\s*OVER\b", expr[end:], re.I):
+            return True
+    return False
+
+
+def _any_value_columns(sql):
+    """Wrap the loose columns of an aggregate query without GROUP BY in ANY_VALUE().
+
+    MySQL (without ONLY_FULL_GROUP_BY) and SQLite collapse such a query to
+    one row and take the other columns from any row; DuckDB rejects it.
+    Select items, window PARTITION BY items and ORDER BY items that are not
+    aggregates get ANY_VALUE(), keeping their output names.
+    """
+    select = re.match(r"\s*SELECT\s+(DISTINCT\s+)?", sql, re.I)
+    frm = select and _top_level(sql, r"FROM\b", select.end())
+    if frm is None or _top_level(sql, r"(GROUP\s+BY|UNION)\b", frm.end()):
+        return sql
+    items = _split_args(sql[select.end():frm.start()])
+    if not any(_is_aggregate(item) for item in items) or all(_is_aggregate(item) for item in items):
+        return sql
+    names, columns = set(), []
+    for item in items:
+        alias = re.search(r"\s+AS\s+(\w+)$", item, re.I)
+        expr = item[:alias.start()] if alias else item
+        name = alias.group(1) if alias else expr.split(".")[-1] if _IDENTIFIER.match(expr) else None
+        names.add((name or "").lower())
+        if re.search(r"\bOVER\s*\(", expr, re.I):
+            expr = re.sub(r"(PARTITION\s+BY\s+)([^)]*?)(\s+ORDER\s+BY\b|\)|$)",
+                          lambda m: m.group(1) + ", ".join(f"ANY_VALUE({p})" for p in _split_args(m.group(2)))
+                          + m.group(3), expr, flags=re.I)
+        elif not _is_aggregate(expr):
+            expr = f"ANY_VALUE({expr})"
+        columns.append(f"{expr} AS {name}" if name else expr)
+    rest = sql[frm.start():]
+    order = _top_level(rest, r"ORDER\s+BY\s+")
+    if order:
+        keys = []
+        keys_text = rest[order.end():].rstrip()
+        end = keys_text[len(keys_text.rstrip(";")):] + rest[len(rest.rstrip()):]
+        for key in _split_args(keys_text.rstrip(";")):
+            m = re.match(r"(.*?)(\s+(?:ASC|DESC))?$", key, re.I | re.S)
+            expr, direction = m.group(1), m.group(2) or ""
+            if expr.lower() not in names and not _is_aggregate(expr):
+                expr = f"ANY_VALUE({expr})"
+            keys.append(expr + direction)
+        rest = rest[:order.end()] + ", ".join(keys) + end
+    return sql[:select.end()] + ",\n    ".join(columns) + "\n" + rest
+
+
+_CREATE_TABLE = re.compile(r"\s*CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?([\w.]+)\s*\((.*)\)[^)]*$", re.I | re.S)
+_INDEX_ITEM = re.compile(r"(?:INDEX|KEY)\s+(\w+)\s*(\(.*\))$", re.I | re.S)
+_UNIQUE_KEY_ITEM = re.compile(r"UNIQUE\s+(?:KEY|INDEX)\s+\w+\s*(\(.*\))$", re.I | re.S)
+
+
+def translate_create_table(sql, dialect):
+    """CREATE TABLE plus the statements it needs (sequences, indexes).
+
+    Foreign keys are dropped: SQLite ignores them by default and DuckDB
+    cannot update or delete referenced rows. DuckDB also skips secondary
+    indexes; it scans with zone maps and ART indexes only slow bulk loads.
+    Table options (ENGINE, PARTITION BY) are dropped.
+    """
+    m = _CREATE_TABLE.match(sql)
+    if m is None:
+        return [sql]
+    if_not_exists, table, body = m.group(1) or "", m.group(2), m.group(3)
+    before, items, after = [], [], []
+    for item in _split_args(body):
+        upper = item.upper()
+        if upper.startswith(("FOREIGN KEY", "CONSTRAINT")):
+            continue
+        unique = _UNIQUE_KEY_ITEM.match(item)
+        if unique:
+            items.append(f"UNIQUE {unique.group(1)}")
+            continue
+        index = _INDEX_ITEM.match(item)
+        if index:
+            if dialect == "sqlite":
+                after.append(f"CREATE INDEX IF NOT EXISTS {table}_{index.group(1)} ON {table} {index.group(2)}")
+            continue
+        item = re.sub(r"\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP(\(\d*\))?", "", item, flags=re.I)
+        if re.search(r"\bAUTO_INCREMENT\b", item, re.I):
+            column = item.split()[0]
+            item = re.sub(r"\s+AUTO_INCREMENT\b", "", item, flags=re.I)
+            if dialect == "sqlite" and re.search(r"\bPRIMARY\s+KEY\b", item, re.I):
+                item = f"{column} INTEGER PRIMARY KEY"  # rowid alias, assigned automatically
+            elif dialect == "duckdb":
+                sequence = f"{table}_{column}_seq"
+                before.append(f"CREATE SEQUENCE IF NOT EXISTS {sequence}")
+                item += f" DEFAULT nextval('{sequence}')"
+        items.append(item)
+    create = f"CREATE TABLE {if_not_exists}{table} (\n    " + ",\n    ".join(items) + "\n)"
+    return before + [create] + after
+
+
+def column_definitions(sql):
+    """[(column, definition)] from a CREATE TABLE statement, skipping keys and indexes."""
+    m = _CREATE_TABLE.match(sql)
+    if m is None:
+        raise ValueError("not a CREATE TABLE statement")
+    columns = []
+    for item in _split_args(m.group(3)):
+        if re.match(r"(PRIMARY|UNIQUE|FOREIGN|CONSTRAINT|INDEX|KEY)\b", item, re.I):
+            continue
+        name, definition = item.split(None, 1)
+        columns.append((name, definition))
+    return columns
+
+
+def table_columns(sql):
+    """[(column, MySQL type)] from a CREATE TABLE statement, in table order."""
+    return [(name, re.match(r"\w+(\([\d, ]+\))?", definition).group().upper())
+            for name, definition in column_definitions(sql)]
+
+
+def translate_statement(sql, dialect):
+    """Engine statements (possibly none) for one MySQL statement."""
+    if dialect == "mysql":
+        return [sql]
+    if re.match(r"\s*SET\s", sql, re.I):
+        return []  # session settings such as FOREIGN_KEY_CHECKS
+    if re.match(r"\s*CREATE\s+TABLE\b", sql, re.I):
+        return translate_create_table(sql, dialect)
+    if dialect == "sqlite":
+        sql = re.sub(r"^\s*TRUNCATE\s+TABLE\s+", "DELETE FROM ", sql, flags=re.I)
+    return [translate_query(sql, dialect)]
+
+
+# ============================================================================
+# BACKENDS
+# ============================================================================
+
+_DATABASE_STATEMENT = re.compile(
+    r"\s*(?:(DROP)\s+DATABASE\s+(?:IF\s+EXISTS\s+)?|(CREATE)\s+DATABASE\s+(?:IF\s+NOT\s+EXISTS\s+)?|(USE)\s+)"
+    r"`?(\w+)`?\s*$", re.I)
+_PLACEHOLDER = re.compile(r"%([s%])")
+
+
+class Backend:
+    """Executes MySQL-dialect statements on one connection.
+
+    execute() takes statements written for MySQL, with %s parameters
+    when params are given, and returns the cursor to fetch from.
+    """
+
+    dialect = None
+
+    def cursor(self):
+        return self.conn.cursor()
+
+    def prepare(self, sql, params=None):
+        if params is not None and self.dialect != "mysql":
+            sql = _PLACEHOLDER.sub(lambda m: "?" if m.group(1) == "s" else "%", sql)
+        return translate_statement(sql, self.dialect)
+
+    def execute(self, sql, params=None, cursor=None):
+        if self.dialect != "mysql":
+            m = _DATABASE_STATEMENT.match(sql)
+            if m:
+                drop, create, _, name = m.groups()
+                (self.drop_database if drop else self.create_database if create else self.use)(name)
+                return None
+        cursor = cursor or self.cursor()
+        for statement in self.prepare(sql, params):
+            cursor.execute(statement, params or ())
+        return cursor
+
+    def query(self, sql, params=None):
+        """All rows of one query."""
+        cursor = self.execute(sql, params)
+        try:
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def result(self, cursor):
+        """(rows or None, rowcount) of the statement just executed."""
+        return (cursor.fetchall() if cursor.description else None), cursor.rowcount
+
+    def run_statements(self, statements, on_statement=None):
+        """Execute statements in order, like db_loader.execute_statements()."""
+        timings = []
+        for index, sql in enumerate(statements, 1):
+            start = time.perf_counter()
+            cursor = self.execute(sql)
+            rows = rowcount = None
+            if cursor is not None:
+                rows, rowcount = self.result(cursor)
+                cursor.close()
+            timing = db_loader.StatementTiming(index, sql, time.perf_counter() - start, rowcount)
+            timings.append(timing)
+            if on_statement:
+                on_statement(timing, rows)
+        return timings
+
+    def run_sql_file(self, path, on_statement=db_loader.print_statement):
+        with open(path, "r", encoding="utf-8") as f:
+            return self.run_statements(db_loader.iter_sql_statements(f), on_statement)
+
+    def insert_rows(self, table, columns, rows, batch_size=db_loader.DEFAULT_BATCH_SIZE):
+        """Bulk insert value tuples; returns the number of rows inserted."""
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})"
+        total = 0
+        cursor = self.cursor()
+        try:
+            for batch in _batches(rows, batch_size):
+                cursor.execute("BEGIN")
+                cursor.executemany(sql, batch)
+                cursor.execute("COMMIT")
+                total += len(batch)
+        finally:
+            cursor.close()
+        return total
+
+    def close(self):
+        self.conn.close()
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class MySQLBackend(Backend):
+    """An open MySQL/MariaDB connection; statements pass through unchanged."""
+
+    dialect = "mysql"
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def insert_rows(self, table, columns, rows, batch_size=db_loader.DEFAULT_BATCH_SIZE):
+        return db_loader.insert_rows(self.conn, table, columns, rows, batch_size)
+
+    def close(self):
+        pass  # the connection belongs to its pool
+
+
+class SQLiteBackend(Backend):
+    """SQLite with one database file per MySQL database.
+
+    The current database (USE) is opened as main and the others are
+    attached under their names. Without a path every database is a named
+    shared in-memory database. Durability is traded for load speed
+    (synchronous=OFF, in-memory journal), which suits throwaway runs.
+    """
+
+    dialect = "sqlite"
+
+    def __init__(self, path=None, database=DEFAULT_DATABASE):
+        self.path = path
+        self.primary = database
+        self.databases = [database]
+        self._memory = {}  # database -> connection keeping a shared in-memory database alive
+        self.conn = None
+        self.use(database)
+
+    def location(self, database):
+        if self.path is None:
+            return f"file:{database}?mode=memory&cache=shared"
+        if database == self.primary:
+            return self.path
+        stem, ext = os.path.splitext(self.path)
+        return f"{stem}_{database}{ext or '.sqlite'}"
+
+    def _open(self, database):
+        import sqlite3
+        if self.path is None and database not in self._memory:
+            self._memory[database] = sqlite3.connect(self.location(database), uri=True)
+        return sqlite3.connect(self.location(database), uri=self.path is None,
+                               isolation_level=None, check_same_thread=False)
+
+    def _exists(self, database):
+        return database in self._memory if self.path is None else os.path.exists(self.location(database))
+
+    def use(self, database):
+        if database not in self.databases:
+            self.databases.append(database)
+        if self.conn is not None:
+            self.conn.close()
+        self.conn = self._open(database)
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute("PRAGMA journal_mode = MEMORY")
+        self.database = database
+        for other in self.databases:
+            if other != database and self._exists(other):
+                self.conn.execute("ATTACH DATABASE ? AS " + other, (self.location(other),))
+
+    def create_database(self, database):
+        if database in self.databases and self._exists(database):
+            return
+        if database not in self.databases:
+            self.databases.append(database)
+        self._open(database).close()  # creates the file / in-memory database
+        if database != self.database:
+            self.conn.execute("ATTACH DATABASE ? AS " + database, (self.location(database),))
+
+    def drop_database(self, database):
+        current = database == self.database
+        if current:
+            self.conn.close()
+            self.conn = None
+        elif self._exists(database):
+            self.conn.execute("DETACH DATABASE " + database)
+        if self.path is None:
+            memory = self._memory.pop(database, None)
+            if memory is not None:
+                memory.close()
+        elif os.path.exists(self.location(database)):
+            os.remove(self.location(database))
+        if current:
+            self.use(database)
+
+    def close(self):
+        self.conn.close()
+        for memory in self._memory.values():
+            memory.close()
+
+
+class DuckDBBackend(Backend):
+    """DuckDB with one schema per MySQL database (in-memory without a path)."""
+
+    dialect = "duckdb"
+
+    def __init__(self, path=None, database=DEFAULT_DATABASE, threads=None):
+        try:
+            import duckdb
+        except ImportError:
+            raise RuntimeError("DuckDB backend requires the duckdb package (pip install duckdb)")
+        self.conn = duckdb.connect(path or ":memory:")
+        if threads:
+            self.conn.execute(f"SET threads = {int(threads)}")
+        self.database = None
+        self.create_database(database)
+        self.use(database)
+
+    def cursor(self):
+        # Cursors are separate connections and do not inherit USE
+        cursor = self.conn.cursor()
+        self._search(cursor, self.database)
+        return cursor
+
+    @staticmethod
+    def _search(conn, database):
+        # main stays on the path for tables created outside any schema
+        conn.execute(f"USE {database}")
+        conn.execute(f"SET search_path = '{database},main'")
+
+    def use(self, database):
+        self._search(self.conn, database)
+        self.database = database
+
+    def create_database(self, database):
+        self.conn.execute(f"CREATE SCHEMA IF NOT EXISTS {database}")
+
+    def drop_database(self, database):
+        if database == self.database:
+            self.conn.execute("USE main")
+        self.conn.execute(f"DROP SCHEMA IF EXISTS {database} CASCADE")
+        if database == self.database:
+            self.create_database(database)
+            self.use(database)
+
+    def result(self, cursor):
+        # DML reports its row count as a one-row 'Count' result
+        rows = cursor.fetchall() if cursor.description else None
+        if rows and [d[0] for d in cursor.description] == ["Count"]:
+            return None, rows[0][0]
+        return rows, cursor.rowcount
+
+    def insert_rows(self, table, columns, rows, batch_size=100_000):
+        """Bulk insert through Arrow when pyarrow is installed, else a staged CSV.
+
+        DuckDB's executemany() runs one statement per row; scanning a whole
+        batch as a relation is orders of magnitude faster.
+        """
+        try:
+            import pyarrow
+        except ImportError:
+            pyarrow = None
+        target = f"{table} ({', '.join(columns)})"
+        total = 0
+        cursor = self.cursor()
+        try:
+            for batch in _batches(rows, batch_size):
+                if pyarrow is not None:
+                    cursor.register("_batch", pyarrow.table(
+                        {name: list(values) for name, values in zip(columns, zip(*batch))}))
+                    cursor.execute(f"INSERT INTO {target} SELECT * FROM _batch")
+                    cursor.unregister("_batch")
+                else:
+                    self._insert_csv(cursor, target, columns, batch)
+                total += len(batch)
+        finally:
+            cursor.close()
+        return total
+
+    @staticmethod
+    def _insert_csv(cursor, target, columns, batch):
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+                csv.writer(f).writerows([r"\N" if v is None else v for v in row] for row in batch)
+            types = ", ".join(f"'{name}': 'VARCHAR'" for name in columns)
+            cursor.execute(f"INSERT INTO {target} SELECT * FROM read_csv(?, header = false, "
+                           f"nullstr = '\\N', columns = {{{types}}})", (path,))
+        finally:
+            os.remove(path)
+
+
+EMBEDDED = {"sqlite": SQLiteBackend, "duckdb": DuckDBBackend}
+
+
+def open_embedded(name, path=None, database=DEFAULT_DATABASE):
+    """SQLiteBackend or DuckDBBackend by name ('sqlite' or 'duckdb')."""
+    return EMBEDDED[name](path, database)
+
+
+def pool_query(pool):
+    """query(sql, params) on a connection borrowed from a db_loader.ConnectionPool per call."""
+    def query(sql, params=None):
+        with pool.connection() as conn:
+            return MySQLBackend(conn).query(sql, params)
+    return query
+
+
+def backend_query(backend):
+    """query(sql, params) on one backend; SQLite calls are serialized on its connection."""
+    if backend.dialect != "sqlite":
+        return backend.query
+    lock = threading.Lock()
+
+    def query(sql, params=None):
+        with lock:
+            return backend.query(sql, params)
+    return query
@@ -0,0 +1,109 @@
+"""
+Healthcare Data Generator - Throughput & Memory Benchmark
+Runs generate_bulk_data.py at several encounter counts and reports
+rows/sec and peak RSS for each run. Every size runs in its own child
+process so peak RSS is measured independently per size.
+
+Usage:
+    python benchmark_generator.py                       # 10k, 1M, 10M encounters
+    python benchmark_generator.py --sizes 10000 100000  # custom sizes
+    python benchmark_generator.py --keep-output         # write real files instead of discarding
+    python benchmark_generator.py --workers 1 8 32      # parallel scaling at each size
+    python benchmark_generator.py --sizes 1000000 --modes faker pooled   # per-row vs pooled
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import generate_bulk_data as gen
+from run_metrics import peak_rss_bytes
+
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+
+
+def run_single(num_encounters, output, chunk_size, workers, mode):
+    """Generate one data set in this process and print its stats as JSON.
+
+    Peak RSS covers this (coordinating) process only; with workers > 1
+    each pool worker has its own, equally bounded, footprint.
+    """
+    with open(output, "w", encoding="utf-8") as f:
+        start = time.perf_counter()
+        config = gen.GenerationConfig(num_encounters=num_encounters, chunk_size=chunk_size,
+                                      workers=workers, mode=mode, tmp_dir=tempfile.gettempdir())
+        rows = gen.write_bulk_sql(f, config)
+        elapsed = time.perf_counter() - start
+        written = f.tell() if output != os.devnull else None
+
+    print(json.dumps({
+        "encounters": num_encounters,
+        "workers": workers,
+        "mode": mode,
+        "rows": rows,
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed else None,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "bytes_written": written,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="encounter counts to benchmark")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="rows per INSERT")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1],
+                        help="worker counts to benchmark at each size")
+    parser.add_argument("--modes", nargs="+", choices=["faker", "pooled"], default=["faker"],
+                        help="generation modes to compare at each size")
+    parser.add_argument("--keep-output", action="store_true",
+                        help="write bench_<N>_<mode>_w<W>.sql files instead of discarding output")
+    parser.add_argument("--json", dest="json_out", help="also write results to this JSON file")
+    parser.add_argument("--single", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--output", default=os.devnull, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single is not None:
+        run_single(args.single, args.output, args.chunk_size, args.workers[0], args.modes[0])
+        return
+
+    results = []
+    print(f"{'encounters':>12} {'mode':>7} {'workers':>8} {'rows':>12} {'seconds':>10} "
+          f"{'rows/sec':>12} {'speedup':>8} {'peak RSS':>12}")
+    runs = [(size, mode, workers) for size in args.sizes
+            for mode in args.modes for workers in args.workers]
+    baselines = {}
+    for size, mode, workers in runs:
+        output = f"bench_{size}_{mode}_w{workers}.sql" if args.keep_output else os.devnull
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--single", str(size),
+             "--chunk-size", str(args.chunk_size), "--workers", str(workers),
+             "--modes", mode, "--output", output],
+            capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        if proc.returncode != 0:
+            print(f"  ERROR at {size} encounters: {proc.stderr.strip()}")
+            sys.exit(1)
+
+        stats = json.loads(proc.stdout.strip().splitlines()[-1])
+        # Speedup is relative to the first mode/worker combination at this size
+        baseline = baselines.setdefault(size, stats["seconds"])
+        stats["speedup"] = round(baseline / stats["seconds"], 2) if stats["seconds"] else None
+        results.append(stats)
+        print(f"{stats['encounters']:>12} {mode:>7} {workers:>8} {stats['rows']:>12} {stats['seconds']:>10} "
+              f"{stats['rows_per_sec']:>12} {stats['speedup']:>8} "
+              f"{gen.format_bytes(stats['peak_rss_bytes']):>12}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
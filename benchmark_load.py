@@ -0,0 +1,160 @@
+"""
+Healthcare Data Generator - Load Time Benchmark
+Generates the same data set as multi-row INSERTs and as CSV/TSV files
+with a LOAD DATA driver, loads each into a local MySQL/MariaDB through
+the mysql command-line client, and compares load times. With --fast-load
+every format is also loaded with generate_bulk_data.py --fast-load
+(indexes and checks deferred) so both modes can be compared.
+
+Prerequisites: healthcare_system schema (healthcare_ddl.sql + encounters
+table) already created, and local_infile=ON on the server.
+
+Usage:
+    python benchmark_load.py --user root --password secret
+    python benchmark_load.py --encounters 5000000 --formats sql tsv csv --workers 8
+    python benchmark_load.py --encounters 10000000 --formats tsv --fast-load --json runs/fast-load.json
+"""
+
+import argparse
+import getpass
+import json
+import os
+import subprocess
+import sys
+import time
+
+import generate_bulk_data as gen
+from setup_normalized_db import find_mysql
+
+
+def run_dir(work_dir, fmt, fast_load):
+    return os.path.join(work_dir, f"{fmt}_fast" if fast_load else fmt)
+
+
+def generate(fmt, work_dir, args, fast_load=False):
+    """Generate one data set in the given format; returns the driver path."""
+    fmt_dir = run_dir(work_dir, fmt, fast_load)
+    os.makedirs(fmt_dir, exist_ok=True)
+    output = os.path.join(fmt_dir, gen.OUTPUT_FILE)
+
+    config = gen.GenerationConfig(
+        num_encounters=args.encounters, workers=args.workers, mode=args.mode,
+        fmt=fmt, tmp_dir=fmt_dir, fast_load=fast_load,
+        profile=gen.workload_profiles.get_profile(args.workload_profile),
+    )
+    start = time.perf_counter()
+    if fmt == "sql":
+        with open(output, "w", encoding="utf-8") as f:
+            gen.write_bulk_sql(f, config)
+    else:
+        gen.write_bulk_delimited(output, config)
+    print(f"  generated {fmt} in {time.perf_counter() - start:.1f}s")
+    return output
+
+
+def load(mysql_path, user, password, driver):
+    """Run a driver script through the mysql client; returns elapsed seconds."""
+    cmd = [mysql_path, "--local-infile=1", "-u", user]
+    if password:
+        cmd.append(f"-p{password}")
+
+    start = time.perf_counter()
+    with open(driver, "r", encoding="utf-8") as f:
+        # Run from the driver's directory: LOAD DATA LOCAL paths are relative
+        result = subprocess.run(cmd, stdin=f, capture_output=True, text=True,
+                                cwd=os.path.dirname(driver))
+    elapsed = time.perf_counter() - start
+
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    problems = fast_load_problems(result.stdout)
+    if problems:
+        raise RuntimeError("fast-load verification failed: " + ", ".join(problems))
+    return elapsed
+
+
+def fast_load_problems(output):
+    """Failed checks in the fast-load verification rows of mysql's batch output."""
+    problems = []
+    for line in output.splitlines():
+        check, _, count = line.partition("\t")
+        if check.startswith(gen.FAST_LOAD_CHECKS) and count.strip().isdigit() and int(count) > 0:
+            problems.append(f"{check} ({count.strip()})")
+    return problems
+
+
+def data_size(driver, fmt):
+    """Total bytes of the driver plus its data files."""
+    paths = [driver]
+    if fmt != "sql":
+        paths += [gen.data_file_path(driver, table, fmt) for table in gen.TABLE_COLUMNS]
+    return sum(os.path.getsize(p) for p in paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", default="root", help="MySQL user")
+    parser.add_argument("--password", help="MySQL password (prompted if omitted)")
+    parser.add_argument("--encounters", type=int, default=5_000_000, help="encounters to load")
+    parser.add_argument("--formats", nargs="+", choices=["sql", "csv", "tsv"],
+                        default=["sql", "tsv", "csv"], help="output formats to compare")
+    parser.add_argument("--mode", choices=["faker", "pooled"], default="pooled",
+                        help="generation mode (pooled is much faster to produce)")
+    parser.add_argument("--workers", type=int, default=1, help="generator worker processes")
+    parser.add_argument("--workload-profile", choices=list(gen.workload_profiles.PROFILES),
+                        default=gen.workload_profiles.DEFAULT_PROFILE,
+                        help="skewed/seasonal encounter workload (see generate_bulk_data.py --help)")
+    parser.add_argument("--work-dir", default="bench_load", help="where generated files go")
+    parser.add_argument("--fast-load", action="store_true",
+                        help="also load every format with indexes and checks deferred (--fast-load)")
+    parser.add_argument("--skip-generate", action="store_true",
+                        help="reuse files from a previous run in --work-dir")
+    parser.add_argument("--json", dest="json_out", help="also write results to this JSON file")
+    args = parser.parse_args()
+
+    mysql_path = find_mysql()
+    if not mysql_path:
+        print("ERROR: MySQL not found! Install MySQL or add it to your PATH.")
+        sys.exit(1)
+    password = args.password if args.password is not None else getpass.getpass("  Password: ")
+
+    results = []
+    for fmt in args.formats:
+        for fast_load in ([False, True] if args.fast_load else [False]):
+            mode = "fast" if fast_load else "plain"
+            print(f"[{fmt}, {mode}]")
+            driver = os.path.join(run_dir(args.work_dir, fmt, fast_load), gen.OUTPUT_FILE)
+            if not args.skip_generate:
+                driver = generate(fmt, args.work_dir, args, fast_load)
+            try:
+                seconds = load(mysql_path, args.user, password, driver)
+            except RuntimeError as e:
+                print(f"  ERROR: {e}")
+                sys.exit(1)
+            results.append({
+                "format": fmt,
+                "load_mode": mode,
+                "workload_profile": args.workload_profile,
+                "encounters": args.encounters,
+                "load_seconds": round(seconds, 2),
+                "rows_per_sec": round(args.encounters / seconds, 1),
+                "bytes": data_size(driver, fmt),
+            })
+            print(f"  loaded in {seconds:.1f}s")
+
+    print()
+    print(f"{'format':>8} {'mode':>6} {'load s':>10} {'enc/sec':>12} {'size MB':>10} {'vs sql':>8}")
+    sql_seconds = next((r["load_seconds"] for r in results
+                        if r["format"] == "sql" and r["load_mode"] == "plain"), None)
+    for r in results:
+        ratio = f"{sql_seconds / r['load_seconds']:.2f}x" if sql_seconds else "-"
+        print(f"{r['format']:>8} {r['load_mode']:>6} {r['load_seconds']:>10} {r['rows_per_sec']:>12} "
+              f"{r['bytes'] / 1048576:>10.1f} {ratio:>8}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Healthcare System - Partition Pruning Benchmark
+Copies denormalized_patient_encounters into a partitioned twin
+(denormalized_patient_encounters_partitioned, same layout as
+healthcare_ddl_partitioned.sql) and runs the analysis queries from
+healthcare_analysis_queries.sql against both, restricted to an
+encounter_date window. Reports median latency per query and how many
+partitions EXPLAIN says the partitioned table actually reads.
+
+Usage:
+    python benchmark_partitions.py --user root --password secret
+    python benchmark_partitions.py --from 2024-10-01 --to 2025-01-01 --repeat 5
+    python benchmark_partitions.py --granularity quarter --skip-copy --json pruning.json
+"""
+
+import argparse
+import getpass
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+import db_loader
+import partition_manager
+
+HEAP_TABLE = partition_manager.TABLE
+PARTITIONED_TABLE = f"{HEAP_TABLE}_partitioned"
+QUERY_FILE = "healthcare_analysis_queries.sql"
+
+
+def build_partitioned_copy(cursor, granularity):
+    """(Re)create the partitioned twin covering the data's date range and fill it."""
+    cursor.execute(f"SELECT MIN(encounter_date), MAX(encounter_date) FROM {HEAP_TABLE}")
+    low, high = cursor.fetchone()
+    if low is None:
+        raise RuntimeError(f"{HEAP_TABLE} is empty")
+    cursor.execute(f"DROP TABLE IF EXISTS {PARTITIONED_TABLE}")
+    cursor.execute(partition_manager.partitioned_table_ddl(low, high, granularity, table=PARTITIONED_TABLE))
+    start = time.perf_counter()
+    cursor.execute(f"INSERT INTO {PARTITIONED_TABLE} SELECT * FROM {HEAP_TABLE}")
+    print(f"  Copied {cursor.rowcount} rows in {time.perf_counter() - start:.1f}s")
+
+
+def default_window(cursor):
+    """The last three months of data: [first day two months before MAX, MAX + 1 day)."""
+    cursor.execute(f"SELECT MAX(encounter_date) FROM {HEAP_TABLE}")
+    high = cursor.fetchone()[0]
+    return partition_manager.add_months(high.replace(day=1), -2), high + timedelta(days=1)
+
+
+def analysis_queries():
+    """Numbered queries that read only the denormalized table."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), QUERY_FILE)
+    with open(path, "r", encoding="utf-8") as f:
+        return [(number, title, sql) for number, title, sql in db_loader.iter_numbered_queries(f)
+                if "FROM encounters" not in sql]
+
+
+def windowed(sql, table, window):
+    """Point the query at table, filtered to the date window.
+
+    The filter sits in a derived table aliased to the original name;
+    MySQL merges it into the outer query, so the predicate reaches the
+    partitioned table and allows pruning.
+    """
+    low, high = window
+    source = (f"(SELECT * FROM {table} WHERE encounter_date >= '{low.isoformat()}' "
+              f"AND encounter_date < '{high.isoformat()}') AS {HEAP_TABLE}")
+    return sql.replace(f"FROM {HEAP_TABLE}", f"FROM {source}")
+
+
+def partitions_read(cursor, sql):
+    """Distinct partitions listed in the EXPLAIN plan."""
+    cursor.execute("EXPLAIN " + sql)
+    columns = [d[0].lower() for d in cursor.description]
+    read = set()
+    for row in cursor.fetchall():
+        value = row[columns.index("partitions")] if "partitions" in columns else None
+        if value:
+            read.update(value.split(","))
+    return read
+
+
+def time_query(cursor, sql, repeat):
+    """Median seconds over repeat runs, and the row count."""
+    timings = []
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(sql)
+        rows = len(cursor.fetchall())
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", default="root", help="MySQL user")
+    parser.add_argument("--password", help="MySQL password (prompted if omitted)")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--database", default="healthcare_system")
+    parser.add_argument("--granularity", choices=list(partition_manager.GRANULARITIES), default="month")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat,
+                        help="window start (default: three months before the newest encounter)")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="window end, exclusive")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per query (median is reported)")
+    parser.add_argument("--skip-copy", action="store_true", help=f"reuse an existing {PARTITIONED_TABLE}")
+    parser.add_argument("--json", dest="json_out", help="also write results to this JSON file")
+    args = parser.parse_args()
+
+    if db_loader.load_driver()[0] is None:
+        print("ERROR: No MySQL driver installed (pip install pymysql)")
+        sys.exit(1)
+    password = args.password if args.password is not None else getpass.getpass("  Password: ")
+    pool = db_loader.ConnectionPool(args.user, password, args.host, args.port, args.database, size=1,
+                                    timeout=db_loader.scaled_timeout(10_000_000))
+
+    results = []
+    try:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            if partition_manager.is_partitioned(cursor, HEAP_TABLE):
+                print(f"ERROR: {HEAP_TABLE} is already partitioned; the benchmark compares it "
+                      f"as a heap table against {PARTITIONED_TABLE}")
+                sys.exit(1)
+            if not args.skip_copy:
+                print(f"Building {PARTITIONED_TABLE} ({args.granularity})...")
+                build_partitioned_copy(cursor, args.granularity)
+            total = len(partition_manager.list_partitions(cursor, PARTITIONED_TABLE))
+
+            window = default_window(cursor)
+            window = (args.date_from or window[0], args.date_to or window[1])
+            print(f"Window: {window[0]} <= encounter_date < {window[1]}, {args.repeat} runs per query")
+            print()
+            print(f"{'#':>3} {'query':<40} {'rows':>8} {'heap ms':>10} {'part ms':>10} "
+                  f"{'speedup':>8} {'partitions':>11}")
+
+            for number, title, sql in analysis_queries():
+                heap_sql = windowed(sql, HEAP_TABLE, window)
+                part_sql = windowed(sql, PARTITIONED_TABLE, window)
+                read = partitions_read(cursor, part_sql)
+                heap_seconds, rows = time_query(cursor, heap_sql, args.repeat)
+                part_seconds, _ = time_query(cursor, part_sql, args.repeat)
+                result = {
+                    "query": number,
+                    "title": title,
+                    "rows": rows,
+                    "heap_ms": round(heap_seconds * 1000, 2),
+                    "partitioned_ms": round(part_seconds * 1000, 2),
+                    "speedup": round(heap_seconds / part_seconds, 2) if part_seconds else None,
+                    "partitions_read": sorted(read),
+                    "partitions_total": total,
+                }
+                results.append(result)
+                print(f"{number:>3} {title[:40]:<40} {rows:>8} {result['heap_ms']:>10} "
+                      f"{result['partitioned_ms']:>10} {result['speedup']:>8} {len(read):>5}/{total:<5}")
+    except Exception as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    finally:
+        pool.close()
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"window": [window[0].isoformat(), window[1].isoformat()],
+                       "granularity": args.granularity, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
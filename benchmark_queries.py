@@ -0,0 +1,253 @@
+"""
+Healthcare System - Analysis Query Benchmark
+Runs the numbered queries of healthcare_analysis_queries.sql (or any file
+in the same '-- N. Title' layout) repeatedly against one database and
+records p50/p95 latency, rows returned and the EXPLAIN plan per query.
+
+Results are written as JSON together with the encounter count, so runs
+against data sets generated at different scales (10k, 1M, 10M encounters)
+or before/after an index change can be compared with --compare.
+
+Backends:
+  mysql    local MySQL/MariaDB server (default)
+  sqlite   SQLite database file (standard library)
+  duckdb   DuckDB database file (pip install duckdb)
+The embedded backends expect a denormalized_patient_encounters table
+(generate_bulk_data.py --backend loads one) and rewrite the MySQL-only
+functions used by the analysis queries (see backends.py).
+
+Usage:
+    python benchmark_queries.py --user root --repeat 10 --json runs/10k.json
+    python benchmark_queries.py --backend sqlite --db-file healthcare.sqlite --json runs/sqlite.json
+    python benchmark_queries.py --user root --queries 1,2,9 --query-file healthcare_analysis_rollup_queries.sql
+    python benchmark_queries.py --compare runs/10k.json runs/1m.json runs/10m.json
+"""
+
+import argparse
+import getpass
+import json
+import math
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import backends
+import db_loader
+
+QUERY_FILE = "healthcare_analysis_queries.sql"
+SCALE_TABLE = "denormalized_patient_encounters"
+EXPLAIN_PREFIX = {"mysql": "EXPLAIN ", "sqlite": "EXPLAIN QUERY PLAN ", "duckdb": "EXPLAIN "}
+
+
+# ============================================================================
+# QUERY LOADING
+# ============================================================================
+
+def load_queries(path, numbers=None):
+    """[(number, title, sql)] from a numbered query file, optionally filtered."""
+    with open(path, "r", encoding="utf-8") as f:
+        queries = list(db_loader.iter_numbered_queries(f))
+    if numbers:
+        queries = [q for q in queries if q[0] in numbers]
+    return queries
+
+
+def parse_numbers(text):
+    """'1,2,5-7' -> {1, 2, 5, 6, 7}"""
+    numbers = set()
+    for part in text.split(","):
+        low, _, high = part.strip().partition("-")
+        numbers.update(range(int(low), int(high or low) + 1))
+    return numbers
+
+
+# ============================================================================
+# BACKENDS
+# ============================================================================
+
+@contextmanager
+def connect(args):
+    """Open the selected backend (backends.py) for the duration of the block."""
+    if args.backend in backends.EMBEDDED:
+        backend = backends.open_embedded(args.backend, args.db_file, args.database)
+        try:
+            yield backend
+        finally:
+            backend.close()
+        return
+
+    if db_loader.load_driver()[0] is None:
+        raise RuntimeError("No MySQL driver installed (pip install pymysql)")
+    password = args.password if args.password is not None else getpass.getpass("  Password: ")
+    pool = db_loader.ConnectionPool(args.user, password, args.host, args.port, args.database, size=1)
+    try:
+        # Full scans at 10M rows can run for minutes; size the timeout to the table
+        pool.timeout = db_loader.scaled_timeout(db_loader.estimated_rows(pool, SCALE_TABLE))
+        pool.close()
+        with pool.connection() as conn:
+            yield backends.MySQLBackend(conn)
+    finally:
+        pool.close()
+
+
+# ============================================================================
+# MEASUREMENT
+# ============================================================================
+
+def percentile(values, pct):
+    """Linearly interpolated percentile of a non-empty list."""
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    low, high = math.floor(k), math.ceil(k)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def _plain(value):
+    return value if value is None or isinstance(value, (int, float, str)) else str(value)
+
+
+def explain(cursor, sql, backend):
+    """EXPLAIN output as a list of {column: value} rows."""
+    cursor.execute(EXPLAIN_PREFIX[backend] + sql)
+    columns = [d[0] for d in cursor.description]
+    return [dict(zip(columns, map(_plain, row))) for row in cursor.fetchall()]
+
+
+def run_query(cursor, sql, repeat, warmup):
+    """Latencies in seconds for repeat timed runs (after warmup runs) and the row count."""
+    rows = 0
+    timings = []
+    for run in range(warmup + repeat):
+        start = time.perf_counter()
+        cursor.execute(sql)
+        rows = len(cursor.fetchall())
+        if run >= warmup:
+            timings.append(time.perf_counter() - start)
+    return timings, rows
+
+
+def benchmark(backend, queries, repeat, warmup):
+    """Time each query; a query that fails is recorded with its error and skipped."""
+    cursor = backend.cursor()
+    results = []
+    print(f"{'#':>3} {'query':<44} {'rows':>9} {'p50 ms':>10} {'p95 ms':>10}")
+    for number, title, sql in queries:
+        result = {"query": number, "title": title}
+        try:
+            sql = backends.translate_query(sql, backend.dialect)
+            result["explain"] = explain(cursor, sql, backend.dialect)
+            timings, rows = run_query(cursor, sql, repeat, warmup)
+        except Exception as e:
+            result["error"] = str(e)
+            print(f"{number:>3} {title[:44]:<44} ERROR: {str(e).splitlines()[0]}")
+            results.append(result)
+            continue
+        ms = [t * 1000 for t in timings]
+        result.update(rows=rows, p50_ms=round(percentile(ms, 50), 3), p95_ms=round(percentile(ms, 95), 3),
+                      min_ms=round(min(ms), 3), max_ms=round(max(ms), 3), timings_ms=[round(t, 3) for t in ms])
+        results.append(result)
+        print(f"{number:>3} {title[:44]:<44} {rows:>9} {result['p50_ms']:>10.2f} {result['p95_ms']:>10.2f}")
+    cursor.close()
+    return results
+
+
+def count_encounters(backend):
+    return backend.query(f"SELECT COUNT(*) FROM {SCALE_TABLE}")[0][0]
+
+
+# ============================================================================
+# COMPARISON
+# ============================================================================
+
+def compare(paths):
+    """Print p50 per query across saved runs, with the last/first ratio."""
+    runs = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            runs.append(json.load(f))
+    labels = [run.get("label") or os.path.basename(path) for run, path in zip(runs, paths)]
+
+    print(" " * 48 + "".join(f"{label[:14]:>15}" for label in labels) + f"{'last/first':>12}")
+    print(f"{'encounters':<48}" + "".join(f"{run.get('encounters', 0):>15,}" for run in runs))
+    titles = {}
+    for run in runs:
+        for result in run["results"]:
+            titles.setdefault(result["query"], result["title"])
+    for number in sorted(titles):
+        p50 = []
+        for run in runs:
+            match = next((r for r in run["results"] if r["query"] == number), {})
+            p50.append(match.get("p50_ms"))
+        cells = "".join(f"{'-' if v is None else format(v, '.2f'):>15}" for v in p50)
+        ratio = f"{p50[-1] / p50[0]:.1f}x" if p50[0] and p50[-1] is not None else "-"
+        print(f"{number:>3} {titles[number][:44]:<44}{cells}{ratio:>12}  (p50 ms)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=backends.BACKENDS, default="mysql")
+    parser.add_argument("--user", default="root", help="MySQL user")
+    parser.add_argument("--password", help="MySQL password (prompted if omitted)")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--database", default="healthcare_system")
+    parser.add_argument("--db-file", help="database file for the sqlite/duckdb backends")
+    parser.add_argument("--query-file", default=QUERY_FILE, help=f"numbered query file (default: {QUERY_FILE})")
+    parser.add_argument("--queries", type=parse_numbers, help="query numbers to run, e.g. 1,2,5-7 (default: all)")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per query (default: 5)")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs per query first (default: 1)")
+    parser.add_argument("--label", help="name for this run in --compare output (default: backend-encounters)")
+    parser.add_argument("--json", dest="json_out", help="write results to this JSON file")
+    parser.add_argument("--compare", nargs="+", metavar="JSON", help="compare saved runs instead of benchmarking")
+    args = parser.parse_args(argv)
+    if args.backend != "mysql" and not args.db_file and not args.compare:
+        parser.error(f"--backend {args.backend} requires --db-file")
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.compare:
+        try:
+            compare(args.compare)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"ERROR: Cannot compare runs: {e}")
+            sys.exit(1)
+        return
+
+    queries = load_queries(args.query_file, args.queries)
+    if not queries:
+        print(f"ERROR: No numbered queries found in {args.query_file}")
+        sys.exit(1)
+
+    try:
+        with connect(args) as backend:
+            encounters = count_encounters(backend)
+            label = args.label or f"{args.backend}-{encounters}"
+            print(f"{label}: {len(queries)} queries from {args.query_file}, {encounters:,} encounters, "
+                  f"{args.repeat} runs each")
+            print()
+            started = datetime.now().isoformat(timespec="seconds")
+            results = benchmark(backend, queries, args.repeat, args.warmup)
+    except Exception as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+    if args.json_out:
+        directory = os.path.dirname(args.json_out)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"label": label, "backend": args.backend,
+                       "database": args.db_file or args.database, "query_file": args.query_file,
+                       "encounters": encounters, "repeat": args.repeat, "warmup": args.warmup,
+                       "started": started, "results": results}, f, indent=2)
+        print(f"\nResults written to {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
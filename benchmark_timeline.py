@@ -0,0 +1,339 @@
+"""
+Healthcare System - Patient Timeline Load Test
+Simulated users page through patient and doctor timelines
+(patient_timeline.py) concurrently for a fixed time, and the run reports
+requests per second, the cache hit rate and p50/p95/p99 latency, both as
+the users saw it and for the database queries behind the misses.
+
+Each user picks a patient (or, for --doctor-share of sessions, a doctor)
+with power-law popularity (--skew, as in the generator's workload
+profiles), reads 1..--pages pages of its timeline with the keyset cursor,
+and starts over. With --invalidate-rate a writer thread fires that many
+invalidations per second for skewed patient ids through the same hooks
+the loaders and dimension updates use, so the hit rate reflects churn.
+--no-cache runs the same load straight against the database.
+
+--compare-offset also pages through the busiest doctor's whole timeline
+with the keyset query and with LIMIT/OFFSET, and reports both latencies
+at the first and the deepest page.
+
+Backends: mysql (a pool of --users connections), sqlite or duckdb
+(--db-file, or --generate for an in-memory data set). The timeline
+indexes are created first where missing.
+
+Usage:
+    python benchmark_timeline.py --user root --users 32 --duration 30 --json runs/timeline.json
+    python benchmark_timeline.py --backend sqlite --generate --encounters 100000 --workload-profile clinic
+    python benchmark_timeline.py --backend sqlite --generate --invalidate-rate 50 --compare-offset
+    python benchmark_timeline.py --backend duckdb --db-file healthcare.duckdb --no-cache
+"""
+
+import argparse
+import getpass
+import json
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import backends
+import db_loader
+import patient_timeline
+import workload_profiles
+from benchmark_queries import percentile
+
+TARGET_TABLE = patient_timeline.TARGET_TABLE
+
+
+# ============================================================================
+# SETUP
+# ============================================================================
+
+@contextmanager
+def open_database(args):
+    """query(sql, params) on the selected backend, with the timeline indexes in place."""
+    if args.backend == "mysql":
+        if db_loader.load_driver()[0] is None:
+            raise RuntimeError("No MySQL driver installed (pip install pymysql)")
+        password = args.password if args.password is not None else getpass.getpass("  Password: ")
+        pool = db_loader.ConnectionPool(args.user, password, args.host, args.port, args.database,
+                                        size=args.users + 1)
+        try:
+            with pool.connection() as conn:
+                patient_timeline.ensure_indexes(backends.MySQLBackend(conn))
+            yield backends.pool_query(pool)
+        finally:
+            pool.close()
+        return
+
+    backend = backends.open_embedded(args.backend, args.db_file, args.database)
+    try:
+        if args.generate:
+            import generate_bulk_data as gen
+            config = gen.GenerationConfig(num_doctors=args.doctors, num_patients=args.patients,
+                                          num_encounters=args.encounters,
+                                          mode="pooled" if gen.np is not None else "faker",
+                                          profile=workload_profiles.get_profile(args.workload_profile))
+            print(f"Generating {args.encounters:,} encounters ({args.workload_profile} workload) "
+                  f"into {args.backend}...")
+            gen.load_rows(backend, config)
+            gen.load_denormalized(backend)
+        patient_timeline.ensure_indexes(backend)
+        yield backends.backend_query(backend)
+    finally:
+        backend.close()
+
+
+class TimedQuery:
+    """Wraps query(sql, params) and records how long each database call took."""
+
+    def __init__(self, query):
+        self.query = query
+        self.seconds = []
+
+    def __call__(self, sql, params=None):
+        start = time.perf_counter()
+        try:
+            return self.query(sql, params)
+        finally:
+            self.seconds.append(time.perf_counter() - start)  # list.append is atomic
+
+
+def skewed_ids(n, skew, salt):
+    """draw(rng) -> an id in 1..n with power-law popularity, hot ids scattered."""
+    scatter = workload_profiles.KeyScatter(n, salt)
+    return lambda rng: scatter(workload_profiles.power_law_rank(rng.random(), n, skew))
+
+
+# ============================================================================
+# LOAD TEST
+# ============================================================================
+
+def run_load(service, args, max_patient, max_doctor):
+    """Run --users sessions for --duration seconds; returns (latencies, invalidations fired)."""
+    patient = skewed_ids(max_patient, args.skew, 1)
+    doctor = skewed_ids(max_doctor, args.skew, 2)
+    deadline = time.perf_counter() + args.duration
+    latencies = [[] for _ in range(args.users)]
+    errors = []
+    stop = threading.Event()
+    fired = 0
+
+    def user(n):
+        rng = random.Random(args.seed * 1000 + n)
+        timings = latencies[n]
+        try:
+            while time.perf_counter() < deadline:
+                if rng.random() < args.doctor_share:
+                    fetch, owner_id = service.doctor_timeline, doctor(rng)
+                else:
+                    fetch, owner_id = service.patient_timeline, patient(rng)
+                after = None
+                for _ in range(rng.randint(1, args.pages)):
+                    start = time.perf_counter()
+                    page = fetch(owner_id, after)
+                    timings.append(time.perf_counter() - start)
+                    if page.next_cursor is None:
+                        break
+                    after = page.next_cursor
+                    if args.think_ms:
+                        time.sleep(args.think_ms / 1000)
+        except Exception as e:
+            errors.append(e)
+
+    def writer():
+        nonlocal fired
+        rng = random.Random(args.seed)
+        while not stop.wait(1 / args.invalidate_rate):
+            patient_timeline.fire_invalidation({"fk_patient_id": [patient(rng)]})
+            fired += 1
+
+    threads = [threading.Thread(target=user, args=(n,), daemon=True) for n in range(args.users)]
+    if args.invalidate_rate:
+        threads.append(threading.Thread(target=writer, daemon=True))
+    for thread in threads:
+        thread.start()
+    for thread in threads[:args.users]:
+        thread.join()
+    stop.set()
+    for thread in threads[args.users:]:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return [t for timings in latencies for t in timings], fired
+
+
+def latency_summary(seconds):
+    if not seconds:
+        return None
+    summary = {f"p{pct}": round(percentile(seconds, pct) * 1000, 3) for pct in (50, 95, 99)}
+    summary["max"] = round(max(seconds) * 1000, 3)
+    return summary
+
+
+def offset_page_sql(owner_column, limit, offset):
+    """The same deferred-join page, positioned with LIMIT/OFFSET instead of the keyset."""
+    return patient_timeline.page_sql(owner_column, False, limit).replace(
+        f"LIMIT {limit + 1})", f"LIMIT {limit} OFFSET {offset})")
+
+
+def compare_offset(query, page_size, max_pages):
+    """Keyset vs OFFSET latency while paging through the busiest doctor's timeline."""
+    doctor_id, encounters = query(f"SELECT fk_doctor_id, COUNT(*) FROM {TARGET_TABLE} "
+                                  f"GROUP BY fk_doctor_id ORDER BY COUNT(*) DESC LIMIT 1")[0]
+    keyset, offset = [], []
+    after, keyset_ids = None, []
+    for _ in range(max_pages):
+        start = time.perf_counter()
+        page = patient_timeline.fetch_page(query, "fk_doctor_id", doctor_id, after, page_size)
+        keyset.append(time.perf_counter() - start)
+        keyset_ids += [row["encounter_id"] for row in page.rows]
+        after = page.next_cursor
+        if after is None:
+            break
+    offset_ids = []
+    for n in range(len(keyset)):
+        start = time.perf_counter()
+        rows = query(offset_page_sql("fk_doctor_id", page_size, n * page_size), (doctor_id,))
+        offset.append(time.perf_counter() - start)
+        offset_ids += [row[patient_timeline.TIMELINE_COLUMNS.index("encounter_id")] for row in rows]
+    if offset_ids != keyset_ids:
+        raise RuntimeError("keyset and OFFSET pagination returned different rows")
+    return {"doctor_id": doctor_id, "encounters": encounters, "pages": len(keyset),
+            "keyset_ms": {"first": round(keyset[0] * 1000, 3), "last": round(keyset[-1] * 1000, 3),
+                          "total": round(sum(keyset) * 1000, 3)},
+            "offset_ms": {"first": round(offset[0] * 1000, 3), "last": round(offset[-1] * 1000, 3),
+                          "total": round(sum(offset) * 1000, 3)}}
+
+
+def print_report(report):
+    cache = report["cache"]
+    print()
+    print(f"Timeline load test: {report['users']} users for {report['duration']}s, "
+          + (f"cache {cache['max_entries']:,} pages, ttl {cache['ttl']}s" if cache else "no cache"))
+    print(f"  requests        {report['requests']:,} ({report['requests_per_sec']:,.1f}/s)")
+    if cache:
+        rate = f"{cache['hit_rate']:.1%}" if cache["hit_rate"] is not None else "-"
+        print(f"  cache hit rate  {rate}  (hits {cache['hits']:,}, misses {cache['misses']:,}, "
+              f"coalesced {cache['coalesced']:,}, evicted {cache['evictions']:,}, "
+              f"expired {cache['expirations']:,}, invalidated {cache['invalidated']:,})")
+    if report["invalidations_fired"]:
+        print(f"  invalidations   {report['invalidations_fired']:,} fired")
+    for label, key in (("latency ms", "latency_ms"), ("database ms", "db_latency_ms")):
+        summary = report[key]
+        if summary:
+            print(f"  {label:<15} p50 {summary['p50']:.3f}  p95 {summary['p95']:.3f}  "
+                  f"p99 {summary['p99']:.3f}  max {summary['max']:.3f}")
+    print(f"  database calls  {report['db_queries']:,}")
+    comparison = report.get("offset_comparison")
+    if comparison:
+        print(f"\nDoctor {comparison['doctor_id']} ({comparison['encounters']:,} encounters, "
+              f"{comparison['pages']} pages of {report['page_size']}):")
+        for label, key in (("keyset", "keyset_ms"), ("OFFSET", "offset_ms")):
+            ms = comparison[key]
+            print(f"  {label:<7} first page {ms['first']:.3f} ms, last page {ms['last']:.3f} ms, "
+                  f"all pages {ms['total']:.1f} ms")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=backends.BACKENDS, default="mysql")
+    parser.add_argument("--db-file", help="database file for the sqlite/duckdb backends")
+    parser.add_argument("--user", default="root", help="MySQL user")
+    parser.add_argument("--password", help="MySQL password (prompted if omitted)")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--database", default=backends.DEFAULT_DATABASE)
+    parser.add_argument("--generate", action="store_true",
+                        help="generate a data set into the sqlite/duckdb backend first")
+    parser.add_argument("--encounters", type=int, default=50_000, help="encounters to generate (with --generate)")
+    parser.add_argument("--patients", type=int, default=5_000, help="patients to generate (with --generate)")
+    parser.add_argument("--doctors", type=int, default=200, help="doctors to generate (with --generate)")
+    parser.add_argument("--workload-profile", choices=list(workload_profiles.PROFILES),
+                        default=workload_profiles.DEFAULT_PROFILE,
+                        help="workload profile of the generated data (with --generate)")
+    parser.add_argument("--users", type=int, default=16, help="concurrent simulated users (default: 16)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run (default: 10)")
+    parser.add_argument("--pages", type=int, default=3, help="most pages read per session (default: 3)")
+    parser.add_argument("--page-size", type=int, default=patient_timeline.DEFAULT_PAGE_SIZE,
+                        help=f"encounters per page (default: {patient_timeline.DEFAULT_PAGE_SIZE})")
+    parser.add_argument("--skew", type=float, default=1.0,
+                        help="power-law skew of which patients/doctors users open (0 = uniform; default: 1.0)")
+    parser.add_argument("--doctor-share", type=float, default=0.1,
+                        help="share of sessions that browse a doctor's timeline (default: 0.1)")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="pause between a user's pages")
+    parser.add_argument("--cache-size", type=int, default=patient_timeline.DEFAULT_CACHE_SIZE,
+                        help=f"cached pages (default: {patient_timeline.DEFAULT_CACHE_SIZE:,})")
+    parser.add_argument("--ttl", type=float, default=patient_timeline.DEFAULT_TTL,
+                        help=f"seconds a cached page lives (default: {patient_timeline.DEFAULT_TTL:g}; 0 = no expiry)")
+    parser.add_argument("--no-cache", action="store_true", help="query the database on every request")
+    parser.add_argument("--invalidate-rate", type=float, default=0.0,
+                        help="patient invalidations fired per second while the test runs")
+    parser.add_argument("--compare-offset", action="store_true",
+                        help="also compare keyset and OFFSET paging on the busiest doctor's timeline")
+    parser.add_argument("--compare-pages", type=int, default=500,
+                        help="most pages walked by --compare-offset (default: 500)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", dest="json_out", help="also write the report to this JSON file")
+    args = parser.parse_args(argv)
+    if args.generate and args.backend == "mysql":
+        parser.error("--generate needs --backend sqlite or duckdb")
+    if args.users < 1 or args.pages < 1 or args.duration <= 0:
+        parser.error("--users, --pages and --duration must be positive")
+    if not 0 <= args.doctor_share <= 1:
+        parser.error("--doctor-share must be between 0 and 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    cache = None if args.no_cache else patient_timeline.TimelineCache(args.cache_size, args.ttl or None)
+    if cache is not None:
+        patient_timeline.add_invalidation_hook(cache.invalidate)
+
+    try:
+        with open_database(args) as query:
+            max_patient, max_doctor = query(f"SELECT MAX(fk_patient_id), MAX(fk_doctor_id) FROM {TARGET_TABLE}")[0]
+            if not max_patient:
+                raise RuntimeError(f"{TARGET_TABLE} is empty")
+            timed = TimedQuery(query)
+            service = patient_timeline.TimelineService(timed, cache, args.page_size)
+            print(f"Running {args.users} users for {args.duration:g}s "
+                  f"({max_patient:,} patients, {max_doctor:,} doctors)...")
+            start = time.perf_counter()
+            latencies, fired = run_load(service, args, max_patient, max_doctor)
+            seconds = time.perf_counter() - start
+            report = {
+                "backend": args.backend, "users": args.users, "duration": args.duration,
+                "page_size": args.page_size, "pages": args.pages, "skew": args.skew,
+                "doctor_share": args.doctor_share, "invalidate_rate": args.invalidate_rate,
+                "requests": len(latencies), "requests_per_sec": round(len(latencies) / seconds, 1),
+                "latency_ms": latency_summary(latencies),
+                "db_queries": len(timed.seconds), "db_latency_ms": latency_summary(timed.seconds),
+                "cache": dict(cache.stats(), max_entries=args.cache_size, ttl=args.ttl) if cache else None,
+                "invalidations_fired": fired,
+            }
+            if args.compare_offset:
+                print("Comparing keyset and OFFSET pagination...")
+                report["offset_comparison"] = compare_offset(query, args.page_size, args.compare_pages)
+    except Exception as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    finally:
+        if cache is not None:
+            patient_timeline.remove_invalidation_hook(cache.invalidate)
+
+    print_report(report)
+    if args.json_out:
+        directory = os.path.dirname(args.json_out)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
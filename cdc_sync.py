@@ -0,0 +1,396 @@
+"""
+Healthcare System - Change-Data-Capture Sync into denormalized_patient_encounters
+Trigger-free alternative to the per-row triggers and full UPDATE...JOIN
+batches described in healthcare_implementation_guide.sql. Dimension
+changes (patients, doctors, departments, diagnoses, medications) are read
+from a change log, coalesced per row, and only the changed columns are
+written to the denormalized rows that reference them, in batched UPDATEs
+keyed on the fk_*_id indexes.
+
+Change sources:
+  dimension_change_log     table written by the application (log_change())
+                           in the same transaction as the dimension UPDATE
+  --replay FILE.jsonl      one change per line, e.g. converted from a binlog
+                           reader or recorded for tests:
+                           {"table": "patients", "id": 17, "columns": {"email": "a@b.org"},
+                            "ts": "2025-01-01 10:00:00"}
+
+Each batch of changes is applied in one transaction together with the
+source position in cdc_sync_offset, so a restarted sync continues exactly
+where it stopped. Lag (oldest applied change to commit) and rows/sec are
+reported per batch.
+
+Usage:
+    python cdc_sync.py --user root --password secret     # poll the change log until interrupted
+    python cdc_sync.py --user root --once                # apply everything pending and exit
+    python cdc_sync.py --user root --replay changes.jsonl --once
+    python cdc_sync.py --print-sql
+"""
+
+import argparse
+import getpass
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+import db_loader
+import patient_timeline
+from db_loader import fetch_one
+from incremental_refresh import DIMENSIONS, TARGET_TABLE
+
+CHANGE_LOG_TABLE = "dimension_change_log"
+OFFSET_TABLE = "cdc_sync_offset"
+LOCK_NAME = "healthcare_system.cdc_sync"
+
+DEFAULT_BATCH_KEYS = 500      # dimension rows per UPDATE statement
+DEFAULT_MAX_CHANGES = 10000   # change log entries per transaction
+DEFAULT_INTERVAL = 1.0        # seconds between polls when idle
+
+CHANGE_LOG_DDL = f"""CREATE TABLE IF NOT EXISTS {CHANGE_LOG_TABLE} (
+    change_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    source_table VARCHAR(64) NOT NULL,
+    row_id INT NOT NULL,
+    changed_columns JSON NOT NULL,
+    changed_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+)"""
+
+OFFSET_DDL = f"""CREATE TABLE IF NOT EXISTS {OFFSET_TABLE} (
+    source VARCHAR(255) PRIMARY KEY,
+    last_position BIGINT NOT NULL DEFAULT 0,
+    last_synced_at TIMESTAMP NULL,
+    last_changes INT,
+    last_rows_updated BIGINT,
+    last_lag_seconds DECIMAL(12, 3)
+)"""
+
+
+def log_change(cursor, table, row_id, columns):
+    """Record an update of a dimension row: columns maps source column -> new value.
+
+    Call it in the same transaction as the UPDATE of the dimension table.
+    """
+    if table not in DIMENSIONS:
+        raise ValueError(f"{table} is not a dimension of {TARGET_TABLE}")
+    cursor.execute(f"INSERT INTO {CHANGE_LOG_TABLE} (source_table, row_id, changed_columns) "
+                   f"VALUES (%s, %s, %s)", (table, row_id, json.dumps(columns, default=str)))
+
+
+# ============================================================================
+# CHANGE SOURCES
+# ============================================================================
+# read() returns up to max_changes events after the stored position as
+# (position, table, row_id, {source column: value}, changed_at) tuples.
+
+class ChangeLogSource:
+    """Entries of dimension_change_log above the stored change_id."""
+
+    name = CHANGE_LOG_TABLE
+
+    def __init__(self, max_changes=DEFAULT_MAX_CHANGES):
+        self.max_changes = max_changes
+
+    def read(self, cursor, position):
+        cursor.execute(f"SELECT change_id, source_table, row_id, changed_columns, changed_at "
+                       f"FROM {CHANGE_LOG_TABLE} WHERE change_id > %s ORDER BY change_id LIMIT %s",
+                       (position, self.max_changes))
+        return [(change_id, table, row_id, json.loads(columns) if isinstance(columns, (str, bytes)) else columns,
+                 changed_at)
+                for change_id, table, row_id, columns, changed_at in cursor.fetchall()]
+
+
+class ReplaySource:
+    """Changes from a JSONL file; the position is the line number.
+
+    The line number and byte offset where the last read stopped are kept,
+    so each batch seeks there instead of rescanning the file from the top.
+    """
+
+    def __init__(self, path, max_changes=DEFAULT_MAX_CHANGES):
+        self.path = path
+        self.name = f"replay:{os.path.abspath(path)}"[:255]
+        self.max_changes = max_changes
+        self._mark = (0, 0)  # (lines consumed, byte offset after them)
+
+    def read(self, cursor, position):
+        # A rolled-back batch asks for an earlier position: rescan from the top.
+        number, offset = self._mark if self._mark[0] <= position else (0, 0)
+        events = []
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            while len(events) < self.max_changes:
+                line = f.readline()
+                if not line:
+                    break
+                number += 1
+                if number <= position or not line.strip():
+                    continue
+                change = json.loads(line)
+                changed_at = datetime.fromisoformat(change["ts"]) if change.get("ts") else None
+                events.append((number, change["table"], change["id"], change["columns"], changed_at))
+            self._mark = (number, f.tell())
+        return events
+
+
+# ============================================================================
+# COALESCING & UPDATE STATEMENTS
+# ============================================================================
+
+_SOURCE_REF = re.compile(r"\b(\w+)\.(\w+)\b")
+
+
+def column_plan(table):
+    """[(denormalized column, source expression, source columns it reads)] for a dimension."""
+    alias, _, _, columns = DIMENSIONS[table]
+    return [(column, expr, [c for a, c in _SOURCE_REF.findall(expr) if a == alias])
+            for column, expr in columns]
+
+
+def coalesce(events):
+    """Merge events per (table, row_id) in log order; later values win.
+
+    Returns {(table, row_id): {source column: value}} and the number of
+    events ignored because they name a table outside DIMENSIONS.
+    """
+    pending = {}
+    ignored = 0
+    for _, table, row_id, columns, _ in events:
+        if table not in DIMENSIONS:
+            ignored += 1
+            continue
+        pending.setdefault((table, row_id), {}).update(columns)
+    return pending, ignored
+
+
+def value_sql(table, expr, sources, row_id, changed):
+    """SQL and params for the new value of one denormalized column.
+
+    When every source column the expression reads is in the change the
+    values are bound directly; otherwise (e.g. a derived column reading an
+    unchanged column too) the expression is evaluated against the row.
+    """
+    alias, _, pk, _ = DIMENSIONS[table]
+    if all(s in changed for s in sources):
+        params = []
+
+        def bind(m):
+            if m.group(1) != alias:
+                return m.group(0)
+            params.append(changed[m.group(2)])
+            return "%s"
+        return _SOURCE_REF.sub(bind, expr), params
+    return f"(SELECT {expr} FROM {table} {alias} WHERE {alias}.{pk} = %s)", [row_id]
+
+
+def batch_update_sql(table, plan, changes):
+    """One UPDATE applying the same set of columns for several dimension rows.
+
+    changes is [(row_id, {source column: value})]; each column gets a
+    CASE on the fk_*_id value, and the WHERE ... IN list uses its index.
+    """
+    _, fk, _, _ = DIMENSIONS[table]
+    assignments, params = [], []
+    for column, expr, sources in plan:
+        cases = []
+        for row_id, changed in changes:
+            sql, values = value_sql(table, expr, sources, row_id, changed)
+            cases.append(f"WHEN %s THEN {sql}")
+            params += [row_id] + values
+        assignments.append(f"{column} = CASE {fk}\n        " + "\n        ".join(cases) + f"\n        ELSE {column} END")
+    params += [row_id for row_id, _ in changes]
+    return (f"UPDATE {TARGET_TABLE}\nSET\n    " + ",\n    ".join(assignments) +
+            f"\nWHERE {fk} IN ({', '.join(['%s'] * len(changes))})"), params
+
+
+def update_statements(pending, batch_keys=DEFAULT_BATCH_KEYS):
+    """(sql, params) batches for coalesced changes.
+
+    Rows are grouped by table and by the set of denormalized columns
+    their change touches, so each UPDATE writes only changed columns.
+    Changes to columns the denormalized table does not copy are dropped.
+    """
+    groups = {}
+    for (table, row_id), changed in pending.items():
+        plan = [p for p in column_plan(table) if any(s in changed for s in p[2])]
+        if plan:
+            key = (table, tuple(column for column, _, _ in plan))
+            groups.setdefault(key, (plan, []))[1].append((row_id, changed))
+    for (table, _), (plan, changes) in groups.items():
+        for i in range(0, len(changes), batch_keys):
+            yield batch_update_sql(table, plan, changes[i:i + batch_keys])
+
+
+# ============================================================================
+# SYNC
+# ============================================================================
+
+class SyncBatch:
+    """Counts, rows updated, elapsed time and lag for one applied batch."""
+
+    def __init__(self, changes, keys, statements, rows, seconds, lag):
+        self.changes = changes
+        self.keys = keys
+        self.statements = statements
+        self.rows = rows
+        self.seconds = seconds
+        self.lag = lag
+
+    def __str__(self):
+        rate = self.rows / self.seconds if self.seconds else 0
+        lag = f"{self.lag:.2f}s" if self.lag is not None else "n/a"
+        return (f"  {self.changes:>7} changes -> {self.keys:>6} rows of dimensions, "
+                f"{self.statements:>4} UPDATEs, {self.rows:>9} rows in {self.seconds:.2f}s "
+                f"({rate:,.0f} rows/s), lag {lag}")
+
+
+def ensure_schema(cursor):
+    cursor.execute(CHANGE_LOG_DDL)
+    cursor.execute(OFFSET_DDL)
+
+
+def sync_batch(conn, source, batch_keys=DEFAULT_BATCH_KEYS):
+    """Apply the next batch of changes in one transaction; None when nothing is pending."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("START TRANSACTION")
+        try:
+            row = fetch_one(cursor, f"SELECT last_position FROM {OFFSET_TABLE} WHERE source = %s FOR UPDATE",
+                            (source.name,))
+            events = source.read(cursor, row[0] if row else 0)
+            if not events:
+                cursor.execute("COMMIT")
+                return None
+
+            start = time.perf_counter()
+            pending, ignored = coalesce(events)
+            if ignored:
+                print(f"  Skipped {ignored} changes to tables outside {TARGET_TABLE}")
+            rows = statements = 0
+            for sql, params in update_statements(pending, batch_keys):
+                cursor.execute(sql, params)
+                rows += max(cursor.rowcount, 0)
+                statements += 1
+
+            # Lag of the oldest change in the batch, against the server clock
+            now = fetch_one(cursor, "SELECT NOW(6)")[0]
+            stamps = [e[4] for e in events if e[4] is not None]
+            lag = (now - min(stamps)).total_seconds() if stamps else None
+            cursor.execute(
+                f"REPLACE INTO {OFFSET_TABLE} (source, last_position, last_synced_at, last_changes, "
+                f"last_rows_updated, last_lag_seconds) VALUES (%s, %s, NOW(), %s, %s, %s)",
+                (source.name, events[-1][0], len(events), rows, round(lag, 3) if lag is not None else None),
+            )
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+    finally:
+        cursor.close()
+    if rows:
+        references = {}
+        for table, row_id in pending:
+            references.setdefault(DIMENSIONS[table][1], set()).add(row_id)
+        patient_timeline.fire_invalidation(references)
+    return SyncBatch(len(events), len(pending), statements, rows, time.perf_counter() - start, lag)
+
+
+def run(conn, source, once=False, interval=DEFAULT_INTERVAL, batch_keys=DEFAULT_BATCH_KEYS):
+    """Apply batches until the source is drained (once) or until interrupted."""
+    batches = []
+    cursor = conn.cursor()
+    try:
+        ensure_schema(cursor)
+        if not fetch_one(cursor, "SELECT GET_LOCK(%s, 0)", (LOCK_NAME,))[0]:
+            raise RuntimeError("another sync is already running")
+        try:
+            while True:
+                batch = sync_batch(conn, source, batch_keys)
+                if batch:
+                    print(batch)
+                    batches.append(batch)
+                elif once:
+                    break
+                else:
+                    time.sleep(interval)
+        except KeyboardInterrupt:
+            print("  Interrupted")
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchall()
+    finally:
+        cursor.close()
+    return batches
+
+
+def print_sql():
+    """DDL plus a sample batch: two patients with new emails, one with a new date of birth."""
+    for sql in (CHANGE_LOG_DDL, OFFSET_DDL):
+        print(sql + ";\n")
+    pending = {("patients", 17): {"email": "a@example.org"},
+               ("patients", 42): {"email": "b@example.org"},
+               ("patients", 99): {"date_of_birth": "1980-02-29"},
+               ("doctors", 3): {"phone_number": "555-0100", "specialization": "Cardiology"}}
+    for sql, params in update_statements(pending):
+        print(f"-- params: {params}")
+        print(sql.replace("%%", "%") + ";\n")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", default="root", help="MySQL user")
+    parser.add_argument("--password", help="MySQL password (prompted if omitted)")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--database", default="healthcare_system")
+    parser.add_argument("--replay", metavar="FILE", help="read changes from a JSONL file instead of the change log")
+    parser.add_argument("--once", action="store_true", help="exit when no changes are pending")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL,
+                        help=f"seconds between polls when idle (default: {DEFAULT_INTERVAL})")
+    parser.add_argument("--max-changes", type=int, default=DEFAULT_MAX_CHANGES,
+                        help=f"changes per transaction (default: {DEFAULT_MAX_CHANGES})")
+    parser.add_argument("--batch-keys", type=int, default=DEFAULT_BATCH_KEYS,
+                        help=f"dimension rows per UPDATE (default: {DEFAULT_BATCH_KEYS})")
+    parser.add_argument("--print-sql", action="store_true", help="print the DDL and a sample batch and exit")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.print_sql:
+        print_sql()
+        return
+
+    if args.replay and not os.path.exists(args.replay):
+        print(f"ERROR: Replay file not found: {args.replay}")
+        sys.exit(1)
+    if db_loader.load_driver()[0] is None:
+        print("ERROR: No MySQL driver installed (pip install pymysql)")
+        sys.exit(1)
+    password = args.password if args.password is not None else getpass.getpass("  Password: ")
+
+    source = (ReplaySource(args.replay, args.max_changes) if args.replay
+              else ChangeLogSource(args.max_changes))
+    pool = db_loader.ConnectionPool(args.user, password, args.host, args.port, args.database, size=1)
+    print(f"Syncing {source.name} into {args.database}.{TARGET_TABLE}"
+          f"{'' if args.once else ' (Ctrl+C to stop)'}")
+    start = time.perf_counter()
+    try:
+        with pool.connection() as conn:
+            batches = run(conn, source, once=args.once, interval=args.interval, batch_keys=args.batch_keys)
+    except Exception as e:
+        print(f"  ERROR: {e}")
+        sys.exit(1)
+    finally:
+        pool.close()
+
+    elapsed = time.perf_counter() - start
+    busy = sum(b.seconds for b in batches)
+    rows = sum(b.rows for b in batches)
+    print(f"  {'total':<8} {sum(b.changes for b in batches):>7} changes, {rows} rows updated in {elapsed:.2f}s "
+          f"({rows / busy if busy else 0:,.0f} rows/s while applying)")
+
+
+if __name__ == "__main__":
+    main()
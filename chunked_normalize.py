@@ -0,0 +1,286 @@
+"""
+Healthcare System - Chunked, Resumable Normalization
+Builds healthcare_system_model_db from denormalized_patient_encounters in
+encounter_id ranges instead of the monolithic INSERT...SELECTs in
+normalize_healthcare.sql.
+
+Every chunk is one short transaction that also advances the step's row in
+the normalize_checkpoint control table, so an interrupted run resumes from
+the last committed chunk. Dimension extraction keeps the script's rn = 1
+semantics: within a chunk ROW_NUMBER() picks the first encounter per
+natural key, and keys already loaded by an earlier chunk are skipped.
+
+Phases:
+  1. departments                                   (doctors join on them)
+  2. doctors, patients, diagnoses, medications     (concurrently with --workers > 1)
+  3. encounters                                    (needs every dimension)
+
+Table definitions are taken from normalize_healthcare.sql, so both paths
+create the same schema. Driven from setup_normalized_db.py --chunked.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import db_loader
+
+TARGET_DB = "healthcare_system_model_db"
+SOURCE_TABLE = "healthcare_system.denormalized_patient_encounters"
+CHECKPOINT_TABLE = "normalize_checkpoint"
+DDL_SCRIPT = "normalize_healthcare.sql"
+
+DEFAULT_CHUNK_SIZE = 100_000
+DEFAULT_WORKERS = 1
+
+CHECKPOINT_DDL = f"""CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+    step VARCHAR(32) PRIMARY KEY,
+    last_encounter_id INT NOT NULL DEFAULT 0,
+    rows_inserted BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+)"""
+
+
+# ============================================================================
+# STEP DEFINITIONS
+# ============================================================================
+
+def dimension_sql(table, columns, key, source_key, source_columns, extra_join=""):
+    """INSERT...SELECT of first-seen rows for one encounter_id range.
+
+    columns/source_columns pair target columns with the sub-select's
+    columns; key/source_key are the natural key on each side.
+    """
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)})\n"
+        f"SELECT {', '.join(source_columns)}\n"
+        f"FROM (\n"
+        f"    SELECT *, ROW_NUMBER() OVER (PARTITION BY {source_key} ORDER BY encounter_id) AS rn\n"
+        f"    FROM {SOURCE_TABLE}\n"
+        f"    WHERE {source_key} IS NOT NULL AND encounter_id > %s AND encounter_id <= %s\n"
+        f") sub\n"
+        f"{extra_join}"
+        f"WHERE sub.rn = 1\n"
+        f"  AND NOT EXISTS (SELECT 1 FROM {table} x WHERE x.{key} = sub.{source_key})\n"
+        f"ORDER BY sub.{source_key}"
+    )
+
+
+STEP_SQL = {
+    "departments": dimension_sql(
+        "departments",
+        ["department_name", "department_code", "floor_number", "phone_number", "head_physician"],
+        "department_name", "department_name",
+        ["sub.department_name", "sub.department_code", "sub.department_floor",
+         "sub.department_phone", "sub.department_head"],
+    ),
+    "doctors": dimension_sql(
+        "doctors",
+        ["first_name", "last_name", "license_number", "specialization", "fk_department_id",
+         "phone_number", "email", "hire_date", "years_of_experience"],
+        "license_number", "doctor_license_number",
+        ["sub.doctor_first_name", "sub.doctor_last_name", "sub.doctor_license_number",
+         "sub.doctor_specialization", "d.department_id", "sub.doctor_phone", "sub.doctor_email",
+         "sub.doctor_hire_date", "sub.doctor_years_experience"],
+        extra_join="JOIN departments d ON d.department_name = sub.department_name\n",
+    ),
+    "patients": dimension_sql(
+        "patients",
+        ["source_patient_id", "first_name", "last_name", "date_of_birth", "gender", "blood_type",
+         "phone_number", "email", "street_address", "city", "state_province", "postal_code",
+         "country", "insurance_provider", "insurance_policy_number", "emergency_contact_name",
+         "emergency_contact_phone", "registration_date"],
+        "source_patient_id", "fk_patient_id",
+        ["sub.fk_patient_id", "sub.patient_first_name", "sub.patient_last_name",
+         "sub.patient_date_of_birth", "sub.patient_gender", "sub.patient_blood_type",
+         "sub.patient_phone", "sub.patient_email", "sub.patient_street_address", "sub.patient_city",
+         "sub.patient_state", "sub.patient_postal_code", "sub.patient_country",
+         "sub.patient_insurance_provider", "sub.patient_insurance_policy_number",
+         "sub.patient_emergency_contact_name", "sub.patient_emergency_contact_phone",
+         "sub.patient_registration_date"],
+    ),
+    "diagnoses": dimension_sql(
+        "diagnoses",
+        ["icd_code", "diagnosis_name", "diagnosis_category", "severity_level", "description", "is_chronic"],
+        "icd_code", "diagnosis_icd_code",
+        ["sub.diagnosis_icd_code", "sub.diagnosis_name", "sub.diagnosis_category",
+         "sub.diagnosis_severity", "sub.diagnosis_description", "sub.is_chronic_diagnosis"],
+    ),
+    "medications": dimension_sql(
+        "medications",
+        ["medication_name", "generic_name", "dosage_strength", "dosage_form", "route_of_administration",
+         "common_side_effects", "contraindications", "manufacturer"],
+        "medication_name", "medication_name",
+        ["sub.medication_name", "sub.medication_generic_name", "sub.medication_dosage_strength",
+         "sub.medication_dosage_form", "sub.medication_route", "sub.medication_side_effects",
+         "sub.medication_contraindications", "sub.medication_manufacturer"],
+    ),
+    "encounters": f"""INSERT INTO encounters (
+    source_encounter_id, fk_patient_id, fk_doctor_id, fk_department_id,
+    fk_diagnosis_id, fk_medication_id, encounter_date, encounter_time,
+    encounter_type, encounter_duration_minutes, chief_complaint,
+    vital_signs_temperature, vital_signs_blood_pressure, vital_signs_heart_rate,
+    vital_signs_respiratory_rate, clinical_notes, treatment_plan,
+    prescribed_quantity, prescribed_frequency, prescription_duration_days,
+    follow_up_date, follow_up_required, billable_amount, billing_status,
+    created_by, last_modified_by
+)
+SELECT
+    dpe.encounter_id, p.patient_id, doc.doctor_id, dep.department_id,
+    diag.diagnosis_id, med.medication_id, dpe.encounter_date, dpe.encounter_time,
+    dpe.encounter_type, dpe.encounter_duration_minutes, dpe.chief_complaint,
+    dpe.vital_signs_temperature, dpe.vital_signs_blood_pressure, dpe.vital_signs_heart_rate,
+    dpe.vital_signs_respiratory_rate, dpe.clinical_notes, dpe.treatment_plan,
+    dpe.prescribed_quantity, dpe.prescribed_frequency, dpe.prescription_duration_days,
+    dpe.follow_up_date, dpe.follow_up_required, dpe.billingBillable_amount, dpe.billing_status,
+    dpe.created_by, dpe.last_modified_by
+FROM {SOURCE_TABLE} dpe
+JOIN patients p ON p.source_patient_id = dpe.fk_patient_id
+JOIN doctors doc ON doc.license_number = dpe.doctor_license_number
+JOIN departments dep ON dep.department_name = dpe.department_name
+LEFT JOIN diagnoses diag ON diag.icd_code = dpe.diagnosis_icd_code
+LEFT JOIN medications med ON med.medication_name = dpe.medication_name
+WHERE dpe.encounter_id > %s AND dpe.encounter_id <= %s
+ORDER BY dpe.encounter_id""",
+}
+
+PHASES = [
+    ["departments"],
+    ["doctors", "patients", "diagnoses", "medications"],
+    ["encounters"],
+]
+
+VERIFY_SQL = """SELECT 'departments' AS table_name, COUNT(*) AS record_count FROM departments
+UNION ALL SELECT 'doctors', COUNT(*) FROM doctors
+UNION ALL SELECT 'patients', COUNT(*) FROM patients
+UNION ALL SELECT 'diagnoses', COUNT(*) FROM diagnoses
+UNION ALL SELECT 'medications', COUNT(*) FROM medications
+UNION ALL SELECT 'encounters', COUNT(*) FROM encounters"""
+
+
+# ============================================================================
+# SCHEMA
+# ============================================================================
+
+def table_ddl(script=DDL_SCRIPT):
+    """CREATE TABLE statements from normalize_healthcare.sql, made idempotent."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), script)
+    with open(path, "r", encoding="utf-8") as f:
+        statements = list(db_loader.iter_sql_statements(f))
+    return [s.replace("CREATE TABLE ", "CREATE TABLE IF NOT EXISTS ", 1)
+            for s in statements if s.upper().startswith("CREATE TABLE ")]
+
+
+def prepare_schema(conn, restart=False):
+    """Create (or, with restart, recreate) the target database and tables."""
+    cursor = conn.cursor()
+    try:
+        # A database without checkpoints came from normalize_healthcare.sql
+        # and cannot be resumed, so it is rebuilt like that script would.
+        cursor.execute("SELECT COUNT(*) FROM information_schema.tables "
+                       "WHERE table_schema = %s AND table_name = %s", (TARGET_DB, CHECKPOINT_TABLE))
+        if restart or not cursor.fetchone()[0]:
+            cursor.execute(f"DROP DATABASE IF EXISTS {TARGET_DB}")
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {TARGET_DB}")
+        cursor.execute(f"USE {TARGET_DB}")
+        for ddl in table_ddl():
+            cursor.execute(ddl)
+        cursor.execute(CHECKPOINT_DDL)
+    finally:
+        cursor.close()
+
+
+# ============================================================================
+# CHUNKED EXECUTION
+# ============================================================================
+
+def chunk_bounds(low, high, chunk_size):
+    """(low, high] encounter_id ranges of at most chunk_size ids."""
+    while low < high:
+        yield low, min(low + chunk_size, high)
+        low += chunk_size
+
+
+def run_step(pool, step, high, chunk_size, progress=print, on_statement=None):
+    """Process one step chunk by chunk from its checkpoint up to high.
+
+    on_statement(timing, None) is called with a db_loader.StatementTiming for
+    every chunk's INSERT...SELECT. Returns the number of rows inserted by this call.
+    """
+    sql = STEP_SQL[step]
+    inserted = 0
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"USE {TARGET_DB}")
+            cursor.execute(f"INSERT IGNORE INTO {CHECKPOINT_TABLE} (step) VALUES (%s)", (step,))
+            cursor.execute(f"SELECT last_encounter_id FROM {CHECKPOINT_TABLE} WHERE step = %s", (step,))
+            low = cursor.fetchone()[0]
+            if low > 0 and low < high:
+                progress(f"  {step}: resuming after encounter_id {low}")
+
+            for index, (lo, hi) in enumerate(chunk_bounds(low, high, chunk_size), 1):
+                start = time.perf_counter()
+                cursor.execute("START TRANSACTION")
+                try:
+                    cursor.execute(sql, (lo, hi))
+                    rows = max(cursor.rowcount, 0)
+                    if on_statement:
+                        on_statement(db_loader.StatementTiming(index, sql, time.perf_counter() - start, rows), None)
+                    cursor.execute(
+                        f"UPDATE {CHECKPOINT_TABLE} SET last_encounter_id = %s, "
+                        f"rows_inserted = rows_inserted + %s WHERE step = %s",
+                        (hi, rows, step),
+                    )
+                    cursor.execute("COMMIT")
+                except Exception:
+                    cursor.execute("ROLLBACK")
+                    raise
+                inserted += rows
+                progress(f"  {step:<12} ({lo}, {hi}] {rows:>10} rows {time.perf_counter() - start:8.2f}s")
+        finally:
+            cursor.close()
+    return inserted
+
+
+def source_high_water(pool):
+    """Highest encounter_id in the source table (0 when empty)."""
+    return db_loader.query_scalar(pool, f"SELECT COALESCE(MAX(encounter_id), 0) FROM {SOURCE_TABLE}")
+
+
+def normalize(pool, chunk_size=DEFAULT_CHUNK_SIZE, workers=DEFAULT_WORKERS, restart=False, progress=print,
+              on_statement=None):
+    """Run (or resume) the chunked normalization; returns {step: rows inserted}.
+
+    pool should allow at least `workers` connections. on_statement is passed
+    to run_step() and may be called from several threads.
+    """
+    with pool.connection() as conn:
+        prepare_schema(conn, restart)
+    high = source_high_water(pool)
+    progress(f"  Source encounter_id high-water mark: {high}, chunk size {chunk_size}")
+
+    results = {}
+    for phase in PHASES:
+        if workers > 1 and len(phase) > 1:
+            with ThreadPoolExecutor(max_workers=min(workers, len(phase))) as executor:
+                futures = {step: executor.submit(run_step, pool, step, high, chunk_size, progress, on_statement)
+                           for step in phase}
+                for step, future in futures.items():
+                    results[step] = future.result()
+        else:
+            for step in phase:
+                results[step] = run_step(pool, step, high, chunk_size, progress, on_statement)
+    return results
+
+
+def print_counts(pool):
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"USE {TARGET_DB}")
+            cursor.execute(VERIFY_SQL)
+            for table, count in cursor.fetchall():
+                print(f"  {table:<12} {count:>12}")
+        finally:
+            cursor.close()
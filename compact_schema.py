@@ -0,0 +1,346 @@
+"""
+Healthcare System - Compact Layout of denormalized_patient_encounters
+Builds healthcare_system_compact, a narrower copy of the wide table that
+keeps hot rows small so more of them fit in the InnoDB buffer pool:
+
+  encounters_compact  hot columns; low-cardinality strings (department,
+                      specialization, diagnosis and medication attributes,
+                      billing_status, encounter_type, ...) become ENUMs,
+                      stored as 1-byte codes
+  patient_details     per-patient contact and address columns, once per
+                      patient instead of once per encounter
+  encounter_notes     cold wide text (chief_complaint, clinical_notes,
+                      treatment_plan), read only when selected
+
+A view named denormalized_patient_encounters joins them back into the
+original 73-column surface, so the analysis queries run unchanged with
+--database healthcare_system_compact.
+
+ENUM domains are read from the source data (sorted in collation order, so
+ORDER BY on an ENUM column sorts like the string did). A column with more
+than MAX_ENUM_VALUES distinct values, or values longer than 255
+characters, keeps its original type. Each load rebuilds the compact
+database, so domains always match the data.
+
+Usage:
+    python compact_schema.py load --user root                  # (re)build and copy in encounter_id chunks
+    python compact_schema.py load --user root --dry-run        # print the DDL and load statements
+    python compact_schema.py benchmark --user root --repeat 5  # size, buffer-pool hit rate, query latency
+"""
+
+import argparse
+import getpass
+import json
+import os
+import re
+import sys
+import time
+
+import backends
+import benchmark_queries
+import db_loader
+import partition_manager
+
+SOURCE_DATABASE = "healthcare_system"
+COMPACT_DATABASE = "healthcare_system_compact"
+SOURCE_TABLE = "denormalized_patient_encounters"
+HOT_TABLE = "encounters_compact"
+PATIENT_TABLE = "patient_details"
+NOTES_TABLE = "encounter_notes"
+DEFAULT_CHUNK_SIZE = 100_000
+MAX_ENUM_VALUES = 255  # 1-byte ENUM storage
+MAX_ENUM_LENGTH = 255  # MySQL limit per ENUM element
+
+ENUM_CANDIDATES = (
+    "patient_gender", "patient_blood_type", "patient_state", "patient_country", "patient_insurance_provider",
+    "doctor_specialization",
+    "department_name", "department_code", "department_phone", "department_head",
+    "diagnosis_icd_code", "diagnosis_name", "diagnosis_category", "diagnosis_severity", "diagnosis_description",
+    "medication_name", "medication_generic_name", "medication_dosage_strength", "medication_dosage_form",
+    "medication_route", "medication_side_effects", "medication_contraindications", "medication_manufacturer",
+    "encounter_type", "prescribed_frequency", "billing_status", "created_by", "last_modified_by",
+)
+PATIENT_COLUMNS = (
+    "patient_phone", "patient_email", "patient_street_address", "patient_city", "patient_postal_code",
+    "patient_insurance_policy_number", "patient_emergency_contact_name", "patient_emergency_contact_phone",
+    "patient_registration_date",
+)
+NOTE_COLUMNS = ("chief_complaint", "clinical_notes", "treatment_plan")
+
+
+# ============================================================================
+# LAYOUT
+# ============================================================================
+
+def source_columns():
+    """[(column, definition)] of the wide table, from healthcare_ddl.sql."""
+    return backends.column_definitions(partition_manager.heap_table_ddl())
+
+
+def source_indexes():
+    """The wide table's secondary INDEX clauses."""
+    return re.findall(r"^\s*(INDEX \w+ \([^)]*\))", partition_manager.heap_table_ddl(), re.M)
+
+
+def enum_literal(value):
+    return "'" + value.replace("\\", "\\\\").replace("'", "''") + "'"
+
+
+def read_domains(cursor, columns=ENUM_CANDIDATES):
+    """{column: sorted distinct values} for the columns that fit an ENUM."""
+    domains = {}
+    for column in columns:
+        cursor.execute(f"SELECT DISTINCT {column} FROM {SOURCE_DATABASE}.{SOURCE_TABLE} "
+                       f"WHERE {column} IS NOT NULL ORDER BY {column} LIMIT {MAX_ENUM_VALUES + 1}")
+        values = [row[0] for row in cursor.fetchall()]
+        if len(values) <= MAX_ENUM_VALUES and all(len(v) <= MAX_ENUM_LENGTH for v in values):
+            domains[column] = values
+    return domains
+
+
+def hot_columns():
+    return [(name, definition) for name, definition in source_columns()
+            if name not in PATIENT_COLUMNS and name not in NOTE_COLUMNS]
+
+
+def ddl_statements(domains):
+    """DROP/CREATE the compact database, its three tables and the compatibility view."""
+    definitions = dict(source_columns())
+    hot = []
+    for name, definition in hot_columns():
+        if name in domains:
+            values = domains[name] or [""]
+            definition = f"ENUM({', '.join(map(enum_literal, values))})"
+        hot.append(f"{name} {definition}")
+    hot.extend(source_indexes())
+
+    patient = ["fk_patient_id INT PRIMARY KEY"] + [f"{c} {definitions[c]}" for c in PATIENT_COLUMNS]
+    notes = ["encounter_id INT PRIMARY KEY"] + [f"{c} {definitions[c]}" for c in NOTE_COLUMNS]
+
+    select = []
+    for name, _ in source_columns():
+        alias = "p" if name in PATIENT_COLUMNS else "n" if name in NOTE_COLUMNS else "c"
+        select.append(f"{alias}.{name}")
+    view = (f"CREATE VIEW {SOURCE_TABLE} AS\nSELECT\n    " + ",\n    ".join(select) + "\n"
+            f"FROM {HOT_TABLE} c\n"
+            f"    LEFT JOIN {PATIENT_TABLE} p ON p.fk_patient_id = c.fk_patient_id\n"
+            f"    LEFT JOIN {NOTES_TABLE} n ON n.encounter_id = c.encounter_id")
+
+    def create(table, items):
+        return f"CREATE TABLE {table} (\n    " + ",\n    ".join(items) + "\n)"
+
+    return [
+        f"DROP DATABASE IF EXISTS {COMPACT_DATABASE}",
+        f"CREATE DATABASE {COMPACT_DATABASE}",
+        f"USE {COMPACT_DATABASE}",
+        create(HOT_TABLE, hot),
+        create(PATIENT_TABLE, patient),
+        create(NOTES_TABLE, notes),
+        view,
+    ]
+
+
+def chunk_statements():
+    """Copy statements for one encounter_id range; params (low, high) each.
+
+    patient_details keeps the values of each patient's latest encounter.
+    """
+    source = f"{SOURCE_DATABASE}.{SOURCE_TABLE}"
+    where = "WHERE encounter_id BETWEEN %s AND %s"
+    hot = ", ".join(name for name, _ in hot_columns())
+    patient = ", ".join(("fk_patient_id",) + PATIENT_COLUMNS)
+    notes = ", ".join(("encounter_id",) + NOTE_COLUMNS)
+    return [
+        f"INSERT INTO {HOT_TABLE} ({hot})\nSELECT {hot}\nFROM {source} {where}",
+        f"REPLACE INTO {PATIENT_TABLE} ({patient})\nSELECT {patient}\nFROM {source} {where}\nORDER BY encounter_id",
+        f"INSERT INTO {NOTES_TABLE} ({notes})\nSELECT {notes}\nFROM {source} {where}",
+    ]
+
+
+# ============================================================================
+# LOAD
+# ============================================================================
+
+def load(conn, chunk_size=DEFAULT_CHUNK_SIZE, progress=print):
+    """Rebuild healthcare_system_compact from the wide table; returns rows copied."""
+    cursor = conn.cursor()
+    try:
+        progress("Reading ENUM domains...")
+        domains = read_domains(cursor)
+        kept = [c for c in ENUM_CANDIDATES if c not in domains]
+        progress(f"  {len(domains)} ENUM columns" + (f"; kept as strings: {', '.join(kept)}" if kept else ""))
+        for sql in ddl_statements(domains):
+            cursor.execute(sql)
+
+        cursor.execute(f"SELECT MIN(encounter_id), MAX(encounter_id) FROM {SOURCE_DATABASE}.{SOURCE_TABLE}")
+        low, high = cursor.fetchone()
+        start = time.perf_counter()
+        statements = chunk_statements()
+        for chunk_low in range(low or 1, (high or 0) + 1, chunk_size):
+            chunk_high = min(chunk_low + chunk_size - 1, high)
+            for sql in statements:
+                cursor.execute(sql, (chunk_low, chunk_high))
+            conn.commit()
+            progress(f"  encounter_id {chunk_low:,}-{chunk_high:,} copied")
+        for table in (HOT_TABLE, PATIENT_TABLE, NOTES_TABLE):
+            cursor.execute(f"ANALYZE TABLE {table}")
+            cursor.fetchall()
+        cursor.execute(f"SELECT COUNT(*) FROM {HOT_TABLE}")
+        copied = cursor.fetchone()[0]
+        progress(f"  {copied:,} encounters in {time.perf_counter() - start:.1f}s")
+        return copied
+    finally:
+        cursor.close()
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+SIZE_SQL = """SELECT table_name, table_rows, data_length, index_length
+FROM information_schema.tables
+WHERE table_schema = %s AND table_type = 'BASE TABLE' AND table_name IN ({})"""
+
+
+def table_sizes(cursor, database, tables):
+    """[(table, rows, data bytes, index bytes)] from information_schema."""
+    cursor.execute(SIZE_SQL.format(", ".join(["%s"] * len(tables))), (database, *tables))
+    return cursor.fetchall()
+
+
+def buffer_pool_counters(cursor):
+    """Logical read requests and reads that missed the buffer pool (went to disk)."""
+    cursor.execute("SHOW GLOBAL STATUS WHERE Variable_name IN "
+                   "('Innodb_buffer_pool_read_requests', 'Innodb_buffer_pool_reads')")
+    status = {name: int(value) for name, value in cursor.fetchall()}
+    return status["Innodb_buffer_pool_read_requests"], status["Innodb_buffer_pool_reads"]
+
+
+def run_layout(pool, queries, repeat, warmup):
+    """Benchmark the queries on one database; returns (results, hit rate, disk reads)."""
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        requests_before, reads_before = buffer_pool_counters(cursor)
+        results = benchmark_queries.benchmark(backends.MySQLBackend(conn), queries, repeat, warmup)
+        requests_after, reads_after = buffer_pool_counters(cursor)
+        cursor.close()
+    requests, reads = requests_after - requests_before, reads_after - reads_before
+    return results, (1 - reads / requests if requests else None), reads
+
+
+def print_sizes(label, sizes):
+    total = 0
+    for table, rows, data, index in sizes:
+        total += data + index
+        print(f"  {label + '.' + table:<52} {rows or 0:>12,} {data / 1e6:>10.1f} {index / 1e6:>10.1f}")
+    return total
+
+
+def benchmark(pools, query_file, repeat, warmup):
+    """Compare size, buffer-pool hit rate and per-query p50 of the wide and compact layouts."""
+    with pools[SOURCE_DATABASE].connection() as conn:
+        cursor = conn.cursor()
+        print(f"  {'table':<52} {'rows (est.)':>12} {'data MB':>10} {'index MB':>10}")
+        wide = print_sizes(SOURCE_DATABASE, table_sizes(cursor, SOURCE_DATABASE, [SOURCE_TABLE]))
+        compact = print_sizes(COMPACT_DATABASE, table_sizes(cursor, COMPACT_DATABASE,
+                                                            [HOT_TABLE, PATIENT_TABLE, NOTES_TABLE]))
+        cursor.close()
+    print(f"  total: wide {wide / 1e6:.1f} MB, compact {compact / 1e6:.1f} MB "
+          f"({compact / wide:.0%} of wide)" if wide else "")
+
+    queries = benchmark_queries.load_queries(query_file)
+    report = {"sizes": {"wide_bytes": wide, "compact_bytes": compact}, "layouts": {}}
+    for database in (SOURCE_DATABASE, COMPACT_DATABASE):
+        print(f"\n{database}:")
+        results, hit_rate, reads = run_layout(pools[database], queries, repeat, warmup)
+        report["layouts"][database] = {"buffer_pool_hit_rate": hit_rate, "disk_reads": reads,
+                                       "results": results}
+
+    wide_results, compact_results = (report["layouts"][d]["results"] for d in (SOURCE_DATABASE, COMPACT_DATABASE))
+    print(f"\n{'#':>3} {'query':<44} {'wide p50':>10} {'compact p50':>12} {'ratio':>7}")
+    for before, after in zip(wide_results, compact_results):
+        if "p50_ms" in before and "p50_ms" in after:
+            ratio = f"{after['p50_ms'] / before['p50_ms']:.2f}x" if before["p50_ms"] else "-"
+            print(f"{before['query']:>3} {before['title'][:44]:<44} {before['p50_ms']:>10.2f} "
+                  f"{after['p50_ms']:>12.2f} {ratio:>7}")
+        else:
+            print(f"{before['query']:>3} {before['title'][:44]:<44} {'(error)':>10}")
+    for database, layout in report["layouts"].items():
+        rate = layout["buffer_pool_hit_rate"]
+        print(f"  {database}: buffer-pool hit rate "
+              f"{'-' if rate is None else format(rate, '.4%')}, {layout['disk_reads']:,} page reads from disk")
+    return report
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, text in (("load", "rebuild healthcare_system_compact from the wide table"),
+                       ("benchmark", "compare the wide and compact layouts")):
+        cmd = sub.add_parser(name, help=text)
+        cmd.add_argument("--user", default="root", help="MySQL user")
+        cmd.add_argument("--password", help="MySQL password (prompted if omitted)")
+        cmd.add_argument("--host", default="localhost")
+        cmd.add_argument("--port", type=int, default=3306)
+        if name == "load":
+            cmd.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                             help=f"encounter_ids copied per transaction (default: {DEFAULT_CHUNK_SIZE})")
+            cmd.add_argument("--dry-run", action="store_true",
+                             help="print the DDL and load statements without changing anything")
+        else:
+            cmd.add_argument("--query-file", default=benchmark_queries.QUERY_FILE)
+            cmd.add_argument("--repeat", type=int, default=5, help="timed runs per query (default: 5)")
+            cmd.add_argument("--warmup", type=int, default=1, help="untimed runs per query first (default: 1)")
+            cmd.add_argument("--json", dest="json_out", help="write the comparison to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if db_loader.load_driver()[0] is None:
+        print("ERROR: No MySQL driver installed (pip install pymysql)")
+        sys.exit(1)
+    password = args.password if args.password is not None else getpass.getpass("  Password: ")
+
+    pools = {database: db_loader.ConnectionPool(args.user, password, args.host, args.port, database, size=1)
+             for database in (SOURCE_DATABASE, COMPACT_DATABASE)}
+    try:
+        # Domain reads, chunk copies and benchmark queries all scan the wide table
+        timeout = db_loader.scaled_timeout(db_loader.estimated_rows(pools[SOURCE_DATABASE], SOURCE_TABLE))
+        for pool in pools.values():
+            pool.timeout = timeout
+            pool.close()
+
+        if args.command == "load" and args.dry_run:
+            with pools[SOURCE_DATABASE].connection() as conn:
+                cursor = conn.cursor()
+                domains = read_domains(cursor)
+                cursor.close()
+            for sql in ddl_statements(domains) + chunk_statements():
+                print(sql + ";\n")
+        elif args.command == "load":
+            with pools[SOURCE_DATABASE].connection() as conn:
+                load(conn, args.chunk_size)
+        else:
+            report = benchmark(pools, args.query_file, args.repeat, args.warmup)
+            if args.json_out:
+                directory = os.path.dirname(args.json_out)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(args.json_out, "w", encoding="utf-8") as f:
+                    json.dump(report, f, indent=2, default=str)
+                print(f"\nResults written to {args.json_out}")
+    except Exception as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    finally:
+        for pool in pools.values():
+            pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,476 @@
+"""
+Healthcare System - Native Database Loader
+Runs SQL scripts and bulk row loads over pooled DB-API connections
+(PyMySQL or mysql-connector-python) instead of piping whole files into a
+mysql child process. Scripts are split into individual statements and
+timed one by one; row data goes through batched executemany().
+
+The mysql command-line path in setup_normalized_db.py remains the
+fallback when no driver is installed.
+"""
+
+import argparse
+import getpass
+import gzip
+import io
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+try:
+    import zstandard
+except ImportError:  # Only needed for .zst scripts
+    zstandard = None
+
+DEFAULT_POOL_SIZE = 4
+DEFAULT_BATCH_SIZE = 1000
+
+# Statement timeouts grow with the amount of data being processed so large
+# normalization runs are not killed at a fixed two minutes.
+BASE_TIMEOUT = 120  # seconds
+SECONDS_PER_MILLION_ROWS = 600
+
+
+def scaled_timeout(row_count, base=BASE_TIMEOUT, per_million=SECONDS_PER_MILLION_ROWS):
+    """Timeout in seconds for work proportional to row_count rows."""
+    return int(base + per_million * max(row_count or 0, 0) / 1_000_000)
+
+
+def load_driver():
+    """Return (name, module) for the first available MySQL driver, or (None, None)."""
+    try:
+        import pymysql
+        return "pymysql", pymysql
+    except ImportError:
+        pass
+    try:
+        import mysql.connector
+        return "mysql-connector", mysql.connector
+    except ImportError:
+        return None, None
+
+
+# ============================================================================
+# CONNECTION POOL
+# ============================================================================
+
+class ConnectionPool:
+    """Thread-safe pool of at most `size` open connections.
+
+    Connections are created lazily and handed out through the
+    connection() context manager. A connection that raised an error is
+    closed instead of being returned to the pool.
+    """
+
+    def __init__(self, user, password="", host="localhost", port=3306, database=None,
+                 size=DEFAULT_POOL_SIZE, timeout=BASE_TIMEOUT, local_infile=False):
+        self.driver_name, self.driver = load_driver()
+        if self.driver is None:
+            raise RuntimeError("No MySQL driver installed (pip install pymysql)")
+        self.size = size
+        self.timeout = timeout
+        self._connect_args = dict(user=user, password=password or "", host=host,
+                                  port=port, database=database, local_infile=local_infile)
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        a = self._connect_args
+        if self.driver_name == "pymysql":
+            return self.driver.connect(
+                host=a["host"], port=a["port"], user=a["user"], password=a["password"],
+                database=a["database"], charset="utf8mb4", autocommit=True,
+                local_infile=a["local_infile"], connect_timeout=30,
+                read_timeout=self.timeout, write_timeout=self.timeout,
+            )
+        return self.driver.connect(
+            host=a["host"], port=a["port"], user=a["user"], password=a["password"],
+            database=a["database"], charset="utf8mb4", autocommit=True,
+            allow_local_infile=a["local_infile"], connection_timeout=self.timeout,
+        )
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            except Exception:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                conn = None
+                raise
+            finally:
+                if conn is not None:
+                    self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+            except Exception:
+                pass
+
+
+# ============================================================================
+# STATEMENT SPLITTING
+# ============================================================================
+# Splits on ';' outside of quoted strings and comments. Works line by line
+# so arbitrarily large files are never held in memory at once.
+
+_OUTSIDE = re.compile(r"['\"`;#]|--|/\*")
+_QUOTE_END = {q: re.compile(r"\\.|" + re.escape(q), re.S) for q in ("'", '"', "`")}
+
+
+def iter_sql_statements(lines):
+    """Yield each complete statement (without the trailing ';') from lines."""
+    buf = []
+    quote = None
+    in_comment = False
+
+    for line in lines:
+        pos, n = 0, len(line)
+        while pos < n:
+            if in_comment:
+                end = line.find("*/", pos)
+                if end < 0:
+                    break
+                pos, in_comment = end + 2, False
+                continue
+
+            if quote:
+                m = _QUOTE_END[quote].search(line, pos)
+                if m is None:
+                    buf.append(line[pos:])
+                    break
+                buf.append(line[pos:m.end()])
+                pos = m.end()
+                if m.group() == quote:
+                    quote = None
+                continue
+
+            m = _OUTSIDE.search(line, pos)
+            if m is None:
+                buf.append(line[pos:])
+                break
+            buf.append(line[pos:m.start()])
+            token, pos = m.group(), m.end()
+
+            if token == ";":
+                statement = "".join(buf).strip()
+                if statement:
+                    yield statement
+                buf = []
+            elif token in ("'", '"', "`"):
+                buf.append(token)
+                quote = token
+            elif token == "/*":
+                buf.append(" ")
+                in_comment = True
+            elif token == "--" and pos < n and not line[pos].isspace():
+                buf.append(token)  # MySQL needs whitespace after '--' for a comment
+            else:
+                buf.append("\n")  # '-- ' or '#' comment runs to end of line
+                break
+
+    statement = "".join(buf).strip()
+    if statement:
+        yield statement
+
+
+def split_sql_statements(text):
+    """List of statements in a SQL script string."""
+    return list(iter_sql_statements(text.splitlines(keepends=True)))
+
+
+_SOURCE = re.compile(r"SOURCE\s+(\S+)$", re.I)
+
+
+def open_script(path):
+    """Open a SQL file for reading as text; .gz and .zst files are decompressed.
+
+    zstd needs the zstandard package (pip install zstandard).
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError(f"{path} is zstd-compressed and the zstandard package is not installed "
+                               f"(pip install zstandard)")
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True),
+                                encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def iter_script_statements(path):
+    """Statements of a SQL file, with mysql-client SOURCE commands expanded.
+
+    SOURCE paths are relative to the including file, as in the part-file
+    drivers written by generate_bulk_data.py --max-file-size. Compressed
+    scripts are read through open_script().
+    """
+    with open_script(path) as f:
+        for statement in iter_sql_statements(f):
+            m = _SOURCE.match(statement)
+            if m:
+                yield from iter_script_statements(os.path.join(os.path.dirname(path), m.group(1)))
+            else:
+                yield statement
+
+
+_QUERY_HEADER = re.compile(r"^\s*--\s*(\d+)\.\s+(.+?)\s*$")
+
+
+def iter_numbered_queries(lines):
+    """Yield (number, title, sql) for statements under '-- N. Title' headers.
+
+    This is the layout of healthcare_analysis_queries.sql; statements
+    without a header of their own (USE, etc.) are skipped.
+    """
+    header = []
+
+    def tracked(lines):
+        for line in lines:
+            m = _QUERY_HEADER.match(line)
+            if m:
+                header[:] = [int(m.group(1)), m.group(2)]
+            yield line
+
+    for statement in iter_sql_statements(tracked(lines)):
+        if header:
+            yield header[0], header[1], statement
+            header.clear()
+
+
+# ============================================================================
+# EXECUTION
+# ============================================================================
+
+class StatementTiming:
+    """Timing record for one executed statement."""
+
+    def __init__(self, index, sql, seconds, rowcount):
+        self.index = index
+        self.sql = sql
+        self.seconds = seconds
+        self.rowcount = rowcount
+
+    @property
+    def summary(self):
+        text = " ".join(self.sql.split())
+        return text if len(text) <= 70 else text[:67] + "..."
+
+    def __str__(self):
+        rows = f" ({self.rowcount} rows)" if self.rowcount not in (None, -1) else ""
+        return f"[{self.index:>4}] {self.seconds:8.2f}s  {self.summary}{rows}"
+
+
+def execute_statements(conn, statements, on_statement=None):
+    """Execute statements in order on one connection (session state such as
+    USE and SET carries over between them).
+
+    Result sets are fetched and passed to on_statement(timing, rows) along
+    with the timing record. Returns the list of StatementTiming records.
+    """
+    timings = []
+    cursor = conn.cursor()
+    try:
+        for index, sql in enumerate(statements, 1):
+            start = time.perf_counter()
+            cursor.execute(sql)
+            rows = cursor.fetchall() if cursor.description else None
+            timing = StatementTiming(index, sql, time.perf_counter() - start, cursor.rowcount)
+            timings.append(timing)
+            if on_statement:
+                on_statement(timing, rows)
+    finally:
+        cursor.close()
+    return timings
+
+
+_INDEX_BUILD = re.compile(r"\s*ALTER\s+TABLE\s+\S+\s+ADD\s+(UNIQUE\s+)?(INDEX|KEY)\b", re.I)
+
+
+def _build_index(pool, database, sql):
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            if database:
+                cursor.execute(f"USE `{database}`")
+            start = time.perf_counter()
+            cursor.execute(sql)
+            return time.perf_counter() - start
+        finally:
+            cursor.close()
+
+
+def execute_script(pool, statements, on_statement=None, ddl_workers=1):
+    """Execute statements in order on one pooled connection, like execute_statements().
+
+    With ddl_workers > 1, each run of consecutive ALTER TABLE ... ADD INDEX
+    statements (the index rebuild of a generate_bulk_data.py --fast-load
+    script) is spread over up to ddl_workers further connections, so
+    different tables' indexes are built concurrently. The pool needs
+    ddl_workers + 1 connections.
+    """
+    timings = []
+
+    def record(sql, seconds, rowcount, rows=None):
+        timing = StatementTiming(len(timings) + 1, sql, seconds, rowcount)
+        timings.append(timing)
+        if on_statement:
+            on_statement(timing, rows)
+
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        builds = []
+
+        def flush():
+            if not builds:
+                return
+            cursor.execute("SELECT DATABASE()")
+            database = cursor.fetchone()[0]
+            with ThreadPoolExecutor(max_workers=min(ddl_workers, len(builds))) as executor:
+                for sql, seconds in zip(builds, executor.map(lambda sql: _build_index(pool, database, sql), builds)):
+                    record(sql, seconds, None)
+            builds.clear()
+
+        try:
+            for sql in statements:
+                if ddl_workers > 1 and _INDEX_BUILD.match(sql):
+                    builds.append(sql)
+                    continue
+                flush()
+                start = time.perf_counter()
+                cursor.execute(sql)
+                rows = cursor.fetchall() if cursor.description else None
+                record(sql, time.perf_counter() - start, cursor.rowcount, rows)
+            flush()
+        finally:
+            cursor.close()
+    return timings
+
+
+def print_statement(timing, rows):
+    """Default progress reporter: timing line plus any result rows."""
+    print(f"  {timing}")
+    for row in rows or ():
+        print("    " + " | ".join("NULL" if v is None else str(v) for v in row))
+
+
+def run_sql_file(pool, sql_path, on_statement=print_statement, ddl_workers=1):
+    """Execute every statement in a SQL file on one pooled connection.
+
+    SOURCE commands are expanded (iter_script_statements()). See
+    execute_script() for ddl_workers.
+    """
+    statements = iter_script_statements(sql_path)
+    if ddl_workers > 1:
+        return execute_script(pool, statements, on_statement, ddl_workers)
+    with pool.connection() as conn:
+        return execute_statements(conn, statements, on_statement)
+
+
+def insert_rows(conn, table, columns, rows, batch_size=DEFAULT_BATCH_SIZE):
+    """Bulk insert an iterable of value tuples with batched executemany().
+
+    Both supported drivers rewrite executemany() of a simple INSERT into
+    multi-row INSERT statements, so each batch is one round trip.
+    Returns the number of rows inserted.
+    """
+    sql = (f"INSERT INTO {table} ({', '.join(columns)}) "
+           f"VALUES ({', '.join(['%s'] * len(columns))})")
+    total = 0
+    cursor = conn.cursor()
+    try:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                cursor.executemany(sql, batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(sql, batch)
+            total += len(batch)
+    finally:
+        cursor.close()
+    return total
+
+
+def query_scalar(pool, sql, params=None):
+    """Run a single-value query on a pooled connection."""
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        finally:
+            cursor.close()
+    return row[0] if row else None
+
+
+def fetch_one(cursor, sql, params=None):
+    """Run sql on cursor and return its first row."""
+    cursor.execute(sql, params)
+    return cursor.fetchone()
+
+
+def estimated_rows(pool, table="encounters"):
+    """Optimizer row estimate for a table (no scan), used to size timeouts."""
+    return query_scalar(pool, (
+        "SELECT COALESCE(MAX(table_rows), 0) FROM information_schema.tables "
+        "WHERE table_schema = DATABASE() AND table_name = %s"
+    ), (table,))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run SQL scripts over a native driver with per-statement timing")
+    parser.add_argument("files", nargs="+", help="SQL files to execute in order")
+    parser.add_argument("--user", default="root", help="MySQL user")
+    parser.add_argument("--password", help="MySQL password (prompted if omitted)")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--database", help="default database")
+    parser.add_argument("--expected-rows", type=int, default=0,
+                        help="approximate rows processed; scales the statement timeout")
+    parser.add_argument("--ddl-workers", type=int, default=1,
+                        help="connections that build consecutive ALTER TABLE ... ADD INDEX "
+                             "statements concurrently (fast-load index rebuild)")
+    args = parser.parse_args()
+
+    password = args.password if args.password is not None else getpass.getpass("Password: ")
+    pool = ConnectionPool(args.user, password, args.host, args.port, args.database, size=args.ddl_workers + 1,
+                          timeout=scaled_timeout(args.expected_rows), local_infile=True)
+    try:
+        for path in args.files:
+            print(f"{path}:")
+            # LOAD DATA LOCAL paths in generated drivers are relative to the driver
+            cwd = os.getcwd()
+            os.chdir(os.path.dirname(os.path.abspath(path)))
+            start = time.perf_counter()
+            try:
+                timings = run_sql_file(pool, os.path.basename(path), ddl_workers=args.ddl_workers)
+            finally:
+                os.chdir(cwd)
+            print(f"  {len(timings)} statements in {time.perf_counter() - start:.2f}s")
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Healthcare System - Embedded Pipeline
+Runs the whole generate -> denormalize -> normalize -> analyze cycle in
+an embedded engine (SQLite or DuckDB, see backends.py), with no MySQL
+server, and prints the wall time of each stage:
+
+  generate     create healthcare_system and insert generated rows
+  denormalize  rebuild denormalized_patient_encounters (INSERT...SELECT)
+  normalize    run normalize_healthcare.sql into healthcare_system_model_db
+               (or, with --normalize streaming, streaming_normalize.py)
+  analyze      run the numbered analysis queries (benchmark_queries.py)
+
+DuckDB is the fast choice for large runs; SQLite shows row-store
+behaviour. --metrics-json / --metrics-prom write a run report with CPU,
+RSS and rows per stage (see run_metrics.py). With --db-file the databases are kept for later runs of
+benchmark_queries.py --backend; otherwise everything stays in memory.
+
+Usage:
+    python embedded_pipeline.py --encounters 1000000 --patients 100000 --doctors 1000
+    python embedded_pipeline.py --backend sqlite --db-file healthcare.sqlite --encounters 100000
+    python embedded_pipeline.py --json runs/embedded-1m.json
+    python embedded_pipeline.py --metrics-json runs/embedded-metrics.json
+    python embedded_pipeline.py --workload-profile hospital --encounters 1000000 --patients 100000
+    python embedded_pipeline.py --normalize streaming --encounters 1000000
+"""
+
+import argparse
+import json
+import os
+import sys
+from contextlib import contextmanager
+
+import backends
+import benchmark_queries
+import generate_bulk_data as gen
+import run_metrics
+import streaming_normalize
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+NORMALIZE_FILE = os.path.join(HERE, "normalize_healthcare.sql")
+QUERY_FILE = os.path.join(HERE, benchmark_queries.QUERY_FILE)
+
+
+@contextmanager
+def stage(stages, name):
+    """run_metrics.stage() with a banner; the Stage is appended to stages."""
+    print(f"\n=== {name} ===")
+    with run_metrics.stage(name) as measured:
+        yield measured
+    stages.append(measured)
+    print(f"--- {name}: {measured.wall_seconds:.2f}s")
+
+
+def print_stages(stages):
+    print(f"\n{'stage':<14} {'seconds':>10}")
+    for measured in stages:
+        print(f"{measured.name:<14} {measured.wall_seconds:>10.2f}")
+    print(f"{'total':<14} {sum(s.wall_seconds for s in stages):>10.2f}")
+
+
+def print_counts(counts):
+    for table, count in counts.items():
+        print(f"  {table:<32} {count:>12,}")
+
+
+def run_pipeline(backend, config, query_file, repeat, warmup, stages, normalizer="script"):
+    """Run every stage on backend, appending each Stage to stages; returns (table counts, query results)."""
+    with stage(stages, "generate"):
+        gen.load_rows(backend, config)
+    with stage(stages, "denormalize"):
+        gen.load_denormalized(backend)
+        gen.rebuild_indexes(backend, config)
+        counts = gen.table_counts(backend)
+    print_counts(counts)
+
+    with stage(stages, "normalize"):
+        if normalizer == "streaming":
+            streaming_normalize.normalize_backend(backend)
+        else:
+            backend.run_sql_file(NORMALIZE_FILE)
+        backend.use(backends.DEFAULT_DATABASE)
+
+    queries = benchmark_queries.load_queries(query_file)
+    with stage(stages, "analyze"):
+        results = benchmark_queries.benchmark(backend, queries, repeat, warmup)
+    return counts, results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=sorted(backends.EMBEDDED), default="duckdb",
+                        help="embedded engine (default: duckdb)")
+    parser.add_argument("--db-file", help="keep the databases in this file (default: in-memory)")
+    parser.add_argument("--doctors", type=int, default=gen.NUM_DOCTORS, help="number of doctors")
+    parser.add_argument("--patients", type=int, default=gen.NUM_PATIENTS, help="number of patients")
+    parser.add_argument("--encounters", type=int, default=gen.NUM_ENCOUNTERS, help="number of encounters")
+    parser.add_argument("--seed", type=int, default=gen.SEED, help="master random seed")
+    parser.add_argument("--shards", type=int, default=None,
+                        help="shards per large table (same rows as generate_bulk_data.py --shards)")
+    parser.add_argument("--mode", choices=["faker", "pooled"],
+                        help="row generation mode (default: pooled when numpy is installed)")
+    parser.add_argument("--pool-size", type=int, default=gen.POOL_SIZE,
+                        help="values pre-generated per Faker type in pooled mode")
+    parser.add_argument("--fast-load", action="store_true",
+                        help="drop secondary indexes for the load and rebuild them after denormalize (SQLite)")
+    parser.add_argument("--workload-profile", choices=list(gen.workload_profiles.PROFILES),
+                        default=gen.workload_profiles.DEFAULT_PROFILE,
+                        help="skewed/seasonal encounter workload (see generate_bulk_data.py --help)")
+    parser.add_argument("--normalize", choices=["script", "streaming"], default="script",
+                        help="normalize with normalize_healthcare.sql or the single-pass "
+                             "streaming_normalize.py (default: script)")
+    parser.add_argument("--query-file", default=QUERY_FILE,
+                        help=f"numbered query file (default: {benchmark_queries.QUERY_FILE})")
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per query (default: 1)")
+    parser.add_argument("--warmup", type=int, default=0, help="untimed runs per query first (default: 0)")
+    parser.add_argument("--json", dest="json_out", help="write stage timings and query results to this JSON file")
+    run_metrics.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.mode is None:
+        args.mode = "pooled" if gen.np is not None else "faker"
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.mode == "pooled" and gen.np is None:
+        print("ERROR: --mode pooled requires numpy (pip install numpy)")
+        sys.exit(1)
+    config = gen.GenerationConfig(num_doctors=args.doctors, num_patients=args.patients,
+                                  num_encounters=args.encounters, seed=args.seed, shards=args.shards,
+                                  mode=args.mode, pool_size=args.pool_size, fast_load=args.fast_load,
+                                  profile=gen.workload_profiles.get_profile(args.workload_profile))
+    print(f"Embedded pipeline: {args.backend} ({args.db_file or 'in-memory'}), "
+          f"{config.num_encounters:,} encounters, {config.mode} mode, {args.workload_profile} workload, "
+          f"{args.normalize} normalize")
+    stages = []
+    with run_metrics.run("embedded_pipeline", args.metrics_json, args.metrics_prom,
+                         labels={"backend": args.backend, "normalize": args.normalize}, measure=True) as metrics:
+        try:
+            backend = backends.open_embedded(args.backend, args.db_file)
+            try:
+                counts, results = run_pipeline(backend, config, args.query_file, args.repeat, args.warmup, stages,
+                                               args.normalize)
+            finally:
+                backend.close()
+        except Exception as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+        metrics.rows = sum(counts.values())
+        metrics.details.update(counts=counts)
+    print_stages(stages)
+
+    failed = [r["query"] for r in results if "error" in r]
+    if failed:
+        print(f"\n{len(failed)} queries failed on {args.backend}: {', '.join(map(str, failed))}")
+
+    if args.json_out:
+        directory = os.path.dirname(args.json_out)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"backend": args.backend, "database": args.db_file or ":memory:",
+                       "mode": config.mode, "seed": config.seed, "workload_profile": args.workload_profile,
+                       "normalize": args.normalize,
+                       "counts": counts,
+                       "stages": {s.name: round(s.wall_seconds, 3) for s in stages},
+                       "results": results}, f, indent=2)
+        print(f"\nResults written to {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
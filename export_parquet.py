@@ -0,0 +1,383 @@
+"""
+Healthcare System - Columnar Export of denormalized_patient_encounters
+Streams the 68-column table in encounter_id (primary key) chunks into a
+Hive-partitioned Parquet dataset, one directory per encounter month:
+
+    exports/encounters/encounter_month=2024-04/part-0.parquet
+
+Only one chunk of rows is held in Python at a time. The low-cardinality
+columns (department_name, doctor_specialization, billing_status,
+encounter_type, diagnosis_category) are Arrow dictionary columns, so
+they are stored dictionary-encoded and read back as categoricals. --arrow
+also writes an uncompressed Arrow IPC copy that read_arrow() memory-maps
+without copying or decoding.
+
+The source is MySQL (default), a SQLite/DuckDB file (backends.py), or the
+generator itself (--generate builds the table in an in-memory DuckDB).
+--compare reports size and scan time of the source table against the
+exported files.
+
+Reading the export in a notebook:
+    import export_parquet
+    table = export_parquet.read_parquet("exports/encounters", columns=["department_name", "billingBillable_amount"])
+    table = export_parquet.read_arrow("exports/encounters_arrow")   # memory-mapped, zero-copy
+    df = table.to_pandas()
+
+Usage:
+    python export_parquet.py --user root --output exports/encounters --compare
+    python export_parquet.py --backend duckdb --db-file healthcare.duckdb --output exports/encounters --arrow
+    python export_parquet.py --generate --encounters 1000000 --output exports/encounters
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+import backends
+import db_loader
+from benchmark_queries import connect
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+except ImportError:  # Reported by main()
+    pa = None
+
+SOURCE_TABLE = "denormalized_patient_encounters"
+DDL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "healthcare_ddl.sql")
+DEFAULT_CHUNK_SIZE = 100_000
+DEFAULT_ROW_GROUP_ROWS = 16_384  # rows buffered per partition before a row group is written
+PARTITION_COLUMN = "encounter_month"
+DICTIONARY_COLUMNS = ("department_name", "doctor_specialization", "billing_status",
+                      "encounter_type", "diagnosis_category")
+SCAN_COLUMNS = ("department_name", "billingBillable_amount")  # projection used by --compare
+
+
+# ============================================================================
+# SCHEMA
+# ============================================================================
+
+def arrow_type(mysql_type):
+    """Arrow type for a column type of healthcare_ddl.sql.
+
+    DECIMAL becomes float64, which is what notebooks compute with anyway.
+    """
+    base = mysql_type.split("(")[0]
+    if base == "INT":
+        return pa.int32()
+    if base == "DECIMAL":
+        return pa.float64()
+    if base == "BOOLEAN":
+        return pa.bool_()
+    if base == "DATE":
+        return pa.date32()
+    if base == "TIME":
+        return pa.time32("s")
+    if base == "TIMESTAMP":
+        return pa.timestamp("us")
+    return pa.string()
+
+
+def encounter_schema(ddl_path=DDL_FILE):
+    """Arrow schema of denormalized_patient_encounters, read from the DDL."""
+    with open(ddl_path, "r", encoding="utf-8") as f:
+        create = next(s for s in db_loader.iter_sql_statements(f)
+                      if s.upper().startswith(f"CREATE TABLE {SOURCE_TABLE.upper()}"))
+    fields = []
+    for name, mysql_type in backends.table_columns(create):
+        if name in DICTIONARY_COLUMNS:
+            fields.append(pa.field(name, pa.dictionary(pa.int32(), pa.string())))
+        else:
+            fields.append(pa.field(name, arrow_type(mysql_type)))
+    return pa.schema(fields)
+
+
+def _seconds(value):
+    """TIME value as seconds since midnight (drivers return timedelta or 'HH:MM:SS')"""
+    if value is None or isinstance(value, int):
+        return value
+    if isinstance(value, timedelta):
+        return int(value.total_seconds())
+    if isinstance(value, str):
+        h, m, s = value.split(":")
+        return int(h) * 3600 + int(m) * 60 + int(float(s))
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def rows_to_table(rows, schema):
+    """Arrow table from driver row tuples, cast to schema.
+
+    Values are converted per column, so drivers that return dates and
+    timestamps as strings (SQLite) or booleans as 0/1 (MySQL) all work.
+    """
+    columns = list(zip(*rows)) if rows else [()] * len(schema)
+    arrays = []
+    for field, values in zip(schema, columns):
+        if field.type == pa.time32("s"):
+            arrays.append(pa.array([_seconds(v) for v in values], pa.int32()).cast(field.type))
+        else:
+            arrays.append(pa.array(values).cast(field.type))
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+
+def fetch_chunk(backend, schema, after_id, chunk_size):
+    """Next chunk of rows with encounter_id > after_id, as an Arrow table."""
+    sql = (f"SELECT {', '.join(schema.names)} FROM {SOURCE_TABLE} "
+           f"WHERE encounter_id > %s ORDER BY encounter_id LIMIT {int(chunk_size)}")
+    cursor = backend.execute(sql, (after_id,))
+    try:
+        if backend.dialect == "duckdb":
+            # DuckDB hands over Arrow directly, with no Python row objects
+            table = cursor.arrow()  # a RecordBatchReader since DuckDB 1.4
+            if isinstance(table, pa.RecordBatchReader):
+                table = table.read_all()
+            return table.cast(schema)
+        return rows_to_table(cursor.fetchall(), schema)
+    finally:
+        cursor.close()
+
+
+def iter_chunks(backend, schema, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield the table as Arrow record batches in encounter_id order, plus the partition column."""
+    after_id = 0
+    while True:
+        table = fetch_chunk(backend, schema, after_id, chunk_size)
+        if table.num_rows == 0:
+            return
+        after_id = table["encounter_id"][-1].as_py()
+        month = pc.strftime(table["encounter_date"], format="%Y-%m")
+        yield from table.append_column(PARTITION_COLUMN, month).to_batches()
+        if table.num_rows < chunk_size:
+            return
+
+
+def export(backend, output, fmt="parquet", chunk_size=DEFAULT_CHUNK_SIZE,
+           row_group_rows=DEFAULT_ROW_GROUP_ROWS, compression="zstd", progress=None):
+    """Write the table to output as a month-partitioned dataset; returns the row count.
+
+    fmt is 'parquet' or 'arrow' (uncompressed IPC for memory mapping).
+    progress(rows) is called after every chunk.
+    """
+    schema = encounter_schema()
+    full_schema = schema.append(pa.field(PARTITION_COLUMN, pa.string()))
+    state = {"rows": 0}
+
+    def batches():
+        for batch in iter_chunks(backend, schema, chunk_size):
+            state["rows"] += batch.num_rows
+            if progress:
+                progress(state["rows"])
+            yield batch
+
+    if fmt == "parquet":
+        file_format = ds.ParquetFileFormat()
+        options = file_format.make_write_options(compression=compression)
+    else:
+        file_format = ds.IpcFileFormat()
+        options = file_format.make_write_options(compression=None)
+    ds.write_dataset(
+        ds.Scanner.from_batches(batches(), schema=full_schema),
+        output,
+        format=file_format,
+        file_options=options,
+        partitioning=ds.partitioning(pa.schema([(PARTITION_COLUMN, pa.string())]), flavor="hive"),
+        min_rows_per_group=row_group_rows,
+        max_rows_per_group=max(row_group_rows, 1 << 20),
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    return state["rows"]
+
+
+# ============================================================================
+# READERS
+# ============================================================================
+
+def read_parquet(path, columns=None, filter=None):
+    """Read an exported Parquet dataset (memory-mapped files, column projection,
+    partition pruning on encounter_month via filter)."""
+    dataset = ds.dataset(path, format=ds.ParquetFileFormat(), partitioning="hive")
+    return dataset.to_table(columns=columns, filter=filter)
+
+
+def read_arrow(path, columns=None):
+    """Memory-map an exported Arrow IPC dataset without copying or decoding.
+
+    Column buffers point straight into the page cache; the returned table
+    stays valid while it is referenced.
+    """
+    tables = []
+    for directory, _, files in sorted(os.walk(path)):
+        month = os.path.basename(directory).partition(f"{PARTITION_COLUMN}=")[2]
+        for name in sorted(files):
+            with pa.memory_map(os.path.join(directory, name), "r") as source:
+                table = pa.ipc.open_file(source).read_all()
+            if columns is not None:
+                table = table.select([c for c in columns if c != PARTITION_COLUMN])
+            if columns is None or PARTITION_COLUMN in columns:
+                table = table.append_column(PARTITION_COLUMN, pa.array([month] * table.num_rows, pa.string()))
+            tables.append(table)
+    if not tables:
+        raise FileNotFoundError(f"No Arrow files under {path}")
+    return pa.concat_tables(tables, promote_options="permissive")
+
+
+# ============================================================================
+# COMPARISON
+# ============================================================================
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+
+
+def source_size(backend):
+    """Bytes used by the source table (data + indexes), when the engine reports it."""
+    if backend.dialect == "mysql":
+        return backend.query(
+            "SELECT data_length + index_length FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name = %s", (SOURCE_TABLE,))[0][0]
+    return None
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def scan_source(backend, columns, chunk_size):
+    """Fetch columns of every row into Python objects, chunk by chunk (the notebook path)."""
+    rows, after_id = 0, 0
+    select = ", ".join(("encounter_id",) + tuple(c for c in columns if c != "encounter_id"))
+    while True:
+        chunk = backend.query(f"SELECT {select} FROM {SOURCE_TABLE} WHERE encounter_id > %s "
+                              f"ORDER BY encounter_id LIMIT {int(chunk_size)}", (after_id,))
+        if not chunk:
+            return rows
+        rows += len(chunk)
+        after_id = chunk[-1][0]
+
+
+def compare(backend, parquet_dir, arrow_dir, chunk_size):
+    """Print size and full/projected scan times for the source and the exports."""
+    schema = encounter_schema()
+    print(f"\n{'':<26} {'size MB':>10} {'full scan s':>12} {'2-col scan s':>13}")
+
+    def line(label, size, full, projected):
+        size_text = "-" if size is None else f"{size / 1e6:.1f}"
+        print(f"{label:<26} {size_text:>10} {full:>12.2f} {projected:>13.2f}")
+
+    full, rows = timed(lambda: scan_source(backend, schema.names, chunk_size))
+    projected, _ = timed(lambda: scan_source(backend, SCAN_COLUMNS, chunk_size))
+    line(f"{backend.dialect} ({rows:,} rows)", source_size(backend), full, projected)
+
+    full, table = timed(lambda: read_parquet(parquet_dir))
+    projected, _ = timed(lambda: read_parquet(parquet_dir, columns=list(SCAN_COLUMNS)))
+    line(f"parquet ({table.num_rows:,} rows)", directory_size(parquet_dir), full, projected)
+    if arrow_dir:
+        full, table = timed(lambda: read_arrow(arrow_dir))
+        projected, _ = timed(lambda: read_arrow(arrow_dir, columns=list(SCAN_COLUMNS)))
+        line(f"arrow mmap ({table.num_rows:,} rows)", directory_size(arrow_dir), full, projected)
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=backends.BACKENDS, default="mysql")
+    parser.add_argument("--db-file", help="database file for the sqlite/duckdb backends")
+    parser.add_argument("--user", default="root", help="MySQL user")
+    parser.add_argument("--password", help="MySQL password (prompted if omitted)")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--database", default=backends.DEFAULT_DATABASE)
+    parser.add_argument("--generate", action="store_true",
+                        help="export freshly generated data (in-memory DuckDB) instead of a database")
+    parser.add_argument("--encounters", type=int, default=1000, help="encounters to generate (with --generate)")
+    parser.add_argument("--patients", type=int, default=200, help="patients to generate (with --generate)")
+    parser.add_argument("--doctors", type=int, default=50, help="doctors to generate (with --generate)")
+    parser.add_argument("--output", default="exports/encounters", help="Parquet dataset directory")
+    parser.add_argument("--arrow", action="store_true",
+                        help="also write an uncompressed Arrow IPC copy to OUTPUT_arrow for read_arrow()")
+    parser.add_argument("--overwrite", action="store_true", help="replace existing export directories")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"encounter_ids fetched per query (default: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--row-group-rows", type=int, default=DEFAULT_ROW_GROUP_ROWS,
+                        help=f"rows per Parquet row group (default: {DEFAULT_ROW_GROUP_ROWS})")
+    parser.add_argument("--compression", default="zstd", help="Parquet codec (default: zstd)")
+    parser.add_argument("--compare", action="store_true",
+                        help="after exporting, compare size and scan time against the source table")
+    args = parser.parse_args(argv)
+    if args.backend != "mysql" and not args.db_file and not args.generate:
+        parser.error(f"--backend {args.backend} requires --db-file")
+    return args
+
+
+@contextmanager
+def open_source(args):
+    """The database to export from; with --generate an in-memory DuckDB of fresh data."""
+    if not args.generate:
+        with connect(args) as backend:
+            yield backend
+        return
+
+    import generate_bulk_data as gen
+    config = gen.GenerationConfig(num_doctors=args.doctors, num_patients=args.patients,
+                                  num_encounters=args.encounters,
+                                  mode="pooled" if gen.np is not None else "faker")
+    print(f"Generating {args.encounters:,} encounters into in-memory DuckDB...")
+    backend = backends.DuckDBBackend()
+    try:
+        gen.load_rows(backend, config)
+        gen.load_denormalized(backend)
+        yield backend
+    finally:
+        backend.close()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if pa is None:
+        print("ERROR: export_parquet.py requires pyarrow (pip install pyarrow)")
+        sys.exit(1)
+    arrow_dir = args.output + "_arrow" if args.arrow else None
+    for path in filter(None, (args.output, arrow_dir)):
+        if os.path.isdir(path) and os.listdir(path):
+            if not args.overwrite:
+                print(f"ERROR: {path} is not empty (use --overwrite to replace it)")
+                sys.exit(1)
+            shutil.rmtree(path)
+
+    def progress(rows):
+        print(f"\r  {rows:,} rows", end="", flush=True)
+
+    try:
+        with open_source(args) as backend:
+            print(f"Exporting {SOURCE_TABLE} to {args.output} (Parquet, {args.compression})...")
+            seconds, rows = timed(lambda: export(backend, args.output, "parquet", args.chunk_size,
+                                                 args.row_group_rows, args.compression, progress))
+            print(f"\n  {rows:,} rows in {seconds:.1f}s, {directory_size(args.output) / 1e6:.1f} MB")
+            if arrow_dir:
+                print(f"Exporting {SOURCE_TABLE} to {arrow_dir} (Arrow IPC)...")
+                seconds, rows = timed(lambda: export(backend, arrow_dir, "arrow", args.chunk_size,
+                                                     args.row_group_rows, progress=progress))
+                print(f"\n  {rows:,} rows in {seconds:.1f}s, {directory_size(arrow_dir) / 1e6:.1f} MB")
+            if args.compare:
+                compare(backend, args.output, arrow_dir, args.chunk_size)
+    except Exception as e:
+        print(f"\nERROR: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,73 @@
 """
 Healthcare Data Generator
-Generates ~500 records of fake healthcare data for all tables
+Generates fake healthcare data for all tables (~500 records by default).
+Rows are streamed to the output file as bounded multi-row INSERT chunks,
+so memory use stays flat regardless of NUM_ENCOUNTERS.
+
+The doctor, patient and encounter ID ranges are split into shards, each
+with its own seed derived from the master seed. Shards can be generated
+in a process pool (--workers N); for a given seed and shard count the
+output is byte-identical no matter how many workers are used.
+
+--workload-profile replaces the uniform key and date draws with a skewed,
+seasonal workload (workload_profiles.py).
+
+--scale-factor sizes every table from one number (SF1 = 1M encounters),
+the output size and time of large runs are estimated from a small sample
+before generating, and --max-file-size splits the data into bounded part files
+that can be loaded in parallel. --compress gzip/zstd compresses SQL output.
+
+--pipe skips the output file: rows are loaded into MySQL by a background
+thread (multi-row INSERTs, or LOAD DATA from a named pipe) while the next
+rows are generated, with a bounded buffer between the two.
+
+--metrics-json / --metrics-prom report wall and CPU time, peak RSS, rows/sec
+and bytes per stage (run_metrics.py); --profile samples or cProfiles the
+generator loops.
 """
 
 from faker import Faker
+import argparse
+import errno
+import getpass
+import gzip
+import hashlib
+import io
+import json
+import math
+import os
+import queue
 import random
-from datetime import datetime, timedelta
-
-fake = Faker()
-Faker.seed(42)
-random.seed(42)
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from itertools import groupby, islice
+from operator import attrgetter
+from typing import Optional
+
+import backends
+import db_loader
+import partition_manager
+import patient_timeline
+import run_metrics
+import workload_profiles
+
+try:
+    import numpy as np
+except ImportError:  # Only needed for --mode pooled
+    np = None
+
+try:
+    import zstandard
+except ImportError:  # Only needed for --compress zstd
+    zstandard = None
 
 # ============================================================================
 # CONFIGURATION
@@ -21,6 +79,20 @@ NUM_DIAGNOSES = 20
 NUM_MEDICATIONS = 30
 NUM_ENCOUNTERS = 500
 
+CHUNK_SIZE = 1000  # Rows per multi-row INSERT statement
+SEED = 42  # Master seed; every shard derives its own seed from this
+POOL_SIZE = 10000  # Pre-generated Faker values per type (--mode pooled)
+POOL_BATCH = 10000  # Rows sampled per vectorized batch (--mode pooled)
+OUTPUT_FILE = "healthcare_bulk_data.sql"
+ENCOUNTER_YEARS = (2023, 2024)  # encounter_date range (also sizes --partitioned)
+
+# --scale-factor: TPC-style sizing, SF1 = 1M encounters
+SF1_DOCTORS = 1_000
+SF1_PATIENTS = 100_000
+SF1_ENCOUNTERS = 1_000_000
+ESTIMATE_SAMPLE_ROWS = 1000  # Rows generated per table to estimate a run's size and time
+ESTIMATE_MIN_ROWS = 100 * ESTIMATE_SAMPLE_ROWS  # Smaller runs skip the estimate unless --estimate-only
+
 # ============================================================================
 # REFERENCE DATA
 # ============================================================================
@@ -115,344 +187,1816 @@ def sql_escape(text):
         return 'NULL'
     return str(text).replace("'", "''")
 
-def random_date(start_year=2020, end_year=2024):
+def random_date(start_year=2020, end_year=2024, rng=random):
     """Generate random date"""
     start = datetime(start_year, 1, 1)
     end = datetime(end_year, 12, 31)
     delta = end - start
-    random_days = random.randint(0, delta.days)
+    random_days = rng.randint(0, delta.days)
     return (start + timedelta(days=random_days)).strftime('%Y-%m-%d')
 
-def random_time():
+def random_time(rng=random):
     """Generate random time"""
-    hour = random.randint(8, 18)
-    minute = random.choice([0, 15, 30, 45])
+    hour = rng.randint(8, 18)
+    minute = rng.choice([0, 15, 30, 45])
     return f"{hour:02d}:{minute:02d}:00"
 
+def shard_seed(master_seed, table, shard_index):
+    """Derive a stable per-shard seed from the master seed.
+
+    Uses SHA-256 rather than hash() so the value is identical in every
+    worker process and across Python runs.
+    """
+    digest = hashlib.sha256(f"{master_seed}:{table}:{shard_index}".encode()).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+def license_number(doctor_id, num_doctors):
+    """MD plus the doctor_id, zero-padded to one width for the whole run"""
+    return f"MD{doctor_id:0{max(6, len(str(num_doctors)))}d}"
+
+def policy_number(patient_id, num_patients):
+    """Unique policy digits for a patient.
+
+    patient_id * 3**18 is a bijection modulo any power of 10 (3 is coprime
+    to 10), so the digits look random but never repeat within a run.
+    """
+    width = max(9, len(str(num_patients)))
+    return f"{(patient_id * 387420489 + 100000000) % 10 ** width:0{width}d}"
+
+def email_address(first_name, last_name, key, domain):
+    """first.last.key@domain; key (the row's primary key) keeps it unique"""
+    return f"{first_name.lower()}.{last_name.lower()}.{key}@{domain}"
+
+def shard_ranges(total, num_shards):
+    """Split IDs 1..total into num_shards contiguous (start, stop) ranges"""
+    num_shards = max(1, min(num_shards, total))
+    size, extra = divmod(total, num_shards)
+    ranges = []
+    start = 1
+    for i in range(num_shards):
+        stop = start + size + (1 if i < extra else 0)
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+class ShardContext:
+    """Random state and sizing for one shard.
+
+    Every shard owns its own Random and Faker instance so shards can run
+    in any process, in any order, and still produce the same rows.
+    """
+
+    def __init__(self, seed, num_doctors=NUM_DOCTORS, num_patients=NUM_PATIENTS,
+                 pool_seed=None, pool_size=POOL_SIZE, profile=None):
+        self.rng = random.Random(seed)
+        self.fake = Faker()
+        self.fake.seed_instance(seed)
+        self.num_doctors = num_doctors
+        self.num_patients = num_patients
+        # --workload-profile: None keeps the original uniform draws
+        self.model = encounter_model(profile, num_doctors, num_patients)
+        # Pooled mode: shared value pool plus a vectorized index generator
+        self.pool = None
+        self.np_rng = None
+        if pool_seed is not None:
+            self.pool = get_value_pool(pool_seed, pool_size)
+            self.np_rng = np.random.default_rng(seed)
+
+def encounter_model(profile, num_doctors=NUM_DOCTORS, num_patients=NUM_PATIENTS):
+    """workload_profiles.EncounterModel for profile, or None for uniform data"""
+    if profile is None or profile.is_uniform:
+        return None
+    chronic = [i for i, row in enumerate(DIAGNOSES_DATA, 1) if row[4]]
+    return workload_profiles.EncounterModel(profile, num_patients, num_doctors, NUM_DEPARTMENTS,
+                                            len(DIAGNOSES_DATA), chronic, ENCOUNTER_YEARS)
+
 # ============================================================================
-# GENERATE SQL INSERTS
+# ROW GENERATORS
 # ============================================================================
-
-def generate_doctors_sql():
-    """Generate INSERT statements for doctors"""
-    sql = "-- ============================================================================\n"
-    sql += "-- INSERT DOCTORS (50 records)\n"
-    sql += "-- ============================================================================\n\n"
-    sql += "INSERT INTO doctors (first_name, last_name, license_number, specialization, "
-    sql += "fk_department_id, phone_number, email, hire_date, years_of_experience, is_available) VALUES\n"
-
-    values = []
-    for i in range(1, NUM_DOCTORS + 1):
+# Each *_rows() function is a generator that yields one tuple of Python values
+# per row (None for NULL). Nothing is accumulated, so memory use does not
+# depend on how many rows are requested. Primary keys are written explicitly
+# so a shard's rows do not depend on the order shards are loaded in.
+
+DOCTOR_COLUMNS = (
+    'doctor_id', 'first_name', 'last_name', 'license_number', 'specialization',
+    'fk_department_id', 'phone_number', 'email', 'hire_date',
+    'years_of_experience', 'is_available',
+)
+
+PATIENT_COLUMNS = (
+    'patient_id', 'first_name', 'last_name', 'date_of_birth', 'gender', 'blood_type',
+    'phone_number', 'email', 'street_address', 'city', 'state_province',
+    'postal_code', 'country', 'insurance_provider', 'insurance_policy_number',
+    'emergency_contact_name', 'emergency_contact_phone', 'registration_date',
+    'is_active',
+)
+
+DIAGNOSIS_COLUMNS = (
+    'icd_code', 'diagnosis_name', 'diagnosis_category', 'severity_level',
+    'description', 'is_chronic',
+)
+
+MEDICATION_COLUMNS = (
+    'medication_name', 'generic_name', 'ndc_code', 'dosage_strength',
+    'dosage_form', 'route_of_administration', 'common_side_effects',
+    'contraindications', 'manufacturer', 'is_available',
+)
+
+ENCOUNTER_COLUMNS = (
+    'encounter_id', 'fk_patient_id', 'fk_doctor_id', 'fk_department_id', 'fk_diagnosis_id',
+    'fk_medication_id', 'encounter_date', 'encounter_time', 'encounter_type',
+    'encounter_duration_minutes', 'chief_complaint', 'vital_signs_temperature',
+    'vital_signs_blood_pressure', 'vital_signs_heart_rate',
+    'vital_signs_respiratory_rate', 'clinical_notes', 'treatment_plan',
+    'prescribed_quantity', 'prescribed_frequency', 'prescription_duration_days',
+    'follow_up_date', 'follow_up_required', 'billingBillable_amount',
+    'billing_status', 'created_by', 'last_modified_by',
+)
+
+MANUFACTURERS = ['Pfizer', 'Novartis', 'Merck', 'GSK', 'Sanofi', 'AstraZeneca', 'Teva', 'Cipla']
+
+PRESCRIBED_FREQUENCIES = ['Once daily', 'Twice daily', 'Three times daily', 'As needed']
+
+
+def doctor_rows(ctx, start, stop):
+    """Yield one value tuple per doctor with doctor_id in [start, stop)"""
+    fake, rng, model = ctx.fake, ctx.rng, ctx.model
+    for i in range(start, stop):
         first_name = fake.first_name()
         last_name = fake.last_name()
-        license = f"MD{i:06d}"
-        specialization = random.choice(SPECIALIZATIONS)
-        dept_id = random.randint(1, NUM_DEPARTMENTS)
+        license = license_number(i, ctx.num_doctors)
+        specialization = rng.choice(SPECIALIZATIONS)
+        dept_id = rng.randint(1, NUM_DEPARTMENTS)
+        if model is not None and model.fixed_departments:
+            # The first NUM_DEPARTMENTS specializations are the department names
+            dept_id = model.department_of(i)
+            specialization = SPECIALIZATIONS[dept_id - 1]
         phone = fake.phone_number()[:15]
-        email = f"{first_name.lower()}.{last_name.lower()}@hospital.com"
-        hire_date = random_date(2010, 2023)
-        years_exp = random.randint(5, 30)
+        email = email_address(first_name, last_name, i, 'hospital.com')
+        hire_date = random_date(2010, 2023, rng)
+        years_exp = rng.randint(5, 30)
 
-        values.append(
-            f"('{sql_escape(first_name)}', '{sql_escape(last_name)}', '{license}', "
-            f"'{specialization}', {dept_id}, '{phone}', '{email}', '{hire_date}', {years_exp}, TRUE)"
-        )
+        yield (i, first_name, last_name, license, specialization, dept_id,
+               phone, email, hire_date, years_exp, True)
 
-    sql += ",\n".join(values) + ";\n\n"
-    return sql
-
-def generate_patients_sql():
-    """Generate INSERT statements for patients"""
-    sql = "-- ============================================================================\n"
-    sql += "-- INSERT PATIENTS (200 records)\n"
-    sql += "-- ============================================================================\n\n"
-    sql += "INSERT INTO patients (first_name, last_name, date_of_birth, gender, blood_type, "
-    sql += "phone_number, email, street_address, city, state_province, postal_code, country, "
-    sql += "insurance_provider, insurance_policy_number, emergency_contact_name, "
-    sql += "emergency_contact_phone, registration_date, is_active) VALUES\n"
-
-    values = []
-    for i in range(1, NUM_PATIENTS + 1):
+
+def patient_rows(ctx, start, stop):
+    """Yield one value tuple per patient with patient_id in [start, stop)"""
+    fake, rng = ctx.fake, ctx.rng
+    for i in range(start, stop):
         first_name = fake.first_name()
         last_name = fake.last_name()
-        dob = random_date(1940, 2010)
-        gender = random.choice(['M', 'F'])
-        blood_type = random.choice(BLOOD_TYPES)
+        dob = random_date(1940, 2010, rng)
+        gender = rng.choice(['M', 'F'])
+        blood_type = rng.choice(BLOOD_TYPES)
         phone = fake.phone_number()[:15]
-        email = f"{first_name.lower()}.{last_name.lower()}@email.com"
+        email = email_address(first_name, last_name, i, 'email.com')
         address = fake.street_address()[:255]
         city = fake.city()
         state = fake.state()
         postal = fake.postcode()
         country = 'USA'
-        insurance = random.choice(INSURANCE_PROVIDERS)
-        policy = f"{insurance[:3].upper()}{random.randint(100000000, 999999999)}"
+        insurance = rng.choice(INSURANCE_PROVIDERS)
+        policy = f"{insurance[:3].upper()}{policy_number(i, ctx.num_patients)}"
         emergency_name = fake.name()
         emergency_phone = fake.phone_number()[:15]
-        reg_date = random_date(2018, 2024)
-
-        values.append(
-            f"('{sql_escape(first_name)}', '{sql_escape(last_name)}', '{dob}', '{gender}', "
-            f"'{blood_type}', '{phone}', '{email}', '{sql_escape(address)}', '{sql_escape(city)}', "
-            f"'{sql_escape(state)}', '{postal}', '{country}', '{insurance}', '{policy}', "
-            f"'{sql_escape(emergency_name)}', '{emergency_phone}', '{reg_date}', TRUE)"
-        )
+        reg_date = random_date(2018, 2024, rng)
 
-    sql += ",\n".join(values) + ";\n\n"
-    return sql
+        yield (i, first_name, last_name, dob, gender, blood_type, phone, email,
+               address, city, state, postal, country, insurance, policy,
+               emergency_name, emergency_phone, reg_date, True)
 
-def generate_diagnoses_sql():
-    """Generate INSERT statements for diagnoses"""
-    sql = "-- ============================================================================\n"
-    sql += "-- INSERT DIAGNOSES (20 records)\n"
-    sql += "-- ============================================================================\n\n"
-    sql += "INSERT INTO diagnoses (icd_code, diagnosis_name, diagnosis_category, "
-    sql += "severity_level, description, is_chronic) VALUES\n"
 
-    values = []
+def diagnosis_rows(ctx, start=1, stop=None):
+    """Yield one value tuple per reference diagnosis (always a single shard)"""
     for icd, name, category, severity, is_chronic in DIAGNOSES_DATA:
         desc = f"{name} - {category} condition with {severity.lower()} severity"
-        values.append(
-            f"('{icd}', '{sql_escape(name)}', '{category}', '{severity}', "
-            f"'{sql_escape(desc)}', {str(is_chronic).upper()})"
-        )
+        yield (icd, name, category, severity, desc, is_chronic)
 
-    sql += ",\n".join(values) + ";\n\n"
-    return sql
 
-def generate_medications_sql():
-    """Generate INSERT statements for medications"""
-    sql = "-- ============================================================================\n"
-    sql += "-- INSERT MEDICATIONS (30 records)\n"
-    sql += "-- ============================================================================\n\n"
-    sql += "INSERT INTO medications (medication_name, generic_name, ndc_code, dosage_strength, "
-    sql += "dosage_form, route_of_administration, common_side_effects, contraindications, "
-    sql += "manufacturer, is_available) VALUES\n"
-
-    values = []
-    manufacturers = ['Pfizer', 'Novartis', 'Merck', 'GSK', 'Sanofi', 'AstraZeneca', 'Teva', 'Cipla']
-
-    for i, (med_name, generic, strength, form, route) in enumerate(MEDICATIONS_DATA, 1):
-        ndc = f"{random.randint(1000, 9999)}-{random.randint(1000, 9999)}-{random.randint(10, 99)}"
+def medication_rows(ctx, start=1, stop=None):
+    """Yield one value tuple per reference medication (always a single shard)"""
+    fake, rng = ctx.fake, ctx.rng
+    for k, (med_name, generic, strength, form, route) in enumerate(MEDICATIONS_DATA, 1):
+        # labeler-product-package; the product code is the row number, so codes never repeat
+        ndc = f"{rng.randint(1000, 9999)}-{k:04d}-{rng.randint(10, 99)}"
         side_effects = fake.sentence(nb_words=6)
         contraindications = fake.sentence(nb_words=5)
-        manufacturer = random.choice(manufacturers)
-
-        values.append(
-            f"('{sql_escape(med_name)}', '{sql_escape(generic)}', '{ndc}', '{strength}', "
-            f"'{form}', '{route}', '{sql_escape(side_effects)}', '{sql_escape(contraindications)}', "
-            f"'{manufacturer}', TRUE)"
-        )
-
-    sql += ",\n".join(values) + ";\n\n"
-    return sql
-
-def generate_encounters_sql():
-    """Generate INSERT statements for normalized encounters table"""
-    sql = "-- ============================================================================\n"
-    sql += "-- INSERT ENCOUNTERS (500 records)\n"
-    sql += "-- ============================================================================\n\n"
-    sql += "INSERT INTO encounters (fk_patient_id, fk_doctor_id, fk_department_id, "
-    sql += "fk_diagnosis_id, fk_medication_id, encounter_date, encounter_time, encounter_type, "
-    sql += "encounter_duration_minutes, chief_complaint, vital_signs_temperature, "
-    sql += "vital_signs_blood_pressure, vital_signs_heart_rate, vital_signs_respiratory_rate, "
-    sql += "clinical_notes, treatment_plan, prescribed_quantity, prescribed_frequency, "
-    sql += "prescription_duration_days, follow_up_date, follow_up_required, "
-    sql += "billingBillable_amount, billing_status, created_by, last_modified_by) VALUES\n"
-
-    values = []
-    for i in range(NUM_ENCOUNTERS):
-        patient_id = random.randint(1, NUM_PATIENTS)
-        doctor_id = random.randint(1, NUM_DOCTORS)
-        dept_id = random.randint(1, NUM_DEPARTMENTS)
-        diagnosis_id = random.randint(1, len(DIAGNOSES_DATA))
-        medication_id = random.randint(1, len(MEDICATIONS_DATA)) if random.random() > 0.1 else 'NULL'
-
-        encounter_date = random_date(2023, 2024)
-        encounter_time = random_time()
-        encounter_type = random.choice(ENCOUNTER_TYPES)
-        duration = random.choice([15, 20, 30, 45, 60, 90, 120])
+        manufacturer = rng.choice(MANUFACTURERS)
+
+        yield (med_name, generic, ndc, strength, form, route, side_effects,
+               contraindications, manufacturer, True)
+
+
+def encounter_rows(ctx, start, stop):
+    """Yield one value tuple per encounter with encounter_id in [start, stop)"""
+    fake, rng, model = ctx.fake, ctx.rng, ctx.model
+    for i in range(start, stop):
+        if model is None:
+            patient_id = rng.randint(1, ctx.num_patients)
+            doctor_id = rng.randint(1, ctx.num_doctors)
+            dept_id = rng.randint(1, NUM_DEPARTMENTS)
+            diagnosis_id = rng.randint(1, len(DIAGNOSES_DATA))
+        else:
+            visit = model.draw(rng)
+            patient_id, doctor_id, dept_id, diagnosis_id = visit[:4]
+        medication_id = rng.randint(1, len(MEDICATIONS_DATA)) if rng.random() > 0.1 else None
+
+        if model is None:
+            encounter_date = random_date(*ENCOUNTER_YEARS, rng=rng)
+            encounter_time = random_time(rng)
+        else:
+            encounter_date, encounter_time = visit.date, visit.time
+        encounter_type = rng.choice(ENCOUNTER_TYPES)
+        if model is not None and visit.revisit:
+            encounter_type = 'Follow-up Visit'
+        duration = rng.choice([15, 20, 30, 45, 60, 90, 120])
         complaint = fake.sentence(nb_words=8)
 
-        temp = round(random.uniform(97.0, 99.5), 1)
-        bp_systolic = random.randint(110, 160)
-        bp_diastolic = random.randint(60, 100)
+        temp = round(rng.uniform(97.0, 99.5), 1)
+        bp_systolic = rng.randint(110, 160)
+        bp_diastolic = rng.randint(60, 100)
         bp = f"{bp_systolic}/{bp_diastolic}"
-        heart_rate = random.randint(60, 100)
-        resp_rate = random.randint(12, 20)
+        heart_rate = rng.randint(60, 100)
+        resp_rate = rng.randint(12, 20)
 
         clinical_notes = fake.paragraph(nb_sentences=2)
         treatment_plan = fake.paragraph(nb_sentences=2)
 
-        prescribed_qty = random.choice([14, 30, 60, 90]) if medication_id != 'NULL' else 'NULL'
-        prescribed_freq = random.choice([
-            'Once daily', 'Twice daily', 'Three times daily', 'As needed'
-        ]) if medication_id != 'NULL' else 'NULL'
-        prescription_days = random.choice([7, 14, 30, 90]) if medication_id != 'NULL' else 'NULL'
-
-        follow_up_required = random.choice([True, False])
-        follow_up_date = f"'{random_date(2024, 2025)}'" if follow_up_required else 'NULL'
-
-        billing_amount = round(random.uniform(150.0, 5000.0), 2)
-        billing_status = random.choice(BILLING_STATUSES)
-
-        doctor_name = f"Dr. Smith"  # Placeholder
-
-        med_id_val = medication_id if medication_id != 'NULL' else 'NULL'
-        qty_val = prescribed_qty if prescribed_qty != 'NULL' else 'NULL'
-        freq_val = f"'{prescribed_freq}'" if prescribed_freq != 'NULL' else 'NULL'
-        days_val = prescription_days if prescription_days != 'NULL' else 'NULL'
-
-        values.append(
-            f"({patient_id}, {doctor_id}, {dept_id}, {diagnosis_id}, {med_id_val}, "
-            f"'{encounter_date}', '{encounter_time}', '{encounter_type}', {duration}, "
-            f"'{sql_escape(complaint)}', {temp}, '{bp}', {heart_rate}, {resp_rate}, "
-            f"'{sql_escape(clinical_notes)}', '{sql_escape(treatment_plan)}', "
-            f"{qty_val}, {freq_val}, {days_val}, {follow_up_date}, "
-            f"{str(follow_up_required).upper()}, {billing_amount}, '{billing_status}', "
-            f"'{doctor_name}', '{doctor_name}')"
-        )
+        if medication_id is not None:
+            prescribed_qty = rng.choice([14, 30, 60, 90])
+            prescribed_freq = rng.choice(PRESCRIBED_FREQUENCIES)
+            prescription_days = rng.choice([7, 14, 30, 90])
+        else:
+            prescribed_qty = prescribed_freq = prescription_days = None
+
+        follow_up_required = rng.choice([True, False])
+        follow_up_date = random_date(2024, 2025, rng) if follow_up_required else None
 
-    sql += ",\n".join(values) + ";\n\n"
-    return sql
+        billing_amount = round(rng.uniform(150.0, 5000.0), 2)
+        billing_status = rng.choice(BILLING_STATUSES)
+
+        doctor_name = "Dr. Smith"  # Placeholder
+
+        yield (i, patient_id, doctor_id, dept_id, diagnosis_id, medication_id,
+               encounter_date, encounter_time, encounter_type, duration,
+               complaint, temp, bp, heart_rate, resp_rate, clinical_notes,
+               treatment_plan, prescribed_qty, prescribed_freq,
+               prescription_days, follow_up_date, follow_up_required,
+               billing_amount, billing_status, doctor_name, doctor_name)
 
 # ============================================================================
-# MAIN SCRIPT
+# POOLED GENERATION (--mode pooled)
 # ============================================================================
+# Instead of calling Faker and random once per field per row, pooled mode
+# generates POOL_SIZE values of each Faker type once per process, then
+# builds rows in batches by drawing NumPy arrays of pool indices, vitals,
+# dates and amounts. The pool is seeded from the master seed (so every
+# shard shares it) and the index draws from the shard seed, keeping output
+# reproducible for a given seed and shard count.
 
-def main():
-    print("Generating SQL file with bulk fake data...")
+_VALUE_POOLS = {}
 
-    output_file = "healthcare_bulk_data.sql"
+def date_strings(start_year, end_year):
+    """Every date from Jan 1 of start_year to Dec 31 of end_year as 'YYYY-MM-DD'"""
+    start = datetime(start_year, 1, 1)
+    days = (datetime(end_year, 12, 31) - start).days + 1
+    return [(start + timedelta(days=d)).strftime('%Y-%m-%d') for d in range(days)]
+
+TIME_STRINGS = [f"{h:02d}:{m:02d}:00" for h in range(8, 19) for m in (0, 15, 30, 45)]
+
+def get_value_pool(seed, size):
+    """Build (once per process) the pool of pre-generated Faker values"""
+    key = (seed, size)
+    if key not in _VALUE_POOLS:
+        fake = Faker()
+        fake.seed_instance(seed)
+        _VALUE_POOLS[key] = {
+            'first_name': [fake.first_name() for _ in range(size)],
+            'last_name': [fake.last_name() for _ in range(size)],
+            'name': [fake.name() for _ in range(size)],
+            'phone': [fake.phone_number()[:15] for _ in range(size)],
+            'street_address': [fake.street_address()[:255] for _ in range(size)],
+            'city': [fake.city() for _ in range(size)],
+            'state': [fake.state() for _ in range(size)],
+            'postcode': [fake.postcode() for _ in range(size)],
+            'complaint': [fake.sentence(nb_words=8) for _ in range(size)],
+            'paragraph': [fake.paragraph(nb_sentences=2) for _ in range(size)],
+            'hire_date': date_strings(2010, 2023),
+            'dob': date_strings(1940, 2010),
+            'registration_date': date_strings(2018, 2024),
+            'encounter_date': date_strings(*ENCOUNTER_YEARS),
+            'follow_up_date': date_strings(2024, 2025),
+        }
+    return _VALUE_POOLS[key]
+
+def pooled_batches(start, stop):
+    """Split [start, stop) into (batch_start, batch_len) pieces of POOL_BATCH rows"""
+    for batch_start in range(start, stop, POOL_BATCH):
+        yield batch_start, min(POOL_BATCH, stop - batch_start)
+
+def pick(values, indices):
+    """Look up pool values for an array of indices"""
+    return [values[i] for i in indices.tolist()]
+
+def pooled_doctor_rows(ctx, start, stop):
+    """Pooled equivalent of doctor_rows()"""
+    pool, rng, model = ctx.pool, ctx.np_rng, ctx.model
+    size = len(pool['first_name'])
+    for batch_start, n in pooled_batches(start, stop):
+        first = pick(pool['first_name'], rng.integers(0, size, n))
+        last = pick(pool['last_name'], rng.integers(0, size, n))
+        specialization = pick(SPECIALIZATIONS, rng.integers(0, len(SPECIALIZATIONS), n))
+        dept = rng.integers(1, NUM_DEPARTMENTS + 1, n).tolist()
+        if model is not None and model.fixed_departments:
+            dept = model.departments_of(np.arange(batch_start, batch_start + n)).tolist()
+            specialization = [SPECIALIZATIONS[d - 1] for d in dept]
+        phone = pick(pool['phone'], rng.integers(0, size, n))
+        hire = pick(pool['hire_date'], rng.integers(0, len(pool['hire_date']), n))
+        years = rng.integers(5, 31, n).tolist()
+
+        for k in range(n):
+            i = batch_start + k
+            yield (i, first[k], last[k], license_number(i, ctx.num_doctors), specialization[k],
+                   dept[k], phone[k], email_address(first[k], last[k], i, 'hospital.com'),
+                   hire[k], years[k], True)
+
+def pooled_patient_rows(ctx, start, stop):
+    """Pooled equivalent of patient_rows()"""
+    pool, rng = ctx.pool, ctx.np_rng
+    size = len(pool['first_name'])
+    for batch_start, n in pooled_batches(start, stop):
+        first = pick(pool['first_name'], rng.integers(0, size, n))
+        last = pick(pool['last_name'], rng.integers(0, size, n))
+        dob = pick(pool['dob'], rng.integers(0, len(pool['dob']), n))
+        gender = pick(['M', 'F'], rng.integers(0, 2, n))
+        blood = pick(BLOOD_TYPES, rng.integers(0, len(BLOOD_TYPES), n))
+        phone = pick(pool['phone'], rng.integers(0, size, n))
+        address = pick(pool['street_address'], rng.integers(0, size, n))
+        city = pick(pool['city'], rng.integers(0, size, n))
+        state = pick(pool['state'], rng.integers(0, size, n))
+        postal = pick(pool['postcode'], rng.integers(0, size, n))
+        insurance = pick(INSURANCE_PROVIDERS, rng.integers(0, len(INSURANCE_PROVIDERS), n))
+        emergency_name = pick(pool['name'], rng.integers(0, size, n))
+        emergency_phone = pick(pool['phone'], rng.integers(0, size, n))
+        reg = pick(pool['registration_date'], rng.integers(0, len(pool['registration_date']), n))
+
+        for k in range(n):
+            i = batch_start + k
+            yield (i, first[k], last[k], dob[k], gender[k], blood[k], phone[k],
+                   email_address(first[k], last[k], i, 'email.com'), address[k], city[k],
+                   state[k], postal[k], 'USA', insurance[k],
+                   f"{insurance[k][:3].upper()}{policy_number(i, ctx.num_patients)}",
+                   emergency_name[k], emergency_phone[k], reg[k], True)
+
+def pooled_encounter_rows(ctx, start, stop):
+    """Pooled equivalent of encounter_rows()"""
+    pool, rng, model = ctx.pool, ctx.np_rng, ctx.model
+    size = len(pool['complaint'])
+    durations = [15, 20, 30, 45, 60, 90, 120]
+    for batch_start, n in pooled_batches(start, stop):
+        if model is None:
+            patient = rng.integers(1, ctx.num_patients + 1, n).tolist()
+            doctor = rng.integers(1, ctx.num_doctors + 1, n).tolist()
+            dept = rng.integers(1, NUM_DEPARTMENTS + 1, n).tolist()
+            diagnosis = rng.integers(1, len(DIAGNOSES_DATA) + 1, n).tolist()
+        else:
+            visit = model.draw_batch(rng, n)
+            patient, doctor, dept, diagnosis, enc_date, enc_time = visit[:6]
+        has_med = (rng.random(n) > 0.1).tolist()
+        medication = rng.integers(1, len(MEDICATIONS_DATA) + 1, n).tolist()
+        if model is None:
+            enc_date = pick(pool['encounter_date'], rng.integers(0, len(pool['encounter_date']), n))
+            enc_time = pick(TIME_STRINGS, rng.integers(0, len(TIME_STRINGS), n))
+        enc_type = pick(ENCOUNTER_TYPES, rng.integers(0, len(ENCOUNTER_TYPES), n))
+        if model is not None:
+            enc_type = ['Follow-up Visit' if r else t for r, t in zip(visit.revisit, enc_type)]
+        duration = pick(durations, rng.integers(0, len(durations), n))
+        complaint = pick(pool['complaint'], rng.integers(0, size, n))
+        temp = (rng.integers(970, 996, n) / 10).tolist()
+        systolic = rng.integers(110, 161, n).tolist()
+        diastolic = rng.integers(60, 101, n).tolist()
+        heart_rate = rng.integers(60, 101, n).tolist()
+        resp_rate = rng.integers(12, 21, n).tolist()
+        notes = pick(pool['paragraph'], rng.integers(0, size, n))
+        plan = pick(pool['paragraph'], rng.integers(0, size, n))
+        qty = pick([14, 30, 60, 90], rng.integers(0, 4, n))
+        freq = pick(PRESCRIBED_FREQUENCIES, rng.integers(0, len(PRESCRIBED_FREQUENCIES), n))
+        days = pick([7, 14, 30, 90], rng.integers(0, 4, n))
+        follow_up = (rng.random(n) < 0.5).tolist()
+        follow_date = pick(pool['follow_up_date'], rng.integers(0, len(pool['follow_up_date']), n))
+        billing = (rng.integers(15000, 500001, n) / 100).tolist()
+        status = pick(BILLING_STATUSES, rng.integers(0, len(BILLING_STATUSES), n))
+
+        for k in range(n):
+            med = has_med[k]
+            yield (batch_start + k, patient[k], doctor[k], dept[k], diagnosis[k],
+                   medication[k] if med else None, enc_date[k], enc_time[k], enc_type[k],
+                   duration[k], complaint[k], temp[k], f"{systolic[k]}/{diastolic[k]}",
+                   heart_rate[k], resp_rate[k], notes[k], plan[k],
+                   qty[k] if med else None, freq[k] if med else None,
+                   days[k] if med else None, follow_date[k] if follow_up[k] else None,
+                   follow_up[k], billing[k], status[k], "Dr. Smith", "Dr. Smith")
 
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("-- ============================================================================\n")
-        f.write("-- Healthcare System - BULK FAKE DATA GENERATION\n")
-        f.write("-- ============================================================================\n")
-        f.write("-- Total Records: ~500+\n")
-        f.write(f"-- Doctors: {NUM_DOCTORS}\n")
-        f.write(f"-- Patients: {NUM_PATIENTS}\n")
-        f.write(f"-- Diagnoses: {len(DIAGNOSES_DATA)}\n")
-        f.write(f"-- Medications: {len(MEDICATIONS_DATA)}\n")
-        f.write(f"-- Encounters: {NUM_ENCOUNTERS}\n")
-        f.write("-- ============================================================================\n\n")
-        f.write("USE healthcare_system;\n\n")
-
-        # Add cleanup section
-        f.write("-- ============================================================================\n")
-        f.write("-- DATA CLEANUP - Remove existing data to prevent duplicates\n")
-        f.write("-- ============================================================================\n")
-        f.write("-- This prevents \"Duplicate entry\" errors for UNIQUE constraints\n")
-        f.write("-- We clear dependent tables first (in reverse FK order), then parent tables\n\n")
+# ============================================================================
+# GENERATE SQL INSERTS
+# ============================================================================
+# Each generate_*_sql() function is itself a generator: it yields one
+# multi-row INSERT statement per chunk of rows for one shard's ID range, so
+# the caller can write each piece to disk as soon as it is produced.
 
-        f.write("SET FOREIGN_KEY_CHECKS = 0;\n\n")
+def sql_literal(value):
+    """Render a Python value as a MySQL literal"""
+    if value is None:
+        return 'NULL'
+    if value is True:
+        return 'TRUE'
+    if value is False:
+        return 'FALSE'
+    if isinstance(value, (int, float)):
+        return str(value)
+    return f"'{sql_escape(value)}'"
+
+def section_header(title):
+    """Banner comment that introduces each table's INSERT statements"""
+    return (
+        "-- ============================================================================\n"
+        f"-- {title}\n"
+        "-- ============================================================================\n\n"
+    )
+
+def insert_statements(table, columns, rows, chunk_size=CHUNK_SIZE):
+    """Yield multi-row INSERT statements of at most chunk_size rows each"""
+    prefix = f"INSERT INTO {table} ({', '.join(columns)}) VALUES\n"
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        values = ",\n".join(
+            "(" + ", ".join(sql_literal(v) for v in row) + ")" for row in chunk
+        )
+        yield prefix + values + ";\n\n"
 
-        f.write("-- Clear denormalized table first (depends on all others)\n")
-        f.write("TRUNCATE TABLE denormalized_patient_encounters;\n\n")
+def generate_doctors_sql(ctx, start, stop, chunk_size=CHUNK_SIZE):
+    """Generate INSERT statements for doctors with doctor_id in [start, stop)"""
+    yield from insert_statements('doctors', DOCTOR_COLUMNS,
+                                 table_rows(ctx, 'doctors', start, stop), chunk_size)
 
-        f.write("-- Clear encounters table (depends on dimension tables)\n")
-        f.write("TRUNCATE TABLE encounters;\n\n")
+def generate_patients_sql(ctx, start, stop, chunk_size=CHUNK_SIZE):
+    """Generate INSERT statements for patients with patient_id in [start, stop)"""
+    yield from insert_statements('patients', PATIENT_COLUMNS,
+                                 table_rows(ctx, 'patients', start, stop), chunk_size)
 
-        f.write("-- Clear dimension tables (doctors depends on departments, so clear doctors first)\n")
-        f.write("TRUNCATE TABLE doctors;\n")
-        f.write("TRUNCATE TABLE patients;\n")
-        f.write("TRUNCATE TABLE diagnoses;\n")
-        f.write("TRUNCATE TABLE medications;\n\n")
+def generate_diagnoses_sql(ctx, start=1, stop=None, chunk_size=CHUNK_SIZE):
+    """Generate INSERT statements for diagnoses"""
+    yield from insert_statements('diagnoses', DIAGNOSIS_COLUMNS,
+                                 table_rows(ctx, 'diagnoses', start, stop), chunk_size)
 
-        f.write("-- Keep departments table as-is (already has 10 records)\n")
-        f.write("-- If you want fresh departments too, uncomment the next line:\n")
-        f.write("-- TRUNCATE TABLE departments;\n\n")
+def generate_medications_sql(ctx, start=1, stop=None, chunk_size=CHUNK_SIZE):
+    """Generate INSERT statements for medications"""
+    yield from insert_statements('medications', MEDICATION_COLUMNS,
+                                 table_rows(ctx, 'medications', start, stop), chunk_size)
+
+def generate_encounters_sql(ctx, start, stop, chunk_size=CHUNK_SIZE):
+    """Generate INSERT statements for encounters with encounter_id in [start, stop)"""
+    yield from insert_statements('encounters', ENCOUNTER_COLUMNS,
+                                 table_rows(ctx, 'encounters', start, stop), chunk_size)
+
+# Tables in load (FK) order
+TABLE_GENERATORS = {
+    'doctors': generate_doctors_sql,
+    'patients': generate_patients_sql,
+    'diagnoses': generate_diagnoses_sql,
+    'medications': generate_medications_sql,
+    'encounters': generate_encounters_sql,
+}
+
+TABLE_COLUMNS = {
+    'doctors': DOCTOR_COLUMNS,
+    'patients': PATIENT_COLUMNS,
+    'diagnoses': DIAGNOSIS_COLUMNS,
+    'medications': MEDICATION_COLUMNS,
+    'encounters': ENCOUNTER_COLUMNS,
+}
+
+# (per-row Faker generator, pooled generator) for each table
+ROW_GENERATORS = {
+    'doctors': (doctor_rows, pooled_doctor_rows),
+    'patients': (patient_rows, pooled_patient_rows),
+    'diagnoses': (diagnosis_rows, diagnosis_rows),
+    'medications': (medication_rows, medication_rows),
+    'encounters': (encounter_rows, pooled_encounter_rows),
+}
+
+# Reference tables are tiny and fixed, so they are never split
+SHARDED_TABLES = ('doctors', 'patients', 'encounters')
+
+def table_rows(ctx, table, start, stop):
+    """Row iterator for one table's [start, stop) range in the context's mode"""
+    faker_rows, pooled_rows = ROW_GENERATORS[table]
+    return (pooled_rows if ctx.pool is not None else faker_rows)(ctx, start, stop)
 
-        f.write("SET FOREIGN_KEY_CHECKS = 1;\n\n")
+# ============================================================================
+# DELIMITED OUTPUT (--format csv / tsv) FOR LOAD DATA INFILE
+# ============================================================================
+# MySQL parses LOAD DATA input far faster than multi-row INSERTs. Fields use
+# MySQL's default escape rules (ESCAPED BY '\\'): NULL is written as \N and
+# backslashes, tabs, newlines, carriage returns and NULs are backslash-escaped.
+# CSV additionally encloses every string in double quotes and escapes
+# embedded quotes, so commas and quotes inside values are safe.
+
+DELIMITED_FORMATS = {
+    'tsv': "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'",
+    'csv': "FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '\\\\'",
+}
+
+_TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+_CSV_ESCAPES = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n', '\r': '\\r', '\0': '\\0'})
+
+def delimited_field(value, fmt):
+    """Render a Python value as one LOAD DATA field"""
+    if value is None:
+        return '\\N'
+    if value is True:
+        return '1'
+    if value is False:
+        return '0'
+    if isinstance(value, (int, float)):
+        return str(value)
+    if fmt == 'csv':
+        return '"' + str(value).translate(_CSV_ESCAPES) + '"'
+    return str(value).translate(_TSV_ESCAPES)
+
+def delimited_lines(rows, fmt, chunk_size=CHUNK_SIZE):
+    """Yield blocks of chunk_size delimited lines"""
+    sep = ',' if fmt == 'csv' else '\t'
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield "".join(
+            sep.join(delimited_field(v, fmt) for v in row) + "\n" for row in chunk
+        )
 
-        f.write("-- ============================================================================\n")
-        f.write("-- Note: All tables are now empty (except departments with 10 records)\n")
-        f.write("-- Ready for bulk data insertion\n")
-        f.write("-- ============================================================================\n\n")
+def data_file_path(output, table, fmt):
+    """Data file for one table, next to the driver script"""
+    base, _ = os.path.splitext(output)
+    return f"{base}_{table}.{fmt}"
+
+def load_data_sql(table, path, fmt, relative=True):
+    """LOAD DATA statement matching the files written by delimited_lines().
+
+    The file is named relative to the driver script unless relative is False.
+    """
+    columns = ", ".join(TABLE_COLUMNS[table])
+    name = os.path.basename(path) if relative else path
+    return (
+        f"LOAD DATA LOCAL INFILE '{sql_escape(name)}'\n"
+        f"INTO TABLE {table}\n"
+        "CHARACTER SET utf8mb4\n"
+        f"{DELIMITED_FORMATS[fmt]}\n"
+        "LINES TERMINATED BY '\\n'\n"
+        f"({columns});\n\n"
+    )
 
-        print("Generating doctors data...")
-        f.write(generate_doctors_sql())
+# ============================================================================
+# SHARDED GENERATION
+# ============================================================================
 
-        print("Generating patients data...")
-        f.write(generate_patients_sql())
+@dataclass
+class GenerationConfig:
+    """Everything that determines what gets generated and how"""
+    num_doctors: int = NUM_DOCTORS
+    num_patients: int = NUM_PATIENTS
+    num_encounters: int = NUM_ENCOUNTERS
+    chunk_size: int = CHUNK_SIZE
+    seed: int = SEED
+    workers: int = 1
+    shards: Optional[int] = None  # Defaults to workers
+    mode: str = 'faker'  # 'faker' or 'pooled'
+    pool_size: int = POOL_SIZE
+    fmt: str = 'sql'  # 'sql', 'csv' or 'tsv'
+    tmp_dir: Optional[str] = None
+    partitioned: Optional[str] = None  # 'month' or 'quarter' to recreate the table partitioned
+    fast_load: bool = False  # defer secondary indexes and checks until the data is in
+    profile: Optional[workload_profiles.WorkloadProfile] = None  # None = uniform keys and dates
+    scale_factor: Optional[float] = None  # recorded in the header when the sizes came from --scale-factor
+    max_file_bytes: Optional[int] = None  # split data into part files of about this size
+    compress: Optional[str] = None  # 'gzip' or 'zstd' for SQL file output
+
+    @property
+    def num_shards(self):
+        return self.shards or self.workers
+
+    def sizes(self):
+        """Row count per table, in load order"""
+        return {
+            'doctors': self.num_doctors,
+            'patients': self.num_patients,
+            'diagnoses': len(DIAGNOSES_DATA),
+            'medications': len(MEDICATIONS_DATA),
+            'encounters': self.num_encounters,
+        }
+
+    def total_records(self):
+        return sum(self.sizes().values())
+
+ShardTask = namedtuple('ShardTask', ['table', 'shard_index', 'start', 'stop', 'seed', 'config'])
+
+def plan_shards(config):
+    """Build the ordered list of shard tasks for every table.
+
+    The plan depends only on the sizes, seed and shard count, never on the
+    number of workers.
+    """
+    tasks = []
+    for table, total in config.sizes().items():
+        count = config.num_shards if table in SHARDED_TABLES else 1
+        for index, (start, stop) in enumerate(shard_ranges(total, count)):
+            tasks.append(ShardTask(table, index, start, stop,
+                                   shard_seed(config.seed, table, index), config))
+    return tasks
+
+def shard_context(task):
+    """ShardContext for one shard task"""
+    config = task.config
+    pool_seed = shard_seed(config.seed, 'pool', 0) if config.mode == 'pooled' else None
+    return ShardContext(task.seed, config.num_doctors, config.num_patients,
+                        pool_seed, config.pool_size, config.profile)
+
+def shard_pieces(task, ctx=None):
+    """Yield the text (INSERT statements or delimited lines) for one shard"""
+    config = task.config
+    ctx = ctx or shard_context(task)
+    if config.fmt == 'sql':
+        return TABLE_GENERATORS[task.table](ctx, task.start, task.stop, config.chunk_size)
+    rows = table_rows(ctx, task.table, task.start, task.stop)
+    return delimited_lines(rows, config.fmt, config.chunk_size)
+
+def output_newline(fmt):
+    """Delimited files always use \\n line endings to match LINES TERMINATED BY"""
+    return None if fmt == 'sql' else ''
+
+def write_shard(task, out=None):
+    """Generate one shard.
+
+    Writes straight into out when given (serial mode) and returns the
+    number of bytes written; otherwise writes a temporary file and returns
+    its path (process pool mode).
+    """
+    pieces = shard_pieces(task)
+    if out is not None:
+        size = 0
+        for piece in pieces:
+            out.write(piece)
+            size += len(piece) if piece.isascii() else len(piece.encode('utf-8'))
+        return size
+
+    fd, path = tempfile.mkstemp(prefix=f"{task.table}_{task.shard_index:05d}_",
+                                suffix=f".{task.config.fmt}", dir=task.config.tmp_dir)
+    with os.fdopen(fd, 'w', encoding='utf-8', newline=output_newline(task.config.fmt)) as f:
+        f.writelines(pieces)
+    return path
+
+def write_shard_measured(task):
+    """write_shard() in a pool worker; returns (path, CPU seconds, worker peak RSS)"""
+    start = run_metrics.cpu_seconds()
+    path = write_shard(task)
+    return path, run_metrics.cpu_seconds() - start, run_metrics.peak_rss_bytes()
+
+def write_table_data(out_for, config):
+    """Write every table's rows, in FK order.
+
+    out_for(table) returns the open file that table's rows go to (the one
+    bulk script for SQL output, one data file per table for CSV/TSV). With
+    workers > 1 shards are generated in a process pool and their temporary
+    files are appended in plan order as they complete. Each table is one
+    run_metrics stage.
+    """
+    tasks = plan_shards(config)
+    sizes = config.sizes()
+    state = {'table': None, 'file': None}
+
+    def file_for(table):
+        if table != state['table']:
+            print(f"Generating {table} data...")
+            state['table'] = table
+            state['file'] = out_for(table)
+            if config.fmt == 'sql':
+                state['file'].write(section_header(f"INSERT {table.upper()} ({sizes[table]} records)"))
+        return state['file']
+
+    if config.workers <= 1:
+        with run_metrics.profiled():
+            for table, table_tasks in groupby(tasks, key=attrgetter('table')):
+                with run_metrics.stage(f"generate {table}", rows=sizes[table]) as stage:
+                    f = file_for(table)
+                    for task in table_tasks:
+                        stage.add_bytes(write_shard(task, f))
+        return
+
+    newline = output_newline(config.fmt)
+    with ProcessPoolExecutor(max_workers=config.workers) as executor:
+        results = executor.map(write_shard_measured, tasks)
+        for table, table_tasks in groupby(tasks, key=attrgetter('table')):
+            # Take exactly this table's results, so the stage never waits on the next table's shards
+            shards = len(list(table_tasks))
+            with run_metrics.stage(f"generate {table}", rows=sizes[table]) as stage:
+                f = file_for(table)
+                for path, cpu, peak_rss in islice(results, shards):
+                    stage.add_bytes(os.path.getsize(path))
+                    stage.add_worker(cpu, peak_rss)
+                    with open(path, 'r', encoding='utf-8', newline=newline) as src:
+                        if isinstance(f, PartWriter) and f.max_bytes:
+                            # whole statements (lines for CSV/TSV), so parts only break between them
+                            f.writelines(sql_statements(src) if config.fmt == 'sql' else src)
+                        else:
+                            shutil.copyfileobj(src, f, 1 << 20)
+                    os.remove(path)
+
+# ============================================================================
+# SCALE FACTOR, SIZE ESTIMATE AND PART FILES
+# ============================================================================
+# --scale-factor derives every table's size from one number, TPC style.
+# Before generating, a sample of each table is generated in memory and
+# extrapolated to estimate the output size and generation time. With
+# --max-file-size each table's rows go to numbered part files that each
+# load on their own (dimension tables before encounters, any order within
+# a table), so they can be loaded over several connections.
+
+_SIZE_UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+def scaled_sizes(scale_factor):
+    """(doctors, patients, encounters) for a scale factor; SF1 = 1M encounters"""
+    return tuple(max(1, round(base * scale_factor))
+                 for base in (SF1_DOCTORS, SF1_PATIENTS, SF1_ENCOUNTERS))
+
+def parse_size(text):
+    """'512M', '2G', '1048576' -> bytes"""
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)I?B?\s*", text, re.I)
+    if not m:
+        raise ValueError(f"invalid size {text!r} (use e.g. 512M or 2G)")
+    return int(float(m.group(1)) * _SIZE_UNITS[m.group(2).upper()])
+
+def format_bytes(n):
+    """Human-readable byte count ("n/a" for None)"""
+    if n is None:
+        return "n/a"
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == 'B' else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+def format_seconds(seconds):
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+Estimate = namedtuple('Estimate', ['bytes', 'seconds', 'files', 'tables'])
+
+def estimate_run(config, sample_rows=ESTIMATE_SAMPLE_ROWS):
+    """Estimate output bytes and generation seconds from a sample of each table.
+
+    Generates up to sample_rows rows of every table with the run's own
+    format, mode and profile, and scales bytes and time by row count.
+    Sharded tables are assumed to speed up with the number of workers.
+    tables maps each table to its estimated bytes.
+    """
+    parallel = max(1, min(config.workers, config.num_shards))
+    tables, total_seconds = {}, 0.0
+    for table, rows in config.sizes().items():
+        count = min(rows, sample_rows)
+        task = ShardTask(table, 0, 1, 1 + count, shard_seed(config.seed, table, 0), config)
+        ctx = shard_context(task)  # Faker setup and the value pool are one-off costs
+        start = time.perf_counter()
+        size = sum(len(piece.encode('utf-8')) for piece in shard_pieces(task, ctx))
+        seconds = (time.perf_counter() - start) * rows / count
+        tables[table] = size * rows / count
+        total_seconds += seconds / parallel if table in SHARDED_TABLES else seconds
+    total = sum(tables.values())
+    if config.max_file_bytes:
+        files = sum(max(1, math.ceil(b / config.max_file_bytes)) for b in tables.values()) + 1
+    else:
+        files = 1 if config.fmt == 'sql' else len(tables) + 1
+    return Estimate(total, total_seconds, files, tables)
+
+def print_estimate(estimate, config, output):
+    """Report an estimate and warn when it will not fit on the output's disk"""
+    split = f", parts of <= {format_bytes(config.max_file_bytes)}" if config.max_file_bytes else ""
+    if config.compress:
+        split += f", before {config.compress} compression"
+    print(f"Estimated output: {format_bytes(estimate.bytes)} in {estimate.files} files{split}; "
+          f"generation ~{format_seconds(estimate.seconds)} with {config.workers} worker(s)")
+    for table, size in estimate.tables.items():
+        print(f"  {table:<12} {config.sizes()[table]:>14,} rows  {format_bytes(size):>10}")
+    free = shutil.disk_usage(os.path.dirname(os.path.abspath(output))).free
+    if estimate.bytes > free:
+        print(f"WARNING: only {format_bytes(free)} free next to {output}")
+
+
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+
+def compressed_path(path, compress):
+    """path with the compression suffix added (unchanged without compression)"""
+    suffix = COMPRESSION_SUFFIXES.get(compress, '')
+    return path if path.endswith(suffix) else path + suffix
+
+def open_output(path, compress=None, newline=None):
+    """Open an output file for writing as text, gzip- or zstd-compressed if asked"""
+    if compress == 'gzip':
+        return gzip.open(path, 'wt', encoding='utf-8', newline=newline, compresslevel=6)
+    if compress == 'zstd':
+        writer = zstandard.ZstdCompressor(level=3).stream_writer(open(path, 'wb'), closefd=True)
+        return io.TextIOWrapper(writer, encoding='utf-8', newline=newline)
+    return open(path, 'w', encoding='utf-8', newline=newline)
+
+def sql_statements(lines):
+    """Join the lines of a generated SQL file back into whole statements"""
+    statement = []
+    for line in lines:
+        statement.append(line)
+        if line.rstrip('\n').endswith(';') or not line.strip():
+            yield ''.join(statement)
+            statement = []
+    if statement:
+        yield ''.join(statement)
+
+class PartWriter:
+    """File-like sink for one table's rows that rolls over to numbered parts.
+
+    Without max_bytes everything goes to a single file (path_for(None)).
+    With it, a new part file path_for(n) is started at a boundary (end of
+    an INSERT statement, or of a CSV/TSV line) before a write that would
+    take the current part past max_bytes, so only a single statement
+    larger than max_bytes makes a part overshoot. Blank text that does not
+    fit is dropped rather than opening a part of its own. Every part
+    starts with preamble. max_bytes counts uncompressed text when
+    compress is set.
+    """
+
+    def __init__(self, table, path_for, max_bytes=None, fmt='sql', preamble='', compress=None):
+        self.table = table
+        self.path_for = path_for
+        self.max_bytes = max_bytes
+        self.fmt = fmt
+        self.preamble = preamble
+        self.compress = compress
+        self.paths = []
+        self.sizes = []
+        self.file = None
+        self._boundary = True
+        self._preamble_bytes = len(preamble.encode('utf-8'))
+
+    def _next_part(self):
+        self.close()
+        path = self.path_for(len(self.paths) + 1 if self.max_bytes else None)
+        self.file = open_output(path, self.compress, output_newline(self.fmt))
+        self.paths.append(path)
+        self.sizes.append(0)
+        if self.preamble:
+            self.write(self.preamble)
+
+    def write(self, text):
+        size = len(text.encode('utf-8')) if self.max_bytes else 0
+        if self.file is None:
+            self._next_part()
+        elif self.max_bytes and self._boundary and self.sizes[-1] + size > self.max_bytes:
+            if not text.strip():
+                return  # blank line after the part's last statement
+            if self.sizes[-1] > self._preamble_bytes:
+                self._next_part()
+        self.file.write(text)
+        if self.max_bytes:
+            self.sizes[-1] += size
+            if self.fmt != 'sql':
+                self._boundary = text.endswith('\n')
+            elif text.strip():  # blank lines between statements keep the boundary
+                self._boundary = text.rstrip('\n').endswith(';')
+
+    def writelines(self, pieces):
+        for piece in pieces:
+            self.write(piece)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+def part_file_path(output, table, fmt, part):
+    """Part file of one table, next to the driver script"""
+    base, _ = os.path.splitext(output)
+    return f"{base}_{table}_{part:04d}.{fmt}"
+
+def write_data_files(output, config):
+    """Write every table's rows into its own data file(s) next to output.
+
+    One data_file_path() per table, or numbered parts with max_file_bytes.
+    SQL files start with USE healthcare_system so each loads on its own.
+    Returns {table: [paths]} in load order.
+    """
+    preamble = "USE healthcare_system;\n\n" if config.fmt == 'sql' else ''
+    writers = []
+
+    def out_for(table):
+        # Tables arrive in order, so the previous table's files are complete
+        if writers:
+            writers[-1].close()
+
+        def path_for(part):
+            if part is None:
+                return compressed_path(data_file_path(output, table, config.fmt), config.compress)
+            return compressed_path(part_file_path(output, table, config.fmt, part), config.compress)
+        writers.append(PartWriter(table, path_for, config.max_file_bytes, config.fmt, preamble,
+                                  config.compress))
+        return writers[-1]
+
+    try:
+        write_table_data(out_for, config)
+    finally:
+        for writer in writers:
+            writer.close()
+    return {writer.table: writer.paths for writer in writers}
+
+def write_manifest(output, config, files):
+    """JSON list of the part files per table, for parallel loaders"""
+    base, _ = os.path.splitext(output)
+    path = f"{base}_manifest.json"
+    manifest = {
+        'driver': os.path.basename(output),
+        'format': config.fmt,
+        'seed': config.seed,
+        'scale_factor': config.scale_factor,
+        'rows': config.sizes(),
+        'tables': {table: [{'path': os.path.basename(p), 'bytes': os.path.getsize(p)} for p in paths]
+                   for table, paths in files.items()},
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return path
+
+def output_paths(output, config):
+    """Every file a file-output run writes: driver or script, data files, manifest"""
+    if config.max_file_bytes:
+        manifest = f"{os.path.splitext(output)[0]}_manifest.json"
+        with open(manifest, 'r', encoding='utf-8') as f:
+            tables = json.load(f)['tables']
+        directory = os.path.dirname(output)
+        return [output, manifest] + [os.path.join(directory, part['path'])
+                                     for parts in tables.values() for part in parts]
+    if config.fmt == 'sql':
+        return [output]
+    return [output] + [data_file_path(output, table, config.fmt) for table in config.sizes()]
 
-        print("Generating diagnoses data...")
-        f.write(generate_diagnoses_sql())
+# ============================================================================
+# FAST LOAD (--fast-load)
+# ============================================================================
+# Every row loaded into a table with live secondary indexes updates each of
+# those B-trees. With --fast-load the script turns off unique and foreign
+# key checks and autocommit, drops the secondary indexes of the loaded
+# tables, and rebuilds them after the data is in with one ALTER TABLE per
+# table, which InnoDB builds by sorting instead of row by row. Indexes
+# whose leading column is a foreign key stay: InnoDB refuses to drop them.
+# Since nothing was checked during the load, a verification query then
+# counts missing indexes, duplicate unique values and orphaned foreign keys.
+
+FAST_LOAD_TABLES = ('doctors', 'patients', 'diagnoses', 'medications',
+                    'encounters', 'denormalized_patient_encounters')
+FAST_LOAD_CHECKS = ('indexes ', 'unique ', 'foreign keys ')  # check_name prefixes of the verification rows
+
+_INDEX_LINE = re.compile(r"^\s*INDEX\s+(\w+)\s*\(([^)]*)\)", re.I | re.M)
+_FOREIGN_KEY_LINE = re.compile(r"^\s*FOREIGN\s+KEY\s*\((\w+)\)\s*REFERENCES\s+(\w+)\s*\((\w+)\)", re.I | re.M)
+_UNIQUE_COLUMN_LINE = re.compile(r"^\s*(\w+)\s+[^\n]*\bUNIQUE\b", re.I | re.M)
+
+class TableKeys:
+    """Index and constraint layout of one table, read from its CREATE TABLE"""
+
+    def __init__(self, table, create_sql):
+        self.table = table
+        self.foreign_keys = _FOREIGN_KEY_LINE.findall(create_sql)  # [(column, table, column)]
+        fk_columns = {column for column, _, _ in self.foreign_keys}
+        self.indexes = [(name, columns) for name, columns in _INDEX_LINE.findall(create_sql)]
+        self.deferred = [(name, columns) for name, columns in self.indexes
+                         if columns.split(',')[0].strip() not in fk_columns]
+        self.unique = _UNIQUE_COLUMN_LINE.findall(create_sql)
+
+def partitioned_ddl(granularity):
+    """Partitioned denormalized table covering the generated dates plus upcoming months"""
+    start = date(ENCOUNTER_YEARS[0], 1, 1)
+    end = max(date(ENCOUNTER_YEARS[1], 12, 1), partition_manager.months_ahead(partition_manager.DEFAULT_MONTHS_AHEAD))
+    return partition_manager.partitioned_table_ddl(start, end, granularity)
+
+def table_keys(config=None):
+    """{table: TableKeys} for the tables a load writes, in load order"""
+    creates = {}
+    for statement in schema_statements():
+        words = statement.split('(', 1)[0].split()
+        if len(words) >= 3 and words[0].upper() == 'CREATE' and words[1].upper() == 'TABLE':
+            creates[words[-1]] = statement
+    if config is not None and config.partitioned:
+        creates['denormalized_patient_encounters'] = partitioned_ddl(config.partitioned)
+    return {table: TableKeys(table, creates[table]) for table in FAST_LOAD_TABLES}
+
+def write_fast_load_prologue(f, config=None):
+    """Session settings off and secondary indexes dropped (only those that exist)"""
+    f.write("-- ============================================================================\n")
+    f.write("-- FAST LOAD - defer index maintenance and constraint checks\n")
+    f.write("-- ============================================================================\n\n")
+    f.write("SET @OLD_UNIQUE_CHECKS = @@UNIQUE_CHECKS, UNIQUE_CHECKS = 0;\n")
+    f.write("SET @OLD_FOREIGN_KEY_CHECKS = @@FOREIGN_KEY_CHECKS, FOREIGN_KEY_CHECKS = 0;\n")
+    f.write("SET @OLD_AUTOCOMMIT = @@AUTOCOMMIT, AUTOCOMMIT = 0;\n\n")
+    f.write("-- Drop secondary indexes; rebuilt after the load (indexes backing a foreign key stay)\n")
+    for keys in table_keys(config).values():
+        if not keys.deferred:
+            continue
+        names = ", ".join(f"'{name}'" for name, _ in keys.deferred)
+        f.write(f"SET @fast_load_sql = (SELECT IFNULL(CONCAT('ALTER TABLE {keys.table} ', "
+                "GROUP_CONCAT(DISTINCT CONCAT('DROP INDEX ', index_name) SEPARATOR ', ')), 'DO 0')\n")
+        f.write("    FROM information_schema.statistics\n")
+        f.write(f"    WHERE table_schema = DATABASE() AND table_name = '{keys.table}' AND index_name IN ({names}));\n")
+        f.write("PREPARE fast_load_stmt FROM @fast_load_sql;\n")
+        f.write("EXECUTE fast_load_stmt;\n")
+        f.write("DEALLOCATE PREPARE fast_load_stmt;\n\n")
+
+def write_fast_load_epilogue(f, config=None):
+    """Commit the load, rebuild the dropped indexes, restore the session, verify what was not checked
+
+    The only COMMIT of a fast load: rows and the denormalized copy are
+    written with AUTOCOMMIT = 0 since the prologue.
+    """
+    keys_by_table = table_keys(config)
+    f.write("COMMIT;\n\n")
+    f.write("-- ============================================================================\n")
+    f.write("-- FAST LOAD - rebuild indexes (one sorted build per table)\n")
+    f.write("-- ============================================================================\n")
+    f.write("-- python db_loader.py --ddl-workers N runs these ALTERs concurrently\n\n")
+    for keys in keys_by_table.values():
+        if keys.deferred:
+            adds = ",\n    ".join(f"ADD INDEX {name} ({columns})" for name, columns in keys.deferred)
+            f.write(f"ALTER TABLE {keys.table}\n    {adds};\n")
+    f.write("\n")
+    f.write("SET UNIQUE_CHECKS = @OLD_UNIQUE_CHECKS;\n")
+    f.write("SET FOREIGN_KEY_CHECKS = @OLD_FOREIGN_KEY_CHECKS;\n")
+    f.write("SET AUTOCOMMIT = @OLD_AUTOCOMMIT;\n\n")
+
+    checks = []
+    for keys in keys_by_table.values():
+        names = ", ".join(f"'{name}'" for name, _ in keys.indexes)
+        checks.append(f"SELECT 'indexes {keys.table}' AS check_name, "
+                      f"{len(keys.indexes)} - COUNT(DISTINCT index_name) AS problems\n"
+                      "    FROM information_schema.statistics\n"
+                      f"    WHERE table_schema = DATABASE() AND table_name = '{keys.table}' AND index_name IN ({names})")
+        for column in keys.unique:
+            checks.append(f"SELECT 'unique {keys.table}.{column}' AS check_name, "
+                          f"COUNT({column}) - COUNT(DISTINCT {column}) AS problems FROM {keys.table}")
+        if keys.foreign_keys:
+            orphans = " + ".join(f"SUM(t.{column} IS NOT NULL AND r{i}.{ref_column} IS NULL)"
+                                 for i, (column, _, ref_column) in enumerate(keys.foreign_keys))
+            joins = "".join(f"\n    LEFT JOIN {ref_table} r{i} ON t.{column} = r{i}.{ref_column}"
+                            for i, (column, ref_table, ref_column) in enumerate(keys.foreign_keys))
+            checks.append(f"SELECT 'foreign keys {keys.table}' AS check_name, COALESCE({orphans}, 0) AS problems\n"
+                          f"    FROM {keys.table} t{joins}")
+    f.write("-- Fast-load verification: every row should report 0 problems\n")
+    f.write("SELECT check_name, problems FROM (\n")
+    f.write("\nUNION ALL\n".join(checks))
+    f.write("\n) AS fast_load_checks;\n\n")
 
-        print("Generating medications data...")
-        f.write(generate_medications_sql())
+# ============================================================================
+# MAIN SCRIPT
+# ============================================================================
 
-        print("Generating encounters data...")
-        f.write(generate_encounters_sql())
+def write_script_header(f, config):
+    """Banner with the run's parameters plus USE healthcare_system"""
+    sizes = config.sizes()
+    f.write("-- ============================================================================\n")
+    f.write("-- Healthcare System - BULK FAKE DATA GENERATION\n")
+    f.write("-- ============================================================================\n")
+    f.write(f"-- Total Records: {config.total_records()}\n")
+    f.write(f"-- Doctors: {sizes['doctors']}\n")
+    f.write(f"-- Patients: {sizes['patients']}\n")
+    f.write(f"-- Diagnoses: {sizes['diagnoses']}\n")
+    f.write(f"-- Medications: {sizes['medications']}\n")
+    f.write(f"-- Encounters: {sizes['encounters']}\n")
+    f.write(f"-- Format: {config.fmt}, Rows per chunk: {config.chunk_size}\n")
+    f.write(f"-- Seed: {config.seed}, Shards: {config.num_shards}, Mode: {config.mode}\n")
+    if config.scale_factor is not None:
+        f.write(f"-- Scale factor: {config.scale_factor:g} (SF1 = {SF1_ENCOUNTERS:,} encounters)\n")
+    if config.max_file_bytes:
+        f.write(f"-- Data split into part files of about {format_bytes(config.max_file_bytes)}\n")
+    if config.fast_load:
+        f.write("-- Fast load: secondary indexes and unique/FK checks deferred until the data is in\n")
+    if config.profile is not None and not config.profile.is_uniform:
+        f.write(f"-- Workload profile: {config.profile.summary()}\n")
+    f.write("-- ============================================================================\n\n")
+    f.write("USE healthcare_system;\n\n")
+
+def write_partitioned_table_sql(f, granularity):
+    """Recreate denormalized_patient_encounters partitioned by encounter_date.
+
+    Partitions cover the generated encounter dates through
+    DEFAULT_MONTHS_AHEAD months past today; later periods land in p_future
+    until partition_manager.py ensure splits it.
+    """
+    f.write(f"-- Recreate denormalized table partitioned by {granularity} (healthcare_ddl_partitioned.sql layout)\n")
+    f.write("DROP TABLE IF EXISTS denormalized_patient_encounters;\n")
+    f.write(partitioned_ddl(granularity) + ";\n\n")
+
+def write_cleanup_sql(f, config=None):
+    """TRUNCATE every generated table (FK checks off while clearing)"""
+    f.write("-- ============================================================================\n")
+    f.write("-- DATA CLEANUP - Remove existing data to prevent duplicates\n")
+    f.write("-- ============================================================================\n")
+    f.write("-- This prevents \"Duplicate entry\" errors for UNIQUE constraints\n")
+    f.write("-- We clear dependent tables first (in reverse FK order), then parent tables\n\n")
+
+    f.write("SET FOREIGN_KEY_CHECKS = 0;\n\n")
+
+    if config is not None and config.partitioned:
+        write_partitioned_table_sql(f, config.partitioned)
+    else:
+        f.write("-- Clear denormalized table first (depends on all others)\n")
+        f.write("TRUNCATE TABLE denormalized_patient_encounters;\n\n")
 
+    f.write("-- Reset the incremental refresh watermark (incremental_refresh.py recreates it)\n")
+    f.write("DROP TABLE IF EXISTS refresh_control;\n\n")
+
+    f.write("-- Clear encounters table (depends on dimension tables)\n")
+    f.write("TRUNCATE TABLE encounters;\n\n")
+
+    f.write("-- Clear dimension tables (doctors depends on departments, so clear doctors first)\n")
+    f.write("TRUNCATE TABLE doctors;\n")
+    f.write("TRUNCATE TABLE patients;\n")
+    f.write("TRUNCATE TABLE diagnoses;\n")
+    f.write("TRUNCATE TABLE medications;\n\n")
+
+    f.write("-- Keep departments table as-is (already has 10 records)\n")
+    f.write("-- If you want fresh departments too, uncomment the next line:\n")
+    f.write("-- TRUNCATE TABLE departments;\n\n")
+
+    f.write("SET FOREIGN_KEY_CHECKS = 1;\n\n")
+
+    f.write("-- ============================================================================\n")
+    f.write("-- Note: All tables are now empty (except departments with 10 records)\n")
+    f.write("-- Ready for bulk data insertion\n")
+    f.write("-- ============================================================================\n\n")
+
+def write_denormalize_sql(f):
+    """INSERT...SELECT that rebuilds denormalized_patient_encounters"""
+    f.write("-- ============================================================================\n")
+    f.write("-- POPULATE DENORMALIZED TABLE\n")
+    f.write("-- ============================================================================\n\n")
+    f.write("INSERT INTO denormalized_patient_encounters (\n")
+    f.write("    encounter_id,\n")
+    f.write("    fk_patient_id, fk_doctor_id, fk_department_id, fk_diagnosis_id, fk_medication_id,\n")
+    f.write("    patient_first_name, patient_last_name, patient_date_of_birth, patient_age,\n")
+    f.write("    patient_gender, patient_blood_type, patient_phone, patient_email,\n")
+    f.write("    patient_street_address, patient_city, patient_state, patient_postal_code,\n")
+    f.write("    patient_country, patient_insurance_provider, patient_insurance_policy_number,\n")
+    f.write("    patient_emergency_contact_name, patient_emergency_contact_phone, patient_registration_date,\n")
+    f.write("    doctor_first_name, doctor_last_name, doctor_license_number, doctor_specialization,\n")
+    f.write("    doctor_phone, doctor_email, doctor_hire_date, doctor_years_experience,\n")
+    f.write("    department_name, department_code, department_floor, department_phone, department_head,\n")
+    f.write("    diagnosis_icd_code, diagnosis_name, diagnosis_category, diagnosis_severity,\n")
+    f.write("    diagnosis_description, is_chronic_diagnosis,\n")
+    f.write("    medication_name, medication_generic_name, medication_dosage_strength,\n")
+    f.write("    medication_dosage_form, medication_route, medication_side_effects,\n")
+    f.write("    medication_contraindications, medication_manufacturer,\n")
+    f.write("    encounter_date, encounter_time, encounter_type, encounter_duration_minutes,\n")
+    f.write("    chief_complaint, vital_signs_temperature, vital_signs_blood_pressure,\n")
+    f.write("    vital_signs_heart_rate, vital_signs_respiratory_rate, clinical_notes,\n")
+    f.write("    treatment_plan, prescribed_quantity, prescribed_frequency, prescription_duration_days,\n")
+    f.write("    follow_up_date, follow_up_required, billingBillable_amount, billing_status,\n")
+    f.write("    created_by, last_modified_by\n")
+    f.write(")\n")
+    f.write("SELECT\n")
+    f.write("    e.encounter_id,\n")
+    f.write("    e.fk_patient_id, e.fk_doctor_id, e.fk_department_id, e.fk_diagnosis_id, e.fk_medication_id,\n")
+    f.write("    p.first_name, p.last_name, p.date_of_birth,\n")
+    f.write("    YEAR(CURDATE()) - YEAR(p.date_of_birth) - (DATE_FORMAT(CURDATE(), '%m%d') < DATE_FORMAT(p.date_of_birth, '%m%d')) AS patient_age,\n")
+    f.write("    p.gender, p.blood_type, p.phone_number, p.email,\n")
+    f.write("    p.street_address, p.city, p.state_province, p.postal_code, p.country,\n")
+    f.write("    p.insurance_provider, p.insurance_policy_number,\n")
+    f.write("    p.emergency_contact_name, p.emergency_contact_phone, p.registration_date,\n")
+    f.write("    d.first_name, d.last_name, d.license_number, d.specialization,\n")
+    f.write("    d.phone_number, d.email, d.hire_date, d.years_of_experience,\n")
+    f.write("    dp.department_name, dp.department_code, dp.floor_number, dp.phone_number, dp.head_physician,\n")
+    f.write("    di.icd_code, di.diagnosis_name, di.diagnosis_category, di.severity_level,\n")
+    f.write("    di.description, di.is_chronic,\n")
+    f.write("    m.medication_name, m.generic_name, m.dosage_strength, m.dosage_form,\n")
+    f.write("    m.route_of_administration, m.common_side_effects, m.contraindications, m.manufacturer,\n")
+    f.write("    e.encounter_date, e.encounter_time, e.encounter_type, e.encounter_duration_minutes,\n")
+    f.write("    e.chief_complaint, e.vital_signs_temperature, e.vital_signs_blood_pressure,\n")
+    f.write("    e.vital_signs_heart_rate, e.vital_signs_respiratory_rate, e.clinical_notes,\n")
+    f.write("    e.treatment_plan, e.prescribed_quantity, e.prescribed_frequency, e.prescription_duration_days,\n")
+    f.write("    e.follow_up_date, e.follow_up_required, e.billingBillable_amount, e.billing_status,\n")
+    f.write("    e.created_by, e.last_modified_by\n")
+    f.write("FROM encounters e\n")
+    f.write("    LEFT JOIN patients p ON e.fk_patient_id = p.patient_id\n")
+    f.write("    LEFT JOIN doctors d ON e.fk_doctor_id = d.doctor_id\n")
+    f.write("    LEFT JOIN departments dp ON e.fk_department_id = dp.department_id\n")
+    f.write("    LEFT JOIN diagnoses di ON e.fk_diagnosis_id = di.diagnosis_id\n")
+    f.write("    LEFT JOIN medications m ON e.fk_medication_id = m.medication_id\n")
+    f.write("WHERE e.fk_patient_id IS NOT NULL\n")
+    f.write("  AND e.fk_doctor_id IS NOT NULL\n")
+    f.write("  AND e.fk_department_id IS NOT NULL;\n\n")
+
+def write_verification_sql(f):
+    """Row counts for every table"""
+    f.write("-- ============================================================================\n")
+    f.write("-- VERIFICATION QUERIES\n")
+    f.write("-- ============================================================================\n\n")
+    f.write("SELECT 'doctors' AS table_name, COUNT(*) AS row_count FROM doctors\n")
+    f.write("UNION ALL SELECT 'patients', COUNT(*) FROM patients\n")
+    f.write("UNION ALL SELECT 'diagnoses', COUNT(*) FROM diagnoses\n")
+    f.write("UNION ALL SELECT 'medications', COUNT(*) FROM medications\n")
+    f.write("UNION ALL SELECT 'encounters', COUNT(*) FROM encounters\n")
+    f.write("UNION ALL SELECT 'denormalized_patient_encounters', COUNT(*) FROM denormalized_patient_encounters;\n")
+
+
+def write_bulk_sql(f, config=None):
+    """Stream the complete bulk-load script into the open file f.
+
+    Returns the total number of generated rows.
+    """
+    config = config or GenerationConfig()
+    write_script_header(f, config)
+    write_cleanup_sql(f, config)
+    if config.fast_load:
+        write_fast_load_prologue(f, config)
+    write_table_data(lambda table: f, config)
+    write_denormalize_sql(f)
+    if config.fast_load:
+        write_fast_load_epilogue(f, config)
+    write_verification_sql(f)
+    return config.total_records()
+
+def write_bulk_delimited(output, config):
+    """Write one CSV/TSV data file per table plus a LOAD DATA driver script.
+
+    output is the driver .sql path; data files are written next to it and
+    referenced by name, so run the driver from that directory with
+    mysql --local-infile=1. Returns the total number of generated rows.
+    """
+    files = write_data_files(output, config)
+    loads = [load_data_sql(table, path, config.fmt) for table, paths in files.items() for path in paths]
+    write_driver(output, config, "LOAD DATA FILES",
+                 "-- Requires local_infile=ON on the server and mysql --local-infile=1\n\n", loads)
+    if config.max_file_bytes:
+        write_manifest(output, config, files)
+    return config.total_records()
+
+def write_bulk_sql_parts(output, config):
+    """SQL output split into part files of about config.max_file_bytes.
+
+    Each table's INSERTs go to numbered part files next to output, and
+    output becomes a driver that SOURCEs them in FK order between the
+    usual cleanup and denormalize steps. A _manifest.json lists the parts.
+    Returns the total number of generated rows.
+    """
+    files = write_data_files(output, config)
+    loads = []
+    for paths in files.values():
+        loads += [f"SOURCE {os.path.basename(path)};\n" for path in paths]
+        loads.append("\n")
+    if config.compress:
+        # The mysql client would read the compressed parts as SQL text.
+        how = ("-- Run with db_loader.py or parallel_loader.py; the part files are compressed\n"
+               "-- and the mysql client cannot SOURCE them. Each part")
+    else:
+        how = "-- Run from this directory with the mysql client or db_loader.py. Each part"
+    write_driver(output, config, "SOURCE DATA FILES",
+                 how + "\n"
+                 "-- loads on its own: tables in this order, a table's parts in any order or\n"
+                 "-- in parallel (see the _manifest.json file).\n\n", loads)
+    write_manifest(output, config, files)
+    return config.total_records()
+
+def write_driver(output, config, title, note, loads):
+    """Driver script: cleanup, the data file loads, then denormalize and verify"""
+    with open(output, 'w', encoding='utf-8') as f:
+        write_script_header(f, config)
+        write_cleanup_sql(f, config)
+        if config.fast_load:
+            write_fast_load_prologue(f, config)
         f.write("-- ============================================================================\n")
-        f.write("-- POPULATE DENORMALIZED TABLE\n")
-        f.write("-- ============================================================================\n\n")
-        f.write("INSERT INTO denormalized_patient_encounters (\n")
-        f.write("    fk_patient_id, fk_doctor_id, fk_department_id, fk_diagnosis_id, fk_medication_id,\n")
-        f.write("    patient_first_name, patient_last_name, patient_date_of_birth, patient_age,\n")
-        f.write("    patient_gender, patient_blood_type, patient_phone, patient_email,\n")
-        f.write("    patient_street_address, patient_city, patient_state, patient_postal_code,\n")
-        f.write("    patient_country, patient_insurance_provider, patient_insurance_policy_number,\n")
-        f.write("    patient_emergency_contact_name, patient_emergency_contact_phone, patient_registration_date,\n")
-        f.write("    doctor_first_name, doctor_last_name, doctor_license_number, doctor_specialization,\n")
-        f.write("    doctor_phone, doctor_email, doctor_hire_date, doctor_years_experience,\n")
-        f.write("    department_name, department_code, department_floor, department_phone, department_head,\n")
-        f.write("    diagnosis_icd_code, diagnosis_name, diagnosis_category, diagnosis_severity,\n")
-        f.write("    diagnosis_description, is_chronic_diagnosis,\n")
-        f.write("    medication_name, medication_generic_name, medication_dosage_strength,\n")
-        f.write("    medication_dosage_form, medication_route, medication_side_effects,\n")
-        f.write("    medication_contraindications, medication_manufacturer,\n")
-        f.write("    encounter_date, encounter_time, encounter_type, encounter_duration_minutes,\n")
-        f.write("    chief_complaint, vital_signs_temperature, vital_signs_blood_pressure,\n")
-        f.write("    vital_signs_heart_rate, vital_signs_respiratory_rate, clinical_notes,\n")
-        f.write("    treatment_plan, prescribed_quantity, prescribed_frequency, prescription_duration_days,\n")
-        f.write("    follow_up_date, follow_up_required, billingBillable_amount, billing_status,\n")
-        f.write("    created_by, last_modified_by\n")
-        f.write(")\n")
-        f.write("SELECT\n")
-        f.write("    e.fk_patient_id, e.fk_doctor_id, e.fk_department_id, e.fk_diagnosis_id, e.fk_medication_id,\n")
-        f.write("    p.first_name, p.last_name, p.date_of_birth,\n")
-        f.write("    YEAR(CURDATE()) - YEAR(p.date_of_birth) - (DATE_FORMAT(CURDATE(), '%m%d') < DATE_FORMAT(p.date_of_birth, '%m%d')) AS patient_age,\n")
-        f.write("    p.gender, p.blood_type, p.phone_number, p.email,\n")
-        f.write("    p.street_address, p.city, p.state_province, p.postal_code, p.country,\n")
-        f.write("    p.insurance_provider, p.insurance_policy_number,\n")
-        f.write("    p.emergency_contact_name, p.emergency_contact_phone, p.registration_date,\n")
-        f.write("    d.first_name, d.last_name, d.license_number, d.specialization,\n")
-        f.write("    d.phone_number, d.email, d.hire_date, d.years_of_experience,\n")
-        f.write("    dp.department_name, dp.department_code, dp.floor_number, dp.phone_number, dp.head_physician,\n")
-        f.write("    di.icd_code, di.diagnosis_name, di.diagnosis_category, di.severity_level,\n")
-        f.write("    di.description, di.is_chronic,\n")
-        f.write("    m.medication_name, m.generic_name, m.dosage_strength, m.dosage_form,\n")
-        f.write("    m.route_of_administration, m.common_side_effects, m.contraindications, m.manufacturer,\n")
-        f.write("    e.encounter_date, e.encounter_time, e.encounter_type, e.encounter_duration_minutes,\n")
-        f.write("    e.chief_complaint, e.vital_signs_temperature, e.vital_signs_blood_pressure,\n")
-        f.write("    e.vital_signs_heart_rate, e.vital_signs_respiratory_rate, e.clinical_notes,\n")
-        f.write("    e.treatment_plan, e.prescribed_quantity, e.prescribed_frequency, e.prescription_duration_days,\n")
-        f.write("    e.follow_up_date, e.follow_up_required, e.billingBillable_amount, e.billing_status,\n")
-        f.write("    e.created_by, e.last_modified_by\n")
-        f.write("FROM encounters e\n")
-        f.write("    LEFT JOIN patients p ON e.fk_patient_id = p.patient_id\n")
-        f.write("    LEFT JOIN doctors d ON e.fk_doctor_id = d.doctor_id\n")
-        f.write("    LEFT JOIN departments dp ON e.fk_department_id = dp.department_id\n")
-        f.write("    LEFT JOIN diagnoses di ON e.fk_diagnosis_id = di.diagnosis_id\n")
-        f.write("    LEFT JOIN medications m ON e.fk_medication_id = m.medication_id\n")
-        f.write("WHERE e.fk_patient_id IS NOT NULL\n")
-        f.write("  AND e.fk_doctor_id IS NOT NULL\n")
-        f.write("  AND e.fk_department_id IS NOT NULL;\n\n")
-
+        f.write(f"-- {title}\n")
         f.write("-- ============================================================================\n")
-        f.write("-- VERIFICATION QUERIES\n")
-        f.write("-- ============================================================================\n\n")
-        f.write("SELECT 'doctors' AS table_name, COUNT(*) AS row_count FROM doctors\n")
-        f.write("UNION ALL SELECT 'patients', COUNT(*) FROM patients\n")
-        f.write("UNION ALL SELECT 'diagnoses', COUNT(*) FROM diagnoses\n")
-        f.write("UNION ALL SELECT 'medications', COUNT(*) FROM medications\n")
-        f.write("UNION ALL SELECT 'encounters', COUNT(*) FROM encounters\n")
-        f.write("UNION ALL SELECT 'denormalized_patient_encounters', COUNT(*) FROM denormalized_patient_encounters;\n")
-
-    print(f"\n[SUCCESS] SQL file generated: {output_file}")
-    print(f"Total records: {NUM_DOCTORS + NUM_PATIENTS + len(DIAGNOSES_DATA) + len(MEDICATIONS_DATA) + NUM_ENCOUNTERS}")
+        f.write(note)
+        f.writelines(loads)
+        write_denormalize_sql(f)
+        if config.fast_load:
+            write_fast_load_epilogue(f, config)
+        write_verification_sql(f)
+
+# ============================================================================
+# DIRECT LOAD INTO AN EMBEDDED ENGINE
+# ============================================================================
+
+SCHEMA_FILES = ('healthcare_ddl.sql', 'healthcare_insert_select.sql', 'healthcare_dml.sql')
+
+def schema_statements():
+    """Statements that build an empty healthcare_system with the 10 departments.
+
+    healthcare_ddl.sql in full, plus the encounters table from
+    healthcare_insert_select.sql and the departments seed from
+    healthcare_dml.sql.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    ddl, insert_select, dml = (os.path.join(here, name) for name in SCHEMA_FILES)
+    with open(ddl, 'r', encoding='utf-8') as f:
+        yield from db_loader.iter_sql_statements(f)
+    with open(insert_select, 'r', encoding='utf-8') as f:
+        yield next(s for s in db_loader.iter_sql_statements(f)
+                   if s.upper().startswith('CREATE TABLE IF NOT EXISTS ENCOUNTERS'))
+    with open(dml, 'r', encoding='utf-8') as f:
+        yield next(s for s in db_loader.iter_sql_statements(f)
+                   if s.upper().startswith('INSERT INTO DEPARTMENTS'))
+
+def script_statements(write):
+    """Statements of a script section written by one of the write_*_sql functions"""
+    buf = io.StringIO()
+    write(buf)
+    return db_loader.split_sql_statements(buf.getvalue())
+
+def load_rows(backend, config):
+    """Create the schema in backend (backends.py) and insert generated rows.
+
+    Rows go straight from the row generators into backend.insert_rows();
+    no SQL text or data files are produced.
+    """
+    backend.run_statements(schema_statements())
+    if config.fast_load:
+        defer_indexes(backend, config)
+    sizes = config.sizes()
+    pool_seed = shard_seed(config.seed, 'pool', 0) if config.mode == 'pooled' else None
+    with run_metrics.profiled():
+        for table, table_tasks in groupby(plan_shards(config), key=attrgetter('table')):
+            print(f"Loading {table} data ({sizes[table]} records)...")
+            with run_metrics.stage(f"load {table}", rows=sizes[table]):
+                for task in table_tasks:
+                    ctx = ShardContext(task.seed, config.num_doctors, config.num_patients,
+                                       pool_seed, config.pool_size, config.profile)
+                    backend.insert_rows(table, TABLE_COLUMNS[table], table_rows(ctx, table, task.start, task.stop))
+
+def embedded_indexes(backend, config):
+    """[(index, table, columns)] as translate_create_table() names them in SQLite.
+
+    DuckDB creates no secondary indexes, so there is nothing to defer.
+    SQLite does not enforce foreign keys, so every secondary index goes.
+    """
+    if backend.dialect != 'sqlite':
+        return []
+    return [(f"{keys.table}_{name}", keys.table, columns)
+            for keys in table_keys(config).values() for name, columns in keys.indexes]
+
+def defer_indexes(backend, config):
+    """Embedded counterpart of write_fast_load_prologue()"""
+    backend.run_statements([f"DROP INDEX IF EXISTS {index}" for index, _, _ in embedded_indexes(backend, config)])
+
+def rebuild_indexes(backend, config):
+    """Recreate the indexes defer_indexes() dropped (no-op without fast_load)"""
+    indexes = embedded_indexes(backend, config) if config.fast_load else []
+    if indexes:
+        print(f"Rebuilding {len(indexes)} indexes...")
+        backend.run_statements([f"CREATE INDEX IF NOT EXISTS {index} ON {table} ({columns})"
+                                for index, table, columns in indexes])
+
+def load_denormalized(backend, on_statement=None):
+    """Rebuild denormalized_patient_encounters with the script's INSERT...SELECT"""
+    print("Populating denormalized_patient_encounters...")
+    backend.run_statements(script_statements(write_denormalize_sql), on_statement)
+
+def table_counts(backend):
+    """{table: row count} from the verification query"""
+    counts = {}
+    for statement in script_statements(write_verification_sql):
+        counts.update(backend.query(statement))
+    return counts
+
+def load_backend(backend, config):
+    """Generate straight into an embedded engine; returns {table: row count}"""
+    load_rows(backend, config)
+    with run_metrics.stage("denormalize", rows=config.num_encounters) as stage:
+        load_denormalized(backend, stage.statement_hook())
+    with run_metrics.stage("rebuild indexes"):
+        rebuild_indexes(backend, config)
+    patient_timeline.fire_invalidation()
+    return table_counts(backend)
+
+# ============================================================================
+# PIPE MODE (--pipe): GENERATE STRAIGHT INTO MYSQL
+# ============================================================================
+# Rows go from the row generators into a MySQL connection while the next
+# rows are still being generated, so no bulk file is written and read back,
+# and a run takes about max(generate, load) instead of their sum. The two
+# sides are coupled through a bounded buffer, so generation waits whenever
+# the load falls behind:
+#   insert: batches of chunk_size rows queue up (at most queue_depth) for a
+#           loader thread that sends them as multi-row INSERTs
+#   fifo:   each table is written as TSV into a named pipe that LOAD DATA
+#           LOCAL INFILE on the loader thread reads (POSIX only); the pipe
+#           buffer is the bound
+# The cleanup, fast-load, denormalize and verification steps are the same
+# statements a generated script would run, on the same connection.
+
+PIPE_METHODS = ('insert', 'fifo')
+PIPE_QUEUE_DEPTH = 8
+
+class PipeSink:
+    """Runs load(item) for each put() item on a background thread.
+
+    put() blocks while queue_depth items are waiting and returns the
+    item's sequence number; done counts the items finished. An error in
+    the loader is raised from the next put(), check() or close(); the
+    loader keeps draining the queue so put() never hangs on it.
+    """
+
+    def __init__(self, load, queue_depth=PIPE_QUEUE_DEPTH):
+        self.load = load
+        self.rows = 0
+        self.seconds = 0.0
+        self.submitted = 0
+        self.done = 0
+        self.error = None
+        self.queue = queue.Queue(queue_depth)
+        self.thread = threading.Thread(target=self._run, name='pipe-loader', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            if self.error is None:
+                start = time.perf_counter()
+                try:
+                    self.rows += self.load(item)
+                except Exception as e:
+                    self.error = e
+                self.seconds += time.perf_counter() - start
+            self.done += 1
+
+    def check(self):
+        if self.error is not None:
+            raise self.error
+
+    def put(self, item):
+        self.check()
+        self.queue.put(item)
+        self.submitted += 1
+        return self.submitted - 1
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.check()
+
+def open_fifo_writer(path, sink, ticket):
+    """Open a named pipe for writing once LOAD DATA (sink item ticket) has opened it"""
+    while True:
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_NONBLOCK)
+            break
+        except OSError as e:
+            if e.errno != errno.ENXIO:  # ENXIO: no reader yet
+                raise
+            sink.check()
+            if sink.done > ticket:
+                raise RuntimeError(f"LOAD DATA finished without reading {path}")
+            time.sleep(0.01)
+    os.set_blocking(fd, True)
+    return os.fdopen(fd, 'w', encoding='utf-8', newline='')
+
+def pipe_load(conn, config, method='insert', queue_depth=PIPE_QUEUE_DEPTH,
+              on_statement=db_loader.print_statement):
+    """Generate every table straight into an open MySQL connection.
+
+    Returns {'rows', 'seconds', 'generate_seconds', 'load_seconds'}: wall
+    time, time spent generating (not waiting on the load) and time the
+    loader was busy (with fifo, the LOAD DATA statements' run time, which
+    includes waiting for rows).
+    """
+    def run(stage_name, *writers):
+        buf = io.StringIO()
+        for write in writers:
+            write(buf)
+        with run_metrics.stage(stage_name) as stage:
+            db_loader.execute_statements(conn, db_loader.split_sql_statements(buf.getvalue()),
+                                         stage.statement_hook(on_statement))
+
+    run("prepare", lambda f: write_script_header(f, config), lambda f: write_cleanup_sql(f, config),
+        *([lambda f: write_fast_load_prologue(f, config)] if config.fast_load else []))
+
+    def load(item):
+        cursor = conn.cursor()
+        try:
+            if method == 'fifo':
+                cursor.execute(item)
+                return max(cursor.rowcount, 0)
+            table, rows = item
+            return db_loader.insert_rows(conn, table, TABLE_COLUMNS[table], rows, config.chunk_size)
+        finally:
+            cursor.close()
+
+    sizes = config.sizes()
+    sink = PipeSink(load, queue_depth)
+    fifo_dir = tempfile.mkdtemp(prefix='pipe_', dir=config.tmp_dir) if method == 'fifo' else None
+    fifo, waited = None, 0.0
+    start = time.perf_counter()
+    try:
+        with run_metrics.profiled():
+            for table, table_tasks in groupby(plan_shards(config), key=attrgetter('table')):
+                print(f"Piping {table} data ({sizes[table]:,} records)...")
+                with run_metrics.stage(f"pipe {table}", rows=sizes[table]):
+                    if method == 'fifo':
+                        if fifo is not None:
+                            fifo.close()  # end of file for the previous LOAD DATA
+                        path = os.path.join(fifo_dir, f"{table}.tsv")
+                        os.mkfifo(path)
+                        ticket = sink.put(load_data_sql(table, path, 'tsv', relative=False))
+                        fifo = open_fifo_writer(path, sink, ticket)
+                    for task in table_tasks:
+                        rows = table_rows(shard_context(task), task.table, task.start, task.stop)
+                        if method == 'fifo':
+                            for text in delimited_lines(rows, 'tsv', config.chunk_size):
+                                step = time.perf_counter()
+                                fifo.write(text)
+                                waited += time.perf_counter() - step
+                            continue
+                        while True:
+                            batch = list(islice(rows, config.chunk_size))
+                            if not batch:
+                                break
+                            step = time.perf_counter()
+                            sink.put((task.table, batch))
+                            waited += time.perf_counter() - step
+    except BrokenPipeError:
+        pass  # LOAD DATA stopped reading; close() raises its error
+    finally:
+        if fifo is not None:
+            try:
+                fifo.close()
+            except BrokenPipeError:
+                pass
+        try:
+            sink.close()
+        finally:
+            if fifo_dir is not None:
+                shutil.rmtree(fifo_dir, ignore_errors=True)
+    seconds = time.perf_counter() - start
+
+    run("denormalize and verify", write_denormalize_sql,
+        *([lambda f: write_fast_load_epilogue(f, config)] if config.fast_load else []), write_verification_sql)
+    patient_timeline.fire_invalidation()
+    return {'rows': sink.rows, 'seconds': seconds, 'generate_seconds': seconds - waited,
+            'load_seconds': sink.seconds}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate bulk fake healthcare data as SQL")
+    parser.add_argument("--scale-factor", type=float,
+                        help=f"size every table from one number: SF1 = {SF1_ENCOUNTERS:,} encounters, "
+                             f"{SF1_PATIENTS:,} patients, {SF1_DOCTORS:,} doctors "
+                             "(--doctors/--patients/--encounters still override)")
+    parser.add_argument("--doctors", type=int, help=f"number of doctors (default: {NUM_DOCTORS})")
+    parser.add_argument("--patients", type=int, help=f"number of patients (default: {NUM_PATIENTS})")
+    parser.add_argument("--encounters", type=int, help=f"number of encounters (default: {NUM_ENCOUNTERS})")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE,
+                        help="rows per multi-row INSERT statement (or per write in csv/tsv)")
+    parser.add_argument("--output", default=OUTPUT_FILE,
+                        help="output SQL file (the LOAD DATA driver script for csv/tsv)")
+    parser.add_argument("--format", dest="fmt", choices=["sql", "csv", "tsv"], default="sql",
+                        help="sql: multi-row INSERTs; csv/tsv: one data file per table "
+                             "plus a LOAD DATA LOCAL INFILE driver script")
+    parser.add_argument("--max-file-size", type=parse_size,
+                        help="split the data into part files of about this size (e.g. 512M, 2G), "
+                             "one table per file, plus a driver and a _manifest.json")
+    parser.add_argument("--estimate-only", action="store_true",
+                        help="print the estimated output size and generation time, then exit")
+    parser.add_argument("--seed", type=int, default=SEED, help="master random seed")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="worker processes generating shards in parallel")
+    parser.add_argument("--shards", type=int, default=None,
+                        help="shards per large table (default: --workers); output is "
+                             "byte-identical for a given --seed and --shards")
+    parser.add_argument("--mode", choices=["faker", "pooled"], default="faker",
+                        help="faker: call Faker per row; pooled: sample pre-generated "
+                             "value pools in vectorized batches (requires numpy)")
+    parser.add_argument("--pool-size", type=int, default=POOL_SIZE,
+                        help="values pre-generated per Faker type in pooled mode")
+    parser.add_argument("--partitioned", choices=["month", "quarter"],
+                        help="recreate denormalized_patient_encounters partitioned by encounter_date "
+                             "(partitions cover the generated dates plus upcoming months)")
+    parser.add_argument("--fast-load", action="store_true",
+                        help="drop secondary indexes and turn off unique/FK checks and autocommit "
+                             "during the load, then rebuild the indexes and verify")
+    parser.add_argument("--workload-profile", choices=list(workload_profiles.PROFILES),
+                        default=workload_profiles.DEFAULT_PROFILE,
+                        help="shape of the encounter workload: " + "; ".join(
+                            f"{p.name}: {p.description}" for p in workload_profiles.PROFILES.values()))
+    parser.add_argument("--skew", type=float,
+                        help="override the profile's patient/doctor power-law exponent (0 = uniform)")
+    parser.add_argument("--chronic-fraction", type=float,
+                        help="override the share of patients with a chronic condition (0-1)")
+    parser.add_argument("--chronic-revisit-rate", type=float,
+                        help="override the share of encounters that are chronic follow-ups (0-1)")
+    parser.add_argument("--backend", choices=sorted(backends.EMBEDDED),
+                        help="load rows directly into an embedded engine instead of writing "
+                             "SQL/CSV files (recreates healthcare_system there first)")
+    parser.add_argument("--db-file",
+                        help="database file for --backend (default: in-memory, discarded on exit)")
+    parser.add_argument("--pipe", nargs="?", const="insert", choices=PIPE_METHODS,
+                        help="generate straight into MySQL while loading, with no output file: "
+                             "insert (default) sends queued row batches as INSERTs, fifo feeds "
+                             "LOAD DATA through a named pipe per table")
+    parser.add_argument("--queue-depth", type=int, default=PIPE_QUEUE_DEPTH,
+                        help="row batches buffered between generation and load (with --pipe insert)")
+    parser.add_argument("--user", default="root", help="MySQL user (with --pipe)")
+    parser.add_argument("--password", help="MySQL password (with --pipe; prompted if omitted)")
+    parser.add_argument("--host", default="localhost", help="MySQL host (with --pipe)")
+    parser.add_argument("--port", type=int, default=3306, help="MySQL port (with --pipe)")
+    parser.add_argument("--compress", choices=sorted(COMPRESSION_SUFFIXES),
+                        help="compress SQL output (and part files) with gzip or zstd; "
+                             "db_loader.py and parallel_loader.py read them directly")
+    run_metrics.add_arguments(parser, profile=True)
+    args = parser.parse_args(argv)
+    try:
+        args.profile = profile_from_args(args)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.scale_factor is not None and args.scale_factor <= 0:
+        parser.error("--scale-factor must be positive")
+    defaults = (scaled_sizes(args.scale_factor) if args.scale_factor
+                else (NUM_DOCTORS, NUM_PATIENTS, NUM_ENCOUNTERS))
+    for name, default in zip(("doctors", "patients", "encounters"), defaults):
+        if getattr(args, name) is None:
+            setattr(args, name, default)
+        elif getattr(args, name) < 1:
+            parser.error(f"--{name} must be at least 1")
+    if args.backend and args.max_file_size:
+        parser.error("--max-file-size applies to file output, not --backend")
+    if args.backend and (args.workers > 1 or args.partitioned):
+        parser.error("--backend loads rows in this process and does not support --workers or --partitioned")
+    if args.pipe and (args.backend or args.max_file_size or args.compress):
+        parser.error("--pipe writes no files and cannot be combined with --backend, --max-file-size or --compress")
+    if args.pipe and args.workers > 1:
+        parser.error("--pipe generates in this process while a thread loads; it does not support --workers")
+    if args.pipe == "fifo" and not hasattr(os, "mkfifo"):
+        parser.error("--pipe fifo needs named pipes (POSIX); use --pipe insert")
+    if args.compress and args.fmt != "sql":
+        parser.error("--compress applies to --format sql (LOAD DATA cannot read compressed files)")
+    if args.compress == "zstd" and zstandard is None:
+        parser.error("--compress zstd requires the zstandard package (pip install zstandard)")
+    if args.compress and not args.max_file_size:
+        args.output = compressed_path(args.output, args.compress)
+    if args.profiler and args.workers > 1:
+        parser.error("--profile samples this process; generator workers run in others, use --workers 1")
+    if args.profile_output and not args.profiler:
+        parser.error("--profile-output needs --profile")
+    return args
+
+
+def profile_from_args(args):
+    """WorkloadProfile for --workload-profile plus any --skew/--chronic-* overrides"""
+    return workload_profiles.get_profile(args.workload_profile, patient_skew=args.skew,
+                                         doctor_skew=args.skew,
+                                         chronic_fraction=args.chronic_fraction,
+                                         chronic_revisit_rate=args.chronic_revisit_rate)
+
+
+def config_from_args(args):
+    # Keep shard temp files next to the output so large runs stay on the same disk
+    return GenerationConfig(
+        num_doctors=args.doctors,
+        num_patients=args.patients,
+        num_encounters=args.encounters,
+        chunk_size=args.chunk_size,
+        seed=args.seed,
+        workers=args.workers,
+        shards=args.shards,
+        mode=args.mode,
+        pool_size=args.pool_size,
+        fmt=args.fmt,
+        tmp_dir=os.path.dirname(os.path.abspath(args.output)),
+        partitioned=args.partitioned,
+        fast_load=args.fast_load,
+        profile=args.profile,
+        scale_factor=args.scale_factor,
+        max_file_bytes=args.max_file_size,
+        compress=args.compress,
+    )
+
+
+def run_labels(args, config):
+    """Run report labels: what was generated, how and where to"""
+    target = (f"pipe-{args.pipe}" if args.pipe else f"backend-{args.backend}" if args.backend
+              else "file")
+    return {'target': target, 'format': config.fmt, 'mode': config.mode, 'workers': config.workers,
+            'doctors': config.num_doctors, 'patients': config.num_patients,
+            'encounters': config.num_encounters, 'workload_profile': config.profile.name,
+            'fast_load': config.fast_load, 'compress': config.compress}
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.mode == "pooled" and np is None:
+        print("ERROR: --mode pooled requires numpy (pip install numpy)")
+        sys.exit(1)
+    config = config_from_args(args)
+    with run_metrics.run("generate_bulk_data", args.metrics_json, args.metrics_prom, args.profiler,
+                         args.profile_output, run_labels(args, config)) as metrics:
+        run(args, config, metrics)
+
+
+def run(args, config, metrics=None):
+    """Generate as the parsed arguments say; metrics is the active RunMetrics or None"""
+    # The sample costs as much as a small run itself; only large runs need the disk check
+    if args.estimate_only or (not (args.backend or args.pipe)
+                              and config.total_records() >= ESTIMATE_MIN_ROWS):
+        with run_metrics.stage("estimate"):
+            print_estimate(estimate_run(config), config, args.output)
+        if args.estimate_only:
+            return
+        print()
+
+    if args.pipe:
+        password = args.password if args.password is not None else getpass.getpass("Password: ")
+        print(f"Piping bulk fake data into MySQL at {args.host}:{args.port} ({args.pipe})...")
+        try:
+            pool = db_loader.ConnectionPool(args.user, password, args.host, args.port, size=1,
+                                            timeout=db_loader.scaled_timeout(config.total_records()),
+                                            local_infile=args.pipe == "fifo")
+            try:
+                with pool.connection() as conn:
+                    result = pipe_load(conn, config, args.pipe, args.queue_depth)
+                    if metrics is not None:
+                        metrics.bytes = run_metrics.schema_bytes(conn, "healthcare_system")
+            finally:
+                pool.close()
+        except Exception as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+        print(f"\n[SUCCESS] {result['rows']:,} rows generated and loaded in {result['seconds']:.1f}s "
+              f"(generating {result['generate_seconds']:.1f}s, loading {result['load_seconds']:.1f}s, overlapped)")
+        if metrics is not None:
+            metrics.rows = result['rows']
+            metrics.details.update(pipe={k: round(v, 3) for k, v in result.items() if k != 'rows'})
+        return
+
+    if args.backend:
+        print(f"Loading bulk fake data into {args.backend} ({args.db_file or 'in-memory'})...")
+        start = time.perf_counter()
+        try:
+            backend = backends.open_embedded(args.backend, args.db_file)
+            try:
+                counts = load_backend(backend, config)
+            finally:
+                backend.close()
+        except Exception as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+        print(f"\n[SUCCESS] Loaded in {time.perf_counter() - start:.1f}s")
+        for table, count in counts.items():
+            print(f"  {table:<32} {count:>12,}")
+        if metrics is not None:
+            metrics.rows = config.total_records()
+            metrics.details.update(counts=counts)
+            if args.db_file and os.path.exists(args.db_file):
+                metrics.bytes = os.path.getsize(args.db_file)
+        return
+
+    if config.fmt == "sql" and config.max_file_bytes:
+        print("Generating SQL part files with bulk fake data...")
+        total_records = write_bulk_sql_parts(args.output, config)
+        print(f"\n[SUCCESS] SOURCE driver generated: {args.output}")
+        if config.compress:
+            print("Load with: python db_loader.py --user root " + args.output
+                  + "   # or parallel_loader.py; mysql cannot read compressed parts")
+        else:
+            print("Load with: mysql -u root -p < " + os.path.basename(args.output) + "   # from the same directory")
+    elif config.fmt == "sql":
+        print("Generating SQL file with bulk fake data...")
+        with open_output(args.output, config.compress) as f:
+            total_records = write_bulk_sql(f, config)
+        print(f"\n[SUCCESS] SQL file generated: {args.output}")
+    else:
+        print(f"Generating {config.fmt.upper()} data files with bulk fake data...")
+        total_records = write_bulk_delimited(args.output, config)
+        print(f"\n[SUCCESS] LOAD DATA driver generated: {args.output}")
+        if config.max_file_bytes:
+            print(f"  part files listed in {os.path.splitext(args.output)[0]}_manifest.json")
+        else:
+            for table in config.sizes():
+                print(f"  {data_file_path(args.output, table, config.fmt)}")
+        print("Load with: mysql --local-infile=1 -u root -p < " + os.path.basename(args.output))
+    print(f"Total records: {total_records}")
+    if metrics is not None:
+        metrics.rows = total_records
+        metrics.details.update(output_bytes=sum(os.path.getsize(p) for p in output_paths(args.output, config)))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,292 @@
+-- ============================================================================
+-- Healthcare Patient Records - ANALYSIS QUERIES ON ROLLUPS
+-- Database: healthcare_system
+-- Tables: rollup_daily_encounters, rollup_daily_patient_hll (see rollups.py)
+-- Purpose: Dashboard versions of healthcare_analysis_queries.sql that read
+--          the day x department x doctor rollups instead of the raw table
+-- ============================================================================
+-- Numbering matches healthcare_analysis_queries.sql. Queries 3, 4, 6, 8, 10,
+-- 12 and 15 list individual patients or encounters and have no rollup form.
+--
+-- unique_patients / new_patients / total_patients are HyperLogLog estimates
+-- (about 3% standard error): registers are merged with MAX(rho) per bucket,
+-- then estimated with the small-range correction. Averages are computed
+-- from the stored sums and counts, so they match the raw queries exactly.
+-- Department and doctor names come from the departments/doctors tables.
+-- ============================================================================
+
+USE healthcare_system;
+
+-- ============================================================================
+-- 1. PATIENT COUNT BY DEPARTMENT
+-- ============================================================================
+-- Total unique patients per department
+
+SELECT
+    dp.department_name,
+    dp.department_code,
+    hll.unique_patients,
+    r.total_encounters
+FROM (
+    SELECT fk_department_id, SUM(encounter_count) AS total_encounters
+    FROM rollup_daily_encounters
+    GROUP BY fk_department_id
+) r
+JOIN departments dp ON dp.department_id = r.fk_department_id
+JOIN (
+    SELECT fk_department_id,
+        ROUND(CASE WHEN raw <= 2560.0 AND zeros > 0 THEN 1024 * LN(1024 / zeros) ELSE raw END) AS unique_patients
+    FROM (
+        SELECT fk_department_id,
+            0.720541 * 1048576 / (SUM(POW(2, -rho)) + 1024 - COUNT(*)) AS raw,
+            1024 - COUNT(*) AS zeros
+        FROM (
+            SELECT fk_department_id, bucket, MAX(rho) AS rho
+            FROM rollup_daily_patient_hll
+            GROUP BY fk_department_id, bucket
+        ) registers
+        GROUP BY fk_department_id
+    ) sketch
+) hll ON hll.fk_department_id = r.fk_department_id
+ORDER BY unique_patients DESC;
+
+-- ============================================================================
+-- 2. PATIENT COUNT BY DOCTOR
+-- ============================================================================
+-- Total unique patients per doctor with encounter statistics
+
+SELECT
+    CONCAT(d.first_name, ' ', d.last_name) AS doctor_name,
+    d.specialization AS doctor_specialization,
+    hll.unique_patients,
+    r.total_encounters,
+    r.avg_encounter_duration
+FROM (
+    SELECT fk_doctor_id,
+        SUM(encounter_count) AS total_encounters,
+        SUM(duration_sum) / NULLIF(SUM(duration_count), 0) AS avg_encounter_duration
+    FROM rollup_daily_encounters
+    GROUP BY fk_doctor_id
+) r
+JOIN doctors d ON d.doctor_id = r.fk_doctor_id
+JOIN (
+    SELECT fk_doctor_id,
+        ROUND(CASE WHEN raw <= 2560.0 AND zeros > 0 THEN 1024 * LN(1024 / zeros) ELSE raw END) AS unique_patients
+    FROM (
+        SELECT fk_doctor_id,
+            0.720541 * 1048576 / (SUM(POW(2, -rho)) + 1024 - COUNT(*)) AS raw,
+            1024 - COUNT(*) AS zeros
+        FROM (
+            SELECT fk_doctor_id, bucket, MAX(rho) AS rho
+            FROM rollup_daily_patient_hll
+            GROUP BY fk_doctor_id, bucket
+        ) registers
+        GROUP BY fk_doctor_id
+    ) sketch
+) hll ON hll.fk_doctor_id = r.fk_doctor_id
+ORDER BY unique_patients DESC;
+
+-- ============================================================================
+-- 5. DEPARTMENT & DOCTOR SUMMARY
+-- ============================================================================
+-- Combined department and doctor statistics
+
+SELECT
+    dp.department_name,
+    CONCAT(d.first_name, ' ', d.last_name) AS doctor_name,
+    d.specialization AS doctor_specialization,
+    hll.unique_patients,
+    r.total_encounters,
+    r.total_revenue,
+    r.avg_duration
+FROM (
+    SELECT fk_department_id, fk_doctor_id,
+        SUM(encounter_count) AS total_encounters,
+        SUM(billed_sum) AS total_revenue,
+        SUM(duration_sum) / NULLIF(SUM(duration_count), 0) AS avg_duration
+    FROM rollup_daily_encounters
+    GROUP BY fk_department_id, fk_doctor_id
+) r
+JOIN departments dp ON dp.department_id = r.fk_department_id
+JOIN doctors d ON d.doctor_id = r.fk_doctor_id
+JOIN (
+    SELECT fk_department_id, fk_doctor_id,
+        ROUND(CASE WHEN raw <= 2560.0 AND zeros > 0 THEN 1024 * LN(1024 / zeros) ELSE raw END) AS unique_patients
+    FROM (
+        SELECT fk_department_id, fk_doctor_id,
+            0.720541 * 1048576 / (SUM(POW(2, -rho)) + 1024 - COUNT(*)) AS raw,
+            1024 - COUNT(*) AS zeros
+        FROM (
+            SELECT fk_department_id, fk_doctor_id, bucket, MAX(rho) AS rho
+            FROM rollup_daily_patient_hll
+            GROUP BY fk_department_id, fk_doctor_id, bucket
+        ) registers
+        GROUP BY fk_department_id, fk_doctor_id
+    ) sketch
+) hll ON hll.fk_department_id = r.fk_department_id AND hll.fk_doctor_id = r.fk_doctor_id
+ORDER BY dp.department_name, unique_patients DESC;
+
+-- ============================================================================
+-- 7. DOCTOR WORKLOAD ANALYSIS
+-- ============================================================================
+-- Doctor workload with patient distribution
+
+SELECT
+    CONCAT(d.first_name, ' ', d.last_name) AS doctor_name,
+    d.specialization AS doctor_specialization,
+    dp.department_name,
+    hll.unique_patients,
+    r.total_encounters,
+    r.follow_ups_needed,
+    r.total_billed,
+    r.avg_bill_per_encounter
+FROM (
+    SELECT fk_doctor_id, fk_department_id,
+        SUM(encounter_count) AS total_encounters,
+        SUM(follow_up_count) AS follow_ups_needed,
+        SUM(billed_sum) AS total_billed,
+        SUM(billed_sum) / NULLIF(SUM(billed_count), 0) AS avg_bill_per_encounter
+    FROM rollup_daily_encounters
+    GROUP BY fk_doctor_id, fk_department_id
+) r
+JOIN doctors d ON d.doctor_id = r.fk_doctor_id
+JOIN departments dp ON dp.department_id = r.fk_department_id
+JOIN (
+    SELECT fk_doctor_id, fk_department_id,
+        ROUND(CASE WHEN raw <= 2560.0 AND zeros > 0 THEN 1024 * LN(1024 / zeros) ELSE raw END) AS unique_patients
+    FROM (
+        SELECT fk_doctor_id, fk_department_id,
+            0.720541 * 1048576 / (SUM(POW(2, -rho)) + 1024 - COUNT(*)) AS raw,
+            1024 - COUNT(*) AS zeros
+        FROM (
+            SELECT fk_doctor_id, fk_department_id, bucket, MAX(rho) AS rho
+            FROM rollup_daily_patient_hll
+            GROUP BY fk_doctor_id, fk_department_id, bucket
+        ) registers
+        GROUP BY fk_doctor_id, fk_department_id
+    ) sketch
+) hll ON hll.fk_doctor_id = r.fk_doctor_id AND hll.fk_department_id = r.fk_department_id
+ORDER BY total_encounters DESC;
+
+-- ============================================================================
+-- 9. RECENT PATIENTS BY DEPARTMENT (LAST 30 DAYS)
+-- ============================================================================
+-- Recent patient activity by department
+
+SELECT
+    dp.department_name,
+    hll.unique_patients AS new_patients,
+    r.total_encounters,
+    r.avg_billing
+FROM (
+    SELECT fk_department_id,
+        SUM(encounter_count) AS total_encounters,
+        SUM(billed_sum) / NULLIF(SUM(billed_count), 0) AS avg_billing
+    FROM rollup_daily_encounters
+    WHERE encounter_date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
+    GROUP BY fk_department_id
+) r
+JOIN departments dp ON dp.department_id = r.fk_department_id
+JOIN (
+    SELECT fk_department_id,
+        ROUND(CASE WHEN raw <= 2560.0 AND zeros > 0 THEN 1024 * LN(1024 / zeros) ELSE raw END) AS unique_patients
+    FROM (
+        SELECT fk_department_id,
+            0.720541 * 1048576 / (SUM(POW(2, -rho)) + 1024 - COUNT(*)) AS raw,
+            1024 - COUNT(*) AS zeros
+        FROM (
+            SELECT fk_department_id, bucket, MAX(rho) AS rho
+            FROM rollup_daily_patient_hll
+            WHERE encounter_date >= DATE_SUB(CURDATE(), INTERVAL 30 DAY)
+            GROUP BY fk_department_id, bucket
+        ) registers
+        GROUP BY fk_department_id
+    ) sketch
+) hll ON hll.fk_department_id = r.fk_department_id
+ORDER BY new_patients DESC;
+
+-- ============================================================================
+-- BONUS QUERIES
+-- ============================================================================
+
+-- 11. Total Encounter Count (Simple)
+SELECT SUM(encounter_count) AS total_encounters
+FROM rollup_daily_encounters;
+
+-- 13. Department Efficiency Metrics
+SELECT
+    dp.department_name,
+    dp.head_physician AS department_head,
+    r.total_encounters,
+    hll.unique_patients,
+    r.paid_encounters,
+    r.pending_encounters,
+    r.total_revenue,
+    r.avg_duration
+FROM (
+    SELECT fk_department_id,
+        SUM(encounter_count) AS total_encounters,
+        SUM(paid_count) AS paid_encounters,
+        SUM(pending_count) AS pending_encounters,
+        SUM(billed_sum) AS total_revenue,
+        SUM(duration_sum) / NULLIF(SUM(duration_count), 0) AS avg_duration
+    FROM rollup_daily_encounters
+    GROUP BY fk_department_id
+) r
+JOIN departments dp ON dp.department_id = r.fk_department_id
+JOIN (
+    SELECT fk_department_id,
+        ROUND(CASE WHEN raw <= 2560.0 AND zeros > 0 THEN 1024 * LN(1024 / zeros) ELSE raw END) AS unique_patients
+    FROM (
+        SELECT fk_department_id,
+            0.720541 * 1048576 / (SUM(POW(2, -rho)) + 1024 - COUNT(*)) AS raw,
+            1024 - COUNT(*) AS zeros
+        FROM (
+            SELECT fk_department_id, bucket, MAX(rho) AS rho
+            FROM rollup_daily_patient_hll
+            GROUP BY fk_department_id, bucket
+        ) registers
+        GROUP BY fk_department_id
+    ) sketch
+) hll ON hll.fk_department_id = r.fk_department_id
+ORDER BY total_revenue DESC;
+
+-- 14. Doctor Performance by Specialization
+SELECT
+    r.doctor_specialization,
+    r.num_doctors,
+    hll.total_patients,
+    r.total_encounters,
+    r.total_revenue,
+    r.avg_revenue_per_encounter
+FROM (
+    SELECT d.specialization AS doctor_specialization,
+        COUNT(DISTINCT ro.fk_doctor_id) AS num_doctors,
+        SUM(ro.encounter_count) AS total_encounters,
+        SUM(ro.billed_sum) AS total_revenue,
+        SUM(ro.billed_sum) / NULLIF(SUM(ro.billed_count), 0) AS avg_revenue_per_encounter
+    FROM rollup_daily_encounters ro
+    JOIN doctors d ON d.doctor_id = ro.fk_doctor_id
+    GROUP BY d.specialization
+) r
+JOIN (
+    SELECT doctor_specialization,
+        ROUND(CASE WHEN raw <= 2560.0 AND zeros > 0 THEN 1024 * LN(1024 / zeros) ELSE raw END) AS total_patients
+    FROM (
+        SELECT doctor_specialization,
+            0.720541 * 1048576 / (SUM(POW(2, -rho)) + 1024 - COUNT(*)) AS raw,
+            1024 - COUNT(*) AS zeros
+        FROM (
+            SELECT d.specialization AS doctor_specialization, h.bucket, MAX(h.rho) AS rho
+            FROM rollup_daily_patient_hll h
+            JOIN doctors d ON d.doctor_id = h.fk_doctor_id
+            GROUP BY d.specialization, h.bucket
+        ) registers
+        GROUP BY doctor_specialization
+    ) sketch
+) hll ON hll.doctor_specialization <=> r.doctor_specialization
+ORDER BY total_revenue DESC;
+
+-- ============================================================================
+-- END OF ROLLUP ANALYSIS QUERIES
+-- ============================================================================
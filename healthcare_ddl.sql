@@ -23,7 +23,9 @@ CREATE TABLE departments (
     phone_number VARCHAR(15),
     head_physician VARCHAR(100),
     budget_allocated DECIMAL(12, 2),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_updated_at (updated_at)
 );
 
 -- 2. DOCTORS TABLE
@@ -40,9 +42,11 @@ CREATE TABLE doctors (
     years_of_experience INT,
     is_available BOOLEAN DEFAULT TRUE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     FOREIGN KEY (fk_department_id) REFERENCES departments(department_id),
     INDEX idx_specialization (specialization),
-    INDEX idx_department (fk_department_id)
+    INDEX idx_department (fk_department_id),
+    INDEX idx_updated_at (updated_at)
 );
 
 -- 3. PATIENTS TABLE
@@ -67,8 +71,10 @@ CREATE TABLE patients (
     registration_date DATE,
     is_active BOOLEAN DEFAULT TRUE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     INDEX idx_patient_name (last_name, first_name),
-    INDEX idx_dob (date_of_birth)
+    INDEX idx_dob (date_of_birth),
+    INDEX idx_updated_at (updated_at)
 );
 
 -- 4. DIAGNOSES LOOKUP TABLE
@@ -81,8 +87,10 @@ CREATE TABLE diagnoses (
     description TEXT,
     is_chronic BOOLEAN DEFAULT FALSE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     INDEX idx_icd_code (icd_code),
-    INDEX idx_category (diagnosis_category)
+    INDEX idx_category (diagnosis_category),
+    INDEX idx_updated_at (updated_at)
 );
 
 -- 5. MEDICATIONS LOOKUP TABLE
@@ -99,8 +107,10 @@ CREATE TABLE medications (
     manufacturer VARCHAR(100),
     is_available BOOLEAN DEFAULT TRUE,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     INDEX idx_med_name (medication_name),
-    INDEX idx_generic (generic_name)
+    INDEX idx_generic (generic_name),
+    INDEX idx_updated_at (updated_at)
 );
 
 -- ============================================================================
@@ -205,7 +215,8 @@ CREATE TABLE denormalized_patient_encounters (
     INDEX idx_department (fk_department_id),
     INDEX idx_encounter_date (encounter_date),
     INDEX idx_encounter_type (encounter_type),
-    INDEX idx_billing_status (billing_status)
+    INDEX idx_billing_status (billing_status),
+    INDEX idx_updated_at (updated_at)
 );
 
 -- ============================================================================
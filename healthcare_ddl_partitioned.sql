@@ -0,0 +1,151 @@
+-- ============================================================================
+-- Healthcare Patient Records - PARTITIONED denormalized_patient_encounters
+-- Generated by: python partition_manager.py ddl --start 2023-01 --end 2026-12 --granularity month
+-- ============================================================================
+-- Run after healthcare_ddl.sql to replace the heap table with a layout
+-- partitioned by encounter_date. Differences from the heap DDL:
+--   * PRIMARY KEY (encounter_id, encounter_date): every unique key must
+--     contain the partitioning column
+--   * no FOREIGN KEY clauses: InnoDB does not support them on partitioned
+--     tables (the load path already joins on the dimension keys)
+-- Future partitions: python partition_manager.py ensure --months-ahead 3
+-- ============================================================================
+
+USE healthcare_system;
+
+DROP TABLE IF EXISTS denormalized_patient_encounters;
+
+CREATE TABLE denormalized_patient_encounters (
+    encounter_id INT NOT NULL AUTO_INCREMENT,
+    fk_patient_id INT NOT NULL,
+    fk_doctor_id INT NOT NULL,
+    fk_department_id INT NOT NULL,
+    fk_diagnosis_id INT,
+    fk_medication_id INT,
+    patient_first_name VARCHAR(100),
+    patient_last_name VARCHAR(100),
+    patient_date_of_birth DATE,
+    patient_age INT,
+    patient_gender VARCHAR(10),
+    patient_blood_type VARCHAR(5),
+    patient_phone VARCHAR(15),
+    patient_email VARCHAR(100),
+    patient_street_address VARCHAR(255),
+    patient_city VARCHAR(100),
+    patient_state VARCHAR(100),
+    patient_postal_code VARCHAR(20),
+    patient_country VARCHAR(100),
+    patient_insurance_provider VARCHAR(100),
+    patient_insurance_policy_number VARCHAR(50),
+    patient_emergency_contact_name VARCHAR(100),
+    patient_emergency_contact_phone VARCHAR(15),
+    patient_registration_date DATE,
+    doctor_first_name VARCHAR(100),
+    doctor_last_name VARCHAR(100),
+    doctor_license_number VARCHAR(50),
+    doctor_specialization VARCHAR(100),
+    doctor_phone VARCHAR(15),
+    doctor_email VARCHAR(100),
+    doctor_hire_date DATE,
+    doctor_years_experience INT,
+    department_name VARCHAR(100),
+    department_code VARCHAR(20),
+    department_floor INT,
+    department_phone VARCHAR(15),
+    department_head VARCHAR(100),
+    diagnosis_icd_code VARCHAR(20),
+    diagnosis_name VARCHAR(255),
+    diagnosis_category VARCHAR(100),
+    diagnosis_severity VARCHAR(20),
+    diagnosis_description TEXT,
+    is_chronic_diagnosis BOOLEAN,
+    medication_name VARCHAR(255),
+    medication_generic_name VARCHAR(255),
+    medication_dosage_strength VARCHAR(50),
+    medication_dosage_form VARCHAR(50),
+    medication_route VARCHAR(50),
+    medication_side_effects TEXT,
+    medication_contraindications TEXT,
+    medication_manufacturer VARCHAR(100),
+    encounter_date DATE NOT NULL,
+    encounter_time TIME,
+    encounter_type VARCHAR(50),
+    encounter_duration_minutes INT,
+    chief_complaint TEXT,
+    vital_signs_temperature DECIMAL(5, 2),
+    vital_signs_blood_pressure VARCHAR(20),
+    vital_signs_heart_rate INT,
+    vital_signs_respiratory_rate INT,
+    clinical_notes TEXT,
+    treatment_plan TEXT,
+    prescribed_quantity INT,
+    prescribed_frequency VARCHAR(100),
+    prescription_duration_days INT,
+    follow_up_date DATE,
+    follow_up_required BOOLEAN,
+    billingBillable_amount DECIMAL(10, 2),
+    billing_status VARCHAR(50),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    created_by VARCHAR(100),
+    last_modified_by VARCHAR(100),
+    PRIMARY KEY (encounter_id, encounter_date),
+    INDEX idx_patient (fk_patient_id),
+    INDEX idx_doctor (fk_doctor_id),
+    INDEX idx_department (fk_department_id),
+    INDEX idx_encounter_date (encounter_date),
+    INDEX idx_encounter_type (encounter_type),
+    INDEX idx_billing_status (billing_status),
+    INDEX idx_updated_at (updated_at)
+)
+PARTITION BY RANGE COLUMNS(encounter_date) (
+    PARTITION p202301 VALUES LESS THAN ('2023-02-01'),
+    PARTITION p202302 VALUES LESS THAN ('2023-03-01'),
+    PARTITION p202303 VALUES LESS THAN ('2023-04-01'),
+    PARTITION p202304 VALUES LESS THAN ('2023-05-01'),
+    PARTITION p202305 VALUES LESS THAN ('2023-06-01'),
+    PARTITION p202306 VALUES LESS THAN ('2023-07-01'),
+    PARTITION p202307 VALUES LESS THAN ('2023-08-01'),
+    PARTITION p202308 VALUES LESS THAN ('2023-09-01'),
+    PARTITION p202309 VALUES LESS THAN ('2023-10-01'),
+    PARTITION p202310 VALUES LESS THAN ('2023-11-01'),
+    PARTITION p202311 VALUES LESS THAN ('2023-12-01'),
+    PARTITION p202312 VALUES LESS THAN ('2024-01-01'),
+    PARTITION p202401 VALUES LESS THAN ('2024-02-01'),
+    PARTITION p202402 VALUES LESS THAN ('2024-03-01'),
+    PARTITION p202403 VALUES LESS THAN ('2024-04-01'),
+    PARTITION p202404 VALUES LESS THAN ('2024-05-01'),
+    PARTITION p202405 VALUES LESS THAN ('2024-06-01'),
+    PARTITION p202406 VALUES LESS THAN ('2024-07-01'),
+    PARTITION p202407 VALUES LESS THAN ('2024-08-01'),
+    PARTITION p202408 VALUES LESS THAN ('2024-09-01'),
+    PARTITION p202409 VALUES LESS THAN ('2024-10-01'),
+    PARTITION p202410 VALUES LESS THAN ('2024-11-01'),
+    PARTITION p202411 VALUES LESS THAN ('2024-12-01'),
+    PARTITION p202412 VALUES LESS THAN ('2025-01-01'),
+    PARTITION p202501 VALUES LESS THAN ('2025-02-01'),
+    PARTITION p202502 VALUES LESS THAN ('2025-03-01'),
+    PARTITION p202503 VALUES LESS THAN ('2025-04-01'),
+    PARTITION p202504 VALUES LESS THAN ('2025-05-01'),
+    PARTITION p202505 VALUES LESS THAN ('2025-06-01'),
+    PARTITION p202506 VALUES LESS THAN ('2025-07-01'),
+    PARTITION p202507 VALUES LESS THAN ('2025-08-01'),
+    PARTITION p202508 VALUES LESS THAN ('2025-09-01'),
+    PARTITION p202509 VALUES LESS THAN ('2025-10-01'),
+    PARTITION p202510 VALUES LESS THAN ('2025-11-01'),
+    PARTITION p202511 VALUES LESS THAN ('2025-12-01'),
+    PARTITION p202512 VALUES LESS THAN ('2026-01-01'),
+    PARTITION p202601 VALUES LESS THAN ('2026-02-01'),
+    PARTITION p202602 VALUES LESS THAN ('2026-03-01'),
+    PARTITION p202603 VALUES LESS THAN ('2026-04-01'),
+    PARTITION p202604 VALUES LESS THAN ('2026-05-01'),
+    PARTITION p202605 VALUES LESS THAN ('2026-06-01'),
+    PARTITION p202606 VALUES LESS THAN ('2026-07-01'),
+    PARTITION p202607 VALUES LESS THAN ('2026-08-01'),
+    PARTITION p202608 VALUES LESS THAN ('2026-09-01'),
+    PARTITION p202609 VALUES LESS THAN ('2026-10-01'),
+    PARTITION p202610 VALUES LESS THAN ('2026-11-01'),
+    PARTITION p202611 VALUES LESS THAN ('2026-12-01'),
+    PARTITION p202612 VALUES LESS THAN ('2027-01-01'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
@@ -447,6 +447,13 @@ C. APPLICATION-LEVEL CONSISTENCY
    - Pros: Business logic control
    - Cons: Error-prone, duplicate code
 
+D. CHANGE-LOG SYNC (cdc_sync.py)
+   - Application logs each dimension update to dimension_change_log
+   - A sync process coalesces changes per row and updates only the
+     changed columns, batched by fk_*_id
+   - Pros: No trigger cost on dimension writes, touches only affected rows
+   - Cons: Seconds of lag, writers must log their changes
+
 ===============================================================================
 PERFORMANCE CHARACTERISTICS
 ===============================================================================
@@ -48,7 +48,8 @@ CREATE TABLE IF NOT EXISTS encounters (
     INDEX idx_patient (fk_patient_id),
     INDEX idx_doctor (fk_doctor_id),
     INDEX idx_department (fk_department_id),
-    INDEX idx_encounter_date (encounter_date)
+    INDEX idx_encounter_date (encounter_date),
+    INDEX idx_updated_at (updated_at)
 );
 
 -- ============================================================================
@@ -0,0 +1,363 @@
+"""
+Healthcare System - Incremental Refresh of denormalized_patient_encounters
+Keeps the wide denormalized table in step with encounters and the
+dimension tables without the TRUNCATE + full INSERT...SELECT rebuild.
+
+Each run:
+  1. inserts encounters above the encounter_id high-water mark,
+  2. rewrites encounters whose updated_at moved since the last refresh,
+  3. pushes dimension changes (patients, doctors, departments, diagnoses,
+     medications updated since the last refresh) into the rows that
+     reference them with targeted UPDATE...JOINs,
+and records the new watermark in the refresh_control table, all in one
+transaction. Rows touched and elapsed time are reported per step. When
+the rollup tables exist (rollups.py) they are refreshed afterwards.
+
+Usage:
+    python incremental_refresh.py --user root --password secret
+    python incremental_refresh.py --full          # rebuild everything and reset the watermark
+    python incremental_refresh.py --prune         # also delete rows whose encounter is gone
+    python incremental_refresh.py --print-sql     # show the statements without connecting
+"""
+
+import argparse
+import getpass
+import sys
+import time
+
+import db_loader
+import partition_manager
+import patient_timeline
+import rollups
+from db_loader import estimated_rows, fetch_one
+from rollups import CONTROL_DDL, CONTROL_TABLE, ensure_change_tracking, run_step
+
+TARGET_TABLE = "denormalized_patient_encounters"
+LOCK_NAME = "healthcare_system.refresh_denormalized"
+
+# '%' is doubled because the statements are run with driver parameters
+PATIENT_AGE_SQL = ("YEAR(CURDATE()) - YEAR(p.date_of_birth) - "
+                   "(DATE_FORMAT(CURDATE(), '%%m%%d') < DATE_FORMAT(p.date_of_birth, '%%m%%d'))")
+
+# ============================================================================
+# COLUMN MAPPING
+# ============================================================================
+# (denormalized column, source expression) per source table. The join keys
+# are the fk_* columns every denormalized row carries.
+
+DIMENSIONS = {
+    "patients": ("p", "fk_patient_id", "patient_id", [
+        ("patient_first_name", "p.first_name"),
+        ("patient_last_name", "p.last_name"),
+        ("patient_date_of_birth", "p.date_of_birth"),
+        ("patient_age", PATIENT_AGE_SQL),
+        ("patient_gender", "p.gender"),
+        ("patient_blood_type", "p.blood_type"),
+        ("patient_phone", "p.phone_number"),
+        ("patient_email", "p.email"),
+        ("patient_street_address", "p.street_address"),
+        ("patient_city", "p.city"),
+        ("patient_state", "p.state_province"),
+        ("patient_postal_code", "p.postal_code"),
+        ("patient_country", "p.country"),
+        ("patient_insurance_provider", "p.insurance_provider"),
+        ("patient_insurance_policy_number", "p.insurance_policy_number"),
+        ("patient_emergency_contact_name", "p.emergency_contact_name"),
+        ("patient_emergency_contact_phone", "p.emergency_contact_phone"),
+        ("patient_registration_date", "p.registration_date"),
+    ]),
+    "doctors": ("d", "fk_doctor_id", "doctor_id", [
+        ("doctor_first_name", "d.first_name"),
+        ("doctor_last_name", "d.last_name"),
+        ("doctor_license_number", "d.license_number"),
+        ("doctor_specialization", "d.specialization"),
+        ("doctor_phone", "d.phone_number"),
+        ("doctor_email", "d.email"),
+        ("doctor_hire_date", "d.hire_date"),
+        ("doctor_years_experience", "d.years_of_experience"),
+    ]),
+    "departments": ("dp", "fk_department_id", "department_id", [
+        ("department_name", "dp.department_name"),
+        ("department_code", "dp.department_code"),
+        ("department_floor", "dp.floor_number"),
+        ("department_phone", "dp.phone_number"),
+        ("department_head", "dp.head_physician"),
+    ]),
+    "diagnoses": ("di", "fk_diagnosis_id", "diagnosis_id", [
+        ("diagnosis_icd_code", "di.icd_code"),
+        ("diagnosis_name", "di.diagnosis_name"),
+        ("diagnosis_category", "di.diagnosis_category"),
+        ("diagnosis_severity", "di.severity_level"),
+        ("diagnosis_description", "di.description"),
+        ("is_chronic_diagnosis", "di.is_chronic"),
+    ]),
+    "medications": ("m", "fk_medication_id", "medication_id", [
+        ("medication_name", "m.medication_name"),
+        ("medication_generic_name", "m.generic_name"),
+        ("medication_dosage_strength", "m.dosage_strength"),
+        ("medication_dosage_form", "m.dosage_form"),
+        ("medication_route", "m.route_of_administration"),
+        ("medication_side_effects", "m.common_side_effects"),
+        ("medication_contraindications", "m.contraindications"),
+        ("medication_manufacturer", "m.manufacturer"),
+    ]),
+}
+
+FK_COLUMNS = ["fk_patient_id", "fk_doctor_id", "fk_department_id",
+              "fk_diagnosis_id", "fk_medication_id"]
+
+ENCOUNTER_COLUMNS = [
+    "encounter_date", "encounter_time", "encounter_type", "encounter_duration_minutes",
+    "chief_complaint", "vital_signs_temperature", "vital_signs_blood_pressure",
+    "vital_signs_heart_rate", "vital_signs_respiratory_rate", "clinical_notes",
+    "treatment_plan", "prescribed_quantity", "prescribed_frequency", "prescription_duration_days",
+    "follow_up_date", "follow_up_required", "billingBillable_amount", "billing_status",
+    "created_by", "last_modified_by",
+]
+
+
+def column_mapping():
+    """Every (denormalized column, source expression) except encounter_id."""
+    mapping = [(c, f"e.{c}") for c in FK_COLUMNS]
+    for _, _, _, columns in DIMENSIONS.values():
+        mapping += columns
+    mapping += [(c, f"e.{c}") for c in ENCOUNTER_COLUMNS]
+    return mapping
+
+
+JOIN_SQL = "\n".join(
+    f"    LEFT JOIN {table} {alias} ON e.{fk} = {alias}.{pk}"
+    for table, (alias, fk, pk, _) in DIMENSIONS.items()
+)
+
+VALID_ENCOUNTER_SQL = ("e.fk_patient_id IS NOT NULL\n"
+                       "  AND e.fk_doctor_id IS NOT NULL\n"
+                       "  AND e.fk_department_id IS NOT NULL")
+
+
+# ============================================================================
+# STATEMENTS
+# ============================================================================
+
+# Change detection needs an indexed updated_at on every source table. New
+# schemas get it from healthcare_ddl.sql / healthcare_insert_select.sql;
+# older ones are upgraded in place by ensure_schema().
+CHANGE_TRACKED_TABLES = ["encounters"] + list(DIMENSIONS)
+
+
+def insert_new_sql():
+    """Append encounters in the (low, high] encounter_id range."""
+    mapping = column_mapping()
+    columns = ",\n    ".join(["encounter_id"] + [c for c, _ in mapping])
+    exprs = ",\n    ".join(["e.encounter_id"] + [x for _, x in mapping])
+    return (f"INSERT INTO {TARGET_TABLE} (\n    {columns}\n)\n"
+            f"SELECT\n    {exprs}\n"
+            f"FROM encounters e\n{JOIN_SQL}\n"
+            f"WHERE e.encounter_id > %s AND e.encounter_id <= %s\n"
+            f"  AND {VALID_ENCOUNTER_SQL}")
+
+
+def update_changed_sql():
+    """Rewrite already-loaded encounters whose source row changed."""
+    assignments = ",\n    ".join(f"t.{c} = {x}" for c, x in column_mapping())
+    return (f"UPDATE {TARGET_TABLE} t\n"
+            f"    JOIN encounters e ON t.encounter_id = e.encounter_id\n{JOIN_SQL}\n"
+            f"SET\n    {assignments}\n"
+            f"WHERE e.updated_at >= %s AND e.encounter_id <= %s\n"
+            f"  AND {VALID_ENCOUNTER_SQL}")
+
+
+def update_dimension_sql(table):
+    """Propagate changed rows of one dimension table.
+
+    Only rows whose copied values actually differ are written, so the
+    reported count is the number of denormalized rows changed.
+    """
+    alias, fk, pk, columns = DIMENSIONS[table]
+    assignments = ",\n    ".join(f"t.{c} = {x}" for c, x in columns)
+    unchanged = "\n    AND ".join(f"t.{c} <=> {x}" for c, x in columns)
+    return (f"UPDATE {TARGET_TABLE} t\n"
+            f"    JOIN {table} {alias} ON t.{fk} = {alias}.{pk}\n"
+            f"SET\n    {assignments}\n"
+            f"WHERE {alias}.updated_at >= %s\n"
+            f"  AND NOT (\n    {unchanged}\n  )")
+
+
+def changed_references(cursor, low, high, since):
+    """{fk column: ids} whose denormalized rows an incremental refresh changes.
+
+    Read inside the refresh transaction, before the updates, so a changed
+    encounter reports the patient and doctor it moves away from as well.
+    Feeds the cache invalidation hooks (patient_timeline.py).
+    """
+    references = {"fk_patient_id": set(), "fk_doctor_id": set()}
+    for sql, params in (
+        ("SELECT DISTINCT fk_patient_id, fk_doctor_id FROM encounters "
+         "WHERE encounter_id > %s AND encounter_id <= %s", (low, high)),
+        ("SELECT DISTINCT fk_patient_id, fk_doctor_id FROM encounters "
+         "WHERE updated_at >= %s AND encounter_id <= %s", (since, low)),
+        (f"SELECT DISTINCT t.fk_patient_id, t.fk_doctor_id FROM {TARGET_TABLE} t "
+         f"JOIN encounters e ON t.encounter_id = e.encounter_id "
+         f"WHERE e.updated_at >= %s AND e.encounter_id <= %s", (since, low)),
+    ):
+        cursor.execute(sql, params)
+        for patient_id, doctor_id in cursor.fetchall():
+            references["fk_patient_id"].add(patient_id)
+            references["fk_doctor_id"].add(doctor_id)
+    for table, (_, fk, pk, _) in DIMENSIONS.items():
+        cursor.execute(f"SELECT {pk} FROM {table} WHERE updated_at >= %s", (since,))
+        references[fk] = references.get(fk, set()) | {row[0] for row in cursor.fetchall()}
+    return references
+
+
+PRUNE_SQL = (f"DELETE t FROM {TARGET_TABLE} t\n"
+             f"    LEFT JOIN encounters e ON t.encounter_id = e.encounter_id\n"
+             f"WHERE e.encounter_id IS NULL")
+
+
+# ============================================================================
+# REFRESH
+# ============================================================================
+
+def ensure_schema(cursor):
+    """Create the control table and add updated_at tracking where missing."""
+    cursor.execute(CONTROL_DDL)
+    for table in CHANGE_TRACKED_TABLES:
+        ensure_change_tracking(cursor, table)
+
+
+def read_watermark(cursor):
+    """(last_encounter_id, last_refresh_started) for the target table.
+
+    Without a control row (first run after a full load) the watermark is
+    taken from the denormalized table itself.
+    """
+    row = fetch_one(cursor, f"SELECT last_encounter_id, last_refresh_started "
+                            f"FROM {CONTROL_TABLE} WHERE target_table = %s FOR UPDATE",
+                    (TARGET_TABLE,))
+    if row:
+        return row[0], row[1]
+    return fetch_one(cursor, f"SELECT COALESCE(MAX(encounter_id), 0), "
+                             f"COALESCE(MAX(updated_at), '1970-01-01 00:00:01') FROM {TARGET_TABLE}")
+
+
+def refresh(conn, full=False, prune=False):
+    """Run one refresh in a single transaction; returns the RefreshStep list."""
+    steps = []
+    references = None  # everything, unless narrowed below
+    start = time.perf_counter()
+    cursor = conn.cursor()
+    try:
+        if not fetch_one(cursor, "SELECT GET_LOCK(%s, 0)", (LOCK_NAME,))[0]:
+            raise RuntimeError("another refresh is already running")
+        try:
+            ensure_schema(cursor)
+            # Partitioned layout: split p_future before new periods arrive (DDL, so outside the transaction)
+            if partition_manager.is_partitioned(cursor, TARGET_TABLE):
+                partition_manager.ensure_partitions(
+                    cursor, partition_manager.months_ahead(partition_manager.DEFAULT_MONTHS_AHEAD), TARGET_TABLE)
+            if full:
+                run_step(cursor, steps, "truncate", f"TRUNCATE TABLE {TARGET_TABLE}")
+            cursor.execute("START TRANSACTION")
+            started = fetch_one(cursor, "SELECT NOW()")[0]
+            high = fetch_one(cursor, "SELECT COALESCE(MAX(encounter_id), 0) FROM encounters")[0]
+
+            if full:
+                run_step(cursor, steps, "insert all encounters", insert_new_sql(), (0, high))
+            else:
+                low, since = read_watermark(cursor)
+                print(f"  Watermark: encounter_id > {low}, changes since {since}")
+                if patient_timeline.has_invalidation_hooks() and not prune:
+                    references = changed_references(cursor, low, high, since)
+                run_step(cursor, steps, "insert new encounters", insert_new_sql(), (low, high))
+                run_step(cursor, steps, "update changed encounters", update_changed_sql(), (since, low))
+                for table in DIMENSIONS:
+                    run_step(cursor, steps, f"propagate {table}", update_dimension_sql(table), (since,))
+                if prune:
+                    run_step(cursor, steps, "prune deleted encounters", PRUNE_SQL)
+
+            touched = sum(s.rows for s in steps)
+            cursor.execute(
+                f"REPLACE INTO {CONTROL_TABLE} (target_table, last_encounter_id, last_refresh_started, "
+                f"last_refresh_finished, last_rows_touched, last_elapsed_seconds) "
+                f"VALUES (%s, %s, %s, NOW(), %s, %s)",
+                (TARGET_TABLE, high, started, touched, round(time.perf_counter() - start, 3)),
+            )
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchall()
+    finally:
+        cursor.close()
+    if any(s.rows for s in steps):
+        patient_timeline.fire_invalidation(references)
+    return steps
+
+
+def print_sql():
+    statements = [CONTROL_DDL, insert_new_sql(), update_changed_sql()]
+    statements += [update_dimension_sql(table) for table in DIMENSIONS]
+    statements.append(PRUNE_SQL)
+    for sql in statements:
+        print(sql.replace("%%", "%") + ";\n")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", default="root", help="MySQL user")
+    parser.add_argument("--password", help="MySQL password (prompted if omitted)")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--database", default="healthcare_system")
+    parser.add_argument("--full", action="store_true",
+                        help="rebuild the whole table and reset the watermark")
+    parser.add_argument("--prune", action="store_true",
+                        help="delete denormalized rows whose encounter no longer exists (full scan)")
+    parser.add_argument("--print-sql", action="store_true", help="print the refresh statements and exit")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.print_sql:
+        print_sql()
+        return
+
+    if db_loader.load_driver()[0] is None:
+        print("ERROR: No MySQL driver installed (pip install pymysql)")
+        sys.exit(1)
+    password = args.password if args.password is not None else getpass.getpass("  Password: ")
+
+    pool = db_loader.ConnectionPool(args.user, password, args.host, args.port, args.database, size=1)
+    print(f"Refreshing {args.database}.{TARGET_TABLE} ({'full' if args.full else 'incremental'})")
+    start = time.perf_counter()
+    try:
+        # Full rebuilds and --prune scan everything; deltas only need the base timeout
+        if args.full or args.prune:
+            pool.timeout = db_loader.scaled_timeout(estimated_rows(pool))
+            pool.close()
+        with pool.connection() as conn:
+            steps = refresh(conn, full=args.full, prune=args.prune)
+            cursor = conn.cursor()
+            try:
+                has_rollups = rollups.rollups_exist(cursor)
+            finally:
+                cursor.close()
+            if has_rollups:
+                print("Refreshing rollups")
+                steps += rollups.refresh(conn, full=args.full)
+    except Exception as e:
+        print(f"  ERROR: {e}")
+        sys.exit(1)
+    finally:
+        pool.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"  {'total':<28} {sum(s.rows for s in steps):>12} rows {elapsed:>10.2f}s")
+
+
+if __name__ == "__main__":
+    main()
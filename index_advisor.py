@@ -0,0 +1,636 @@
+"""
+Healthcare System - Covering-Index Advisor
+Derives candidate indexes for denormalized_patient_encounters from the
+analysis workload (healthcare_analysis_queries.sql), measures each one on
+a scratch copy of the table and keeps only the indexes whose query-time
+gain outweighs what they cost on inserts.
+
+Workload parsing, per numbered query:
+  equality    columns compared with = or IN in WHERE
+  range       columns compared with <, >, BETWEEN or LIKE in WHERE
+  group       GROUP BY columns
+  order       leading plain columns of ORDER BY (stops at an alias)
+  referenced  every table column the query reads
+
+Candidates per query (key columns left to right):
+  filter      equality + range columns
+  group       equality + GROUP BY (or ORDER BY) columns
+  covering    the above plus every other referenced column, so the query
+              is answered from the index alone; skipped when a TEXT
+              column is referenced or the key exceeds InnoDB's 3072 bytes
+The hand-picked indexes of healthcare_implementation_guide.sql are tried
+as well. Candidates that are a left prefix of an existing index are
+dropped.
+
+Measurement: the first --rows encounters are copied into
+index_advisor_encounters (same DDL as the real table). Each candidate is
+created on its own; the queries whose EXPLAIN plan uses it are timed,
+together with an INSERT...SELECT of --insert-rows rows, then the index is
+dropped and the same runs are repeated without it. Pairing the runs keeps
+machine drift out of the comparison; a candidate no plan picks up is
+reported as unused without timing. A candidate is kept when
+
+  sum of query p50 gains  >  extra insert ms/row * --inserts-per-run
+
+i.e. when one run of the workload saves more than the index costs for
+the rows that arrive between two runs. Gains under --min-gain of a
+query's baseline count as noise. Candidates that pass are then added
+greedily, best first, each re-measured with the earlier picks in place so
+overlapping indexes are dropped; the final set is measured together.
+
+Backends: mysql (default) or sqlite (--db-file, or --generate for an
+in-memory data set). DuckDB is not offered: it does not use secondary
+indexes for the scans this workload runs.
+
+Usage:
+    python index_advisor.py --dry-run                                   # parsed workload + candidate DDL
+    python index_advisor.py --user root --rows 100000 --output index_advisor.sql --json runs/advisor.json
+    python index_advisor.py --backend sqlite --generate --encounters 50000 --repeat 3
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+
+import backends
+import benchmark_queries
+from partition_manager import heap_table_ddl
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+TABLE = "denormalized_patient_encounters"
+SCRATCH_TABLE = "index_advisor_encounters"
+GUIDE_FILE = os.path.join(HERE, "healthcare_implementation_guide.sql")
+QUERY_FILE = os.path.join(HERE, benchmark_queries.QUERY_FILE)
+MAX_KEY_BYTES = 3072   # InnoDB limit for one index key (DYNAMIC row format)
+MAX_KEY_COLUMNS = 16
+DEFAULT_ROWS = 100_000
+DEFAULT_INSERT_ROWS = 2_000
+DEFAULT_INSERTS_PER_RUN = 10_000
+DEFAULT_MIN_GAIN = 0.05
+ANALYZE_SQL = {"mysql": "ANALYZE TABLE {table}", "sqlite": "ANALYZE {table}"}
+
+
+# ============================================================================
+# WORKLOAD PARSING
+# ============================================================================
+
+_CLAUSE = re.compile(r"\b(WHERE|GROUP\s+BY|HAVING|ORDER\s+BY|LIMIT|UNION)\b", re.I)
+_DDL_INDEX = re.compile(r"\bINDEX\s+(\w+)\s*\(([^)]*)\)", re.I)
+_GUIDE_INDEX = re.compile(rf"CREATE\s+INDEX\s+(\w+)\s+ON\s+{TABLE}\s*\(([^)]*)\)", re.I)
+
+
+def table_types():
+    """{column: MySQL type} of denormalized_patient_encounters."""
+    return dict(backends.table_columns(heap_table_ddl()))
+
+
+def existing_indexes():
+    """[(name, [columns])] declared by the DDL, primary key first."""
+    ddl = heap_table_ddl()
+    primary = [name for name, definition in backends.column_definitions(ddl)
+               if re.search(r"\bPRIMARY\s+KEY\b", definition, re.I)]
+    return [("PRIMARY", primary)] + [(name, [c.strip() for c in cols.split(",")])
+                                     for name, cols in _DDL_INDEX.findall(ddl)]
+
+
+def guide_indexes(path=GUIDE_FILE):
+    """[(name, [columns])] recommended in the implementation guide."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [(name, [c.strip() for c in cols.split(",")]) for name, cols in _GUIDE_INDEX.findall(f.read())]
+
+
+def top_level_clauses(sql):
+    """{clause keyword: text} for the clauses outside parentheses."""
+    depth, marks = 0, []
+    positions = {m.start(): m for m in _CLAUSE.finditer(sql)}
+    for i, ch in enumerate(sql):
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif depth == 0 and i in positions:
+            marks.append(positions[i])
+    clauses = {}
+    for m, following in zip(marks, marks[1:] + [None]):
+        keyword = " ".join(m.group(1).upper().split())
+        end = following.start() if following else len(sql)
+        clauses.setdefault(keyword, sql[m.end():end])
+    return clauses
+
+
+def _columns(text, columns):
+    """Table columns named in text, in order of first appearance."""
+    found = []
+    for word in re.findall(r"\b\w+\b", text):
+        if word in columns and word not in found:
+            found.append(word)
+    return found
+
+
+def order_columns(text, columns):
+    """Leading ORDER BY items that are plain table columns, with direction."""
+    result = []
+    for item in backends._split_args(text.strip().rstrip(";")):
+        m = re.fullmatch(r"(\w+)(\s+(?:ASC|DESC))?", item.strip(), re.I)
+        if m is None or m.group(1) not in columns:
+            break
+        result.append(m.group(1) + (" DESC" if (m.group(2) or "").strip().upper() == "DESC" else ""))
+    return result
+
+
+class QueryProfile:
+    """Column usage of one analysis query."""
+
+    def __init__(self, number, title, sql, columns):
+        self.number = number
+        self.title = title
+        self.sql = sql
+        clauses = top_level_clauses(sql)
+        where = clauses.get("WHERE", "")
+        self.equality, self.range = [], []
+        for column in _columns(where, columns):
+            if re.search(rf"\b{column}\s*(=|<=>|IN\b)", where, re.I):
+                self.equality.append(column)
+            elif re.search(rf"\b{column}\s*([<>]|BETWEEN\b|LIKE\b)", where, re.I):
+                self.range.append(column)
+        self.group = _columns(clauses.get("GROUP BY", ""), columns)
+        self.order = order_columns(clauses["ORDER BY"], columns) if "ORDER BY" in clauses else []
+        self.referenced = _columns(sql, columns)
+
+    def as_dict(self):
+        return {"query": self.number, "title": self.title, "equality": self.equality, "range": self.range,
+                "group": self.group, "order": self.order, "referenced": self.referenced}
+
+
+def load_workload(path, numbers=None):
+    """[QueryProfile] for the numbered queries that read the table."""
+    columns = table_types()
+    return [QueryProfile(number, title, sql, columns)
+            for number, title, sql in benchmark_queries.load_queries(path, numbers)
+            if re.search(rf"\bFROM\s+{TABLE}\b", sql, re.I)]
+
+
+# ============================================================================
+# CANDIDATES
+# ============================================================================
+
+class Candidate:
+    """One proposed index and its measurements."""
+
+    def __init__(self, name, columns, source):
+        self.name = name
+        self.columns = columns
+        self.source = source   # 'guide' or the query numbers it was derived from
+        self.gain_ms = None
+        self.insert_ms_per_row = None
+        self.cost_ms = None
+        self.query_p50_ms = {}   # query number -> [p50 without, p50 with]
+        self.users = []
+        self.verdict = None      # keep, reject, unused, redundant, dropped or error
+
+    @property
+    def key(self):
+        return tuple(c.split()[0] for c in self.columns)
+
+    def ddl(self, table=TABLE):
+        return f"CREATE INDEX {self.name} ON {table} ({', '.join(self.columns)})"
+
+    def as_dict(self):
+        return {"name": self.name, "columns": self.columns, "source": self.source, "users": self.users,
+                "gain_ms": self.gain_ms, "insert_ms_per_row": self.insert_ms_per_row, "cost_ms": self.cost_ms,
+                "query_p50_ms": self.query_p50_ms, "verdict": self.verdict}
+
+
+def key_bytes(column_type):
+    """Worst-case index key bytes of a MySQL column type (utf8mb4 strings)."""
+    m = re.match(r"(\w+)(?:\((\d+))?", column_type)
+    base, length = m.group(1), int(m.group(2)) if m.group(2) else 0
+    if base == "VARCHAR":
+        return 4 * length + 2
+    if base == "TEXT":
+        return None  # needs a prefix length; never part of a generated key
+    return {"INT": 4, "BOOLEAN": 1, "DATE": 3, "TIME": 3, "TIMESTAMP": 4, "DECIMAL": 8}.get(base, 8)
+
+
+def _fits(columns, types):
+    sizes = [key_bytes(types[c.split()[0]]) for c in columns]
+    return None not in sizes and sum(sizes) <= MAX_KEY_BYTES and len(columns) <= MAX_KEY_COLUMNS
+
+
+def _dedupe(columns):
+    seen, result = set(), []
+    for column in columns:
+        if column.split()[0] not in seen:
+            seen.add(column.split()[0])
+            result.append(column)
+    return result
+
+
+def propose(workload, include_guide=True):
+    """Candidate indexes for the workload, deduplicated, minus existing prefixes."""
+    types = table_types()
+    existing = [tuple(cols) for _, cols in existing_indexes()]
+    proposals = []
+    for q in workload:
+        lead = q.group or q.order
+        shapes = []
+        if q.equality or q.range:
+            shapes.append(("filter", q.equality + q.range[:1]))
+        if lead:
+            shapes.append(("group", q.equality + lead))
+        if shapes:
+            base = shapes[-1][1]
+            shapes.append(("covering", base + [c for c in q.referenced if c not in {b.split()[0] for b in base}]))
+        for kind, columns in shapes:
+            columns = _dedupe(columns)
+            if columns and _fits(columns, types):
+                proposals.append((f"idx_q{q.number}_{kind}", columns, [q.number]))
+    if include_guide:
+        proposals += [(name, columns, "guide") for name, columns in guide_indexes()]
+
+    candidates = {}
+    for name, columns, source in proposals:
+        key = tuple(c.split()[0] for c in columns)
+        if any(index[:len(key)] == key for index in existing):
+            continue
+        if key in candidates:
+            if isinstance(candidates[key].source, list) and isinstance(source, list):
+                candidates[key].source += source
+            continue
+        candidates[key] = Candidate(name, columns, source)
+    return list(candidates.values())
+
+
+# ============================================================================
+# MEASUREMENT
+# ============================================================================
+
+class Trial:
+    """Scratch copy of the table plus the timing runs against it."""
+
+    def __init__(self, backend, workload, repeat, warmup, insert_rows, min_gain):
+        self.backend = backend
+        self.repeat = repeat
+        self.warmup = warmup
+        self.insert_rows = insert_rows
+        self.min_gain = min_gain
+        self.columns = [c for c, _ in backends.table_columns(heap_table_ddl())]
+        self.queries = [(q.number, backends.translate_query(self._scratch(q.sql), backend.dialect))
+                        for q in workload]
+        self.baseline = {}
+        self.baseline_insert = None
+
+    @staticmethod
+    def _scratch(sql):
+        return re.sub(rf"(?<!')\b{TABLE}\b(?!')", SCRATCH_TABLE, sql)
+
+    def _run(self, sql, params=None):
+        cursor = self.backend.execute(sql, params)
+        if cursor is not None:
+            self.backend.result(cursor)
+            cursor.close()
+
+    def setup(self, rows):
+        """(Re)create the scratch table with the first `rows` encounters."""
+        self._run(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}")
+        self._run(self._scratch(heap_table_ddl()))
+        columns = ", ".join(self.columns)
+        self._run(f"INSERT INTO {SCRATCH_TABLE} ({columns}) SELECT {columns} FROM {TABLE} "
+                  f"ORDER BY encounter_id LIMIT %s", (rows,))
+        self._run(ANALYZE_SQL[self.backend.dialect].format(table=SCRATCH_TABLE))
+        return self.backend.query(f"SELECT COUNT(*) FROM {SCRATCH_TABLE}")[0][0]
+
+    def teardown(self):
+        self._run(f"DROP TABLE IF EXISTS {SCRATCH_TABLE}")
+
+    def time_queries(self, numbers=None):
+        """{query number: p50 ms}; a failing query is reported and left out."""
+        cursor = self.backend.cursor()
+        p50 = {}
+        try:
+            for number, sql in self.queries:
+                if numbers is not None and number not in numbers:
+                    continue
+                try:
+                    timings, _ = benchmark_queries.run_query(cursor, sql, self.repeat, self.warmup)
+                except Exception as e:
+                    print(f"    query {number} skipped: {str(e).splitlines()[0]}")
+                    continue
+                p50[number] = benchmark_queries.percentile([t * 1000 for t in timings], 50)
+        finally:
+            cursor.close()
+        return p50
+
+    def time_inserts(self):
+        """Median ms per row for INSERT...SELECT of insert_rows rows (removed again)."""
+        columns = ", ".join(c for c in self.columns if c != "encounter_id")
+        high = self.backend.query(f"SELECT MAX(encounter_id) FROM {SCRATCH_TABLE}")[0][0]
+        samples = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            self._run(f"INSERT INTO {SCRATCH_TABLE} ({columns}) SELECT {columns} FROM {SCRATCH_TABLE} "
+                      f"WHERE encounter_id <= %s ORDER BY encounter_id LIMIT %s", (high, self.insert_rows))
+            samples.append((time.perf_counter() - start) * 1000 / self.insert_rows)
+            self._run(f"DELETE FROM {SCRATCH_TABLE} WHERE encounter_id > %s", (high,))
+        return benchmark_queries.percentile(samples, 50)
+
+    def measure_baseline(self):
+        self.baseline = self.time_queries()
+        self.baseline_insert = self.time_inserts()
+        self.queries = [(n, sql) for n, sql in self.queries if n in self.baseline]
+
+    def users(self, names):
+        """Query numbers whose plan uses one of the named indexes."""
+        pattern = re.compile(r"\b(" + "|".join(map(re.escape, names)) + r")\b")
+        cursor = self.backend.cursor()
+        try:
+            return {number for number, sql in self.queries
+                    if any(pattern.search(str(row.get("key") or row.get("detail") or ""))
+                           for row in benchmark_queries.explain(cursor, sql, self.backend.dialect))}
+        finally:
+            cursor.close()
+
+    def gain(self, without, with_index):
+        """Summed p50 gain in ms, ignoring per-query changes below min_gain."""
+        total = 0.0
+        for number, base in without.items():
+            delta = base - with_index.get(number, base)
+            if abs(delta) >= base * self.min_gain:
+                total += delta
+        return total
+
+    def create(self, candidate):
+        self._run(candidate.ddl(SCRATCH_TABLE))
+        self._run(ANALYZE_SQL[self.backend.dialect].format(table=SCRATCH_TABLE))
+
+    def drop(self, candidate):
+        on = f" ON {SCRATCH_TABLE}" if self.backend.dialect == "mysql" else ""
+        self._run(f"DROP INDEX {candidate.name}{on}")
+
+    def paired(self, candidates):
+        """Time the queries using candidates and the inserts with, then without them.
+
+        Both halves run back to back so drift in the machine (caches,
+        CPU throttling) affects them alike. Returns (users, with p50,
+        without p50, with ms/row, without ms/row); users is empty, and
+        nothing is timed, when no plan picks up the indexes.
+        """
+        for candidate in candidates:
+            self.create(candidate)
+        try:
+            users = self.users([c.name for c in candidates])
+            if not users:
+                return users, {}, {}, None, None
+            with_index = self.time_queries(users)
+            with_insert = self.time_inserts()
+        finally:
+            for candidate in candidates:
+                self.drop(candidate)
+        return users, with_index, self.time_queries(users), with_insert, self.time_inserts()
+
+    def evaluate(self, candidate, inserts_per_run):
+        """Measure one candidate on its own and set its verdict."""
+        users, with_index, without, with_insert, without_insert = self.paired([candidate])
+        candidate.users = sorted(users)
+        if not users:
+            candidate.verdict = "unused"
+            return
+        candidate.query_p50_ms = {n: [round(without[n], 3), round(with_index[n], 3)] for n in with_index}
+        candidate.insert_ms_per_row = with_insert
+        candidate.gain_ms = self.gain(without, with_index)
+        candidate.cost_ms = max(with_insert - without_insert, 0.0) * inserts_per_run
+        candidate.verdict = "keep" if candidate.gain_ms > 0 and candidate.gain_ms > candidate.cost_ms else "reject"
+
+
+def _print_row(candidate):
+    if candidate.verdict == "unused" or candidate.gain_ms is None:
+        print(f"{candidate.name:<32} {'-':<12} {'':>10} {'':>10}  {candidate.verdict}")
+        return
+    used_by = ",".join(map(str, candidate.users))
+    print(f"{candidate.name:<32} {used_by:<12} {candidate.gain_ms:>10.1f} {candidate.cost_ms:>10.1f}  "
+          f"{candidate.verdict}")
+
+
+def advise(trial, candidates, inserts_per_run):
+    """Screen every candidate alone, then pick greedily by marginal benefit.
+
+    The greedy pass adds screened candidates best-first, re-measuring each
+    with the indexes already chosen in place, so an index whose queries
+    are already served by an earlier pick is marked redundant. The final
+    set is then measured together; while it does not pay for its insert
+    cost, the member with the smallest margin is dropped and the rest are
+    measured again. Returns (kept, combined report of the kept set).
+    """
+    print(f"\nBaseline ({len(trial.queries)} queries, {trial.repeat} runs each)...")
+    trial.measure_baseline()
+    print(f"  workload {sum(trial.baseline.values()):.1f} ms, inserts {trial.baseline_insert:.4f} ms/row")
+
+    header = f"{'index':<32} {'used by':<12} {'gain ms':>10} {'cost ms':>10}  verdict"
+    print(f"\nScreening {len(candidates)} candidates one at a time:\n{header}")
+    for candidate in candidates:
+        try:
+            trial.evaluate(candidate, inserts_per_run)
+        except Exception as e:
+            candidate.verdict = f"error: {str(e).splitlines()[0]}"
+        _print_row(candidate)
+
+    screened = sorted((c for c in candidates if c.verdict == "keep"),
+                      key=lambda c: c.gain_ms - c.cost_ms, reverse=True)
+    kept = []
+    if screened:
+        print(f"\nGreedy selection (gain and cost given the indexes kept above):\n{header}")
+    try:
+        for candidate in screened:
+            if kept:
+                trial.evaluate(candidate, inserts_per_run)
+                if candidate.verdict != "keep":
+                    candidate.verdict = "redundant"
+            _print_row(candidate)
+            if candidate.verdict == "keep":
+                trial.create(candidate)
+                kept.append(candidate)
+    finally:
+        for candidate in kept:
+            trial.drop(candidate)
+
+    while kept:
+        combined = measure_together(trial, kept, inserts_per_run)
+        print(f"\nKept {len(kept)} together: gain {combined['gain_ms']:.1f} ms per workload run, "
+              f"insert cost {combined['cost_ms']:.1f} ms per {inserts_per_run:,} rows")
+        if combined["gain_ms"] > combined["cost_ms"]:
+            return kept, combined
+        weakest = min(kept, key=lambda c: c.gain_ms - c.cost_ms)
+        weakest.verdict = "dropped"
+        kept.remove(weakest)
+        print(f"  not worth it together; dropping {weakest.name} and measuring again")
+
+    print("\nNo candidate paid for its insert cost.")
+    return kept, None
+
+
+def measure_together(trial, kept, inserts_per_run):
+    """Combined report of the kept indexes measured side by side."""
+    users, with_index, without, with_insert, without_insert = trial.paired(kept)
+    cost = max(with_insert - without_insert, 0.0) * inserts_per_run if users else 0.0
+    return {"indexes": [c.name for c in kept], "users": sorted(users),
+            "gain_ms": round(trial.gain(without, with_index), 3), "cost_ms": round(cost, 3),
+            "query_p50_ms": {n: [round(without[n], 3), round(with_index[n], 3)] for n in with_index}}
+
+
+# ============================================================================
+# OUTPUT
+# ============================================================================
+
+def write_ddl(path, kept, rows, combined, inserts_per_run):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("-- ============================================================================\n")
+        f.write(f"-- Indexes recommended by index_advisor.py ({rows:,}-row trial)\n")
+        if combined:
+            f.write(f"-- Together: save {combined['gain_ms']:.1f} ms per workload run, "
+                    f"cost {combined['cost_ms']:.1f} ms per {inserts_per_run:,} inserted rows\n")
+        else:
+            f.write("-- No candidate paid for its insert cost\n")
+        f.write("-- ============================================================================\n\n")
+        f.write("USE healthcare_system;\n\n")
+        for c in kept:
+            source = "healthcare_implementation_guide.sql" if c.source == "guide" else \
+                "queries " + ", ".join(map(str, c.source))
+            f.write(f"-- {source}\n")
+            f.write(c.ddl() + ";\n\n")
+    print(f"Index DDL written to {path}")
+
+
+def print_workload(workload, candidates):
+    print(f"{'#':>3} {'equality':<20} {'range':<16} {'group / order':<40}")
+    for q in workload:
+        print(f"{q.number:>3} {','.join(q.equality) or '-':<20} {','.join(q.range) or '-':<16} "
+              f"{','.join(q.group or q.order) or '-':<40}")
+    print(f"\n{len(candidates)} candidates:\n")
+    for c in candidates:
+        source = "guide" if c.source == "guide" else "queries " + ",".join(map(str, c.source))
+        print(f"-- {source}\n{c.ddl()};\n")
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["mysql", "sqlite"], default="mysql")
+    parser.add_argument("--db-file", help="database file for the sqlite backend")
+    parser.add_argument("--user", default="root", help="MySQL user")
+    parser.add_argument("--password", help="MySQL password (prompted if omitted)")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--database", default=backends.DEFAULT_DATABASE)
+    parser.add_argument("--generate", action="store_true",
+                        help="trial on freshly generated data (in-memory SQLite) instead of a database")
+    parser.add_argument("--encounters", type=int, default=50_000, help="encounters to generate (with --generate)")
+    parser.add_argument("--patients", type=int, default=5_000, help="patients to generate (with --generate)")
+    parser.add_argument("--doctors", type=int, default=200, help="doctors to generate (with --generate)")
+    parser.add_argument("--workload-profile", default="uniform",
+                        help="workload profile of the generated data, e.g. hotspot (with --generate; "
+                             "see generate_bulk_data.py --help)")
+    parser.add_argument("--query-file", default=QUERY_FILE,
+                        help=f"numbered query file (default: {benchmark_queries.QUERY_FILE})")
+    parser.add_argument("--queries", type=benchmark_queries.parse_numbers,
+                        help="only these query numbers, e.g. 1,2,5-9")
+    parser.add_argument("--no-guide", action="store_true",
+                        help="do not try the indexes from healthcare_implementation_guide.sql")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS,
+                        help=f"encounters copied into the scratch table (default: {DEFAULT_ROWS:,})")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per query (default: 3)")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs per query first (default: 1)")
+    parser.add_argument("--insert-rows", type=int, default=DEFAULT_INSERT_ROWS,
+                        help=f"rows per insert-cost sample (default: {DEFAULT_INSERT_ROWS:,})")
+    parser.add_argument("--inserts-per-run", type=int, default=DEFAULT_INSERTS_PER_RUN,
+                        help="rows inserted between two runs of the workload, weighs insert cost "
+                             f"against query gain (default: {DEFAULT_INSERTS_PER_RUN:,})")
+    parser.add_argument("--min-gain", type=float, default=DEFAULT_MIN_GAIN,
+                        help="per-query change below this fraction of its p50 counts as noise (default: 0.05)")
+    parser.add_argument("--output", default="index_advisor.sql", help="DDL file for the kept indexes")
+    parser.add_argument("--json", dest="json_out", help="write the full report to this JSON file")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print the parsed workload and candidate DDL without connecting")
+    args = parser.parse_args(argv)
+    if args.backend == "sqlite" and not args.db_file and not args.generate and not args.dry_run:
+        parser.error("--backend sqlite requires --db-file or --generate")
+    if args.repeat < 1 or args.insert_rows < 1:
+        parser.error("--repeat and --insert-rows must be at least 1")
+    return args
+
+
+@contextmanager
+def open_database(args):
+    """The database holding the source table; with --generate an in-memory SQLite."""
+    if not args.generate:
+        with benchmark_queries.connect(args) as backend:
+            yield backend
+        return
+
+    import generate_bulk_data as gen
+    config = gen.GenerationConfig(num_doctors=args.doctors, num_patients=args.patients,
+                                  num_encounters=args.encounters,
+                                  mode="pooled" if gen.np is not None else "faker",
+                                  profile=gen.workload_profiles.get_profile(args.workload_profile))
+    print(f"Generating {args.encounters:,} encounters ({args.workload_profile} workload) into in-memory SQLite...")
+    backend = backends.SQLiteBackend()
+    try:
+        gen.load_rows(backend, config)
+        gen.load_denormalized(backend)
+        yield backend
+    finally:
+        backend.close()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workload = load_workload(args.query_file, args.queries)
+    candidates = propose(workload, include_guide=not args.no_guide)
+    if args.dry_run:
+        print_workload(workload, candidates)
+        return
+    if args.generate:
+        args.backend = "sqlite"
+
+    try:
+        with open_database(args) as backend:
+            trial = Trial(backend, workload, args.repeat, args.warmup, args.insert_rows, args.min_gain)
+            print(f"Copying {args.rows:,} encounters into {SCRATCH_TABLE}...")
+            rows = trial.setup(args.rows)
+            print(f"  {rows:,} rows, {len(candidates)} candidates")
+            try:
+                kept, combined = advise(trial, candidates, args.inserts_per_run)
+            finally:
+                trial.teardown()
+    except Exception as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+    print()
+    write_ddl(args.output, kept, rows, combined, args.inserts_per_run)
+    if args.json_out:
+        directory = os.path.dirname(args.json_out)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"backend": args.backend, "rows": rows, "repeat": args.repeat,
+                       "inserts_per_run": args.inserts_per_run, "min_gain": args.min_gain,
+                       "workload": [q.as_dict() for q in workload],
+                       "baseline": {"query_p50_ms": {n: round(ms, 3) for n, ms in trial.baseline.items()},
+                                    "insert_ms_per_row": round(trial.baseline_insert, 5)},
+                       "candidates": [c.as_dict() for c in candidates],
+                       "kept": [c.name for c in kept], "combined": combined}, f, indent=2)
+        print(f"Report written to {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+"""
+Healthcare System - Parallel Sharded Loader
+Loads the output of generate_bulk_data.py over N concurrent connections
+instead of one mysql session applying every INSERT in turn.
+
+The driver script is read as a stream of statements, with SOURCE parts
+expanded (db_loader.iter_script_statements()). It works for .sql output
+and for csv/tsv LOAD DATA drivers, split into parts or not, and accepts
+the _manifest.json written with --max-file-size in place of the driver.
+Statements are handled as follows:
+
+  - setup (USE, TRUNCATE, SET, fast-load index drops) runs in order on
+    one control connection. Session settings (USE and plain SETs) are
+    repeated on every worker connection.
+  - data (INSERT ... VALUES and LOAD DATA) is grouped into shards, and
+    worker threads load the shards in parallel:
+      * tables with an explicit id (doctors, patients, encounters) are
+        split by id range into shards of about --shard-rows rows; each
+        LOAD DATA part file is its own shard
+      * diagnoses and medications take their ids from AUTO_INCREMENT, so
+        each of them loads as one whole-table shard
+  - the rest (denormalize INSERT ... SELECT, index rebuild, checks) runs
+    on the control connection once every shard has loaded.
+
+Dimension tables load first; encounters wait until every dimension shard
+has committed. Each shard is one transaction. A failed shard is retried
+after deleting its id range, or the whole table for a whole-table shard,
+so a retry never duplicates rows.
+
+Usage:
+    python parallel_loader.py healthcare_bulk_data.sql --user root --password secret --connections 8
+    python parallel_loader.py out/healthcare_manifest.json --user root --connections 8 --json runs/load-8.json
+    python parallel_loader.py healthcare_bulk_data.sql --user root --scaling 1 2 4 8 16
+"""
+
+import argparse
+import getpass
+import json
+import os
+import queue
+import re
+import sys
+import threading
+import time
+
+import db_loader
+import patient_timeline
+
+DEFAULT_CONNECTIONS = 4
+DEFAULT_SHARD_ROWS = 50_000
+DEFAULT_RETRIES = 3
+SCALING_CONNECTIONS = [1, 2, 4, 8, 16]
+
+# Tables whose rows carry their own primary key, and so can be sharded by
+# key range and cleaned up before a retry
+KEY_COLUMNS = {"doctors": "doctor_id", "patients": "patient_id", "encounters": "encounter_id"}
+
+# Load phases; every table not listed is a dimension (phase 0)
+FACT_PHASE = {"encounters": 1}
+
+_INSERT = re.compile(r"\s*INSERT\s+INTO\s+`?(\w+)`?\s*\(\s*`?(\w+)`?[^)]*\)\s*VALUES\b", re.I)
+_LOAD_DATA = re.compile(r"(\s*LOAD\s+DATA\s+LOCAL\s+INFILE\s+)'((?:[^'\\]|\\.)*)'(\s+INTO\s+TABLE\s+`?(\w+)`?)",
+                        re.I)
+_FIRST_KEY = re.compile(r"\s*\(\s*(\d+)")
+_LINE_KEY = re.compile(r'\s*"?(\d+)')
+_SESSION = re.compile(r"\s*(USE\b|SET\b)", re.I)
+_NOT_SESSION = re.compile(r"AUTOCOMMIT|SELECT|@fast_load", re.I)
+
+
+# ============================================================================
+# SHARDS
+# ============================================================================
+
+class Shard:
+    """Data statements for one table that load (and retry) as one transaction.
+
+    lo/hi is the key range covered when the table has a KEY_COLUMNS entry;
+    a shard with whole_table set holds every row of its table.
+    """
+
+    def __init__(self, table, whole_table=False):
+        self.table = table
+        self.whole_table = whole_table
+        self.statements = []
+        self.rows = 0  # estimated from the statements; LOAD DATA reports the real count
+        self.lo = None
+        self.hi = None
+
+    def add(self, sql, rows=0, key_range=None):
+        self.statements.append(sql)
+        self.rows += rows
+        if key_range is not None:
+            lo, hi = key_range
+            self.lo = lo if self.lo is None else min(self.lo, lo)
+            self.hi = hi if self.hi is None else max(self.hi, hi)
+
+    @property
+    def retryable(self):
+        return self.whole_table or self.lo is not None
+
+    def cleanup(self):
+        """Statements that undo a partly applied earlier attempt"""
+        if self.whole_table:
+            return [f"DELETE FROM {self.table}", f"ALTER TABLE {self.table} AUTO_INCREMENT = 1"]
+        return [f"DELETE FROM {self.table} WHERE {KEY_COLUMNS[self.table]} BETWEEN {self.lo} AND {self.hi}"]
+
+    def __str__(self):
+        if self.lo is not None:
+            return f"{self.table} {self.lo}-{self.hi}"
+        return self.table
+
+
+def insert_key_range(sql, table):
+    """(first, last) key of a multi-row INSERT whose first column is the table key, else None"""
+    m = _INSERT.match(sql)
+    if KEY_COLUMNS.get(table) != m.group(2).lower():
+        return None
+    first = _FIRST_KEY.match(sql, m.end())
+    last_row = sql.rfind("\n(")
+    last = _LINE_KEY.match(sql, last_row + 2) if last_row > m.end() else first
+    if first is None or last is None:
+        return None
+    lo, hi = int(first.group(1)), int(last.group(1))
+    return min(lo, hi), max(lo, hi)
+
+
+def file_key_range(path):
+    """(first, last) leading integer field of a generated csv/tsv file, or None"""
+    with open(path, "rb") as f:
+        first = f.readline()
+        f.seek(0, os.SEEK_END)
+        f.seek(max(f.tell() - 65536, 0))
+        lines = f.read().rstrip(b"\n").rsplit(b"\n", 1)
+    keys = [_LINE_KEY.match(line.decode("utf-8", "replace")) for line in (first, lines[-1])]
+    if None in keys:
+        return None
+    lo, hi = int(keys[0].group(1)), int(keys[1].group(1))
+    return min(lo, hi), max(lo, hi)
+
+
+def data_statement(sql, base_dir):
+    """(table, sql, row estimate, key range) for an INSERT ... VALUES or LOAD DATA, else None.
+
+    LOAD DATA paths are made absolute (relative ones are relative to the
+    driver script, as generate_bulk_data.py writes them).
+    """
+    m = _INSERT.match(sql)
+    if m:
+        table = m.group(1).lower()
+        return table, sql, max(sql.count("\n("), 1), insert_key_range(sql, table)
+    m = _LOAD_DATA.match(sql)
+    if m:
+        table = m.group(4).lower()
+        path = os.path.join(base_dir, m.group(2).replace("\\\\", "\\"))
+        key_range = file_key_range(path) if table in KEY_COLUMNS else None
+        quoted = path.replace("\\", "\\\\").replace("'", "\\'")
+        return table, f"{m.group(1)}'{quoted}'{m.group(3)}{sql[m.end():]}", 0, key_range
+    return None
+
+
+def resolve_driver(path):
+    """Driver script for a .sql path or a generate_bulk_data.py manifest; returns (driver, rows or None)"""
+    if not path.endswith(".json"):
+        return path, None
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    return os.path.join(os.path.dirname(path), manifest["driver"]), sum(manifest["rows"].values())
+
+
+# ============================================================================
+# WORKERS
+# ============================================================================
+
+class ConnectionStats:
+    """Work done by one worker connection."""
+
+    def __init__(self, name):
+        self.name = name
+        self.shards = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.retries = 0
+
+    @property
+    def rate(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def to_dict(self):
+        return {"connection": self.name, "shards": self.shards, "rows": self.rows,
+                "seconds": round(self.seconds, 3), "rows_per_sec": round(self.rate, 1),
+                "retries": self.retries}
+
+
+class ParallelLoader:
+    """Loads shards on `connections` worker threads, one pooled connection each.
+
+    submit() blocks once 2 x connections shards are waiting, so only a
+    bounded part of the data set is held in memory. barrier() waits until
+    everything submitted has loaded and raises if any shard failed for good.
+    """
+
+    def __init__(self, pool, connections, retries=DEFAULT_RETRIES, verbose=True):
+        self.pool = pool
+        self.retries = retries
+        self.verbose = verbose
+        self.session = []
+        self.failures = []
+        self.queue = queue.Queue(2 * connections)
+        self.stats = [ConnectionStats(f"conn-{i + 1}") for i in range(connections)]
+        self._lock = threading.Lock()
+        self.threads = [threading.Thread(target=self._work, args=(stats,), name=stats.name, daemon=True)
+                        for stats in self.stats]
+        for thread in self.threads:
+            thread.start()
+
+    def _work(self, stats):
+        while True:
+            shard = self.queue.get()
+            try:
+                if shard is None:
+                    return
+                if not self.failures:  # after a failure, drain without loading
+                    self._load(shard, stats)
+            except Exception as e:
+                with self._lock:
+                    self.failures.append((shard, e))
+            finally:
+                self.queue.task_done()
+
+    def _attempt(self, shard, attempt):
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                for sql in self.session:
+                    cursor.execute(sql)
+                if attempt and shard.whole_table:
+                    for sql in shard.cleanup():  # ALTER TABLE commits, so outside the transaction
+                        cursor.execute(sql)
+                cursor.execute("START TRANSACTION")
+                if attempt and not shard.whole_table:
+                    for sql in shard.cleanup():
+                        cursor.execute(sql)
+                rows = 0
+                for sql in shard.statements:
+                    cursor.execute(sql)
+                    rows += max(cursor.rowcount, 0)
+                cursor.execute("COMMIT")
+                return rows
+            finally:
+                cursor.close()
+
+    def _load(self, shard, stats):
+        attempts = 1 + (self.retries if shard.retryable else 0)
+        start = time.perf_counter()
+        for attempt in range(attempts):
+            try:
+                rows = self._attempt(shard, attempt)
+                break
+            except Exception as e:
+                if attempt + 1 == attempts:
+                    raise
+                stats.retries += 1
+                with self._lock:
+                    print(f"  [{stats.name}] {shard}: {e}; retrying ({attempt + 1}/{self.retries})")
+                time.sleep(min(2 ** attempt, 30))
+        seconds = time.perf_counter() - start
+        stats.shards += 1
+        stats.rows += rows
+        stats.seconds += seconds
+        if self.verbose:
+            with self._lock:
+                print(f"  [{stats.name}] {str(shard):<28} {rows:>10,} rows {seconds:7.2f}s "
+                      f"{rows / seconds if seconds else 0:>10,.0f} rows/s")
+
+    def submit(self, shard):
+        if self.failures:
+            raise self._error()
+        self.queue.put(shard)
+
+    def barrier(self):
+        self.queue.join()
+        if self.failures:
+            raise self._error()
+
+    def _error(self):
+        shard, e = self.failures[0]
+        return RuntimeError(f"shard {shard} failed: {e}")
+
+    def close(self):
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+
+
+# ============================================================================
+# DRIVER
+# ============================================================================
+
+def load(pool, driver, connections, shard_rows=DEFAULT_SHARD_ROWS, retries=DEFAULT_RETRIES,
+         verbose=True, on_statement=db_loader.print_statement):
+    """Load a generate_bulk_data.py driver script in parallel.
+
+    Uses one control connection plus `connections` workers, so the pool
+    needs connections + 1. Returns a summary dict (rows, seconds,
+    rows_per_sec, per-connection stats).
+    """
+    base_dir = os.path.dirname(os.path.abspath(driver))
+    loader = ParallelLoader(pool, connections, retries, verbose)
+    shard, phase, loaded = None, 0, False
+    start = time.perf_counter()
+
+    def flush():
+        nonlocal shard
+        if shard is not None and shard.statements:
+            loader.submit(shard)
+        shard = None
+
+    try:
+        with pool.connection() as control:
+            cursor = control.cursor()
+            try:
+                for index, sql in enumerate(db_loader.iter_script_statements(driver), 1):
+                    data = data_statement(sql, base_dir)
+                    if data is None:
+                        if loaded:
+                            # Everything after the data depends on all of it
+                            flush()
+                            loader.barrier()
+                        elif _SESSION.match(sql) and not _NOT_SESSION.search(sql):
+                            loader.session.append(sql)
+                        step = time.perf_counter()
+                        cursor.execute(sql)
+                        rows = cursor.fetchall() if cursor.description else None
+                        if on_statement:
+                            on_statement(db_loader.StatementTiming(index, sql, time.perf_counter() - step,
+                                                                   cursor.rowcount), rows)
+                        continue
+
+                    table, sql, rows, key_range = data
+                    loaded = True
+                    if FACT_PHASE.get(table, 0) > phase:
+                        flush()
+                        loader.barrier()
+                        phase = FACT_PHASE[table]
+                    whole_table = table not in KEY_COLUMNS
+                    if shard is not None and (shard.table != table or
+                                              (not whole_table and (shard.rows >= shard_rows or
+                                                                    key_range is None or rows == 0))):
+                        flush()
+                    if shard is None:
+                        shard = Shard(table, whole_table)
+                    shard.add(sql, rows, key_range)
+                    if key_range is None and not whole_table:
+                        flush()  # cannot clean up a range it does not know: keep it alone
+                flush()
+                loader.barrier()
+            finally:
+                cursor.close()
+    finally:
+        loader.close()
+
+    seconds = time.perf_counter() - start
+    rows = sum(s.rows for s in loader.stats)
+    patient_timeline.fire_invalidation()  # the load replaced every table
+    return {"connections": connections, "rows": rows, "seconds": round(seconds, 3),
+            "rows_per_sec": round(rows / seconds if seconds else 0.0, 1),
+            "retries": sum(s.retries for s in loader.stats),
+            "per_connection": [s.to_dict() for s in loader.stats]}
+
+
+def print_summary(result):
+    print(f"  {result['rows']:,} rows in {result['seconds']:.2f}s over {result['connections']} "
+          f"connection(s): {result['rows_per_sec']:,.0f} rows/s aggregate, {result['retries']} retries")
+    for s in result["per_connection"]:
+        print(f"    {s['connection']:<8} {s['shards']:>5} shards {s['rows']:>12,} rows "
+              f"{s['seconds']:>9.2f}s busy {s['rows_per_sec']:>10,.0f} rows/s")
+
+
+def print_scaling(results):
+    print(f"\n{'conns':>5} {'seconds':>9} {'rows/s':>12} {'speedup':>8} {'per conn':>10}")
+    base = results[0]["seconds"] if results else 0
+    for r in results:
+        speedup = base / r["seconds"] if r["seconds"] else 0
+        print(f"{r['connections']:>5} {r['seconds']:>9.2f} {r['rows_per_sec']:>12,.0f} {speedup:>7.2f}x "
+              f"{r['rows_per_sec'] / r['connections']:>10,.0f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("driver", help="driver script from generate_bulk_data.py, or its _manifest.json")
+    parser.add_argument("--user", default="root", help="MySQL user")
+    parser.add_argument("--password", help="MySQL password (prompted if omitted)")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--connections", type=int, default=DEFAULT_CONNECTIONS,
+                        help=f"concurrent loading connections (default: {DEFAULT_CONNECTIONS})")
+    parser.add_argument("--shard-rows", type=int, default=DEFAULT_SHARD_ROWS,
+                        help=f"rows per INSERT shard (default: {DEFAULT_SHARD_ROWS:,})")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help=f"retries per failed shard (default: {DEFAULT_RETRIES})")
+    parser.add_argument("--expected-rows", type=int, default=None,
+                        help="approximate total rows; scales the statement timeout (default: from the manifest)")
+    parser.add_argument("--scaling", type=int, nargs="*", metavar="N",
+                        help=f"reload once per connection count and compare "
+                             f"(default counts: {' '.join(map(str, SCALING_CONNECTIONS))})")
+    parser.add_argument("--quiet", action="store_true", help="no per-shard and per-statement lines")
+    parser.add_argument("--json", dest="json_out", help="write the load summary (or scaling runs) to this JSON file")
+    args = parser.parse_args(argv)
+    if args.scaling == []:
+        args.scaling = SCALING_CONNECTIONS
+    if min(args.scaling or [args.connections]) < 1:
+        parser.error("connection counts must be at least 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    driver, manifest_rows = resolve_driver(args.driver)
+    if not os.path.exists(driver):
+        print(f"ERROR: {driver} not found")
+        sys.exit(1)
+    if db_loader.load_driver()[0] is None:
+        print("ERROR: no MySQL driver installed (pip install pymysql)")
+        sys.exit(1)
+    password = args.password if args.password is not None else getpass.getpass("Password: ")
+    timeout = db_loader.scaled_timeout(args.expected_rows or manifest_rows or 0)
+    on_statement = None if args.quiet else db_loader.print_statement
+
+    results = []
+    for connections in args.scaling or [args.connections]:
+        print(f"Loading {driver} over {connections} connection(s)...")
+        pool = db_loader.ConnectionPool(args.user, password, args.host, args.port, size=connections + 1,
+                                        timeout=timeout, local_infile=True)
+        try:
+            result = load(pool, driver, connections, args.shard_rows, args.retries,
+                          verbose=not args.quiet, on_statement=on_statement)
+        except Exception as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+        finally:
+            pool.close()
+        print_summary(result)
+        results.append(result)
+    if args.scaling:
+        print_scaling(results)
+
+    if args.json_out:
+        directory = os.path.dirname(args.json_out)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump({"driver": driver, "shard_rows": args.shard_rows,
+                       "runs": results}, f, indent=2)
+        print(f"\nResults written to {args.json_out}")
+
+
+if __name__ == "__main__":
+    main()
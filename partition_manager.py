@@ -0,0 +1,305 @@
+"""
+Healthcare System - Partition Manager for denormalized_patient_encounters
+Maintains the RANGE COLUMNS(encounter_date) layout defined by
+healthcare_ddl_partitioned.sql: monthly (p202401) or quarterly (p2024q1)
+partitions plus a p_future MAXVALUE catch-all.
+
+Commands:
+    ddl      print the partitioned CREATE TABLE (derived from healthcare_ddl.sql)
+    list     show partitions with their bounds and estimated rows
+    ensure   split p_future so partitions exist N months ahead
+    rotate   archive (EXCHANGE into a standalone table) or drop old partitions
+
+Usage:
+    python partition_manager.py ddl --start 2023-01 --end 2025-12 > healthcare_ddl_partitioned.sql
+    python partition_manager.py list --user root
+    python partition_manager.py ensure --user root --months-ahead 3
+    python partition_manager.py rotate --user root --keep-months 24 --action archive
+    python partition_manager.py rotate --keep-months 24 --action drop --dry-run
+"""
+
+import argparse
+import getpass
+import os
+import re
+import sys
+from datetime import date
+
+import db_loader
+
+TABLE = "denormalized_patient_encounters"
+DDL_SCRIPT = "healthcare_ddl.sql"
+FUTURE_PARTITION = "p_future"
+DEFAULT_MONTHS_AHEAD = 3
+GRANULARITIES = {"month": 1, "quarter": 3}
+
+
+# ============================================================================
+# PARTITION BOUNDS
+# ============================================================================
+
+def period_start(day, granularity="month"):
+    """First day of the month or quarter containing day."""
+    months = GRANULARITIES[granularity]
+    return date(day.year, (day.month - 1) // months * months + 1, 1)
+
+
+def add_months(day, months):
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(start, granularity="month"):
+    """p202401 for months, p2024q1 for quarters."""
+    if granularity == "quarter":
+        return f"p{start.year}q{(start.month - 1) // 3 + 1}"
+    return f"p{start.year}{start.month:02d}"
+
+
+def partition_ranges(start, end, granularity="month"):
+    """(name, period start, exclusive upper bound) from start through end's period."""
+    step = GRANULARITIES[granularity]
+    current = period_start(start, granularity)
+    while current <= end:
+        upper = add_months(current, step)
+        yield partition_name(current, granularity), current, upper
+        current = upper
+
+
+def partition_clause(name, upper):
+    return f"PARTITION {name} VALUES LESS THAN ('{upper.isoformat()}')"
+
+
+def future_clause():
+    return f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN (MAXVALUE)"
+
+
+def months_ahead(months, today=None):
+    return add_months(today or date.today(), months)
+
+
+def parse_month(text):
+    """'2024-01' or '2024-01-15' -> date(2024, 1, 1)"""
+    year, month = text.split("-")[:2]
+    return date(int(year), int(month), 1)
+
+
+# ============================================================================
+# DDL
+# ============================================================================
+
+def heap_table_ddl(script=DDL_SCRIPT):
+    """The CREATE TABLE denormalized_patient_encounters statement from healthcare_ddl.sql."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), script)
+    with open(path, "r", encoding="utf-8") as f:
+        for statement in db_loader.iter_sql_statements(f):
+            if statement.startswith(f"CREATE TABLE {TABLE} "):
+                return statement
+    raise ValueError(f"CREATE TABLE {TABLE} not found in {script}")
+
+
+def partitioned_table_ddl(start, end, granularity="month", table=TABLE):
+    """Partitioned variant of the heap DDL covering start..end plus p_future.
+
+    MySQL requires the partitioning column in every unique key and does not
+    allow foreign keys on partitioned tables, so the primary key becomes
+    (encounter_id, encounter_date) and the FOREIGN KEY clauses are dropped;
+    the columns and secondary indexes are unchanged.
+    """
+    lines = []
+    for line in heap_table_ddl().splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("FOREIGN KEY"):
+            continue
+        if stripped.startswith("encounter_id INT PRIMARY KEY AUTO_INCREMENT"):
+            line = line.replace("PRIMARY KEY AUTO_INCREMENT", "NOT NULL AUTO_INCREMENT")
+        elif stripped.startswith("INDEX") and not any(l.strip().startswith("PRIMARY KEY") for l in lines):
+            lines.append("    PRIMARY KEY (encounter_id, encounter_date),")
+        lines.append(line)
+
+    body = "\n".join(lines).replace(f"CREATE TABLE {TABLE} ", f"CREATE TABLE {table} ", 1)
+    partitions = [partition_clause(name, upper) for name, _, upper in partition_ranges(start, end, granularity)]
+    partitions.append(future_clause())
+    return (f"{body}\nPARTITION BY RANGE COLUMNS(encounter_date) (\n    "
+            + ",\n    ".join(partitions) + "\n)")
+
+
+def write_ddl_script(f, start, end, granularity="month"):
+    f.write("-- ============================================================================\n")
+    f.write("-- Healthcare Patient Records - PARTITIONED denormalized_patient_encounters\n")
+    f.write("-- Generated by: python partition_manager.py ddl "
+            f"--start {start:%Y-%m} --end {end:%Y-%m} --granularity {granularity}\n")
+    f.write("-- ============================================================================\n")
+    f.write("-- Run after healthcare_ddl.sql to replace the heap table with a layout\n")
+    f.write("-- partitioned by encounter_date. Differences from the heap DDL:\n")
+    f.write("--   * PRIMARY KEY (encounter_id, encounter_date): every unique key must\n")
+    f.write("--     contain the partitioning column\n")
+    f.write("--   * no FOREIGN KEY clauses: InnoDB does not support them on partitioned\n")
+    f.write("--     tables (the load path already joins on the dimension keys)\n")
+    f.write("-- Future partitions: python partition_manager.py ensure --months-ahead 3\n")
+    f.write("-- ============================================================================\n\n")
+    f.write("USE healthcare_system;\n\n")
+    f.write(f"DROP TABLE IF EXISTS {TABLE};\n\n")
+    f.write(partitioned_table_ddl(start, end, granularity) + ";\n")
+
+
+# ============================================================================
+# LIVE TABLE MAINTENANCE
+# ============================================================================
+
+PARTITIONS_SQL = """SELECT partition_name, partition_description, table_rows
+FROM information_schema.partitions
+WHERE table_schema = DATABASE() AND table_name = %s AND partition_name IS NOT NULL
+ORDER BY partition_ordinal_position"""
+
+
+def list_partitions(cursor, table=TABLE):
+    """[(name, upper bound date or None for MAXVALUE, estimated rows)]"""
+    cursor.execute(PARTITIONS_SQL, (table,))
+    partitions = []
+    for name, description, rows in cursor.fetchall():
+        m = re.search(r"\d{4}-\d{2}-\d{2}", description or "")
+        upper = date.fromisoformat(m.group()) if m else None
+        partitions.append((name, upper, rows))
+    return partitions
+
+
+def detect_granularity(partitions):
+    return "quarter" if any(re.fullmatch(r"p\d{4}q\d", name) for name, _, _ in partitions) else "month"
+
+
+def ensure_statements(partitions, through, table=TABLE):
+    """REORGANIZE of p_future adding every period up to and including through."""
+    bounded = [upper for _, upper, _ in partitions if upper]
+    if not bounded or partitions[-1][0] != FUTURE_PARTITION:
+        raise ValueError(f"{table} has no {FUTURE_PARTITION} partition to split")
+    granularity = detect_granularity(partitions)
+    new = list(partition_ranges(max(bounded), through, granularity))
+    if not new:
+        return []
+    clauses = [partition_clause(name, upper) for name, _, upper in new] + [future_clause()]
+    return [f"ALTER TABLE {table} REORGANIZE PARTITION {FUTURE_PARTITION} INTO (\n    "
+            + ",\n    ".join(clauses) + "\n)"]
+
+
+def rotate_statements(partitions, cutoff, action, table=TABLE):
+    """Statements that archive or drop partitions entirely before cutoff.
+
+    Archiving swaps the partition with an empty standalone table
+    (<table>_<partition>) via EXCHANGE PARTITION, a metadata-only
+    operation, then drops the now-empty partition.
+    """
+    statements = []
+    old = [name for name, upper, _ in partitions if upper and upper <= cutoff]
+    # Keep at least one bounded partition so the layout stays valid
+    if len(old) == len([p for p in partitions if p[1]]):
+        old = old[:-1]
+    for name in old:
+        if action == "archive":
+            archive = f"{table}_{name}"
+            statements += [
+                f"CREATE TABLE {archive} LIKE {table}",
+                f"ALTER TABLE {archive} REMOVE PARTITIONING",
+                f"ALTER TABLE {table} EXCHANGE PARTITION {name} WITH TABLE {archive}",
+            ]
+        statements.append(f"ALTER TABLE {table} DROP PARTITION {name}")
+    return statements
+
+
+def is_partitioned(cursor, table=TABLE):
+    return bool(list_partitions(cursor, table))
+
+
+def ensure_partitions(cursor, through, table=TABLE, dry_run=False, progress=print):
+    """Create partitions up to through on a partitioned table; returns statements run."""
+    statements = ensure_statements(list_partitions(cursor, table), through, table)
+    for sql in statements:
+        progress(sql + ";")
+        if not dry_run:
+            cursor.execute(sql)
+    return statements
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ddl = sub.add_parser("ddl", help="print the partitioned CREATE TABLE")
+    ddl.add_argument("--start", type=parse_month, default=date(2023, 1, 1), help="first period (YYYY-MM)")
+    ddl.add_argument("--end", type=parse_month, default=months_ahead(DEFAULT_MONTHS_AHEAD),
+                     help="last period (YYYY-MM)")
+    ddl.add_argument("--granularity", choices=list(GRANULARITIES), default="month")
+
+    for name, text in (("list", "show partitions"), ("ensure", "create future partitions"),
+                       ("rotate", "archive or drop old partitions")):
+        cmd = sub.add_parser(name, help=text)
+        cmd.add_argument("--user", default="root", help="MySQL user")
+        cmd.add_argument("--password", help="MySQL password (prompted if omitted)")
+        cmd.add_argument("--host", default="localhost")
+        cmd.add_argument("--port", type=int, default=3306)
+        cmd.add_argument("--database", default="healthcare_system")
+        cmd.add_argument("--table", default=TABLE)
+        if name == "ensure":
+            cmd.add_argument("--months-ahead", type=int, default=DEFAULT_MONTHS_AHEAD,
+                             help="create partitions through this many months from today")
+        if name == "rotate":
+            cmd.add_argument("--keep-months", type=int, required=True,
+                             help="keep partitions covering this many most recent months")
+            cmd.add_argument("--action", choices=["archive", "drop"], default="archive")
+        if name != "list":
+            cmd.add_argument("--dry-run", action="store_true", help="print statements without running them")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "ddl":
+        write_ddl_script(sys.stdout, args.start, args.end, args.granularity)
+        return
+
+    if db_loader.load_driver()[0] is None:
+        print("ERROR: No MySQL driver installed (pip install pymysql)")
+        sys.exit(1)
+    password = args.password if args.password is not None else getpass.getpass("  Password: ")
+    pool = db_loader.ConnectionPool(args.user, password, args.host, args.port, args.database, size=1)
+    try:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            partitions = list_partitions(cursor, args.table)
+            if not partitions:
+                print(f"ERROR: {args.database}.{args.table} is not partitioned "
+                      f"(load healthcare_ddl_partitioned.sql first)")
+                sys.exit(1)
+
+            if args.command == "list":
+                print(f"{'partition':<12} {'less than':>12} {'rows (est.)':>14}")
+                for name, upper, rows in partitions:
+                    print(f"{name:<12} {upper.isoformat() if upper else 'MAXVALUE':>12} {rows:>14}")
+                return
+
+            if args.command == "ensure":
+                statements = ensure_partitions(cursor, months_ahead(args.months_ahead), args.table,
+                                               args.dry_run)
+            else:
+                granularity = detect_granularity(partitions)
+                cutoff = add_months(period_start(date.today(), granularity), -args.keep_months)
+                statements = rotate_statements(partitions, cutoff, args.action, args.table)
+                for sql in statements:
+                    print(sql + ";")
+                    if not args.dry_run:
+                        cursor.execute(sql)
+            if not statements:
+                print("Nothing to do.")
+    except Exception as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,441 @@
+"""
+Healthcare System - Patient Timeline Query Layer
+Paginated encounter timelines of one patient (or one doctor) read from
+denormalized_patient_encounters, behind a read-through LRU/TTL cache.
+
+Pagination is by keyset on (encounter_date, encounter_id), never OFFSET:
+a page asks for the rows after the last (date, id) the client saw, so
+page 500 costs the same index range read as page 1, and rows inserted
+while a client pages cannot shift or repeat rows. The cursor handed to
+clients is the opaque string 'YYYY-MM-DD:encounter_id'.
+
+Each page is a deferred join: an inner query walks the
+(fk_patient_id, encounter_date) index for the page's encounter_ids only
+(InnoDB and SQLite append the primary key to every secondary index entry,
+so the index covers the keyset and returns it in order), and the outer
+query fetches the wide rows for those ids. ensure_indexes() adds the
+patient and doctor timeline indexes.
+
+Cache:
+  keys     (fk column, id, cursor, page size)
+  bounds   max_entries pages (least recently used evicted first) and
+           ttl seconds per entry
+  loads    concurrent misses on one key share a single database query
+  tags     every entry is tagged with each fk_*_id its rows carry, so a
+           change to a patient, doctor, department, diagnosis or
+           medication drops exactly the pages that show it
+
+Invalidation hooks: loaders and dimension updates call
+fire_invalidation() after they commit (incremental_refresh.refresh(),
+cdc_sync.sync_batch(), parallel_loader.load() and the generator's direct
+loads). Register a cache with add_invalidation_hook(cache.invalidate) in
+the process that runs them; other processes need their own hook, e.g.
+one that publishes the references to the application's message bus.
+
+Usage:
+    python patient_timeline.py --user root --ensure-indexes
+    python patient_timeline.py --user root --patient 17 --limit 20
+    python patient_timeline.py --user root --patient 17 --after 2024-03-01:81234
+    python patient_timeline.py --backend sqlite --db-file healthcare.sqlite --doctor 3
+    python patient_timeline.py --print-sql
+"""
+
+import argparse
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import backends
+from benchmark_queries import connect
+
+TARGET_TABLE = "denormalized_patient_encounters"
+FK_COLUMNS = ("fk_patient_id", "fk_doctor_id", "fk_department_id", "fk_diagnosis_id", "fk_medication_id")
+
+# Key columns after the owner; the primary key completes the keyset
+TIMELINE_INDEXES = [
+    ("idx_patient_timeline", "fk_patient_id", "encounter_date"),
+    ("idx_doctor_timeline", "fk_doctor_id", "encounter_date"),
+]
+
+TIMELINE_COLUMNS = FK_COLUMNS + (
+    "encounter_id", "encounter_date", "encounter_time", "encounter_type",
+    "encounter_duration_minutes", "chief_complaint",
+    "patient_first_name", "patient_last_name",
+    "doctor_first_name", "doctor_last_name", "doctor_specialization",
+    "department_name", "diagnosis_icd_code", "diagnosis_name", "diagnosis_severity",
+    "medication_name", "medication_dosage_strength",
+    "follow_up_date", "billingBillable_amount", "billing_status",
+)
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 200
+DEFAULT_CACHE_SIZE = 10_000   # cached pages
+DEFAULT_TTL = 60.0            # seconds
+
+_CURSOR = re.compile(r"^(\d{4}-\d{2}-\d{2}):(\d+)$")
+
+
+# ============================================================================
+# KEYSET QUERIES
+# ============================================================================
+
+def page_sql(owner_column, after=False, limit=DEFAULT_PAGE_SIZE):
+    """Deferred-join page query; parameters (owner id) or (owner id, date, date, id).
+
+    The inner query fetches limit + 1 ids so a following page is detected
+    without a COUNT. The keyset predicate is written as a plain range on
+    encounter_date, which every engine seeks on, narrowed by an OR for the
+    cursor's own date; a row constructor (date, id) > (%s, %s) is not
+    range-optimized by every MySQL version.
+    """
+    keyset = ("\n      AND encounter_date >= %s AND (encounter_date > %s OR encounter_id > %s)"
+              if after else "")
+    columns = ",\n    ".join(f"t.{c}" for c in TIMELINE_COLUMNS)
+    return (f"SELECT\n    {columns}\n"
+            f"FROM {TARGET_TABLE} t\n"
+            f"    JOIN (SELECT encounter_id FROM {TARGET_TABLE}\n"
+            f"    WHERE {owner_column} = %s{keyset}\n"
+            f"    ORDER BY encounter_date, encounter_id\n"
+            f"    LIMIT {int(limit) + 1}) page ON t.encounter_id = page.encounter_id\n"
+            f"ORDER BY t.encounter_date, t.encounter_id")
+
+
+def encode_cursor(encounter_date, encounter_id):
+    """'YYYY-MM-DD:encounter_id' for the last row of a page."""
+    return f"{str(encounter_date)[:10]}:{int(encounter_id)}"
+
+
+def decode_cursor(cursor):
+    """(date string, encounter_id) from a cursor made by encode_cursor()."""
+    m = _CURSOR.match(cursor or "")
+    if m is None:
+        raise ValueError(f"invalid timeline cursor {cursor!r}")
+    return m.group(1), int(m.group(2))
+
+
+Page = namedtuple("Page", ["rows", "next_cursor"])
+Page.__doc__ = """One timeline page: rows (tuple of column dicts, shared with the cache;
+treat as read-only) and the cursor of the next page (None on the last)."""
+
+
+def fetch_page(query, owner_column, owner_id, after=None, limit=DEFAULT_PAGE_SIZE):
+    """Read one page; query(sql, params) returns the rows of a statement."""
+    if after is None:
+        rows = query(page_sql(owner_column, False, limit), (owner_id,))
+    else:
+        day, encounter_id = decode_cursor(after)
+        rows = query(page_sql(owner_column, True, limit), (owner_id, day, day, encounter_id))
+    rows = [dict(zip(TIMELINE_COLUMNS, row)) for row in rows]
+    more = len(rows) > limit
+    rows = tuple(rows[:limit])
+    next_cursor = encode_cursor(rows[-1]["encounter_date"], rows[-1]["encounter_id"]) if more else None
+    return Page(rows, next_cursor)
+
+
+def page_tags(owner_column, owner_id, page):
+    """(fk column, id) tags of a cached page: its owner and every key its rows show."""
+    tags = {(owner_column, owner_id)}
+    for row in page.rows:
+        tags.update((c, row[c]) for c in FK_COLUMNS if row[c] is not None)
+    return tags
+
+
+def ensure_indexes(backend):
+    """Create the timeline indexes that are missing; returns their names.
+
+    DuckDB is skipped: it creates no secondary indexes (see backends.py).
+    """
+    if backend.dialect == "duckdb":
+        return []
+    created = []
+    for name, *columns in TIMELINE_INDEXES:
+        if backend.dialect == "mysql":
+            sql = ("SELECT COUNT(*) FROM information_schema.statistics WHERE table_schema = DATABASE() "
+                   "AND table_name = %s AND index_name = %s")
+            params = (TARGET_TABLE, name)
+        else:
+            sql, params = "SELECT COUNT(*) FROM sqlite_master WHERE type = 'index' AND name = %s", (name,)
+        if backend.query(sql, params)[0][0]:
+            continue
+        sql = f"CREATE INDEX {name} ON {TARGET_TABLE} ({', '.join(columns)})"
+        print(f"  Creating {name} ({', '.join(columns)})...")
+        cursor = backend.execute(sql)
+        if cursor is not None:
+            cursor.close()
+        created.append(name)
+    return created
+
+
+# ============================================================================
+# READ-THROUGH CACHE
+# ============================================================================
+
+class _Load:
+    """A database load in progress that concurrent misses on the same key wait for."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = self.error = None
+
+    def result(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class TimelineCache:
+    """Thread-safe LRU cache with a TTL, single-flight loads and tag invalidation.
+
+    A load that overlaps an invalidation is returned to its callers but not
+    stored, so an entry never outlives a change committed after its query
+    started.
+    """
+
+    def __init__(self, max_entries=DEFAULT_CACHE_SIZE, ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires, value, tags)
+        self._tags = {}                # tag -> keys
+        self._loads = {}               # key -> _Load
+        self._version = 0              # bumped by every invalidation
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.coalesced = 0
+        self.evictions = self.expirations = self.invalidated = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, load, tags=None):
+        """Cached value of key, else load() (tags(value): its invalidation tags)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] is None or entry[0] > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self._remove(key)
+                self.expirations += 1
+            pending = self._loads.get(key)
+            if pending is None:
+                pending = self._loads[key] = _Load()
+                version = self._version
+                self.misses += 1
+            else:
+                self.coalesced += 1
+                version = None
+        if version is None:
+            return pending.result()
+
+        try:
+            value = load()
+        except BaseException as e:
+            with self._lock:
+                del self._loads[key]
+            pending.error = e
+            pending.done.set()
+            raise
+        entry_tags = set(tags(value)) if tags else set()
+        with self._lock:
+            del self._loads[key]
+            if version == self._version:
+                self._store(key, value, entry_tags)
+        pending.value = value
+        pending.done.set()
+        return value
+
+    def _store(self, key, value, tags):
+        expires = self.clock() + self.ttl if self.ttl else None
+        self._entries[key] = (expires, value, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate(self, references=None):
+        """Drop entries showing any of references ({fk column: ids}); None drops all.
+
+        Returns the number of entries dropped. The signature matches the
+        invalidation hooks, so add_invalidation_hook(cache.invalidate) works.
+        """
+        with self._lock:
+            self._version += 1
+            if references is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+                self._tags.clear()
+            else:
+                keys = set()
+                for column, ids in references.items():
+                    for row_id in ids:
+                        keys.update(self._tags.get((column, row_id), ()))
+                for key in keys:
+                    self._remove(key)
+                dropped = len(keys)
+            self.invalidated += dropped
+            return dropped
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "coalesced": self.coalesced, "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions, "expirations": self.expirations,
+                "invalidated": self.invalidated}
+
+
+# ============================================================================
+# SERVICE
+# ============================================================================
+
+class TimelineService:
+    """Patient and doctor timelines over query(sql, params), through an optional cache."""
+
+    def __init__(self, query, cache=None, page_size=DEFAULT_PAGE_SIZE):
+        self.query = query
+        self.cache = cache
+        self.page_size = page_size
+
+    def patient_timeline(self, patient_id, after=None, limit=None):
+        """Encounters of one patient, oldest first, after the given cursor."""
+        return self._timeline("fk_patient_id", patient_id, after, limit)
+
+    def doctor_timeline(self, doctor_id, after=None, limit=None):
+        """Encounters seen by one doctor, oldest first, after the given cursor."""
+        return self._timeline("fk_doctor_id", doctor_id, after, limit)
+
+    def _timeline(self, owner_column, owner_id, after, limit):
+        limit = max(1, min(limit or self.page_size, MAX_PAGE_SIZE))
+        if after is not None:
+            decode_cursor(after)  # reject bad cursors before they reach the cache
+
+        def load():
+            return fetch_page(self.query, owner_column, owner_id, after, limit)
+
+        if self.cache is None:
+            return load()
+        return self.cache.get((owner_column, owner_id, after, limit), load,
+                              lambda page: page_tags(owner_column, owner_id, page))
+
+
+# ============================================================================
+# INVALIDATION HOOKS
+# ============================================================================
+
+_hooks = []
+_hooks_lock = threading.Lock()
+
+
+def add_invalidation_hook(hook):
+    """Call hook(references) whenever committed changes reach the denormalized table."""
+    with _hooks_lock:
+        _hooks.append(hook)
+
+
+def remove_invalidation_hook(hook):
+    with _hooks_lock:
+        if hook in _hooks:
+            _hooks.remove(hook)
+
+
+def has_invalidation_hooks():
+    return bool(_hooks)
+
+
+def fire_invalidation(references=None):
+    """Notify every hook; references maps fk column -> changed ids, None means everything.
+
+    Called after COMMIT, so a reader that misses right after the hook
+    returns sees the new rows.
+    """
+    if references is not None:
+        references = {column: set(ids) for column, ids in references.items() if ids}
+        if not references:
+            return
+    with _hooks_lock:
+        hooks = list(_hooks)
+    for hook in hooks:
+        hook(references)
+
+
+# ============================================================================
+# COMMAND LINE
+# ============================================================================
+
+def print_page(page):
+    for row in page.rows:
+        print(f"  {row['encounter_date']}  #{row['encounter_id']:<9} {row['encounter_type'] or '':<14} "
+              f"{row['doctor_last_name'] or '':<14} {row['department_name'] or '':<20} "
+              f"{row['diagnosis_name'] or ''}")
+    print(f"  {len(page.rows)} encounters; next cursor: {page.next_cursor or '(last page)'}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=backends.BACKENDS, default="mysql")
+    parser.add_argument("--db-file", help="database file for the sqlite/duckdb backends")
+    parser.add_argument("--user", default="root", help="MySQL user")
+    parser.add_argument("--password", help="MySQL password (prompted if omitted)")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--database", default=backends.DEFAULT_DATABASE)
+    owner = parser.add_mutually_exclusive_group()
+    owner.add_argument("--patient", type=int, help="show this patient's timeline")
+    owner.add_argument("--doctor", type=int, help="show this doctor's timeline")
+    parser.add_argument("--after", help="cursor printed with the previous page")
+    parser.add_argument("--limit", type=int, default=DEFAULT_PAGE_SIZE,
+                        help=f"encounters per page (default: {DEFAULT_PAGE_SIZE}, max {MAX_PAGE_SIZE})")
+    parser.add_argument("--ensure-indexes", action="store_true",
+                        help="create the (fk_patient_id, encounter_date) and (fk_doctor_id, "
+                             "encounter_date) indexes if missing")
+    parser.add_argument("--print-sql", action="store_true", help="show the statements without connecting")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.print_sql:
+        for name, *columns in TIMELINE_INDEXES:
+            print(f"CREATE INDEX {name} ON {TARGET_TABLE} ({', '.join(columns)});\n")
+        print(page_sql("fk_patient_id", False, args.limit) + ";\n")
+        print(page_sql("fk_patient_id", True, args.limit) + ";")
+        return
+    if not (args.ensure_indexes or args.patient or args.doctor):
+        print("ERROR: nothing to do (use --patient, --doctor, --ensure-indexes or --print-sql)")
+        sys.exit(1)
+
+    try:
+        with connect(args) as backend:
+            if args.ensure_indexes:
+                created = ensure_indexes(backend)
+                print(f"Timeline indexes: {', '.join(created) if created else 'already present'}")
+            if args.patient or args.doctor:
+                service = TimelineService(backend.query)
+                if args.patient:
+                    print(f"Patient {args.patient} timeline:")
+                    page = service.patient_timeline(args.patient, args.after, args.limit)
+                else:
+                    print(f"Doctor {args.doctor} timeline:")
+                    page = service.doctor_timeline(args.doctor, args.after, args.limit)
+                print_page(page)
+    except Exception as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""
+Healthcare System - Rollup Summary Tables
+Maintains pre-aggregated day x department x doctor summaries of
+denormalized_patient_encounters so dashboard queries
+(healthcare_analysis_rollup_queries.sql) never scan the raw table.
+
+  rollup_daily_encounters    additive measures: encounter counts, duration
+                             and billing sums, paid/pending/follow-up counts
+  rollup_daily_patient_hll   HyperLogLog registers of fk_patient_id, one row
+                             per (day, department, doctor, bucket)
+
+Distinct patients are estimated from the HLL registers (2^10 buckets,
+about 3% standard error). Registers merge with MAX(rho), so any
+combination of days, departments and doctors can be estimated in plain
+SQL without going back to the raw rows.
+
+Refresh is incremental: encounters above the stored encounter_id
+watermark are added to the existing cells, and days containing rows
+changed since the last refresh are recomputed from scratch. Rows whose
+encounter_date or deletion removed them from a day are only reflected
+by --full. incremental_refresh.py refreshes the rollups automatically
+once the tables exist.
+
+Usage:
+    python rollups.py --user root --password secret --full    # create and build
+    python rollups.py --user root                             # incremental refresh
+    python rollups.py --user root --check                     # HLL vs exact counts
+    python rollups.py --print-sql
+"""
+
+import argparse
+import getpass
+import sys
+import time
+
+import db_loader
+from db_loader import estimated_rows, fetch_one
+
+SOURCE_TABLE = "denormalized_patient_encounters"
+ROLLUP_TABLE = "rollup_daily_encounters"
+HLL_TABLE = "rollup_daily_patient_hll"
+DIRTY_DAYS_TABLE = "rollup_dirty_days"
+LOCK_NAME = "healthcare_system.refresh_rollups"
+CONTROL_TABLE = "refresh_control"
+
+HLL_PRECISION = 10
+HLL_BUCKETS = 1 << HLL_PRECISION
+HLL_ALPHA = 0.7213 / (1 + 1.079 / HLL_BUCKETS)
+
+ROLLUP_DDL = [
+    f"""CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+    encounter_date DATE NOT NULL,
+    fk_department_id INT NOT NULL,
+    fk_doctor_id INT NOT NULL,
+    encounter_count INT NOT NULL,
+    duration_sum BIGINT NOT NULL,
+    duration_count INT NOT NULL,
+    billed_sum DECIMAL(16, 2) NOT NULL,
+    billed_count INT NOT NULL,
+    paid_count INT NOT NULL,
+    pending_count INT NOT NULL,
+    follow_up_count INT NOT NULL,
+    PRIMARY KEY (encounter_date, fk_department_id, fk_doctor_id),
+    INDEX idx_department (fk_department_id),
+    INDEX idx_doctor (fk_doctor_id)
+)""",
+    f"""CREATE TABLE IF NOT EXISTS {HLL_TABLE} (
+    encounter_date DATE NOT NULL,
+    fk_department_id INT NOT NULL,
+    fk_doctor_id INT NOT NULL,
+    bucket SMALLINT NOT NULL,
+    rho TINYINT NOT NULL,
+    PRIMARY KEY (encounter_date, fk_department_id, fk_doctor_id, bucket),
+    INDEX idx_department_bucket (fk_department_id, bucket, rho),
+    INDEX idx_doctor_bucket (fk_doctor_id, bucket, rho)
+)""",
+]
+
+
+# ============================================================================
+# AGGREGATION STATEMENTS
+# ============================================================================
+# Each takes a WHERE clause over the source table (alias s).
+
+MEASURES_SQL = """COUNT(*),
+    COALESCE(SUM(s.encounter_duration_minutes), 0),
+    COUNT(s.encounter_duration_minutes),
+    COALESCE(SUM(s.billingBillable_amount), 0),
+    COUNT(s.billingBillable_amount),
+    COUNT(CASE WHEN s.billing_status = 'Paid' THEN 1 END),
+    COUNT(CASE WHEN s.billing_status = 'Pending' THEN 1 END),
+    COUNT(CASE WHEN s.follow_up_required = TRUE THEN 1 END)"""
+
+MEASURE_COLUMNS = ["encounter_count", "duration_sum", "duration_count", "billed_sum", "billed_count",
+                   "paid_count", "pending_count", "follow_up_count"]
+
+# 64 bits of MD5(fk_patient_id): the top HLL_PRECISION bits pick the bucket,
+# rho is the 1-based position of the first set bit in the remaining bits.
+HASH_SQL = "CAST(CONV(SUBSTRING(MD5(s.fk_patient_id), 1, 16), 16, 10) AS UNSIGNED)"
+REST_BITS = 64 - HLL_PRECISION
+
+
+def rollup_insert_sql(where):
+    """Aggregate source rows into the rollup, adding to existing cells."""
+    updates = ",\n    ".join(f"{c} = {c} + VALUES({c})" for c in MEASURE_COLUMNS)
+    return (f"INSERT INTO {ROLLUP_TABLE} (encounter_date, fk_department_id, fk_doctor_id,\n"
+            f"    {', '.join(MEASURE_COLUMNS)})\n"
+            f"SELECT s.encounter_date, s.fk_department_id, s.fk_doctor_id,\n    {MEASURES_SQL}\n"
+            f"FROM {SOURCE_TABLE} s\n"
+            f"WHERE {where}\n"
+            f"GROUP BY s.encounter_date, s.fk_department_id, s.fk_doctor_id\n"
+            f"ON DUPLICATE KEY UPDATE\n    {updates}")
+
+
+def hll_insert_sql(where):
+    """Fold source rows into the HLL registers (rho only ever grows)."""
+    mask = (1 << REST_BITS) - 1
+    return (f"INSERT INTO {HLL_TABLE} (encounter_date, fk_department_id, fk_doctor_id, bucket, rho)\n"
+            f"SELECT encounter_date, fk_department_id, fk_doctor_id, bucket,\n"
+            f"    MAX(IF(rest = 0, {REST_BITS + 1}, {REST_BITS + 1} - LENGTH(BIN(rest))))\n"
+            f"FROM (\n"
+            f"    SELECT s.encounter_date, s.fk_department_id, s.fk_doctor_id,\n"
+            f"        {HASH_SQL} >> {REST_BITS} AS bucket,\n"
+            f"        {HASH_SQL} & {mask} AS rest\n"
+            f"    FROM {SOURCE_TABLE} s\n"
+            f"    WHERE {where}\n"
+            f") hashed\n"
+            f"GROUP BY encounter_date, fk_department_id, fk_doctor_id, bucket\n"
+            f"ON DUPLICATE KEY UPDATE rho = GREATEST(rho, VALUES(rho))")
+
+
+NEW_ROWS_WHERE = (f"s.encounter_id > %s AND s.encounter_id <= %s\n"
+                  f"  AND s.encounter_date NOT IN (SELECT encounter_date FROM {DIRTY_DAYS_TABLE})")
+DIRTY_DAYS_WHERE = (f"s.encounter_date IN (SELECT encounter_date FROM {DIRTY_DAYS_TABLE})\n"
+                    f"  AND s.encounter_id <= %s")
+
+DIRTY_DAYS_SQL = [
+    f"CREATE TEMPORARY TABLE IF NOT EXISTS {DIRTY_DAYS_TABLE} (encounter_date DATE PRIMARY KEY)",
+    f"DELETE FROM {DIRTY_DAYS_TABLE}",
+]
+FIND_DIRTY_DAYS_SQL = (f"INSERT INTO {DIRTY_DAYS_TABLE}\n"
+                       f"SELECT DISTINCT encounter_date FROM {SOURCE_TABLE}\n"
+                       f"WHERE updated_at >= %s AND encounter_id <= %s")
+
+
+def hll_estimate_sql(group_columns, where=None):
+    """SELECT group_columns..., unique_patients from the merged HLL registers.
+
+    where, if given, filters the register rows (e.g. a date range).
+
+    Raw HLL estimate with the small-range (linear counting) correction;
+    buckets never written count as registers holding 0.
+    """
+    group = ", ".join(group_columns)
+    m = HLL_BUCKETS
+    return (f"SELECT {group},\n"
+            f"    ROUND(CASE WHEN raw <= {2.5 * m} AND zeros > 0 THEN {m} * LN({m} / zeros) ELSE raw END)"
+            f" AS unique_patients\n"
+            f"FROM (\n"
+            f"    SELECT {group},\n"
+            f"        {HLL_ALPHA:.6f} * {m * m} / (SUM(POW(2, -rho)) + {m} - COUNT(*)) AS raw,\n"
+            f"        {m} - COUNT(*) AS zeros\n"
+            f"    FROM (\n"
+            f"        SELECT {group}, bucket, MAX(rho) AS rho\n"
+            f"        FROM {HLL_TABLE}\n"
+            + (f"        WHERE {where}\n" if where else "")
+            + f"        GROUP BY {group}, bucket\n"
+            f"    ) registers\n"
+            f"    GROUP BY {group}\n"
+            f") sketch")
+
+
+# ============================================================================
+# REFRESH BOOKKEEPING
+# ============================================================================
+# Shared with incremental_refresh.py, which imports this module: one
+# refresh_control row per target table, and per-step timings.
+
+CONTROL_DDL = f"""CREATE TABLE IF NOT EXISTS {CONTROL_TABLE} (
+    target_table VARCHAR(64) PRIMARY KEY,
+    last_encounter_id INT NOT NULL DEFAULT 0,
+    last_refresh_started TIMESTAMP NULL,
+    last_refresh_finished TIMESTAMP NULL,
+    last_rows_touched BIGINT,
+    last_elapsed_seconds DECIMAL(10, 3)
+)"""
+
+
+class RefreshStep:
+    """Rows touched and elapsed time for one refresh statement."""
+
+    def __init__(self, name, rows, seconds):
+        self.name = name
+        self.rows = rows
+        self.seconds = seconds
+
+    def __str__(self):
+        return f"  {self.name:<28} {self.rows:>12} rows {self.seconds:>10.2f}s"
+
+
+def run_step(cursor, steps, name, sql, params=None):
+    start = time.perf_counter()
+    cursor.execute(sql, params)
+    step = RefreshStep(name, max(cursor.rowcount, 0), time.perf_counter() - start)
+    steps.append(step)
+    print(step)
+    return step
+
+
+def ensure_change_tracking(cursor, table):
+    """Add an indexed updated_at column to table if it is missing."""
+    has_column = fetch_one(cursor, (
+        "SELECT COUNT(*) FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() AND table_name = %s AND column_name = 'updated_at'"
+    ), (table,))[0]
+    if not has_column:
+        print(f"  Adding updated_at tracking to {table}")
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN updated_at TIMESTAMP "
+                       f"DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP")
+    has_index = fetch_one(cursor, (
+        "SELECT COUNT(*) FROM information_schema.statistics "
+        "WHERE table_schema = DATABASE() AND table_name = %s "
+        "AND column_name = 'updated_at' AND seq_in_index = 1"
+    ), (table,))[0]
+    if not has_index:
+        cursor.execute(f"ALTER TABLE {table} ADD INDEX idx_updated_at (updated_at)")
+
+
+# ============================================================================
+# REFRESH
+# ============================================================================
+
+def rollups_exist(cursor):
+    return bool(fetch_one(cursor, "SELECT COUNT(*) FROM information_schema.tables "
+                                  "WHERE table_schema = DATABASE() AND table_name = %s", (ROLLUP_TABLE,))[0])
+
+
+def refresh(conn, full=False):
+    """Bring the rollups up to date in one transaction; returns the RefreshStep list.
+
+    Without a watermark (first run, or after the generator reset
+    refresh_control) the rollups are rebuilt from scratch.
+    """
+    steps = []
+    start = time.perf_counter()
+    cursor = conn.cursor()
+    try:
+        if not fetch_one(cursor, "SELECT GET_LOCK(%s, 0)", (LOCK_NAME,))[0]:
+            raise RuntimeError("another rollup refresh is already running")
+        try:
+            cursor.execute(CONTROL_DDL)
+            for ddl in ROLLUP_DDL:
+                cursor.execute(ddl)
+            ensure_change_tracking(cursor, SOURCE_TABLE)
+            for sql in DIRTY_DAYS_SQL:
+                cursor.execute(sql)
+
+            cursor.execute("START TRANSACTION")
+            started = fetch_one(cursor, "SELECT NOW()")[0]
+            high = fetch_one(cursor, f"SELECT COALESCE(MAX(encounter_id), 0) FROM {SOURCE_TABLE}")[0]
+            row = None if full else fetch_one(
+                cursor, f"SELECT last_encounter_id, last_refresh_started FROM {CONTROL_TABLE} "
+                        f"WHERE target_table = %s FOR UPDATE", (ROLLUP_TABLE,))
+
+            if row is None:
+                run_step(cursor, steps, "clear rollups", f"DELETE FROM {ROLLUP_TABLE}")
+                run_step(cursor, steps, "clear hll registers", f"DELETE FROM {HLL_TABLE}")
+                run_step(cursor, steps, "aggregate all rows", rollup_insert_sql("s.encounter_id <= %s"), (high,))
+                run_step(cursor, steps, "hll all rows", hll_insert_sql("s.encounter_id <= %s"), (high,))
+            else:
+                low, since = row
+                print(f"  Watermark: encounter_id > {low}, changes since {since}")
+                run_step(cursor, steps, "find changed days", FIND_DIRTY_DAYS_SQL, (since, low))
+                run_step(cursor, steps, "clear changed days",
+                         f"DELETE FROM {ROLLUP_TABLE} WHERE encounter_date IN "
+                         f"(SELECT encounter_date FROM {DIRTY_DAYS_TABLE})")
+                cursor.execute(f"DELETE FROM {HLL_TABLE} WHERE encounter_date IN "
+                               f"(SELECT encounter_date FROM {DIRTY_DAYS_TABLE})")
+                run_step(cursor, steps, "recompute changed days", rollup_insert_sql(DIRTY_DAYS_WHERE), (high,))
+                cursor.execute(hll_insert_sql(DIRTY_DAYS_WHERE), (high,))
+                run_step(cursor, steps, "add new encounters", rollup_insert_sql(NEW_ROWS_WHERE), (low, high))
+                run_step(cursor, steps, "hll new encounters", hll_insert_sql(NEW_ROWS_WHERE), (low, high))
+
+            cursor.execute(
+                f"REPLACE INTO {CONTROL_TABLE} (target_table, last_encounter_id, last_refresh_started, "
+                f"last_refresh_finished, last_rows_touched, last_elapsed_seconds) "
+                f"VALUES (%s, %s, %s, NOW(), %s, %s)",
+                (ROLLUP_TABLE, high, started, sum(s.rows for s in steps),
+                 round(time.perf_counter() - start, 3)),
+            )
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+            cursor.fetchall()
+    finally:
+        cursor.close()
+    return steps
+
+
+def check(conn):
+    """Compare HLL distinct-patient estimates with exact counts per department."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(hll_estimate_sql(["fk_department_id"]))
+        estimates = dict(cursor.fetchall())
+        cursor.execute(f"SELECT fk_department_id, COUNT(DISTINCT fk_patient_id) FROM {SOURCE_TABLE} "
+                       f"GROUP BY fk_department_id ORDER BY fk_department_id")
+        print(f"  {'department':>10} {'exact':>10} {'hll':>10} {'error':>8}")
+        for department, exact in cursor.fetchall():
+            estimate = int(estimates.get(department, 0))
+            print(f"  {department:>10} {exact:>10} {estimate:>10} {(estimate - exact) / exact:>8.2%}")
+    finally:
+        cursor.close()
+
+
+def print_sql():
+    statements = [CONTROL_DDL] + ROLLUP_DDL + DIRTY_DAYS_SQL + [
+        FIND_DIRTY_DAYS_SQL,
+        rollup_insert_sql(NEW_ROWS_WHERE), hll_insert_sql(NEW_ROWS_WHERE),
+        hll_estimate_sql(["fk_department_id"]),
+    ]
+    for sql in statements:
+        print(sql + ";\n")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--user", default="root", help="MySQL user")
+    parser.add_argument("--password", help="MySQL password (prompted if omitted)")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--database", default="healthcare_system")
+    parser.add_argument("--full", action="store_true", help="rebuild the rollups from scratch")
+    parser.add_argument("--check", action="store_true",
+                        help="compare HLL estimates with exact distinct counts (scans the source)")
+    parser.add_argument("--print-sql", action="store_true", help="print the statements and exit")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.print_sql:
+        print_sql()
+        return
+
+    if db_loader.load_driver()[0] is None:
+        print("ERROR: No MySQL driver installed (pip install pymysql)")
+        sys.exit(1)
+    password = args.password if args.password is not None else getpass.getpass("  Password: ")
+    pool = db_loader.ConnectionPool(args.user, password, args.host, args.port, args.database, size=1)
+    start = time.perf_counter()
+    try:
+        # Full rebuilds and --check scan the source; deltas only need the base timeout
+        if args.full or args.check:
+            pool.timeout = db_loader.scaled_timeout(estimated_rows(pool, SOURCE_TABLE))
+            pool.close()
+        with pool.connection() as conn:
+            if args.check:
+                check(conn)
+                return
+            print(f"Refreshing rollups in {args.database} ({'full' if args.full else 'incremental'})")
+            steps = refresh(conn, full=args.full)
+    except Exception as e:
+        print(f"  ERROR: {e}")
+        sys.exit(1)
+    finally:
+        pool.close()
+
+    print(f"  {'total':<28} {sum(s.rows for s in steps):>12} rows {time.perf_counter() - start:>10.2f}s")
+
+
+if __name__ == "__main__":
+    main()
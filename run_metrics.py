@@ -0,0 +1,502 @@
+"""
+Healthcare System - Run Metrics
+Stage-level instrumentation for generate_bulk_data.py and
+setup_normalized_db.py (--metrics-json / --metrics-prom), so a slow run
+shows where its time went and runs can be compared or alerted on.
+
+Per stage (e.g. 'generate encounters', 'normalize'):
+  wall_seconds      elapsed time
+  cpu_seconds       user + system CPU of this process, plus the CPU
+                    generator worker processes reported for the stage
+  peak_rss_bytes    peak resident set size during the stage (Linux resets
+                    the high-water mark per stage; elsewhere it is the
+                    process peak so far, see rss_scope)
+  rows, bytes       rows produced or loaded and bytes written or loaded,
+                    with the matching per-second rates
+  statements        SQL statements run in the stage, aggregated by text:
+                    calls, total and max seconds, rows
+
+A run is opened with run() by the entry point; library code records
+stages with stage() and wraps its hot loops in profiled(), both no-ops
+when no run is active. With a profiler ('cprofile', or 'sample' for the
+built-in stack sampler) the profiled() sections are profiled in this
+process: cProfile writes a .prof file for pstats/snakeviz, the sampler a
+collapsed-stack file for flamegraph.pl/speedscope, and the report lists
+the top functions either way. Worker processes are not profiled.
+
+Output:
+  JSON report        the run, its totals and every stage
+  Prometheus text    gauges for node_exporter's textfile collector,
+                     labelled by run and stage, written atomically
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PROFILERS = ("cprofile", "sample")
+DEFAULT_SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+TOP_FUNCTIONS = 20
+METRIC_PREFIX = "healthcare"
+
+_current = None
+
+
+# ============================================================================
+# PROCESS RESOURCES
+# ============================================================================
+
+def cpu_seconds():
+    """User + system CPU time of this process."""
+    t = os.times()
+    return t.user + t.system
+
+
+def _reset_peak_rss():
+    """Reset the kernel's peak-RSS mark (Linux); False where that is not possible."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_bytes():
+    """Peak resident set size: since the last reset on Linux, else of the whole process."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:  # Windows
+        try:
+            import psutil
+        except ImportError:
+            return None
+        return psutil.Process().memory_info().peak_wset
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux but bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# ============================================================================
+# STAGES
+# ============================================================================
+
+class Stage:
+    """Measurements of one named stage; rows and bytes are filled in by the caller."""
+
+    def __init__(self, name, rows=None, bytes=None):
+        self.name = name
+        self.rows = rows
+        self.bytes = bytes
+        self.wall_seconds = self.cpu_seconds = 0.0
+        self.worker_cpu_seconds = 0.0
+        self.peak_rss_bytes = self.worker_peak_rss_bytes = None
+        self.statements = {}  # summary -> [calls, seconds, max seconds, rows]
+        self._lock = threading.Lock()
+
+    def add_bytes(self, n):
+        self.bytes = (self.bytes or 0) + n
+
+    def add_worker(self, cpu, peak_rss):
+        """Account CPU and peak RSS a worker process reported for this stage."""
+        self.worker_cpu_seconds += cpu
+        if peak_rss is not None:
+            self.worker_peak_rss_bytes = max(self.worker_peak_rss_bytes or 0, peak_rss)
+
+    def record_statement(self, timing):
+        """Add one db_loader.StatementTiming (callable from any thread)."""
+        rows = timing.rowcount if timing.rowcount not in (None, -1) else 0
+        with self._lock:
+            entry = self.statements.setdefault(timing.summary, [0, 0.0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += timing.seconds
+            entry[2] = max(entry[2], timing.seconds)
+            entry[3] += rows
+
+    def statement_hook(self, inner=None):
+        """on_statement callback that records into this stage and then calls inner."""
+        def on_statement(timing, rows):
+            self.record_statement(timing)
+            if inner:
+                inner(timing, rows)
+        return on_statement
+
+    def to_dict(self):
+        wall = self.wall_seconds
+        data = {"name": self.name, "wall_seconds": round(wall, 4),
+                "cpu_seconds": round(self.cpu_seconds + self.worker_cpu_seconds, 4),
+                "peak_rss_bytes": self.peak_rss_bytes, "rows": self.rows, "bytes": self.bytes,
+                "rows_per_sec": round(self.rows / wall, 1) if self.rows and wall else None,
+                "bytes_per_sec": round(self.bytes / wall, 1) if self.bytes and wall else None}
+        if self.worker_cpu_seconds:
+            data["worker_cpu_seconds"] = round(self.worker_cpu_seconds, 4)
+            data["worker_peak_rss_bytes"] = self.worker_peak_rss_bytes
+        if self.statements:
+            data["statements"] = [
+                {"sql": sql, "calls": calls, "seconds": round(seconds, 4), "max_seconds": round(slowest, 4),
+                 "rows": rows}
+                for sql, (calls, seconds, slowest, rows) in self.statements.items()]
+        return data
+
+
+class _NullStage(Stage):
+    """Stage handed out when no run is active; measures nothing."""
+
+    def statement_hook(self, inner=None):
+        return inner
+
+
+# ============================================================================
+# PROFILERS
+# ============================================================================
+
+class CProfiler:
+    """cProfile over every profiled() section; writes a pstats .prof file."""
+
+    suffix = ".prof"
+
+    def __init__(self):
+        import cProfile
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def write(self, path):
+        self.profile.dump_stats(path)
+
+    def top(self, n=TOP_FUNCTIONS):
+        self.profile.create_stats()
+        stats = self.profile.stats
+        rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:n]
+        return [{"function": f"{os.path.basename(file)}:{line}({func})", "calls": nc,
+                 "self_seconds": round(tt, 4), "cumulative_seconds": round(ct, 4)}
+                for (file, line, func), (_, nc, tt, ct, _) in rows]
+
+
+class StackSampler:
+    """Samples the profiled thread's stack every interval from a helper thread.
+
+    Overhead is one stack walk per sample rather than a hook on every
+    call, so the sampled loops run at close to full speed.
+    """
+
+    suffix = ".folded"
+
+    def __init__(self, interval=DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._target = None
+
+    def start(self):
+        self._target = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def top(self, n=TOP_FUNCTIONS):
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return [{"function": func, "self_samples": count, "self_pct": round(100 * count / self.samples, 1),
+                 "total_pct": round(100 * total[func] / self.samples, 1)}
+                for func, count in own.most_common(n)]
+
+
+# ============================================================================
+# RUNS
+# ============================================================================
+
+class RunMetrics:
+    """All stages of one run plus its totals, written as JSON and Prometheus text."""
+
+    def __init__(self, name, labels=None, profiler=None):
+        self.name = name
+        self.labels = labels or {}
+        self.profiler = {"cprofile": CProfiler, "sample": StackSampler}[profiler]() if profiler else None
+        self.stages = []
+        self.started = datetime.now()
+        self.status = "running"
+        self.error = None
+        self.rss_scope = "stage" if _reset_peak_rss() else "process"
+        self._start_wall = time.perf_counter()
+        self._start_cpu = cpu_seconds()
+        self._profiling = 0
+        self.wall_seconds = self.cpu_seconds = None
+        self.peak_rss_bytes = None
+        self.rows = self.bytes = None  # run totals, set by the entry point
+        self.details = {}              # anything else the entry point wants in the report
+
+    @contextmanager
+    def stage(self, name, rows=None, bytes=None):
+        stage = Stage(name, rows, bytes)
+        if self.rss_scope == "stage":
+            _reset_peak_rss()
+        start_wall, start_cpu = time.perf_counter(), cpu_seconds()
+        try:
+            yield stage
+        finally:
+            stage.wall_seconds = time.perf_counter() - start_wall
+            stage.cpu_seconds = cpu_seconds() - start_cpu
+            stage.peak_rss_bytes = peak_rss_bytes()
+            self.stages.append(stage)
+            self.peak_rss_bytes = max(self.peak_rss_bytes or 0, stage.peak_rss_bytes or 0) or None
+
+    @contextmanager
+    def profiled(self):
+        if self.profiler is None or self._profiling:
+            yield
+            return
+        self._profiling += 1
+        self.profiler.start()
+        try:
+            yield
+        finally:
+            self.profiler.stop()
+            self._profiling -= 1
+
+    def finish(self, status="ok", error=None):
+        self.wall_seconds = time.perf_counter() - self._start_wall
+        self.cpu_seconds = cpu_seconds() - self._start_cpu
+        self.peak_rss_bytes = max(self.peak_rss_bytes or 0, peak_rss_bytes() or 0) or None
+        self.status = status
+        self.error = error
+
+    def report(self):
+        stages = [s.to_dict() for s in self.stages]
+        totals = {"wall_seconds": round(self.wall_seconds or 0.0, 4),
+                  "cpu_seconds": round((self.cpu_seconds or 0.0) + sum(s.worker_cpu_seconds for s in self.stages), 4),
+                  "peak_rss_bytes": self.peak_rss_bytes,
+                  "rows": self.rows,
+                  "bytes": self.bytes if self.bytes is not None else sum(s.bytes or 0 for s in self.stages) or None}
+        report = {"run": self.name, "started": self.started.isoformat(timespec="seconds"),
+                  "status": self.status, "error": self.error, "argv": sys.argv[1:],
+                  "labels": self.labels,
+                  "rss_scope": self.rss_scope, "total": totals, "stages": stages}
+        if self.details:
+            report["details"] = self.details
+        warnings = self.check_stages()
+        if warnings:
+            report["warnings"] = warnings
+        if self.profiler is not None:
+            report["profile"] = {"profiler": "cprofile" if isinstance(self.profiler, CProfiler) else "sample",
+                                 "top": self.profiler.top()}
+            if isinstance(self.profiler, StackSampler):
+                report["profile"]["samples"] = self.profiler.samples
+        return report
+
+    def check_stages(self, slack=0.5):
+        """Stages whose CPU time cannot fit in their wall time on this machine's cores.
+
+        That only happens when work is counted in the wrong stage, e.g. a
+        stage that returned before the worker shards it accounts for.
+        """
+        cores = os.cpu_count() or 1
+        return [f"stage {s.name!r}: {s.cpu_seconds + s.worker_cpu_seconds:.2f}s CPU in "
+                f"{s.wall_seconds:.2f}s wall on {cores} core(s)"
+                for s in self.stages if s.cpu_seconds + s.worker_cpu_seconds > s.wall_seconds * cores + slack]
+
+    def write_json(self, path):
+        _write_atomic(path, json.dumps(self.report(), indent=2, default=str) + "\n")
+
+    def write_prometheus(self, path):
+        _write_atomic(path, prometheus_text(self.report()))
+
+
+def schema_bytes(conn, schema):
+    """Data + index bytes of a MySQL schema's tables (InnoDB's estimate, no scan)."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COALESCE(SUM(data_length + index_length), 0) FROM information_schema.tables "
+                       "WHERE table_schema = %s", (schema,))
+        return int(cursor.fetchone()[0])
+    finally:
+        cursor.close()
+
+
+def _write_atomic(path, text):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)  # a scraper never reads a half-written file
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_label(v)}"' for k, v in labels.items()) + "}"
+
+
+STAGE_GAUGES = [
+    ("stage_wall_seconds", "wall_seconds", "Elapsed time of a run stage"),
+    ("stage_cpu_seconds", "cpu_seconds", "CPU time of a run stage, including generator workers"),
+    ("stage_peak_rss_bytes", "peak_rss_bytes", "Peak resident set size during a run stage"),
+    ("stage_rows", "rows", "Rows produced or loaded by a run stage"),
+    ("stage_bytes", "bytes", "Bytes written or loaded by a run stage"),
+    ("stage_rows_per_second", "rows_per_sec", "Row throughput of a run stage"),
+]
+
+
+def prometheus_text(report):
+    """Prometheus text exposition format of a report (all gauges)."""
+    run = report["run"]
+    lines = []
+
+    def gauge(name, help_text, samples):
+        samples = [(labels, value) for labels, value in samples if value is not None]
+        if not samples:
+            return
+        lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_{name} gauge")
+        lines.extend(f"{METRIC_PREFIX}_{name}{labels} {value}" for labels, value in samples)
+
+    total = report["total"]
+    gauge("run_success", "1 if the last run succeeded, else 0",
+          [(_labels(run=run), int(report["status"] == "ok"))])
+    gauge("run_timestamp_seconds", "Start time of the last run (Unix time)",
+          [(_labels(run=run), int(datetime.fromisoformat(report["started"]).timestamp()))])
+    for key in ("wall_seconds", "cpu_seconds", "peak_rss_bytes", "rows", "bytes"):
+        gauge(f"run_{key}", f"Run total: {key.replace('_', ' ')}", [(_labels(run=run), total[key])])
+    for name, key, help_text in STAGE_GAUGES:
+        gauge(name, help_text, [(_labels(run=run, stage=s["name"]), s[key]) for s in report["stages"]])
+    statements = [(s["name"], st) for s in report["stages"] for st in s.get("statements", ())]
+    gauge("statement_seconds", "Total time of one SQL statement text in a stage",
+          [(_labels(run=run, stage=stage, statement=st["sql"]), st["seconds"]) for stage, st in statements])
+    gauge("statement_calls", "Executions of one SQL statement text in a stage",
+          [(_labels(run=run, stage=stage, statement=st["sql"]), st["calls"]) for stage, st in statements])
+    return "\n".join(lines) + "\n"
+
+
+# ============================================================================
+# ACTIVE RUN
+# ============================================================================
+# Library code calls the module-level stage() and profiled(); they measure
+# only while an entry point has a run() open, so other callers pay nothing.
+
+@contextmanager
+def run(name, json_path=None, prom_path=None, profiler=None, profile_path=None, labels=None, measure=False):
+    """Open the active run; the reports are written when it ends, also on failure.
+
+    Without a report or profiler to write it yields None and measures
+    nothing, unless measure is set because the caller prints the stages.
+    SystemExit with a non-zero code (the scripts' ERROR exits) marks the
+    run failed, as does any other exception, which is re-raised.
+    """
+    global _current
+    if not (json_path or prom_path or profiler or measure):
+        yield None
+        return
+    metrics = _current = RunMetrics(name, labels, profiler)
+    status, error = "ok", None
+    try:
+        yield metrics
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            status, error = "failed", f"exit status {e.code}"
+        raise
+    except BaseException as e:
+        status, error = "failed", f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current = None
+        metrics.finish(status, error)
+        for warning in metrics.check_stages():
+            print(f"WARNING: {warning}")
+        if metrics.profiler is not None:
+            path = profile_path or name + metrics.profiler.suffix
+            metrics.profiler.write(path)
+            print(f"Profile written to {path}")
+        if json_path:
+            metrics.write_json(json_path)
+            print(f"Run report written to {json_path}")
+        if prom_path:
+            metrics.write_prometheus(prom_path)
+            print(f"Prometheus metrics written to {prom_path}")
+
+
+def current():
+    """The active RunMetrics, or None."""
+    return _current
+
+
+@contextmanager
+def stage(name, rows=None, bytes=None):
+    """Measure a stage of the active run; yields a Stage to set rows/bytes on."""
+    if _current is None:
+        yield _NullStage(name, rows, bytes)
+        return
+    with _current.stage(name, rows, bytes) as s:
+        yield s
+
+
+@contextmanager
+def profiled():
+    """Profile the enclosed hot loop when the active run has a profiler."""
+    if _current is None:
+        yield
+        return
+    with _current.profiled():
+        yield
+
+
+def add_arguments(parser, profile=False):
+    """--metrics-json / --metrics-prom (and --profile / --profile-output) options."""
+    parser.add_argument("--metrics-json", help="write a JSON run report (per-stage time, CPU, RSS, rows, bytes)")
+    parser.add_argument("--metrics-prom",
+                        help="write the run metrics in Prometheus text format (e.g. for the textfile collector)")
+    if profile:
+        parser.add_argument("--profile", dest="profiler", choices=PROFILERS,
+                            help="profile the generator loops: cprofile (deterministic, slower) or "
+                                 "sample (stack sampling, low overhead)")
+        parser.add_argument("--profile-output",
+                            help="profile file (default: <script>.prof, or .folded with sample)")
@@ -2,13 +2,31 @@
 Healthcare System - Normalized Database Setup Script
 Reads denormalized_patient_encounters from healthcare_system
 and creates a normalized database (healthcare_system_model_db)
+
+Statements run over a pooled native driver connection (PyMySQL or
+mysql-connector) when one is installed, with per-statement timing;
+otherwise the script falls back to piping the file into the mysql CLI.
+With --chunked the normalization runs in resumable encounter_id chunks
+(see chunked_normalize.py) instead of the single-script rebuild; with
+--streaming the source is read once and the six tables are written
+concurrently (see streaming_normalize.py).
+
+--metrics-json / --metrics-prom write a run report (see run_metrics.py):
+wall and CPU time, peak RSS and rows/sec for source verification and
+normalization, with per-statement timings for every normalization step.
 """
 
+import argparse
 import subprocess
 import sys
 import os
 import getpass
 
+import chunked_normalize
+import db_loader
+import run_metrics
+import streaming_normalize
+
 
 def find_mysql():
     """Find MySQL executable on the system."""
@@ -39,7 +57,7 @@ def find_mysql():
     return None
 
 
-def run_sql_file(mysql_path, user, password, sql_file):
+def run_sql_file(mysql_path, user, password, sql_file, timeout=db_loader.BASE_TIMEOUT):
     """Execute a SQL file using the mysql command-line client."""
     cmd = [mysql_path, "-u", user]
     if password:
@@ -58,7 +76,7 @@ def run_sql_file(mysql_path, user, password, sql_file):
                 stdin=f,
                 capture_output=True,
                 text=True,
-                timeout=120
+                timeout=timeout
             )
 
         if result.returncode != 0:
@@ -71,19 +89,49 @@ def run_sql_file(mysql_path, user, password, sql_file):
         return True
 
     except subprocess.TimeoutExpired:
-        print("  ERROR: Command timed out after 120 seconds")
+        print(f"  ERROR: Command timed out after {timeout} seconds")
+        return False
+    except Exception as e:
+        print(f"  ERROR: {e}")
+        return False
+
+
+SOURCE_COUNT_SQL = "SELECT COUNT(*) FROM healthcare_system.denormalized_patient_encounters;"
+
+
+def verify_source_data_native(pool):
+    """Check the source table over a pooled connection (no process spawn)."""
+    try:
+        return True, db_loader.query_scalar(pool, SOURCE_COUNT_SQL)
+    except Exception as e:
+        return False, str(e)
+
+
+def run_sql_file_native(pool, sql_file, on_statement=db_loader.print_statement):
+    """Execute a SQL file statement by statement over a pooled connection."""
+    sql_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), sql_file)
+
+    if not os.path.exists(sql_path):
+        print(f"  ERROR: SQL file not found: {sql_path}")
         return False
+
+    try:
+        timings = db_loader.run_sql_file(pool, sql_path, on_statement)
     except Exception as e:
         print(f"  ERROR: {e}")
         return False
 
+    total = sum(t.seconds for t in timings)
+    print(f"  {len(timings)} statements in {total:.2f}s")
+    return True
+
 
 def verify_source_data(mysql_path, user, password):
     """Check that the source database and table exist with data."""
     cmd = [mysql_path, "-u", user]
     if password:
         cmd.append(f"-p{password}")
-    cmd += ["-e", "SELECT COUNT(*) FROM healthcare_system.denormalized_patient_encounters;"]
+    cmd += ["-e", SOURCE_COUNT_SQL]
 
     try:
         result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
@@ -99,27 +147,80 @@ def verify_source_data(mysql_path, user, password):
         return False, str(e)
 
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Create the normalized healthcare_system_model_db")
+    parser.add_argument("user", nargs="?", help="MySQL user (prompted if omitted)")
+    parser.add_argument("password", nargs="?", help="MySQL password (prompted if omitted)")
+    parser.add_argument("--host", default="localhost", help="MySQL host (native driver only)")
+    parser.add_argument("--port", type=int, default=3306, help="MySQL port (native driver only)")
+    parser.add_argument("--cli", action="store_true",
+                        help="use the mysql command-line client even if a driver is installed")
+    parser.add_argument("--chunked", action="store_true",
+                        help="normalize in resumable encounter_id chunks (native driver only)")
+    parser.add_argument("--chunk-size", type=int, default=chunked_normalize.DEFAULT_CHUNK_SIZE,
+                        help="encounter_id range per chunk transaction (with --chunked)")
+    parser.add_argument("--workers", type=int, default=chunked_normalize.DEFAULT_WORKERS,
+                        help="connections for concurrent dimension extraction (with --chunked)")
+    parser.add_argument("--streaming", action="store_true",
+                        help="single-pass normalization with in-memory dimension dedup (needs a native driver)")
+    parser.add_argument("--batch-size", type=int, default=streaming_normalize.DEFAULT_BATCH_SIZE,
+                        help="source rows per read (with --streaming)")
+    parser.add_argument("--restart", action="store_true",
+                        help="discard checkpoints and start the chunked run from scratch")
+    run_metrics.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.chunked and args.streaming:
+        parser.error("--chunked and --streaming are mutually exclusive")
+    return args
+
+
+def target_bytes(pool):
+    """Data + index bytes of the normalized database, or None if it cannot be read."""
+    try:
+        with pool.connection() as conn:
+            return run_metrics.schema_bytes(conn, chunked_normalize.TARGET_DB)
+    except Exception:
+        return None
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    method = "chunked" if args.chunked else "streaming" if args.streaming else "script"
+    with run_metrics.run("setup_normalized_db", args.metrics_json, args.metrics_prom,
+                         labels={"method": method}) as metrics:
+        setup(args, metrics)
+
+
+def setup(args, metrics=None):
+    """Create the normalized database; metrics is the active RunMetrics or None."""
     print("=" * 60)
     print("  Healthcare System - Normalized Database Setup")
     print("=" * 60)
     print()
 
-    # Step 1: Find MySQL
-    print("[1/4] Finding MySQL installation...")
-    mysql_path = find_mysql()
-    if not mysql_path:
-        print("  ERROR: MySQL not found!")
-        print("  Install MySQL or add it to your PATH.")
+    # Step 1: Find a native driver, or the MySQL CLI as fallback
+    print("[1/4] Finding MySQL client...")
+    driver_name, _ = db_loader.load_driver()
+    mysql_path = None
+    if (args.chunked or args.streaming) and (args.cli or not driver_name):
+        print(f"  ERROR: {'--chunked' if args.chunked else '--streaming'} needs a native driver (pip install pymysql)")
         sys.exit(1)
-    print(f"  Found: {mysql_path}")
+    if driver_name and not args.cli:
+        print(f"  Using native driver: {driver_name}")
+    else:
+        mysql_path = find_mysql()
+        if not mysql_path:
+            print("  ERROR: MySQL not found!")
+            print("  Install MySQL or add it to your PATH (or pip install pymysql).")
+            sys.exit(1)
+        print(f"  Found: {mysql_path}")
     print()
 
     # Step 2: Get credentials
     print("[2/4] MySQL credentials")
-    if len(sys.argv) >= 3:
-        user = sys.argv[1]
-        password = sys.argv[2]
+    if args.user is not None and args.password is not None:
+        user = args.user
+        password = args.password
         print(f"  Using provided credentials (user: {user})")
     else:
         user = input("  Username [root]: ").strip() or "root"
@@ -128,7 +229,13 @@ def main():
 
     # Step 3: Verify source data
     print("[3/4] Verifying source data...")
-    exists, info = verify_source_data(mysql_path, user, password)
+    pool = None
+    with run_metrics.stage("verify source"):
+        if mysql_path is None:
+            pool = db_loader.ConnectionPool(user, password, args.host, args.port, size=1)
+            exists, info = verify_source_data_native(pool)
+        else:
+            exists, info = verify_source_data(mysql_path, user, password)
     if not exists:
         print(f"  ERROR: Source data not available: {info}")
         print("  Make sure healthcare_system database exists with data.")
@@ -138,15 +245,80 @@ def main():
     print(f"  Source table has {info} records")
     print()
 
+    # Timeouts scale with the source size so large tables are not cut off
+    timeout = db_loader.scaled_timeout(info)
+    if metrics is not None:
+        metrics.rows = info
+
     # Step 4: Run normalization
-    print("[4/4] Running normalization script...")
-    print("  - Dropping existing healthcare_system_model_db (if any)")
-    print("  - Creating normalized tables")
-    print("  - Extracting unique data from denormalized table")
-    print("  - Loading into normalized structure")
-    print()
+    if args.chunked:
+        print("[4/4] Running chunked normalization...")
+        print(f"  - {'Restarting' if args.restart else 'Resuming from checkpoints (if any)'}")
+        print(f"  - {args.chunk_size} encounter_ids per transaction, {args.workers} connection(s)")
+        print()
+        pool.close()
+        # Each statement covers one chunk, so the timeout scales with the chunk
+        pool = db_loader.ConnectionPool(user, password, args.host, args.port, size=max(args.workers, 1),
+                                        timeout=db_loader.scaled_timeout(args.chunk_size))
+        try:
+            with run_metrics.stage("normalize", rows=info) as measure:
+                chunked_normalize.normalize(pool, args.chunk_size, args.workers, args.restart,
+                                            on_statement=measure.statement_hook())
+                if metrics is not None:
+                    measure.bytes = target_bytes(pool)
+            print()
+            chunked_normalize.print_counts(pool)
+            success = True
+        except Exception as e:
+            print(f"  ERROR: {e}")
+            print("  Re-run with --chunked to resume from the last committed chunk.")
+            success = False
+        finally:
+            pool.close()
+    elif args.streaming:
+        print("[4/4] Running streaming normalization...")
+        print("  - Dropping existing healthcare_system_model_db (if any)")
+        print(f"  - One pass over the source, {args.batch_size} rows per read")
+        print(f"  - {len(streaming_normalize.TABLES)} tables written concurrently")
+        print()
+        pool.close()
+        # One reader plus one writer per table; each statement covers one batch
+        pool = db_loader.ConnectionPool(user, password, args.host, args.port,
+                                        size=len(streaming_normalize.TABLES) + 1,
+                                        timeout=db_loader.scaled_timeout(args.batch_size))
+        try:
+            with run_metrics.stage("normalize", rows=info) as measure:
+                streaming_normalize.normalize(pool, args.batch_size, on_statement=measure.statement_hook())
+                if metrics is not None:
+                    measure.bytes = target_bytes(pool)
+            print()
+            chunked_normalize.print_counts(pool)
+            success = True
+        except Exception as e:
+            print(f"  ERROR: {e}")
+            success = False
+        finally:
+            pool.close()
+    else:
+        print("[4/4] Running normalization script...")
+        print("  - Dropping existing healthcare_system_model_db (if any)")
+        print("  - Creating normalized tables")
+        print("  - Extracting unique data from denormalized table")
+        print("  - Loading into normalized structure")
+        print(f"  - Statement timeout: {timeout}s")
+        print()
 
-    success = run_sql_file(mysql_path, user, password, "normalize_healthcare.sql")
+        with run_metrics.stage("normalize", rows=info) as measure:
+            if pool is not None:
+                pool.timeout = timeout
+                pool.close()  # reconnect with the scaled read timeout
+                success = run_sql_file_native(pool, "normalize_healthcare.sql",
+                                              measure.statement_hook(db_loader.print_statement))
+                if success and metrics is not None:
+                    measure.bytes = target_bytes(pool)
+                pool.close()
+            else:
+                success = run_sql_file(mysql_path, user, password, "normalize_healthcare.sql", timeout)
 
     print()
     if success:
@@ -0,0 +1,426 @@
+"""
+Healthcare System - Single-Pass Streaming Normalization
+Builds healthcare_system_model_db from denormalized_patient_encounters in
+one read of the source, instead of the five scans (a DISTINCT plus four
+ROW_NUMBER() window sorts) and the final join of normalize_healthcare.sql.
+
+The source is read once in encounter_id order, in keyset batches. Each
+dimension is deduplicated in memory with a hash map from its natural key
+(department_name, license_number, fk_patient_id, icd_code,
+medication_name) to a surrogate ID. The first row seen for a key wins,
+which is the script's rn = 1 rule (ROW_NUMBER() ... ORDER BY
+encounter_id). Memory therefore grows with dimension cardinality, not with
+the number of encounters.
+
+Rows are kept or dropped exactly as the script's joins would:
+  - doctors whose first row has no department are left out
+  - encounters need a patient, a (kept) doctor and a department
+  - a missing diagnosis or medication becomes NULL
+
+Surrogate IDs follow first appearance, like chunked_normalize.py within a
+chunk, so dimension IDs can differ from the script's (which sorts by the
+natural key). Encounter IDs match it. On MySQL the six target tables are
+written concurrently, each by its own thread and pooled connection fed
+through a bounded queue. Foreign key checks are off on those sessions, and
+orphaned references are counted once the load is done. Embedded backends
+(backends.py) write each batch inline.
+
+Table definitions are taken from normalize_healthcare.sql, so every path
+creates the same schema. Driven from setup_normalized_db.py --streaming
+and embedded_pipeline.py --normalize streaming.
+"""
+
+import queue
+import threading
+import time
+from operator import itemgetter
+
+import backends
+import chunked_normalize
+import db_loader
+
+TARGET_DB = chunked_normalize.TARGET_DB
+SOURCE_TABLE = chunked_normalize.SOURCE_TABLE
+
+DEFAULT_BATCH_SIZE = 50_000  # source rows per keyset read
+DEFAULT_QUEUE_DEPTH = 4  # batches buffered per writer before the reader waits
+
+# Load order; also the writer threads, one per table
+TABLES = ("departments", "doctors", "patients", "diagnoses", "medications", "encounters")
+
+
+# ============================================================================
+# COLUMN MAPPING
+# ============================================================================
+# (target column, source column) per table, after the surrogate ID. The
+# doctors' fk_department_id and the encounters' foreign keys are filled in
+# from the hash maps instead of being copied.
+
+DIMENSIONS = {
+    "departments": ("department_id", "department_name", [
+        ("department_name", "department_name"), ("department_code", "department_code"),
+        ("floor_number", "department_floor"), ("phone_number", "department_phone"),
+        ("head_physician", "department_head"),
+    ]),
+    "doctors": ("doctor_id", "doctor_license_number", [
+        ("first_name", "doctor_first_name"), ("last_name", "doctor_last_name"),
+        ("license_number", "doctor_license_number"), ("specialization", "doctor_specialization"),
+        ("phone_number", "doctor_phone"), ("email", "doctor_email"),
+        ("hire_date", "doctor_hire_date"), ("years_of_experience", "doctor_years_experience"),
+    ]),
+    "patients": ("patient_id", "fk_patient_id", [
+        ("source_patient_id", "fk_patient_id"), ("first_name", "patient_first_name"),
+        ("last_name", "patient_last_name"), ("date_of_birth", "patient_date_of_birth"),
+        ("gender", "patient_gender"), ("blood_type", "patient_blood_type"),
+        ("phone_number", "patient_phone"), ("email", "patient_email"),
+        ("street_address", "patient_street_address"), ("city", "patient_city"),
+        ("state_province", "patient_state"), ("postal_code", "patient_postal_code"),
+        ("country", "patient_country"), ("insurance_provider", "patient_insurance_provider"),
+        ("insurance_policy_number", "patient_insurance_policy_number"),
+        ("emergency_contact_name", "patient_emergency_contact_name"),
+        ("emergency_contact_phone", "patient_emergency_contact_phone"),
+        ("registration_date", "patient_registration_date"),
+    ]),
+    "diagnoses": ("diagnosis_id", "diagnosis_icd_code", [
+        ("icd_code", "diagnosis_icd_code"), ("diagnosis_name", "diagnosis_name"),
+        ("diagnosis_category", "diagnosis_category"), ("severity_level", "diagnosis_severity"),
+        ("description", "diagnosis_description"), ("is_chronic", "is_chronic_diagnosis"),
+    ]),
+    "medications": ("medication_id", "medication_name", [
+        ("medication_name", "medication_name"), ("generic_name", "medication_generic_name"),
+        ("dosage_strength", "medication_dosage_strength"), ("dosage_form", "medication_dosage_form"),
+        ("route_of_administration", "medication_route"),
+        ("common_side_effects", "medication_side_effects"),
+        ("contraindications", "medication_contraindications"),
+        ("manufacturer", "medication_manufacturer"),
+    ]),
+}
+
+ENCOUNTER_COLUMNS = [
+    ("encounter_date", "encounter_date"), ("encounter_time", "encounter_time"),
+    ("encounter_type", "encounter_type"), ("encounter_duration_minutes", "encounter_duration_minutes"),
+    ("chief_complaint", "chief_complaint"), ("vital_signs_temperature", "vital_signs_temperature"),
+    ("vital_signs_blood_pressure", "vital_signs_blood_pressure"),
+    ("vital_signs_heart_rate", "vital_signs_heart_rate"),
+    ("vital_signs_respiratory_rate", "vital_signs_respiratory_rate"),
+    ("clinical_notes", "clinical_notes"), ("treatment_plan", "treatment_plan"),
+    ("prescribed_quantity", "prescribed_quantity"), ("prescribed_frequency", "prescribed_frequency"),
+    ("prescription_duration_days", "prescription_duration_days"),
+    ("follow_up_date", "follow_up_date"), ("follow_up_required", "follow_up_required"),
+    ("billable_amount", "billingBillable_amount"), ("billing_status", "billing_status"),
+    ("created_by", "created_by"), ("last_modified_by", "last_modified_by"),
+]
+
+ENCOUNTER_KEYS = ["encounter_id", "source_encounter_id", "fk_patient_id", "fk_doctor_id",
+                  "fk_department_id", "fk_diagnosis_id", "fk_medication_id"]
+
+# Every source column read, encounter_id first (the keyset cursor)
+SOURCE_COLUMNS = ["encounter_id"]
+for _, _key, _columns in DIMENSIONS.values():
+    for _, _source in [(None, _key)] + _columns:
+        if _source not in SOURCE_COLUMNS:
+            SOURCE_COLUMNS.append(_source)
+SOURCE_COLUMNS += [source for _, source in ENCOUNTER_COLUMNS]
+
+TARGET_COLUMNS = {table: [id_column] + [target for target, _ in columns]
+                  for table, (id_column, _, columns) in DIMENSIONS.items()}
+TARGET_COLUMNS["doctors"].insert(5, "fk_department_id")  # after specialization
+TARGET_COLUMNS["encounters"] = ENCOUNTER_KEYS + [target for target, _ in ENCOUNTER_COLUMNS]
+
+READ_SQL = (f"SELECT {', '.join(SOURCE_COLUMNS)} FROM {SOURCE_TABLE} "
+            "WHERE encounter_id > %s ORDER BY encounter_id LIMIT {limit}")
+
+ORPHANS_SQL = """SELECT 'encounters.fk_patient_id', COUNT(*) FROM encounters e
+    LEFT JOIN patients p ON p.patient_id = e.fk_patient_id WHERE p.patient_id IS NULL
+UNION ALL SELECT 'encounters.fk_doctor_id', COUNT(*) FROM encounters e
+    LEFT JOIN doctors d ON d.doctor_id = e.fk_doctor_id WHERE d.doctor_id IS NULL
+UNION ALL SELECT 'encounters.fk_department_id', COUNT(*) FROM encounters e
+    LEFT JOIN departments d ON d.department_id = e.fk_department_id WHERE d.department_id IS NULL
+UNION ALL SELECT 'encounters.fk_diagnosis_id', COUNT(*) FROM encounters e
+    LEFT JOIN diagnoses d ON d.diagnosis_id = e.fk_diagnosis_id
+    WHERE e.fk_diagnosis_id IS NOT NULL AND d.diagnosis_id IS NULL
+UNION ALL SELECT 'encounters.fk_medication_id', COUNT(*) FROM encounters e
+    LEFT JOIN medications m ON m.medication_id = e.fk_medication_id
+    WHERE e.fk_medication_id IS NOT NULL AND m.medication_id IS NULL
+UNION ALL SELECT 'doctors.fk_department_id', COUNT(*) FROM doctors d
+    LEFT JOIN departments x ON x.department_id = d.fk_department_id WHERE x.department_id IS NULL"""
+
+
+def _getter(columns):
+    """itemgetter returning a tuple of the named source columns, even for one column"""
+    indices = [SOURCE_COLUMNS.index(source) for _, source in columns]
+    if len(indices) == 1:
+        index = indices[0]
+        return lambda row: (row[index],)
+    return itemgetter(*indices)
+
+
+def _execute(backend, sql):
+    cursor = backend.execute(sql)
+    if cursor is not None:  # embedded backends handle database statements themselves
+        cursor.close()
+
+
+def insert_summary(table):
+    """Statement text reported to on_statement for a batch insert into table"""
+    return f"INSERT INTO {table} ({', '.join(TARGET_COLUMNS[table])}) VALUES ..."
+
+
+# ============================================================================
+# SINGLE-PASS DEDUPLICATION
+# ============================================================================
+
+class Normalizer:
+    """Splits source batches into rows for the six target tables.
+
+    keys[table] maps natural key -> surrogate ID (None for a doctor that
+    was left out), so every dimension row is emitted exactly once, from
+    the first source row carrying its key.
+    """
+
+    def __init__(self):
+        self.keys = {table: {} for table in DIMENSIONS}
+        self.next_id = {table: 1 for table in TABLES}
+        self.skipped = 0  # encounters dropped by the script's inner joins
+        self._key = {table: SOURCE_COLUMNS.index(key) for table, (_, key, _) in DIMENSIONS.items()}
+        self._values = {table: _getter(columns) for table, (_, _, columns) in DIMENSIONS.items()}
+        self._doctor_head = _getter(DIMENSIONS["doctors"][2][:4])
+        self._doctor_tail = _getter(DIMENSIONS["doctors"][2][4:])
+        self._encounter = _getter(ENCOUNTER_COLUMNS)
+
+    def _assign(self, table):
+        value = self.next_id[table]
+        self.next_id[table] = value + 1
+        return value
+
+    def _lookup(self, table, row, out):
+        """Surrogate ID for row's key in a plain dimension, emitting it when new"""
+        key = row[self._key[table]]
+        if key is None:
+            return None
+        known = self.keys[table]
+        value = known.get(key)
+        if value is None:
+            value = known[key] = self._assign(table)
+            out[table].append((value,) + self._values[table](row))
+        return value
+
+    def process(self, rows):
+        """{table: [row tuples]} for one batch of source rows"""
+        out = {table: [] for table in TABLES}
+        doctors = self.keys["doctors"]
+        license_index = self._key["doctors"]
+        for row in rows:
+            department_id = self._lookup("departments", row, out)
+            patient_id = self._lookup("patients", row, out)
+            diagnosis_id = self._lookup("diagnoses", row, out)
+            medication_id = self._lookup("medications", row, out)
+
+            license = row[license_index]
+            doctor_id = None
+            if license is not None:
+                if license in doctors:
+                    doctor_id = doctors[license]
+                else:
+                    # JOIN departments on the first row: no department, no doctor
+                    if department_id is not None:
+                        doctor_id = self._assign("doctors")
+                        out["doctors"].append((doctor_id,) + self._doctor_head(row) + (department_id,)
+                                              + self._doctor_tail(row))
+                    doctors[license] = doctor_id
+
+            if patient_id is None or doctor_id is None or department_id is None:
+                self.skipped += 1
+                continue
+            out["encounters"].append((self._assign("encounters"), row[0], patient_id, doctor_id,
+                                      department_id, diagnosis_id, medication_id)
+                                     + self._encounter(row))
+        return out
+
+
+# ============================================================================
+# WRITERS
+# ============================================================================
+
+class BatchWriter:
+    """Inserts batches into one target table, counting and timing them.
+
+    on_statement, if given, gets a db_loader.StatementTiming per batch.
+    """
+
+    def __init__(self, table, on_statement=None):
+        self.table = table
+        self.columns = TARGET_COLUMNS[table]
+        self.rows = 0
+        self.seconds = 0.0
+        self.batches = 0
+        self.on_statement = on_statement
+
+    def _write(self, backend, batch):
+        start = time.perf_counter()
+        rows = backend.insert_rows(self.table, self.columns, batch)
+        seconds = time.perf_counter() - start
+        self.rows += rows
+        self.seconds += seconds
+        self.batches += 1
+        if self.on_statement:
+            self.on_statement(db_loader.StatementTiming(self.batches, insert_summary(self.table), seconds, rows),
+                              None)
+
+
+class TableWriter(BatchWriter):
+    """Bulk-writes one target table on its own thread and pooled connection.
+
+    put() blocks once queue_depth batches are waiting, which bounds memory
+    when the database writes slower than the source is read. A failed
+    writer keeps draining its queue so the reader never blocks on it; the
+    error is raised from the next put() or from close(). on_statement is
+    called from the writer thread.
+    """
+
+    def __init__(self, pool, table, queue_depth=DEFAULT_QUEUE_DEPTH, on_statement=None):
+        super().__init__(table, on_statement)
+        self.pool = pool
+        self.error = None
+        self.queue = queue.Queue(queue_depth)
+        self.thread = threading.Thread(target=self._run, name=f"write-{table}", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        try:
+            with self.pool.connection() as conn:
+                backend = backends.MySQLBackend(conn)
+                _execute(backend, f"USE {TARGET_DB}")
+                _execute(backend, "SET FOREIGN_KEY_CHECKS = 0")
+                while True:
+                    batch = self.queue.get()
+                    if batch is None:
+                        return
+                    self._write(backend, batch)
+        except Exception as e:
+            self.error = e
+            while self.queue.get() is not None:
+                pass
+
+    def put(self, batch):
+        if self.error is not None:
+            raise self.error
+        self.queue.put(batch)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+class InlineWriter(BatchWriter):
+    """TableWriter's interface for an embedded backend: writes on put()"""
+
+    def __init__(self, backend, table, on_statement=None):
+        super().__init__(table, on_statement)
+        self.backend = backend
+
+    def put(self, batch):
+        self._write(self.backend, batch)
+
+    def close(self):
+        pass
+
+
+# ============================================================================
+# DRIVER
+# ============================================================================
+
+def prepare_schema(backend):
+    """Recreate the target database and its tables (as normalize_healthcare.sql does)"""
+    for sql in [f"DROP DATABASE IF EXISTS {TARGET_DB}", f"CREATE DATABASE {TARGET_DB}",
+                f"USE {TARGET_DB}"] + chunked_normalize.table_ddl():
+        _execute(backend, sql)
+
+
+def stream(reader, writers, batch_size=DEFAULT_BATCH_SIZE, progress=print, on_statement=None):
+    """Read the source once through reader and feed writers; returns {table: rows}
+
+    on_statement, if given, gets a db_loader.StatementTiming per source batch read.
+    """
+    normalizer = Normalizer()
+    sql = READ_SQL.format(limit=int(batch_size))
+    last_id, read, start = 0, 0, time.perf_counter()
+    batches = 0
+    try:
+        while True:
+            query_start = time.perf_counter()
+            rows = reader.query(sql, (last_id,))
+            batches += 1
+            if on_statement:
+                on_statement(db_loader.StatementTiming(batches, sql, time.perf_counter() - query_start,
+                                                       len(rows)), None)
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            read += len(rows)
+            for table, batch in normalizer.process(rows).items():
+                if batch:
+                    writers[table].put(batch)
+            elapsed = time.perf_counter() - start
+            progress(f"  read {read:>12,} rows through encounter_id {last_id}"
+                     f"  {read / elapsed if elapsed else 0:>10,.0f} rows/s")
+    finally:
+        errors = []
+        for writer in writers.values():
+            try:
+                writer.close()
+            except Exception as e:
+                errors.append(e)
+    if errors:
+        raise errors[0]
+
+    elapsed = time.perf_counter() - start
+    progress(f"  {read:,} source rows in {elapsed:.2f}s, {normalizer.skipped:,} encounters dropped "
+             f"(no patient, doctor or department)")
+    for table, writer in writers.items():
+        rate = writer.rows / writer.seconds if writer.seconds else 0
+        progress(f"  {table:<12} {writer.rows:>12,} rows  write {writer.seconds:8.2f}s  {rate:>10,.0f} rows/s")
+    return {table: writer.rows for table, writer in writers.items()}
+
+
+def orphans(backend):
+    """{reference: count} of foreign keys pointing at no row (should all be 0)"""
+    return {name: count for name, count in backend.query(ORPHANS_SQL)}
+
+
+def check_orphans(backend):
+    bad = {name: count for name, count in orphans(backend).items() if count}
+    if bad:
+        raise RuntimeError("orphaned references after streaming normalization: "
+                           + ", ".join(f"{name}={count}" for name, count in bad.items()))
+
+
+def normalize(pool, batch_size=DEFAULT_BATCH_SIZE, queue_depth=DEFAULT_QUEUE_DEPTH, progress=print,
+              on_statement=None):
+    """Stream-normalize on MySQL; returns {table: rows written}.
+
+    Uses one reader connection plus one writer connection per target
+    table, so pool should allow len(TABLES) + 1 connections. on_statement
+    is called from the reader and every writer thread.
+    """
+    with pool.connection() as conn:
+        reader = backends.MySQLBackend(conn)
+        prepare_schema(reader)
+        writers = {table: TableWriter(pool, table, queue_depth, on_statement) for table in TABLES}
+        counts = stream(reader, writers, batch_size, progress, on_statement)
+        check_orphans(reader)
+    return counts
+
+
+def normalize_backend(backend, batch_size=DEFAULT_BATCH_SIZE, progress=print, on_statement=None):
+    """Stream-normalize on an embedded backend (backends.py); returns {table: rows written}.
+
+    Leaves the backend in TARGET_DB.
+    """
+    prepare_schema(backend)
+    writers = {table: InlineWriter(backend, table, on_statement) for table in TABLES}
+    counts = stream(backend, writers, batch_size, progress, on_statement)
+    check_orphans(backend)
+    return counts
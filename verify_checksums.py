@@ -0,0 +1,426 @@
+"""
+Healthcare System - Chunked Checksum Verification
+Checks that healthcare_system_model_db still holds what
+healthcare_system.denormalized_patient_encounters says, column for column,
+without diffing the 68-column table row by row.
+
+Both sides are cut into the same encounter_id ranges. The normalized side
+is rejoined on the fly: encounters by source_encounter_id, then LEFT JOINs
+to patients, doctors, departments, diagnoses and medications. Every range
+gets a row count and a checksum, which is the sum of a 64-bit MD5 prefix
+per row. On MySQL the hashing runs on the server, so only two numbers per
+range cross the wire, and the queries for both sides and many ranges run
+in parallel over a connection pool (--workers).
+
+Only ranges whose checksums differ are looked at again. They are split
+into --fanout sub-ranges and hashed again, level by level, down to
+--leaf-size ids. There, per-row hashes name the missing, extra and changed
+encounters, and the changed rows are fetched once to show which columns
+differ. A clean run is one checksum query per side per chunk. A handful of
+bad rows costs a few dozen more queries, however large the table is.
+
+Compared: every source column the normalized model carries (column mapping
+as in streaming_normalize.py), with the encounter's patient identified by
+source_patient_id. Not compared: the source's own doctor, department,
+diagnosis and medication ids (normalized surrogate ids differ by design),
+patient_age (derived) and created_at/updated_at.
+
+Encounters that normalization dropped (no patient, doctor or department)
+show up as missing. Dimension attributes come from each key's first
+encounter, so a source row whose patient or doctor details have since
+changed shows up as changed.
+
+On sqlite/duckdb (backends.py) the rows are hashed in Python instead,
+which suits small local checks.
+
+Usage:
+    python verify_checksums.py --user root --workers 8 --json runs/verify.json
+    python verify_checksums.py --user root --low 9000000          # only encounters after 9M
+    python verify_checksums.py --backend sqlite --db-file healthcare.sqlite --chunk-size 10000
+
+Exits with status 1 when the databases differ.
+"""
+
+import argparse
+import getpass
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import backends
+import chunked_normalize
+import db_loader
+import run_metrics
+import streaming_normalize
+
+SOURCE_TABLE = chunked_normalize.SOURCE_TABLE
+TARGET_DB = chunked_normalize.TARGET_DB
+
+DEFAULT_CHUNK_SIZE = 100_000  # encounter_ids per top-level checksum
+DEFAULT_LEAF_SIZE = 1_000     # ranges this small are compared row by row
+DEFAULT_FANOUT = 10           # sub-ranges per differing range
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_ROWS = 1_000      # stop drilling down after this many differing rows
+SHOWN_ROWS = 20               # differing rows printed (all of them go to --json)
+
+
+# ============================================================================
+# COLUMN MAPPING
+# ============================================================================
+# (source column, normalized expression); the normalized tables are
+# aliased as in NORMALIZED_FROM
+
+ALIASES = {"departments": "dp", "doctors": "d", "patients": "p", "diagnoses": "dg", "medications": "m"}
+
+COLUMNS = [(source, f"e.{target}") for target, source in streaming_normalize.ENCOUNTER_COLUMNS]
+for _table, (_, _, _columns) in streaming_normalize.DIMENSIONS.items():
+    COLUMNS += [(source, f"{ALIASES[_table]}.{target}") for target, source in _columns]
+
+NORMALIZED_FROM = """{db}encounters e
+    LEFT JOIN {db}patients p ON p.patient_id = e.fk_patient_id
+    LEFT JOIN {db}doctors d ON d.doctor_id = e.fk_doctor_id
+    LEFT JOIN {db}departments dp ON dp.department_id = e.fk_department_id
+    LEFT JOIN {db}diagnoses dg ON dg.diagnosis_id = e.fk_diagnosis_id
+    LEFT JOIN {db}medications m ON m.medication_id = e.fk_medication_id"""
+
+# One side of the comparison: the encounter_id it is keyed and chunked by,
+# its FROM clause, the compared expressions (in COLUMNS order) and the one
+# table that holds its keys (MySQL does not drop unused LEFT JOINs)
+Side = namedtuple("Side", "name key source columns keys_from")
+
+
+def sides(database_prefix=""):
+    """(source, normalized) Sides; database_prefix qualifies the normalized tables."""
+    source = Side("source", "encounter_id", SOURCE_TABLE, [column for column, _ in COLUMNS], SOURCE_TABLE)
+    normalized = Side("normalized", "e.source_encounter_id", NORMALIZED_FROM.format(db=database_prefix),
+                      [expression for _, expression in COLUMNS], f"{database_prefix}encounters e")
+    return source, normalized
+
+
+def row_hash_sql(side):
+    """MySQL expression: unsigned 64-bit MD5 prefix of the key and compared columns.
+
+    CONCAT_WS skips NULLs, so a NULL flag per column keeps (NULL, 'x') and
+    ('x', NULL) apart.
+    """
+    values = [side.key] + side.columns
+    nulls = ", ".join(f"ISNULL({value})" for value in values)
+    return (f"CAST(CONV(LEFT(MD5(CONCAT_WS('#', {', '.join(values)}, CONCAT({nulls}))), 16), 16, 10) "
+            f"AS UNSIGNED)")
+
+
+def python_row_hash(row):
+    """row_hash_sql()'s counterpart for rows fetched from an embedded backend."""
+    return int.from_bytes(hashlib.md5(repr(tuple(row)).encode("utf-8")).digest()[:8], "big")
+
+
+# ============================================================================
+# CHECKSUMS
+# ============================================================================
+
+class Checksummer:
+    """Range and row checksums of one Side through query(sql, params).
+
+    server_hash hashes on the database (MySQL); otherwise the rows are
+    fetched and hashed here.
+    """
+
+    def __init__(self, query, side, server_hash):
+        self.query = query
+        self.side = side
+        self.server_hash = server_hash
+        self.queries = 0
+        self._lock = threading.Lock()
+        where = f"WHERE {side.key} > %s AND {side.key} <= %s"
+        if server_hash:
+            row_hash = row_hash_sql(side)
+            self.range_sql = f"SELECT COUNT(*), COALESCE(SUM({row_hash}), 0) FROM {side.source} {where}"
+            self.rows_sql = f"SELECT {side.key}, {row_hash} FROM {side.source} {where}"
+        else:
+            self.rows_sql = f"SELECT {side.key}, {', '.join(side.columns)} FROM {side.source} {where}"
+
+    def _query(self, sql, params):
+        with self._lock:
+            self.queries += 1
+        return self.query(sql, params)
+
+    def range_checksum(self, low, high):
+        """(rows, checksum) of encounter_ids in (low, high]"""
+        if self.server_hash:
+            count, total = self._query(self.range_sql, (low, high))[0]
+            return int(count), int(total)
+        hashes = self.row_checksums(low, high)
+        return len(hashes), sum(hashes.values())
+
+    def row_checksums(self, low, high):
+        """{encounter_id: row hash} for encounter_ids in (low, high]"""
+        rows = self._query(self.rows_sql, (low, high))
+        if self.server_hash:
+            return {key: int(value) for key, value in rows}
+        return {row[0]: python_row_hash(row) for row in rows}
+
+    def row_values(self, ids, batch_size=500):
+        """{encounter_id: compared column values} for the given ids"""
+        values = {}
+        for i in range(0, len(ids), batch_size):
+            batch = tuple(ids[i:i + batch_size])
+            rows = self._query(f"SELECT {self.side.key}, {', '.join(self.side.columns)} FROM {self.side.source} "
+                               f"WHERE {self.side.key} IN ({', '.join(['%s'] * len(batch))})", batch)
+            values.update((row[0], row[1:]) for row in rows)
+        return values
+
+    def bounds(self):
+        """(min, max) key of this side, (None, None) when empty"""
+        return tuple(self._query(f"SELECT MIN({self.side.key}), MAX({self.side.key}) FROM {self.side.keys_from}",
+                                 None)[0])
+
+
+def split_range(low, high, parts):
+    """(low, high] cut into at most parts contiguous sub-ranges."""
+    step = max(-(-(high - low) // parts), 1)
+    return list(chunked_normalize.chunk_bounds(low, high, step))
+
+
+# ============================================================================
+# VERIFICATION
+# ============================================================================
+
+def verify(source, normalized, low=None, high=None, chunk_size=DEFAULT_CHUNK_SIZE, leaf_size=DEFAULT_LEAF_SIZE,
+           fanout=DEFAULT_FANOUT, workers=DEFAULT_WORKERS, max_rows=DEFAULT_MAX_ROWS, progress=print):
+    """Compare two Checksummers over (low, high]; returns the report dict.
+
+    Ranges are checked level by level; each level's checksums (both sides,
+    every range) run concurrently on `workers` threads. Drilling down stops
+    once max_rows differing rows are known (0 = no limit); ranges left
+    unexamined are listed under "unresolved_ranges".
+    """
+    start = time.perf_counter()
+    if low is None or high is None:
+        bounds = source.bounds() + normalized.bounds()
+        keys = [key for key in bounds if key is not None]
+        if low is None:
+            low = min(keys) - 1 if keys else 0
+        if high is None:
+            high = max(keys) if keys else 0
+    ranges = list(chunked_normalize.chunk_bounds(low, high, chunk_size))
+    progress(f"  encounter_id ({low}, {high}] in {len(ranges)} chunk(s) of {chunk_size:,}, {workers} worker(s)")
+
+    report = {"low": low, "high": high, "chunk_size": chunk_size, "leaf_size": leaf_size, "fanout": fanout,
+              "chunks": len(ranges), "source_rows": 0, "normalized_rows": 0, "mismatched_chunks": 0,
+              "missing": [], "extra": [], "changed": [], "unresolved_ranges": []}
+    differing = 0
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        level = 0
+        with run_metrics.stage("checksum chunks") as stage:
+            pending = _differing_ranges(executor, source, normalized, ranges, report)
+            stage.rows = report["source_rows"] + report["normalized_rows"]
+        report["mismatched_chunks"] = len(pending)
+        progress(f"  {report['source_rows']:,} source rows, {report['normalized_rows']:,} normalized rows, "
+                 f"{len(pending)} chunk(s) differ")
+
+        with run_metrics.stage("drill down"):
+            while pending:
+                if max_rows and differing >= max_rows:
+                    report["unresolved_ranges"] = [list(r) for r in pending]
+                    break
+                leaves = [r for r in pending if r[1] - r[0] <= leaf_size]
+                split = [part for r in pending if r[1] - r[0] > leaf_size for part in split_range(*r, fanout)]
+                for missing, extra, changed in executor.map(
+                        lambda r: _compare_rows(source, normalized, *r), leaves):
+                    report["missing"] += missing
+                    report["extra"] += extra
+                    report["changed"] += changed
+                    differing += len(missing) + len(extra) + len(changed)
+                level += 1
+                pending = _differing_ranges(executor, source, normalized, split) if split else []
+                if split:
+                    progress(f"  level {level}: {len(pending)} of {len(split)} sub-range(s) differ, "
+                             f"{differing:,} differing row(s) so far")
+
+        report["changed_rows"] = len(report["changed"])
+        if report["changed"]:
+            shown = report["changed"][:max_rows or None]
+            report["changed"] = _changed_columns(executor, source, normalized, shown)
+
+    for kind in ("missing", "extra"):
+        report[kind].sort()
+    report["checksum_queries"] = source.queries + normalized.queries
+    report["differing_rows"] = differing
+    report["match"] = differing == 0 and not report["unresolved_ranges"]
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    return report
+
+
+def _differing_ranges(executor, source, normalized, ranges, report=None):
+    """The ranges whose (rows, checksum) differ between the sides; adds row totals to report"""
+    source_sums = executor.map(lambda r: source.range_checksum(*r), ranges)
+    normalized_sums = executor.map(lambda r: normalized.range_checksum(*r), ranges)
+    differing = []
+    for r, left, right in zip(ranges, source_sums, normalized_sums):
+        if report is not None:
+            report["source_rows"] += left[0]
+            report["normalized_rows"] += right[0]
+        if left != right:
+            differing.append(r)
+    return differing
+
+
+def _compare_rows(source, normalized, low, high):
+    """(missing ids, extra ids, changed ids) of one leaf range"""
+    left = source.row_checksums(low, high)
+    right = normalized.row_checksums(low, high)
+    missing = [key for key in left if key not in right]
+    extra = [key for key in right if key not in left]
+    changed = sorted(key for key, value in left.items() if key in right and right[key] != value)
+    return missing, extra, changed
+
+
+def _changed_columns(executor, source, normalized, ids):
+    """[{encounter_id, columns: {column: [source value, normalized value]}}] for changed ids"""
+    left, right = executor.map(lambda side: side.row_values(ids), (source, normalized))
+    changed = []
+    for key in ids:
+        if key not in left or key not in right:
+            continue  # changed again since it was hashed
+        columns = {column: [_plain(a), _plain(b)]
+                   for (column, _), a, b in zip(COLUMNS, left[key], right[key]) if a != b}
+        changed.append({"encounter_id": key, "columns": columns})
+    return changed
+
+
+def _plain(value):
+    """JSON-friendly column value"""
+    return value if value is None or isinstance(value, (int, float, str)) else str(value)
+
+
+# ============================================================================
+# REPORTING
+# ============================================================================
+
+def print_report(report):
+    print()
+    print(f"Chunks checked      {report['chunks']:>12,}  ({report['chunk_size']:,} encounter_ids each)")
+    print(f"Source rows         {report['source_rows']:>12,}")
+    print(f"Normalized rows     {report['normalized_rows']:>12,}")
+    print(f"Differing chunks    {report['mismatched_chunks']:>12,}")
+    print(f"Checksum queries    {report['checksum_queries']:>12,}")
+    print(f"Elapsed             {report['seconds']:>12.2f}s")
+    if report["match"]:
+        print("\n[SUCCESS] healthcare_system_model_db matches the denormalized table")
+        return
+
+    print(f"\nMissing from normalized: {len(report['missing']):,}   "
+          f"Not in source: {len(report['extra']):,}   Changed: {report['changed_rows']:,}")
+    for kind in ("missing", "extra"):
+        if report[kind]:
+            ids = ", ".join(str(key) for key in report[kind][:SHOWN_ROWS])
+            more = f" ... (+{len(report[kind]) - SHOWN_ROWS:,})" if len(report[kind]) > SHOWN_ROWS else ""
+            print(f"  {kind:<8} encounter_id {ids}{more}")
+    for row in report["changed"][:SHOWN_ROWS]:
+        print(f"  changed  encounter_id {row['encounter_id']}:")
+        for column, (left, right) in row["columns"].items():
+            print(f"    {column:<36} {left!r} -> {right!r}")
+    if report["changed_rows"] > SHOWN_ROWS:
+        print(f"  ... {report['changed_rows'] - SHOWN_ROWS:,} more changed row(s)")
+    if report["unresolved_ranges"]:
+        print(f"  {len(report['unresolved_ranges'])} differing range(s) not drilled into (--max-rows reached): "
+              + ", ".join(f"({lo}, {hi}]" for lo, hi in report["unresolved_ranges"][:5]))
+
+
+# ============================================================================
+# MAIN
+# ============================================================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=backends.BACKENDS, default="mysql")
+    parser.add_argument("--db-file", help="database file for the sqlite/duckdb backends")
+    parser.add_argument("--user", default="root", help="MySQL user")
+    parser.add_argument("--password", help="MySQL password (prompted if omitted)")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--low", type=int, help="check encounter_ids above this (default: from the data)")
+    parser.add_argument("--high", type=int, help="check encounter_ids up to this (default: from the data)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"encounter_ids per top-level checksum (default: {DEFAULT_CHUNK_SIZE:,})")
+    parser.add_argument("--leaf-size", type=int, default=DEFAULT_LEAF_SIZE,
+                        help=f"compare ranges this small row by row (default: {DEFAULT_LEAF_SIZE:,})")
+    parser.add_argument("--fanout", type=int, default=DEFAULT_FANOUT,
+                        help=f"sub-ranges per differing range (default: {DEFAULT_FANOUT})")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"concurrent checksum queries (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--max-rows", type=int, default=DEFAULT_MAX_ROWS,
+                        help=f"stop drilling down after this many differing rows, 0 = all "
+                             f"(default: {DEFAULT_MAX_ROWS:,})")
+    parser.add_argument("--json", dest="json_out", help="also write the report to this JSON file")
+    run_metrics.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1 or args.leaf_size < 1 or args.workers < 1:
+        parser.error("--chunk-size, --leaf-size and --workers must be positive")
+    if args.fanout < 2:
+        parser.error("--fanout must be at least 2")
+    return args
+
+
+def run(args, metrics=None):
+    """Open the backend, verify and report; returns the report dict."""
+    if args.backend == "mysql":
+        if db_loader.load_driver()[0] is None:
+            raise RuntimeError("No MySQL driver installed (pip install pymysql)")
+        password = args.password if args.password is not None else getpass.getpass("  Password: ")
+        pool = db_loader.ConnectionPool(args.user, password, args.host, args.port, size=args.workers,
+                                        timeout=db_loader.scaled_timeout(args.chunk_size))
+        try:
+            query = backends.pool_query(pool)
+            source, normalized = (Checksummer(query, side, True) for side in sides(f"{TARGET_DB}."))
+            report = verify(source, normalized, args.low, args.high, args.chunk_size, args.leaf_size,
+                            args.fanout, args.workers, args.max_rows)
+        finally:
+            pool.close()
+    else:
+        backend = backends.open_embedded(args.backend, args.db_file)
+        try:
+            backend.use(TARGET_DB)  # the source stays reachable as healthcare_system.<table>
+            query = backends.backend_query(backend)
+            source, normalized = (Checksummer(query, side, False) for side in sides())
+            report = verify(source, normalized, args.low, args.high, args.chunk_size, args.leaf_size,
+                            args.fanout, args.workers, args.max_rows)
+        finally:
+            backend.close()
+    report["backend"] = args.backend
+    if metrics is not None:
+        metrics.rows = report["source_rows"] + report["normalized_rows"]
+        metrics.details.update(match=report["match"], differing_rows=report["differing_rows"])
+    return report
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with run_metrics.run("verify_checksums", args.metrics_json, args.metrics_prom,
+                         labels={"backend": args.backend, "chunk_size": args.chunk_size}) as metrics:
+        print(f"Verifying {TARGET_DB} against {SOURCE_TABLE} ({args.backend})...")
+        try:
+            report = run(args, metrics)
+        except Exception as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+
+        print_report(report)
+        if args.json_out:
+            directory = os.path.dirname(args.json_out)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(args.json_out, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, default=str)
+            print(f"Report written to {args.json_out}")
+        if not report["match"]:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
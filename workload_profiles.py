@@ -0,0 +1,356 @@
+"""
+Healthcare Data Generator - Workload Profiles
+Skewed, time-shaped encounter workloads for generate_bulk_data.py
+(--workload-profile). The default 'uniform' profile is the original
+generator: every key and date drawn independently and uniformly.
+
+A profile controls:
+
+  patient_skew / doctor_skew / diagnosis_skew
+        power-law exponent of key popularity (0 = uniform, ~1 = Zipf).
+        Rank r is drawn with weight (r + 1) ** -skew, and ranks are
+        scattered over the ID range by a fixed bijection so the hot rows
+        are not all adjacent in the primary key.
+  department_weights
+        every doctor belongs to one department (sized by these weights),
+        the doctors table uses it, and encounters take their doctor's
+        department instead of an independent one
+  month_weights / weekday_weights / hour_weights
+        seasonal, weekly and diurnal shape of encounter_date/_time
+  chronic_fraction / chronic_revisit_rate
+        share of patients with one fixed chronic diagnosis, and share of
+        encounters that are their follow-up visits (with their own doctor)
+
+Every draw is a pure function of the shard's random generator and the
+profile, so output stays reproducible for a given seed and shard count.
+"""
+
+import bisect
+import math
+from collections import namedtuple
+from dataclasses import dataclass, replace
+from datetime import date, timedelta
+from functools import lru_cache
+from itertools import accumulate
+from typing import Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Only needed for --mode pooled
+    np = None
+
+DEFAULT_PROFILE = "uniform"
+
+# Quarter-hour slots inside each hour, as in generate_bulk_data.TIME_STRINGS
+MINUTES = (0, 15, 30, 45)
+CLINIC_HOURS = tuple(1.0 if 8 <= h <= 18 else 0.0 for h in range(24))
+
+
+# ============================================================================
+# PROFILES
+# ============================================================================
+
+@dataclass(frozen=True)
+class WorkloadProfile:
+    """Shape of the generated encounter workload (see module docstring)"""
+    name: str
+    description: str = ""
+    patient_skew: float = 0.0
+    doctor_skew: float = 0.0
+    diagnosis_skew: float = 0.0
+    department_weights: Optional[Tuple[float, ...]] = None  # by department_id; None = independent
+    month_weights: Optional[Tuple[float, ...]] = None  # Jan..Dec
+    weekday_weights: Optional[Tuple[float, ...]] = None  # Mon..Sun
+    hour_weights: Optional[Tuple[float, ...]] = None  # 00..23; None = 08:00-18:45 uniform
+    chronic_fraction: float = 0.0
+    chronic_revisit_rate: float = 0.0
+
+    @property
+    def has_revisits(self):
+        return self.chronic_fraction > 0 and self.chronic_revisit_rate > 0
+
+    @property
+    def is_uniform(self):
+        """True when the profile changes nothing about the original generator"""
+        return not (self.patient_skew or self.doctor_skew or self.diagnosis_skew
+                    or self.department_weights or self.month_weights
+                    or self.weekday_weights or self.hour_weights or self.has_revisits)
+
+    def summary(self):
+        """One-line description of the parameters, for script headers and reports"""
+        parts = [f"skew patient={self.patient_skew:g} doctor={self.doctor_skew:g} "
+                 f"diagnosis={self.diagnosis_skew:g}"]
+        if self.department_weights:
+            parts.append("doctor->department fixed")
+        shape = [label for label, weights in (("seasonal", self.month_weights),
+                                              ("weekly", self.weekday_weights),
+                                              ("diurnal", self.hour_weights)) if weights]
+        if shape:
+            parts.append("/".join(shape) + " dates")
+        if self.has_revisits:
+            parts.append(f"chronic {self.chronic_fraction:.0%} of patients, "
+                         f"{self.chronic_revisit_rate:.0%} of encounters")
+        return f"{self.name} ({', '.join(parts)})"
+
+
+# Relative department sizes, in healthcare_dml.sql order:
+# Cardiology, Neurology, Orthopedics, Pediatrics, Oncology, Emergency Medicine,
+# Psychiatry, General Surgery, Dermatology, Gastroenterology
+DEPARTMENT_WEIGHTS = (1.4, 0.8, 1.0, 1.2, 0.7, 2.0, 0.6, 1.0, 0.5, 0.8)
+
+# Respiratory season: winter peak, summer trough
+WINTER_PEAK = (1.35, 1.30, 1.10, 0.95, 0.90, 0.80, 0.75, 0.80, 0.95, 1.05, 1.15, 1.30)
+FLU_SEASON = (1.90, 1.70, 1.20, 0.90, 0.75, 0.60, 0.55, 0.60, 0.80, 1.00, 1.40, 1.80)
+
+CLINIC_WEEK = (1.25, 1.10, 1.05, 1.05, 1.00, 0.30, 0.10)
+HOSPITAL_WEEK = (1.15, 1.05, 1.00, 1.00, 1.05, 0.90, 0.85)
+
+# Clinic day: morning and early-afternoon peaks, lunch dip
+CLINIC_DAY = (0, 0, 0, 0, 0, 0, 0, 0,
+              1.2, 1.8, 1.9, 1.5, 0.8, 1.1, 1.6, 1.5, 1.1, 0.7, 0.4,
+              0, 0, 0, 0, 0)
+# Hospital day: 24h, daytime bulk with an evening emergency shoulder
+HOSPITAL_DAY = (0.25, 0.20, 0.15, 0.15, 0.15, 0.20, 0.35, 0.60,
+                1.10, 1.40, 1.50, 1.40, 1.10, 1.20, 1.30, 1.30, 1.20, 1.10, 1.00,
+                0.90, 0.80, 0.65, 0.50, 0.35)
+
+PROFILES = {p.name: p for p in (
+    WorkloadProfile(
+        "uniform", "independent uniform keys and dates (the original generator)"),
+    WorkloadProfile(
+        "clinic", "outpatient clinic: moderate key skew, weekday office hours, "
+                  "winter peak, chronic follow-ups",
+        patient_skew=0.8, doctor_skew=0.6, diagnosis_skew=0.8,
+        department_weights=DEPARTMENT_WEIGHTS, month_weights=WINTER_PEAK,
+        weekday_weights=CLINIC_WEEK, hour_weights=CLINIC_DAY,
+        chronic_fraction=0.2, chronic_revisit_rate=0.35),
+    WorkloadProfile(
+        "hospital", "24h hospital: Zipfian patients and doctors, flu season, "
+                    "round-the-clock arrivals",
+        patient_skew=1.05, doctor_skew=1.0, diagnosis_skew=1.0,
+        department_weights=DEPARTMENT_WEIGHTS, month_weights=FLU_SEASON,
+        weekday_weights=HOSPITAL_WEEK, hour_weights=HOSPITAL_DAY,
+        chronic_fraction=0.15, chronic_revisit_rate=0.25),
+    WorkloadProfile(
+        "hotspot", "extreme key skew on uniform dates, for index hot-spot and "
+                   "GROUP BY skew tests",
+        patient_skew=1.4, doctor_skew=1.3, diagnosis_skew=1.2,
+        department_weights=DEPARTMENT_WEIGHTS),
+)}
+
+
+def get_profile(name=DEFAULT_PROFILE, **overrides):
+    """Look up a profile by name, replacing any parameters passed as non-None keywords"""
+    if name not in PROFILES:
+        raise ValueError(f"unknown workload profile {name!r} (choose from {', '.join(PROFILES)})")
+    profile = replace(PROFILES[name], **{k: v for k, v in overrides.items() if v is not None})
+    for field in ("patient_skew", "doctor_skew", "diagnosis_skew"):
+        if getattr(profile, field) < 0:
+            raise ValueError(f"{field} must be >= 0")
+    for field in ("chronic_fraction", "chronic_revisit_rate"):
+        if not 0 <= getattr(profile, field) <= 1:
+            raise ValueError(f"{field} must be between 0 and 1")
+    return profile
+
+
+# ============================================================================
+# SAMPLING PRIMITIVES
+# ============================================================================
+# Each primitive works on a float in [0, 1) (faker mode, random.Random) or
+# on a NumPy array of them (pooled mode), so both modes share one model.
+
+def _power_law_value(u, n, skew):
+    """Inverse CDF of the density x ** -skew on [1, n + 1), shifted to start at 0"""
+    if skew <= 0:
+        return u * n
+    if skew == 1:
+        return (n + 1) ** u - 1
+    a = 1 - skew
+    return (1 + u * ((n + 1) ** a - 1)) ** (1 / a) - 1
+
+def power_law_rank(u, n, skew):
+    """Map u in [0, 1) to a rank in [0, n); rank r has weight ~ (r + 1) ** -skew"""
+    return min(int(_power_law_value(u, n, skew)), n - 1)
+
+def power_law_ranks(u, n, skew):
+    """Vectorized power_law_rank() over a NumPy array of uniforms"""
+    return np.minimum(_power_law_value(u, n, skew).astype(np.int64), n - 1)
+
+def _mix(key):
+    """Knuth multiplicative hash of an integer key (or array) to [0, 2**32)"""
+    return (key * 2654435761) % 4294967296
+
+
+class KeyScatter:
+    """Fixed bijection from popularity rank [0, n) to IDs 1..n.
+
+    rank * step + offset (mod n) with step coprime to n, so consecutive
+    ranks land far apart and different salts give different hot sets.
+    """
+
+    def __init__(self, n, salt):
+        step = max(1, int(n * 0.6180339887498949))
+        while math.gcd(step, n) != 1:
+            step += 1
+        self.n = n
+        self.step = step
+        self.offset = (salt * 7919) % n
+
+    def __call__(self, rank):
+        return (rank * self.step + self.offset) % self.n + 1
+
+
+def weighted_table(values, weights):
+    """(values, cumulative weights) with zero-weight values dropped"""
+    kept = [(v, w) for v, w in zip(values, weights) if w > 0]
+    if not kept:
+        raise ValueError("every weight is zero")
+    return [v for v, _ in kept], list(accumulate(w for _, w in kept))
+
+def weighted_index(cdf, u):
+    """Index drawn from cumulative weights cdf by u in [0, 1)"""
+    return min(bisect.bisect_right(cdf, u * cdf[-1]), len(cdf) - 1)
+
+def weighted_indices(cdf, u):
+    """Vectorized weighted_index() over a NumPy cdf and array of uniforms"""
+    return np.minimum(np.searchsorted(cdf, u * cdf[-1], side='right'), len(cdf) - 1)
+
+@lru_cache(maxsize=None)
+def date_table(years, month_weights=None, weekday_weights=None):
+    """Every date in the year range as 'YYYY-MM-DD' plus its cumulative weight"""
+    day = date(years[0], 1, 1)
+    end = date(years[-1], 12, 31)
+    values, weights = [], []
+    while day <= end:
+        values.append(day.isoformat())
+        weights.append((month_weights[day.month - 1] if month_weights else 1.0)
+                       * (weekday_weights[day.weekday()] if weekday_weights else 1.0))
+        day += timedelta(days=1)
+    return weighted_table(values, weights)
+
+@lru_cache(maxsize=None)
+def time_table(hour_weights=None):
+    """Quarter-hour times as 'HH:MM:00' plus their cumulative weight"""
+    hours = hour_weights or CLINIC_HOURS
+    return weighted_table([f"{h:02d}:{m:02d}:00" for h in range(24) for m in MINUTES],
+                          [hours[h] for h in range(24) for _ in MINUTES])
+
+
+# ============================================================================
+# ENCOUNTER MODEL
+# ============================================================================
+
+Visit = namedtuple('Visit', ['patient', 'doctor', 'department', 'diagnosis',
+                             'date', 'time', 'revisit'])
+
+
+class EncounterModel:
+    """Draws the workload-shaped fields of encounters for one profile.
+
+    draw() takes a random.Random and returns one Visit (faker mode);
+    draw_batch() takes a NumPy Generator and returns a Visit of lists
+    (pooled mode). A revisit is a chronic patient's follow-up: the
+    patient comes from the chronic cohort and keeps the same chronic
+    diagnosis and doctor on every revisit.
+    """
+
+    def __init__(self, profile, num_patients, num_doctors, num_departments,
+                 num_diagnoses, chronic_diagnoses, years):
+        self.profile = profile
+        self.num_patients = num_patients
+        self.num_doctors = num_doctors
+        self.num_departments = num_departments
+        self.num_diagnoses = num_diagnoses
+        self.patient_keys = KeyScatter(num_patients, 1)
+        self.doctor_keys = KeyScatter(num_doctors, 2)
+        self.diagnosis_keys = KeyScatter(num_diagnoses, 3)
+        self.chronic_keys = KeyScatter(num_patients, 4)
+        self.chronic_patients = (max(1, round(num_patients * profile.chronic_fraction))
+                                 if profile.has_revisits and chronic_diagnoses else 0)
+        self.chronic_diagnoses = list(chronic_diagnoses)
+        self.department_cdf = None
+        if profile.department_weights:
+            if len(profile.department_weights) != num_departments:
+                raise ValueError(f"profile {profile.name!r} has {len(profile.department_weights)} "
+                                 f"department weights for {num_departments} departments")
+            self.department_cdf = list(accumulate(profile.department_weights))
+        self.dates, self.date_cdf = date_table(tuple(years), profile.month_weights,
+                                               profile.weekday_weights)
+        self.times, self.time_cdf = time_table(profile.hour_weights)
+        if np is not None:
+            self._chronic_array = np.asarray(self.chronic_diagnoses or [0])
+            self._department_cdf = np.asarray(self.department_cdf or [1.0])
+            self._date_cdf = np.asarray(self.date_cdf)
+            self._time_cdf = np.asarray(self.time_cdf)
+
+    @property
+    def fixed_departments(self):
+        return self.department_cdf is not None
+
+    # -- per-key mappings (hash-based, identical in every shard) ------------
+
+    def department_of(self, doctor_id):
+        """The one department a doctor works in"""
+        return weighted_index(self.department_cdf, _mix(doctor_id) / 4294967296) + 1
+
+    def departments_of(self, doctor_ids):
+        """Vectorized department_of() over a NumPy array of doctor IDs"""
+        return weighted_indices(self._department_cdf, _mix(doctor_ids) / 4294967296) + 1
+
+    def _chronic_index(self, patient_id):
+        return _mix(patient_id) % len(self.chronic_diagnoses)
+
+    def _own_doctor(self, patient_id):
+        return _mix(patient_id + 1) % self.num_doctors + 1
+
+    # -- draws --------------------------------------------------------------
+
+    def draw(self, rng):
+        """One Visit from a random.Random"""
+        profile = self.profile
+        revisit = self.chronic_patients > 0 and rng.random() < profile.chronic_revisit_rate
+        if revisit:
+            patient = self.chronic_keys(rng.randrange(self.chronic_patients))
+            diagnosis = self.chronic_diagnoses[self._chronic_index(patient)]
+            doctor = self._own_doctor(patient)
+        else:
+            patient = self.patient_keys(power_law_rank(rng.random(), self.num_patients,
+                                                       profile.patient_skew))
+            diagnosis = self.diagnosis_keys(power_law_rank(rng.random(), self.num_diagnoses,
+                                                           profile.diagnosis_skew))
+            doctor = self.doctor_keys(power_law_rank(rng.random(), self.num_doctors,
+                                                     profile.doctor_skew))
+        if self.fixed_departments:
+            department = self.department_of(doctor)
+        else:
+            department = rng.randint(1, self.num_departments)
+        encounter_date = self.dates[weighted_index(self.date_cdf, rng.random())]
+        encounter_time = self.times[weighted_index(self.time_cdf, rng.random())]
+        return Visit(patient, doctor, department, diagnosis, encounter_date, encounter_time, revisit)
+
+    def draw_batch(self, rng, n):
+        """A Visit of n-element lists from a NumPy Generator"""
+        profile = self.profile
+        patient = self.patient_keys(power_law_ranks(rng.random(n), self.num_patients,
+                                                    profile.patient_skew))
+        diagnosis = self.diagnosis_keys(power_law_ranks(rng.random(n), self.num_diagnoses,
+                                                        profile.diagnosis_skew))
+        doctor = self.doctor_keys(power_law_ranks(rng.random(n), self.num_doctors,
+                                                  profile.doctor_skew))
+        revisit = np.zeros(n, dtype=bool)
+        if self.chronic_patients:
+            revisit = rng.random(n) < profile.chronic_revisit_rate
+            chronic = self.chronic_keys(rng.integers(0, self.chronic_patients, n))
+            patient = np.where(revisit, chronic, patient)
+            diagnosis = np.where(revisit, self._chronic_array[self._chronic_index(chronic)], diagnosis)
+            doctor = np.where(revisit, self._own_doctor(chronic), doctor)
+        if self.fixed_departments:
+            department = self.departments_of(doctor)
+        else:
+            department = rng.integers(1, self.num_departments + 1, n)
+        date_index = weighted_indices(self._date_cdf, rng.random(n))
+        time_index = weighted_indices(self._time_cdf, rng.random(n))
+        dates, times = self.dates, self.times
+        return Visit(patient.tolist(), doctor.tolist(), department.tolist(), diagnosis.tolist(),
+                     [dates[i] for i in date_index.tolist()],
+                     [times[i] for i in time_index.tolist()], revisit.tolist())